@@ -0,0 +1,23 @@
+"""Add CoreDatabase.option_stream_upload.
+
+Opt-in streaming mode for the MySQL/MariaDB/PostgreSQL engines: the dump is zipped
+straight into S3 multipart uploads (apps/_tasks/integration/storage/streaming.py)
+instead of being materialized under _storage first. Existing nodes keep the on-disk
+path (default False).
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0017_alter_corelog_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coredatabase",
+            name="option_stream_upload",
+            field=models.BooleanField(default=False),
+        ),
+    ]
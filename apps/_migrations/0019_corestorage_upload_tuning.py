@@ -0,0 +1,32 @@
+"""Add CoreStorage.upload_part_size_mb / upload_max_concurrency / upload_bandwidth_limit_mbps.
+
+Per-storage multipart tuning for the shared S3-compatible upload engine
+(apps/_tasks/integration/storage/s3_compat.py). All nullable: existing storages keep
+the S3_UPLOAD_* defaults and no bandwidth cap.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0018_coredatabase_option_stream_upload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="corestorage",
+            name="upload_part_size_mb",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="corestorage",
+            name="upload_max_concurrency",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="corestorage",
+            name="upload_bandwidth_limit_mbps",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
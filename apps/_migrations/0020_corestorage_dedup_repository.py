@@ -0,0 +1,22 @@
+"""Add CoreStorage.dedup_repository.
+
+Opt-in deduplicating repository format for S3-compatible and Local Storage
+destinations (apps/_tasks/integration/storage/dedup.py). Existing storages keep
+uploading one zip per backup.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0019_corestorage_upload_tuning"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="corestorage",
+            name="dedup_repository",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+"""Add CoreSchedule.archive_format.
+
+Per-schedule archive format for file-based backups: zip (deflate) or tar
+compressed with multi-threaded zstd (apps/_tasks/integration/archive.py).
+Existing schedules keep producing zip archives.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0020_corestorage_dedup_repository"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coreschedule",
+            name="archive_format",
+            field=models.CharField(
+                choices=[("zip", "Zip (deflate)"), ("tar_zstd", "Tar + zstd (multi-threaded)")],
+                default="zip",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+"""Add CoreDatabase.dump_parallelism and CoreDatabase.option_postgres_directory.
+
+dump_parallelism bounds how many mysqldump / pg_dump processes a database
+backup runs at once (apps/_tasks/integration/backup/_parallel.py);
+option_postgres_directory switches direct PostgreSQL backups to a single
+``pg_dump -Fd -j N`` directory dump. Existing nodes keep dumping one at a time.
+"""
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0021_coreschedule_archive_format"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coredatabase",
+            name="dump_parallelism",
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(32),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="coredatabase",
+            name="option_postgres_directory",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+"""Add CoreDatabase.option_ssh_compress.
+
+SSH-mode database backups can gzip each dump on the database host before it
+crosses the network (apps/_tasks/integration/backup/_ssh_transport.py); the
+.sql.gz files are archived without recompression. Existing nodes keep
+transferring plain dumps (default False).
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0022_coredatabase_dump_parallelism"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coredatabase",
+            name="option_ssh_compress",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,59 @@
+"""Add incremental database backups.
+
+CoreDatabase.backup_mode chooses between a full dump every run (default, the
+existing behaviour) and a full base every full_backup_interval_days with
+incremental log backups in between. Each CoreDatabaseBackup of an incremental
+chain records its base_backup and chain_position so retention keeps chains
+whole.
+"""
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0023_coredatabase_option_ssh_compress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coredatabase",
+            name="backup_mode",
+            field=models.CharField(
+                choices=[
+                    ("dump", "Full dump every run"),
+                    ("incremental", "Full base + incremental logs"),
+                ],
+                default="dump",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="coredatabase",
+            name="full_backup_interval_days",
+            field=models.PositiveSmallIntegerField(
+                default=7,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(365),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="coredatabasebackup",
+            name="chain_position",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="coredatabasebackup",
+            name="base_backup",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="increments",
+                to="apps.coredatabasebackup",
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+"""Add incremental server-side tar website backups.
+
+CoreWebsite.BackupType gains INCREMENTAL_V2: the remote tar keeps a
+``--listed-incremental`` snapshot so each run ships only the files changed
+since the previous one, with a level-0 base every full_backup_interval_days.
+CoreWebsiteBackup records base_backup and chain_position like database
+chains, so retention and restores treat a chain as a unit.
+"""
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0024_coredatabase_backup_mode"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="corewebsite",
+            name="backup_type",
+            field=models.IntegerField(
+                choices=[
+                    (1, "Full"),
+                    (4, "Full (Server-Side Tar)"),
+                    (5, "Incremental (Server-Side Tar)"),
+                ],
+                default=1,
+            ),
+        ),
+        migrations.AddField(
+            model_name="corewebsite",
+            name="full_backup_interval_days",
+            field=models.PositiveSmallIntegerField(
+                default=7,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(365),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="corewebsitebackup",
+            name="chain_position",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="corewebsitebackup",
+            name="base_backup",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="increments",
+                to="apps.corewebsitebackup",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+"""Add CoreWebsite.transfer_tuning.
+
+Website mirrors learn their lftp parallelism and per-file segment count across
+runs (backup._lftp_tuning) instead of always using CoreWebsite.parallel.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0025_corewebsite_incremental_tar"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="corewebsite",
+            name="transfer_tuning",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
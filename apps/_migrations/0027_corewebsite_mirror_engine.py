@@ -0,0 +1,25 @@
+"""Add CoreWebsite.mirror_engine.
+
+Website mirrors can run on the in-process engine (backup._mirror) instead of
+the lftp binary; lftp stays the default.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0026_corewebsite_transfer_tuning"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="corewebsite",
+            name="mirror_engine",
+            field=models.CharField(
+                choices=[("lftp", "lftp"), ("native", "Native (in-process)")],
+                default="lftp",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+"""Add CoreSnapshotPoll.
+
+In-flight cloud / volume snapshots are tracked in one table and checked by the
+consolidated snapshot poller (helper.snapshot_poller), one provider call per
+connection per tick, instead of a self-requeueing task per snapshot.
+"""
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0027_corewebsite_mirror_engine"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CoreSnapshotPoll",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created", model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name="created")),
+                ("modified", model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name="modified")),
+                ("backup_id", models.BigIntegerField()),
+                ("started", models.FloatField()),
+                ("timeout", models.IntegerField(default=86400)),
+                ("next_poll", models.FloatField(db_index=True)),
+                ("checks", models.IntegerField(default=0)),
+                ("finished", models.FloatField(null=True)),
+                ("node", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="snapshot_polls", to="apps.corenode")),
+            ],
+            options={
+                "db_table": "core_snapshot_poll",
+                "constraints": [models.UniqueConstraint(fields=("node", "backup_id"), name="unique_snapshot_poll")],
+            },
+        ),
+    ]
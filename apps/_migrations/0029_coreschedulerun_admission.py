@@ -0,0 +1,44 @@
+"""Add admission fields to CoreScheduleRun.
+
+Scheduled runs are queued and started by the admission controller
+(helper.admission), with per-schedule jitter and per-resource concurrency
+limits, instead of being dispatched the moment beat fires. Existing runs were
+all dispatched immediately, so they default to admitted.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0028_coresnapshotpoll"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coreschedulerun",
+            name="status",
+            field=models.IntegerField(
+                choices=[(1, "Queued"), (2, "Admitted"), (3, "Skipped")], default=2
+            ),
+        ),
+        migrations.AddField(
+            model_name="coreschedulerun",
+            name="not_before",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name="coreschedulerun",
+            name="admitted",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name="coreschedulerun",
+            name="resources",
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="coreschedulerun",
+            index=models.Index(fields=["status", "not_before"], name="schedule_run_queue"),
+        ),
+    ]
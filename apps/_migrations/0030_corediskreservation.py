@@ -0,0 +1,39 @@
+"""Add CoreDiskReservation.
+
+Dumps and restores reserve their estimated bytes on the shared _storage volume
+in this ledger (helper.disk_ledger) instead of each checking free space on its
+own, so concurrent runs cannot together overcommit the volume.
+"""
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("apps", "0029_coreschedulerun_admission"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CoreDiskReservation",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created", model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name="created")),
+                ("modified", model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name="modified")),
+                ("key", models.CharField(max_length=255, unique=True)),
+                ("what", models.CharField(max_length=64)),
+                ("bytes", models.BigIntegerField()),
+                ("expires", models.FloatField()),
+                ("released", models.FloatField(db_index=True, null=True)),
+                ("dump_bytes", models.BigIntegerField(null=True)),
+                ("zip_bytes", models.BigIntegerField(null=True)),
+                ("node", models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="disk_reservations", to="apps.corenode")),
+            ],
+            options={
+                "db_table": "core_disk_reservation",
+            },
+        ),
+    ]
@@ -1698,3 +1698,19 @@ class RestoreStoragePointNotFound(APIException):
 
     def __str__(self):
         return f"{self.message}"
+
+
+class BackupManifestNotFound(APIException):
+    status_code = 404
+    default_detail = "No file manifest is available for one of these backups."
+    default_code = "backup_manifest_not_found"
+
+    def __init__(
+        self,
+        message="No file manifest is available for one of these backups.",
+    ):
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f"{self.message}"
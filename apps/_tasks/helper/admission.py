@@ -0,0 +1,239 @@
+"""Admission control for scheduled backups.
+
+Beat fires every schedule on its cron minute, so at midnight hundreds of
+backups would otherwise hit the same source servers, provider accounts,
+storage destinations and the shared _storage volume at once. Instead
+run_scheduled_backup queues a CoreScheduleRun (QUEUED) and the
+admit_scheduled_backups beat task, every SCHEDULER_TICK_SECONDS, starts the
+queued runs:
+
+  * not before their ``not_before`` -- the firing time plus a per-schedule
+    jitter of up to SCHEDULER_JITTER_SECONDS (jitter_seconds(), stable for a
+    schedule so its backups keep a regular spacing);
+  * only while every resource the run uses (resource_keys()) is under its
+    limit: SCHEDULER_MAX_PER_HOST backups per source host,
+    SCHEDULER_MAX_PER_CONNECTION per provider connection,
+    SCHEDULER_MAX_PER_STORAGE per storage destination,
+    SCHEDULER_MAX_LOCAL_DUMPS local dumps on _storage, and one per node
+    (0 = unlimited);
+  * oldest first; a run blocked on one host does not hold back runs for others.
+
+Usage is derived from the database, not counted in and out: a resource is held
+by each admitted run whose node is still backing up (or that was admitted less
+than ADMIT_GRACE seconds ago, before its worker picked it up), and by every
+other busy node -- an on-demand backup or a manual trigger.
+"""
+import hashlib
+import uuid
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.console.node.models import CoreNode, CoreSchedule, CoreScheduleRun
+
+# An admitted run holds its resources this long even before its node turns busy
+# (the backup task may still be waiting in its worker queue).
+ADMIT_GRACE = 600
+# Queued runs considered per admission tick.
+ADMIT_BATCH = 500
+# Cache lock held by a running admission tick.
+LOCK_KEY = "admit_scheduled_backups:lock"
+LOCK_TIMEOUT = 300
+
+BUSY = (
+    CoreNode.Status.BACKUP_READY,
+    CoreNode.Status.BACKUP_IN_PROGRESS,
+    CoreNode.Status.BACKUP_RETRYING,
+)
+# Node types dumped to the local _storage volume.
+LOCAL_DUMP_TYPES = (CoreNode.Type.WEBSITE, CoreNode.Type.DATABASE, CoreNode.Type.SAAS)
+
+
+def jitter_seconds(schedule_id):
+    """Delay of a schedule's runs after their firing time: a stable hash of the
+    schedule id in 0..SCHEDULER_JITTER_SECONDS."""
+    spread = settings.SCHEDULER_JITTER_SECONDS
+    if spread <= 0:
+        return 0
+    digest = hashlib.sha256(str(schedule_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % (spread + 1)
+
+
+def source_host(node):
+    """Host name of the server a website / database / WordPress node is dumped
+    from, None for API-only nodes."""
+    connection = node.connection
+    for relation in ("auth_website", "auth_database"):
+        try:
+            return getattr(connection, relation).host.strip().lower() or None
+        except (AttributeError, ObjectDoesNotExist):
+            continue
+    try:
+        return urlparse(connection.auth_wordpress.url).hostname
+    except (AttributeError, ObjectDoesNotExist):
+        return None
+
+
+def resource_keys(node, storage_ids=()):
+    """The resources a backup of `node` to `storage_ids` occupies."""
+    keys = [f"node:{node.id}", f"connection:{node.connection_id}"]
+    host = source_host(node)
+    if host:
+        keys.append(f"host:{host}")
+    if node.type in LOCAL_DUMP_TYPES:
+        keys.append("disk")
+    keys.extend(f"storage:{storage_id}" for storage_id in storage_ids or ())
+    return keys
+
+
+def limit(key):
+    """Concurrent backups allowed on resource `key` (0 = unlimited)."""
+    kind = key.split(":", 1)[0]
+    if kind == "node":
+        return 1
+    return {
+        "host": settings.SCHEDULER_MAX_PER_HOST,
+        "connection": settings.SCHEDULER_MAX_PER_CONNECTION,
+        "storage": settings.SCHEDULER_MAX_PER_STORAGE,
+        "disk": settings.SCHEDULER_MAX_LOCAL_DUMPS,
+    }.get(kind, 0)
+
+
+def usage(now=None):
+    """Counter of backups currently holding each resource (see the module docstring)."""
+    now = now or timezone.now()
+    busy = set(CoreNode.objects.filter(status__in=BUSY).values_list("id", flat=True))
+    held = Counter()
+    seen = set()
+    runs = (
+        CoreScheduleRun.objects.filter(status=CoreScheduleRun.Status.ADMITTED, admitted__isnull=False)
+        .filter(Q(admitted__gte=now - timedelta(seconds=ADMIT_GRACE)) | Q(schedule__node_id__in=busy))
+        .order_by("-admitted")
+        .values_list("schedule__node_id", "resources")
+    )
+    # Only a node's latest admitted run can still be running.
+    for node_id, resources in runs:
+        if node_id in seen:
+            continue
+        seen.add(node_id)
+        held.update(resources or ())
+    for node in CoreNode.objects.filter(id__in=busy - seen).select_related("connection"):
+        held.update(resource_keys(node))
+    return held
+
+
+def _fits(keys, held):
+    return all(not limit(key) or held[key] < limit(key) for key in keys)
+
+
+def queue(schedule, now=None):
+    """Queue a run of `schedule` for admission. A schedule with a run still
+    queued gets its new run recorded as SKIPPED instead -- the queued one
+    already covers it."""
+    now = now or timezone.now()
+    node = schedule.node
+    run = CoreScheduleRun(
+        schedule=schedule,
+        request_id=uuid.uuid4().hex,
+        not_before=now + timedelta(seconds=jitter_seconds(schedule.id)),
+        resources=resource_keys(node, schedule.storage_ids),
+    )
+    if CoreScheduleRun.objects.filter(schedule=schedule, status=CoreScheduleRun.Status.QUEUED).exists():
+        run.status = CoreScheduleRun.Status.SKIPPED
+    else:
+        run.status = CoreScheduleRun.Status.QUEUED
+    run.save()
+    return run
+
+
+def mark_admitted(run, now=None):
+    """Record a run dispatched outside the queue (a manual trigger) as holding
+    its node's resources."""
+    run.status = CoreScheduleRun.Status.ADMITTED
+    run.admitted = now or timezone.now()
+    run.resources = resource_keys(run.schedule.node, run.schedule.storage_ids)
+    run.save(update_fields=["status", "admitted", "resources", "modified"])
+
+
+def _dispatch(schedule):
+    current_app.send_task(
+        schedule.node.backup_task_name(),
+        kwargs={
+            "node_id": schedule.node.id,
+            "schedule_id": schedule.id,
+            "storage_ids": schedule.storage_ids,
+        },
+    )
+
+
+def admit(now=None):
+    """Admit the due queued runs that fit under the limits and dispatch their
+    backups. Returns the admitted runs."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = list(
+            CoreScheduleRun.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status=CoreScheduleRun.Status.QUEUED, not_before__lte=now)
+            .select_related("schedule__node__connection__integration")
+            .order_by("not_before", "id")[:ADMIT_BATCH]
+        )
+        if not due:
+            return []
+        held = usage(now)
+        admitted, skipped = [], []
+        for run in due:
+            if run.schedule.status != CoreSchedule.Status.ACTIVE:
+                # Paused or deleted while it waited.
+                run.status = CoreScheduleRun.Status.SKIPPED
+                skipped.append(run)
+                continue
+            keys = run.resources or resource_keys(run.schedule.node, run.schedule.storage_ids)
+            if not _fits(keys, held):
+                continue
+            held.update(keys)
+            run.status, run.admitted, run.resources = CoreScheduleRun.Status.ADMITTED, now, keys
+            admitted.append(run)
+        CoreScheduleRun.objects.bulk_update(admitted + skipped, ["status", "admitted", "resources"])
+    for run in admitted:
+        _dispatch(run.schedule)
+    return admitted
+
+
+def queue_depth(runs, now=None):
+    """Queue statistics for the CoreScheduleRun queryset `runs`: runs queued,
+    how many of them are due, the longest a due run has waited (seconds), and
+    how many due runs each kind of limit is holding back."""
+    now = now or timezone.now()
+    queued = runs.filter(status=CoreScheduleRun.Status.QUEUED)
+    due = list(queued.filter(not_before__lte=now).values_list("not_before", "resources"))
+    held = usage(now) if due else Counter()
+    blocked = Counter()
+    for _not_before, keys in due:
+        for kind in sorted({key.split(":", 1)[0] for key in keys or () if limit(key) and held[key] >= limit(key)}):
+            blocked[kind] += 1
+    return {
+        "queued": queued.count(),
+        "due": len(due),
+        "oldest_due_seconds": int((now - min(not_before for not_before, _ in due)).total_seconds()) if due else 0,
+        "blocked_by": dict(blocked),
+    }
+
+
+@current_app.task(name="admit_scheduled_backups", bind=True, ignore_result=True)
+def admit_scheduled_backups(self):
+    """Beat tick: start the queued scheduled backups that may run now (see admit).
+    Ticks never overlap: two admissions at once could both see a resource free."""
+    if not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        return
+    try:
+        admit()
+    finally:
+        cache.delete(LOCK_KEY)
@@ -0,0 +1,160 @@
+"""Disk-space reservations on the shared _storage volume.
+
+ensure_disk_space only compares one run's estimate with the free space, so ten
+dumps starting together all see the same free space and together fill the
+volume. Dumps and restores reserve their estimate here instead
+(reserve_disk_space): a reservation is granted while the free space, minus what
+the other running dumps and restores have reserved, still covers it. Otherwise
+the worker waits -- up to DISK_RESERVATION_WAIT seconds, checking every
+_POLL_INTERVAL -- for the others to finish, and then fails like the preflight
+always did (the backup is retried later). With nothing else reserved it fails
+at once, as waiting cannot help.
+
+A reservation is keyed by the run's _storage name (the backup uuid, or
+restore_<uuid>) and released by delete_from_disk when the run's working files
+are removed: the finished archive is then on disk, in the free space, and
+nothing more is written for it. A worker that died holding one stops counting
+after DISK_RESERVATION_TTL seconds. Counting the full estimate of a running
+dump, part of which it has already written, errs on the safe side.
+
+Estimates (estimate_bytes) start from the node's last archive size. Each dump
+that completes records its dump and archive sizes; once a node has such
+history, its median dump / archive ratio replaces the fixed multipliers.
+"""
+import os
+import shutil
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.api.v1.utils.api_helpers import ensure_disk_space, get_directory_size
+from apps.console.backup.models import CoreDiskReservation
+
+# Completed dumps per node kept as dump / archive ratio history.
+HISTORY_SIZE = 10
+# Headroom on history-based estimates (dumps grow between runs).
+ESTIMATE_MARGIN = 1.2
+LOCK_KEY = "disk_reservation:lock"
+LOCK_TIMEOUT = 30
+_LOCK_INTERVAL = 0.2
+_POLL_INTERVAL = 5
+
+
+def dump_ratio(node_id):
+    """Median dump size / archive size of the node's recent dumps, or None."""
+    samples = [
+        dump_bytes / zip_bytes
+        for dump_bytes, zip_bytes in CoreDiskReservation.objects.filter(
+            node_id=node_id, released__isnull=False, dump_bytes__gt=0, zip_bytes__gt=0
+        )
+        .order_by("-released")
+        .values_list("dump_bytes", "zip_bytes")[:HISTORY_SIZE]
+    ]
+    return statistics.median(samples) if samples else None
+
+
+def estimate_bytes(node, zip_bytes, *, multiplier, floor=1 << 30, refine=True):
+    """Bytes a run needs on _storage given the node's last archive size: the
+    dump plus its archive by the node's dump / archive ratio when `refine` and
+    there is history, `multiplier` x zip_bytes otherwise; at least `floor`."""
+    ratio = dump_ratio(node.id) if refine and node is not None else None
+    if ratio is not None:
+        needed = (1 + ratio) * (zip_bytes or 0) * ESTIMATE_MARGIN
+    else:
+        needed = multiplier * (zip_bytes or 0)
+    return int(max(needed, floor))
+
+
+@contextmanager
+def _lock():
+    # The cache is the database cache, shared by every worker; the entry's own
+    # timeout frees the lock if its holder died.
+    while not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        time.sleep(_LOCK_INTERVAL)
+    try:
+        yield
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def reserved_bytes(exclude_key=None):
+    """Bytes reserved by the live reservations (other than `exclude_key`)."""
+    reservations = CoreDiskReservation.objects.filter(released__isnull=True, expires__gt=time.time())
+    if exclude_key:
+        reservations = reservations.exclude(key=exclude_key)
+    return sum(reservations.values_list("bytes", flat=True))
+
+
+def reserve_disk_space(key, needed_bytes, *, node=None, what="backup", path="_storage"):
+    """Reserve `needed_bytes` on the volume holding `path` for the run whose
+    _storage name is `key`, waiting for other runs' reservations if the volume
+    is overcommitted (see the module docstring). Raises RuntimeError when the
+    space does not become available."""
+    deadline = time.monotonic() + settings.DISK_RESERVATION_WAIT
+    while True:
+        with _lock():
+            # Reservations of workers that died without releasing them.
+            CoreDiskReservation.objects.filter(released__isnull=True, expires__lte=time.time()).delete()
+            free = shutil.disk_usage(path).free
+            reserved = reserved_bytes(exclude_key=key)
+            if needed_bytes <= free - reserved:
+                CoreDiskReservation.objects.update_or_create(
+                    key=key,
+                    defaults={
+                        "node": node, "what": what, "bytes": needed_bytes,
+                        "expires": time.time() + settings.DISK_RESERVATION_TTL,
+                        "released": None, "dump_bytes": None, "zip_bytes": None,
+                    },
+                )
+                return
+        if not reserved:
+            # Nothing to wait for: the plain free-space check's error.
+            ensure_disk_space(needed_bytes, path=path, what=what)
+            continue
+        if time.monotonic() >= deadline:
+            raise RuntimeError(
+                f"Not enough free disk space for {what}: "
+                f"need ~{needed_bytes / (1024 ** 3):.2f} GB, "
+                f"have ~{free / (1024 ** 3):.2f} GB free, "
+                f"~{reserved / (1024 ** 3):.2f} GB of it reserved by running backups/restores"
+            )
+        time.sleep(_POLL_INTERVAL)
+
+
+def _trim_history(node_id):
+    keep = (
+        CoreDiskReservation.objects.filter(node_id=node_id, released__isnull=False)
+        .order_by("-released")
+        .values_list("id", flat=True)[:HISTORY_SIZE]
+    )
+    CoreDiskReservation.objects.filter(node_id=node_id, released__isnull=False).exclude(id__in=list(keep)).delete()
+
+
+def release_disk_space(key, *, dump_bytes=None, zip_bytes=None):
+    """Release the reservation of `key`, keeping the dump and archive sizes
+    (when both are known) as its node's history."""
+    reservation = CoreDiskReservation.objects.filter(key=key, released__isnull=True).first()
+    if reservation is None:
+        return
+    if reservation.node_id is None or not dump_bytes or not zip_bytes:
+        reservation.delete()
+        return
+    reservation.released = time.time()
+    reservation.dump_bytes, reservation.zip_bytes = dump_bytes, zip_bytes
+    reservation.save(update_fields=["released", "dump_bytes", "zip_bytes", "modified"])
+    _trim_history(reservation.node_id)
+
+
+def working_sizes(storage_dir, key):
+    """(dump bytes, archive bytes) of the run `key` in `storage_dir`, each None
+    when absent -- measured by delete_from_disk before it removes them."""
+    if os.path.basename(key) != key or key in ("", ".", ".."):
+        return None, None
+    dump_dir = os.path.join(storage_dir, key)
+    archive = os.path.join(storage_dir, f"{key}.zip")
+    dump_bytes = get_directory_size(dump_dir) if os.path.isdir(dump_dir) else None
+    zip_bytes = os.path.getsize(archive) if os.path.isfile(archive) else None
+    return dump_bytes, zip_bytes
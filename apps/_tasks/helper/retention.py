@@ -0,0 +1,177 @@
+"""Schedule retention (CoreSchedule.keep_last).
+
+Once a backup completes, the schedule keeps its newest ``keep_last`` completed
+backups and deletes the rest. Incremental backups (CoreDatabase.backup_mode
+incremental, website INCREMENTAL_V2 tars) are only restorable together with
+their chain: the full base (``base_backup``) and every earlier increment on top
+of it. A kept increment therefore keeps its whole chain, so a base is deleted
+only once no kept backup depends on it.
+
+apply_retention() runs inside finalize_backup and the snapshot poller's
+_settle (helper/snapshot_poller.py), so it only decides: expired_backups()
+ranks the schedule's completed backups in the database (ROW_NUMBER() over
+created), the expired ones are claimed as DELETE_REQUESTED in one statement,
+and delete_expired_backups tasks (the "cloud" queue, never "storage") delete
+them in batches of RETENTION_BATCH_SIZE. File backups are deleted per storage
+through StorageBackend.delete_many -- one S3 DeleteObjects per 1000 keys, one
+Drive batch request per 100 files -- instead of a client and a request per
+file.
+"""
+from celery import current_app
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from sentry_sdk import capture_exception
+
+from apps.console.utils.models import UtilBackup
+
+
+def _is_chained(model):
+    return any(field.name == "base_backup" for field in model._meta.concrete_fields)
+
+
+def expired_backups(backups, keep_last):
+    """Ids (oldest first) of the backups in the `backups` queryset that retention
+    deletes: all but the newest keep_last, minus the chains the kept ones need."""
+    ranked = backups.annotate(
+        retention_rank=Window(RowNumber(), order_by=[F("created").desc(), F("id").desc()])
+    )
+    fields = ("id", "created", "base_backup_id") if _is_chained(backups.model) else ("id", "created")
+    expired = list(ranked.filter(retention_rank__gt=keep_last).values_list(*fields).order_by("created", "id"))
+    if not expired or len(fields) == 2:
+        return [row[0] for row in expired]
+
+    # Newest kept backup of each chain that has one among the kept backups.
+    pins = {}
+    for base_id, created in ranked.filter(retention_rank__lte=keep_last).values_list("base_backup_id", "created"):
+        if base_id is not None and (base_id not in pins or created > pins[base_id]):
+            pins[base_id] = created
+    return [
+        backup_id for backup_id, created, base_id in expired
+        if backup_id not in pins and not (base_id in pins and created <= pins[base_id])
+    ]
+
+
+def apply_retention(backup):
+    """Queue the deletion of the completed backups of backup's schedule beyond keep_last."""
+    schedule = backup.schedule
+    if not schedule or (schedule.keep_last or 0) <= 0:
+        return
+    model = backup.__class__
+    expired = expired_backups(
+        model.objects.filter(schedule=schedule, status=UtilBackup.Status.COMPLETE), schedule.keep_last
+    )
+    if not expired:
+        return
+    with transaction.atomic():
+        # Rows another sweep already claimed stay with that sweep.
+        claimed = list(
+            model.objects.select_for_update(skip_locked=True)
+            .filter(id__in=expired, status=UtilBackup.Status.COMPLETE)
+            .values_list("id", flat=True)
+        )
+        model.objects.filter(id__in=claimed).update(status=UtilBackup.Status.DELETE_REQUESTED)
+    batch = settings.RETENTION_BATCH_SIZE
+    for start in range(0, len(claimed), batch):
+        delete_expired_backups.apply_async(args=[model._meta.label, claimed[start:start + batch]])
+
+
+def _storage_point_model(model):
+    """The <backup>StoragePoints model of a file backup model, None for snapshots."""
+    from apps.console.backup.models import BaseBackupStoragePoints
+
+    for relation in model._meta.related_objects:
+        if issubclass(relation.related_model, BaseBackupStoragePoints) and relation.field.name == "backup":
+            return relation.related_model
+    return None
+
+
+def _log_deletion(point, error=None):
+    backup, storage = point.backup, point.storage
+    if error is None:
+        message = f"Backup {backup.uuid_str} was deleted from storage point {storage.name} - {storage.type.name}."
+    else:
+        message = (
+            f"Backup {backup.uuid_str} "
+            f"unable to delete from storage point {storage.name} - {storage.type.name}. "
+            f"Error: {error}"
+        )
+    storage.account.create_storage_log(message, backup.node, backup, storage)
+
+
+def delete_stored_backups(points):
+    """Delete the stored files of `points` (storage points of one model), one
+    StorageBackend.delete_many call per storage; dedup repository backups are
+    deleted together per repository (dedup.delete_backups). Points end
+    DELETE_COMPLETED or DELETE_FAILED, each with its storage log entry, except
+    dedup backups on a no_delete local storage, which are left as they are."""
+    from apps._tasks.integration.storage.dedup import delete_backups, is_dedup_point, keeps_files
+    from apps._tasks.integration.storage.registry import get_backend
+
+    by_storage = {}
+    for point in points:
+        if point.storage_file_id and point.status != point.Status.DELETE_COMPLETED:
+            by_storage.setdefault(point.storage_id, []).append(point)
+
+    for group in by_storage.values():
+        storage = group[0].storage
+        dedup = [point for point in group if is_dedup_point(point)]
+        plain = [point for point in group if not is_dedup_point(point)]
+        if dedup and keeps_files(storage):
+            group, dedup = plain, []
+        if not group:
+            continue
+        errors = delete_backups(dedup) if dedup else {}
+        backend = get_backend(storage.type.code)
+        if plain and backend:
+            errors.update(backend.delete_many(plain))
+
+        point_model = type(group[0])
+        failed = [point.id for point in group if point.id in errors]
+        point_model.objects.filter(id__in=failed).update(status=point_model.Status.DELETE_FAILED)
+        point_model.objects.filter(id__in=[point.id for point in group if point.id not in errors]).update(
+            status=point_model.Status.DELETE_COMPLETED
+        )
+        for point in group:
+            _log_deletion(point, errors.get(point.id))
+
+
+@current_app.task(
+    name="delete_expired_backups",
+    bind=True,
+    ignore_result=True,
+    default_retry_delay=300,
+    max_retries=3,
+)
+def delete_expired_backups(self, model_label, backup_ids):
+    """Delete a batch of backups apply_retention claimed (DELETE_REQUESTED)."""
+    model = apps.get_model(model_label)
+    backups = list(model.objects.filter(id__in=backup_ids, status=UtilBackup.Status.DELETE_REQUESTED))
+    if not backups:
+        return
+    ids = [backup.id for backup in backups]
+    model.objects.filter(id__in=ids).update(status=UtilBackup.Status.DELETE_IN_PROGRESS)
+
+    point_model = _storage_point_model(model)
+    if point_model is None:
+        # Provider snapshots have no batch API; each goes through its own.
+        for backup in backups:
+            try:
+                backup.soft_delete()
+            except Exception as e:
+                capture_exception(e)
+        return
+
+    try:
+        delete_stored_backups(
+            point_model.objects.filter(backup_id__in=ids).select_related(
+                "backup", "storage__type", "storage__account"
+            )
+        )
+    except Exception as e:
+        # Put the batch back so the retry picks it up again.
+        model.objects.filter(id__in=ids).update(status=UtilBackup.Status.DELETE_REQUESTED)
+        raise self.retry(exc=e)
+    model.objects.filter(id__in=ids).update(status=UtilBackup.Status.DELETE_COMPLETED)
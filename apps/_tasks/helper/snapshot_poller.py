@@ -0,0 +1,224 @@
+"""Consolidated polling of in-flight cloud / volume snapshots.
+
+A backup engine hands its snapshot to poll_cloud_backup, which registers it
+here (a CoreSnapshotPoll row) and checks it once. From then on the
+poll_cloud_snapshots beat task, every CLOUD_POLL_MIN_INTERVAL seconds, claims
+the snapshots that are due and dispatches one poll_connection_snapshots task
+per provider connection. That task checks them together: providers with a
+batch API (a ``poll_many`` classmethod on the backup model -- AWS
+DescribeImages / DescribeSnapshots with many ids, the DigitalOcean action and
+snapshot listings) cost one or two calls per connection; the others fall back
+to one poll_status() per snapshot, still within the one task.
+
+Intervals adapt per node (next_interval): without history a snapshot is
+checked every CLOUD_POLL_INTERVAL seconds; with it, checks halve the gap to the
+node's median completion time and back off once a snapshot runs late, always
+within CLOUD_POLL_MIN_INTERVAL..CLOUD_POLL_MAX_INTERVAL.
+"""
+import statistics
+import time
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from sentry_sdk import capture_exception
+
+from apps._tasks.exceptions import NodeBackupFailedError, NodeBackupStatusCheckTimeOutError
+from apps._tasks.helper.retention import apply_retention
+from apps.console.backup.models import CoreSnapshotPoll
+from apps.console.node.models import CoreNode
+from apps.console.utils.models import UtilBackup
+
+# Completed snapshots per node kept as completion-time history.
+HISTORY_SIZE = 10
+# Due snapshots are pushed this far out while their connection's task runs, so
+# the next tick does not dispatch them again (and retries them if it died).
+CLAIM_SECONDS = 600
+
+# Backups in any of these states are no longer waited on (completed elsewhere,
+# cancelled, or queued/processed for deletion).
+TERMINAL = (
+    UtilBackup.Status.COMPLETE,
+    UtilBackup.Status.FAILED,
+    UtilBackup.Status.TIMEOUT,
+    UtilBackup.Status.CANCELLED,
+    UtilBackup.Status.DELETE_REQUESTED,
+    UtilBackup.Status.DELETE_IN_PROGRESS,
+    UtilBackup.Status.DELETE_COMPLETED,
+)
+
+
+def next_interval(expected, elapsed):
+    """Seconds until the next check of a snapshot running for `elapsed` seconds
+    on a node whose snapshots usually take `expected` (None: no history)."""
+    if expected is None:
+        interval = settings.CLOUD_POLL_INTERVAL
+    elif elapsed < expected:
+        # Few checks early on, closer together near the expected finish.
+        interval = (expected - elapsed) / 2
+    else:
+        # Running late: back off in proportion to how late.
+        interval = (elapsed - expected) / 2
+    return max(settings.CLOUD_POLL_MIN_INTERVAL, min(settings.CLOUD_POLL_MAX_INTERVAL, interval))
+
+
+def expected_seconds(node_id):
+    """Median completion time of the node's recent snapshots, or None."""
+    durations = [
+        finished - started
+        for started, finished in CoreSnapshotPoll.objects.filter(node_id=node_id, finished__isnull=False)
+        .order_by("-finished")
+        .values_list("started", "finished")[:HISTORY_SIZE]
+    ]
+    return statistics.median(durations) if durations else None
+
+
+def _trim_history(node_id):
+    keep = (
+        CoreSnapshotPoll.objects.filter(node_id=node_id, finished__isnull=False)
+        .order_by("-finished")
+        .values_list("id", flat=True)[:HISTORY_SIZE]
+    )
+    CoreSnapshotPoll.objects.filter(node_id=node_id, finished__isnull=False).exclude(id__in=list(keep)).delete()
+
+
+def check_statuses(backups):
+    """{backup id: status} for `backups`: through the model's poll_many for each
+    connection's group where available, poll_status() for whatever is left.
+    A failed check counts as IN_PROGRESS, never as a failed backup."""
+    groups = {}
+    for backup in backups:
+        groups.setdefault((type(backup), backup.node.connection_id), []).append(backup)
+
+    statuses = {}
+    for (model, _connection_id), group in groups.items():
+        poll_many = getattr(model, "poll_many", None)
+        if poll_many is not None and len(group) > 1:
+            try:
+                statuses.update(poll_many(group))
+            except Exception as e:
+                capture_exception(e)
+        for backup in group:
+            if backup.id in statuses:
+                continue
+            try:
+                statuses[backup.id] = backup.poll_status()
+            except Exception as e:
+                # poll_status is meant to swallow transient errors itself; if an
+                # unexpected one escapes, treat it as "still in progress".
+                capture_exception(e)
+                statuses[backup.id] = UtilBackup.Status.IN_PROGRESS
+    return statuses
+
+
+def _settle(poll, backup, status, now, expected):
+    node = poll.node
+    if status == UtilBackup.Status.COMPLETE:
+        node.backup_complete_reset(backup.celery_task_id)
+        poll.finished = now
+        poll.save(update_fields=["finished", "modified"])
+        _trim_history(node.id)
+        # Retention: keep only the newest keep_last completed backups for the schedule.
+        apply_retention(backup)
+        node.notify_backup_success(backup)
+    elif status == UtilBackup.Status.FAILED:
+        backup.status = UtilBackup.Status.FAILED
+        backup.save()
+        poll.delete()
+        node.backup_complete_reset()  # return node to ACTIVE (no celery id -> node only)
+        node.notify_backup_fail(
+            NodeBackupFailedError(
+                node, backup.uuid_str, backup.attempt_no, backup.type,
+                "Cloud provider reported the snapshot as errored.",
+            ),
+            backup.type,
+        )
+    elif now - poll.started > poll.timeout:
+        poll.delete()
+        node.backup_timeout_reset(backup.celery_task_id)
+        node.notify_backup_fail(
+            NodeBackupStatusCheckTimeOutError(node, backup.uuid_str), backup.type
+        )
+    else:
+        poll.checks += 1
+        poll.next_poll = now + next_interval(expected, now - poll.started)
+        poll.save(update_fields=["checks", "next_poll", "modified"])
+
+
+def poll_snapshots(poll_ids):
+    """Check the snapshots of the given CoreSnapshotPoll rows and settle them:
+    finalize (retention + success notify), fail, time out, or schedule the
+    next check."""
+    polls = list(
+        CoreSnapshotPoll.objects.filter(id__in=poll_ids, finished__isnull=True)
+        .select_related("node__connection__integration")
+    )
+    pending = []
+    for poll in polls:
+        backup = poll.backup
+        if backup is None or backup.status in TERMINAL:
+            poll.delete()
+        else:
+            pending.append((poll, backup))
+    if not pending:
+        return
+
+    statuses = check_statuses([backup for _poll, backup in pending])
+    now = time.time()
+    expected = {}
+    for poll, backup in pending:
+        if poll.node_id not in expected:
+            expected[poll.node_id] = expected_seconds(poll.node_id)
+        try:
+            _settle(poll, backup, statuses.get(backup.id, UtilBackup.Status.IN_PROGRESS), now,
+                    expected[poll.node_id])
+        except Exception as e:
+            capture_exception(e)
+
+
+def watch(node_id, backup_id, *, started_at=None, timeout=86400):
+    """Register a snapshot with the poller and check it right away."""
+    try:
+        node = CoreNode.objects.get(id=node_id)
+    except CoreNode.DoesNotExist:
+        return
+    now = time.time()
+    poll, created = CoreSnapshotPoll.objects.get_or_create(
+        node=node, backup_id=backup_id,
+        defaults={"started": started_at or now, "next_poll": now, "timeout": timeout},
+    )
+    if not created and poll.finished is not None:
+        # The backup is being snapshotted again (a retried attempt).
+        poll.started, poll.finished, poll.checks = now, None, 0
+        poll.save(update_fields=["started", "finished", "checks", "modified"])
+    poll_snapshots([poll.id])
+
+
+@current_app.task(name="poll_connection_snapshots", bind=True, ignore_result=True)
+def poll_connection_snapshots(self, poll_ids):
+    """Check the due snapshots of one provider connection (see poll_snapshots)."""
+    poll_snapshots(poll_ids)
+
+
+@current_app.task(name="poll_cloud_snapshots", bind=True, ignore_result=True)
+def poll_cloud_snapshots(self):
+    """Beat tick: claim the due snapshots and dispatch one
+    poll_connection_snapshots per connection."""
+    now = time.time()
+    with transaction.atomic():
+        due = list(
+            CoreSnapshotPoll.objects.select_for_update(skip_locked=True)
+            .filter(finished__isnull=True, next_poll__lte=now)
+            .values_list("id", "node_id")
+        )
+        CoreSnapshotPoll.objects.filter(id__in=[poll_id for poll_id, _ in due]).update(
+            next_poll=now + CLAIM_SECONDS
+        )
+    connections = dict(
+        CoreNode.objects.filter(id__in={node_id for _, node_id in due}).values_list("id", "connection_id")
+    )
+    by_connection = {}
+    for poll_id, node_id in due:
+        by_connection.setdefault(connections.get(node_id), []).append(poll_id)
+    for poll_ids in by_connection.values():
+        poll_connection_snapshots.apply_async(args=[poll_ids])
@@ -2,7 +2,6 @@ import datetime
 import json
 import os
 import shutil
-import uuid
 import boto3
 import humanfriendly
 import pytz
@@ -27,11 +26,13 @@ from slack_sdk import WebhookClient
 
 @current_app.task(name="run_scheduled_backup", bind=True, ignore_result=True)
 def run_scheduled_backup(self, schedule_id=None):
-    """Fired by django-celery-beat for each active schedule; enqueues the node backup.
+    """Fired by django-celery-beat for each active schedule; queues the node backup.
 
     Replaces the SaaS path where AWS EventBridge called /schedules/{id}/trigger/.
+    The run starts once the admission controller (helper.admission) admits it.
     """
-    from apps.console.node.models import CoreSchedule, CoreScheduleRun
+    from apps._tasks.helper.admission import queue
+    from apps.console.node.models import CoreSchedule
 
     try:
         schedule = CoreSchedule.objects.get(
@@ -40,15 +41,7 @@ def run_scheduled_backup(self, schedule_id=None):
     except CoreSchedule.DoesNotExist:
         return
 
-    CoreScheduleRun.objects.create(schedule=schedule, request_id=uuid.uuid4().hex)
-    current_app.send_task(
-        schedule.node.backup_task_name(),
-        kwargs={
-            "node_id": schedule.node.id,
-            "schedule_id": schedule.id,
-            "storage_ids": schedule.storage_ids,
-        },
-    )
+    queue(schedule)
 
 
 @current_app.task(
@@ -93,7 +86,8 @@ def delete_from_disk(self, backup_uuid, path_type):
         "both" -> the working directory and the archive
 
     The run log (<uuid>.log) is intentionally kept on disk and pruned later by
-    delete_old_logs; it is never removed here.
+    delete_old_logs; it is never removed here. The run's disk-space reservation
+    (helper.disk_ledger) is released once its files are gone.
 
     Uses plain Python file operations -- no shell, no sudo, no hardcoded host paths --
     and is idempotent: a missing file is success, not an error. Only unexpected failures
@@ -115,6 +109,16 @@ def delete_from_disk(self, backup_uuid, path_type):
             except FileNotFoundError:
                 pass
 
+    from apps._tasks.helper.disk_ledger import release_disk_space, working_sizes
+
+    # A finished dump's sizes refine the node's next disk-space estimate.
+    sizes = {}
+    if path_type == "dir":
+        try:
+            sizes["dump_bytes"], sizes["zip_bytes"] = working_sizes(storage_dir, backup_uuid)
+        except Exception as e:
+            capture_exception(e)
+
     try:
         if path_type in ("dir", "both"):
             _remove(backup_uuid, is_dir=True)
@@ -125,12 +129,18 @@ def delete_from_disk(self, backup_uuid, path_type):
         capture_exception(e)
         raise self.retry()
 
+    # Nothing more is written for this run: its disk-space reservation ends.
+    try:
+        release_disk_space(backup_uuid, **sizes)
+    except Exception as e:
+        capture_exception(e)
+
 
 @current_app.task(name="delete_old_logs", bind=True, ignore_result=True)
 def delete_old_logs(self, max_age_days=None):
     """Prune backup run logs from local _storage once they pass the retention window.
 
-    Self-hosted builds keep run logs (and the .files/.md5 artefacts) on the container
+    Self-hosted builds keep run logs (and the .files/.manifest/.md5 artefacts) on the container
     instead of uploading them anywhere, so this task is what bounds their disk usage.
     It is scheduled daily by Celery beat (see CELERY_BEAT_SCHEDULE). max_age_days
     defaults to settings.LOG_RETENTION_DAYS (30).
@@ -139,7 +149,7 @@ def delete_old_logs(self, max_age_days=None):
         max_age_days = getattr(settings, "LOG_RETENTION_DAYS", 30)
     storage_dir = os.path.realpath(os.path.join(settings.BASE_DIR, "_storage"))
     cutoff = time.time() - (max_age_days * 86400)
-    suffixes = (".log", ".files", ".md5")
+    suffixes = (".log", ".files", ".manifest", ".md5")
     try:
         with os.scandir(storage_dir) as entries:
             for entry in entries:
@@ -176,96 +186,21 @@ def delete_old_db_logs(self):
 def poll_cloud_backup(self, node_id, backup_id, started_at=None, interval=120, timeout=86400):
     """Asynchronously wait for a cloud / volume snapshot to finish.
 
-    Runs ONE status check per invocation and re-queues itself between checks, so the
-    worker is never blocked for the whole (potentially hours-long) snapshot -- replacing
-    the old blocking `while ...: time.sleep(60)` poll inside each backup model.
+    Hands the snapshot to the consolidated snapshot poller (helper.snapshot_poller)
+    and runs its first status check right away; later checks are batched per
+    provider connection by the poll_cloud_snapshots beat task, so the worker is
+    never blocked for the whole (potentially hours-long) snapshot and no task is
+    queued per snapshot per check. `interval` is accepted for checks queued by
+    older releases; the poller plans intervals itself.
 
     Resilience: a single failed or transient status check never fails the backup --
-    backup.poll_status() returns IN_PROGRESS and we simply poll again. The backup is
-    marked FAILED only when the provider itself reports the snapshot errored, and TIMEOUT
-    only after `timeout` seconds of polling.
+    backup.poll_status() returns IN_PROGRESS and the poller simply checks again. The
+    backup is marked FAILED only when the provider itself reports the snapshot
+    errored, and TIMEOUT only after `timeout` seconds of polling.
     """
-    import time as _time
-    from apps.console.node.models import CoreNode
-    from apps._tasks.exceptions import (
-        NodeBackupFailedError,
-        NodeBackupStatusCheckTimeOutError,
-    )
-
-    try:
-        node = CoreNode.objects.get(id=node_id)
-    except CoreNode.DoesNotExist:
-        return
-
-    backup = node.get_cloud_backup(backup_id)
-    if backup is None:
-        return
-
-    # Stop polling once the backup has reached any terminal state (completed elsewhere,
-    # cancelled, or queued/processed for deletion).
-    terminal = (
-        UtilBackup.Status.COMPLETE,
-        UtilBackup.Status.FAILED,
-        UtilBackup.Status.TIMEOUT,
-        UtilBackup.Status.CANCELLED,
-        UtilBackup.Status.DELETE_REQUESTED,
-        UtilBackup.Status.DELETE_IN_PROGRESS,
-        UtilBackup.Status.DELETE_COMPLETED,
-    )
-    if backup.status in terminal:
-        return
-
-    if started_at is None:
-        started_at = _time.time()
-
-    try:
-        status = backup.poll_status()
-    except Exception as e:
-        # poll_status is meant to swallow transient errors itself; if an unexpected one
-        # escapes, treat it as "still in progress" rather than failing the backup.
-        capture_exception(e)
-        status = UtilBackup.Status.IN_PROGRESS
-
-    if status == UtilBackup.Status.COMPLETE:
-        node.backup_complete_reset(backup.celery_task_id)
-        # Retention: keep only the newest keep_last completed backups for the schedule.
-        if backup.schedule and (backup.schedule.keep_last or 0) > 0:
-            keep_last = backup.schedule.keep_last
-            completed = list(
-                backup.__class__.objects.filter(
-                    schedule=backup.schedule, status=UtilBackup.Status.COMPLETE
-                ).order_by("created")
-            )
-            for old_backup in completed[:-keep_last]:
-                old_backup.soft_delete()
-        node.notify_backup_success(backup)
-        return
-
-    if status == UtilBackup.Status.FAILED:
-        backup.status = UtilBackup.Status.FAILED
-        backup.save()
-        node.backup_complete_reset()  # return node to ACTIVE (no celery id -> node only)
-        node.notify_backup_fail(
-            NodeBackupFailedError(
-                node, backup.uuid_str, backup.attempt_no, backup.type,
-                "Cloud provider reported the snapshot as errored.",
-            ),
-            backup.type,
-        )
-        return
-
-    # Still in progress (or a transient check failure). Give up only past the hard
-    # timeout; otherwise re-queue another check and free the worker until then.
-    if (_time.time() - started_at) > timeout:
-        node.backup_timeout_reset(backup.celery_task_id)
-        node.notify_backup_fail(
-            NodeBackupStatusCheckTimeOutError(node, backup.uuid_str), backup.type
-        )
-        return
+    from apps._tasks.helper.snapshot_poller import watch
 
-    poll_cloud_backup.apply_async(
-        args=[node_id, backup_id, started_at, interval, timeout], countdown=interval
-    )
+    watch(node_id, backup_id, started_at=started_at, timeout=timeout)
 
 
 @current_app.task(
@@ -518,7 +453,7 @@ def node_delete_requested(self, node_id):
                     cache_base = os.path.realpath(os.path.join(storage_dir, "website_cache", node.uuid_str))
                     if cache_base != storage_dir and os.path.commonpath([storage_dir, cache_base]) == storage_dir:
                         shutil.rmtree(cache_base, ignore_errors=True)
-                        for suffix in (".meta.json", ".lock"):
+                        for suffix in (".meta.json", ".lock", ".zip", ".snar"):
                             try:
                                 os.remove(cache_base + suffix)
                             except FileNotFoundError:
@@ -0,0 +1,217 @@
+"""Backup archive formats.
+
+Every file-based engine (website, WordPress, Basecamp, MySQL, MariaDB,
+PostgreSQL) stages its snapshot at ``_storage/{uuid}.zip`` and the storage
+backends upload that file. The backup schedule's archive_format decides what
+the file holds:
+
+  * ``zip``      -- zip/deflate, the historical format (one core).
+  * ``tar_zstd`` -- a tar stream compressed by ``zstd -T<threads>``, which
+    spreads compression over every core of the worker.
+
+The staging path keeps its .zip name whatever the format, so upload, cleanup
+and retention code stays format-agnostic. Remote objects get the real
+extension (archive_name), and restores identify the format from the file's
+magic bytes (detect_format), never from the schedule, which may have been
+changed or deleted since the backup was taken.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import zipfile
+
+from django.conf import settings
+
+from apps._tasks.integration.manifest import walk_tree
+
+ZIP = "zip"
+TAR_ZSTD = "tar_zstd"
+
+EXTENSIONS = {ZIP: "zip", TAR_ZSTD: "tar.zst"}
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def staging_path(backup):
+    return f"_storage/{backup.uuid}.zip"
+
+
+def archive_format(backup):
+    """The format a new archive for `backup` is written in (schedule setting;
+    on-demand backups have no schedule and use zip)."""
+    schedule = getattr(backup, "schedule", None)
+    return getattr(schedule, "archive_format", None) or ZIP
+
+
+def detect_format(path):
+    """ZIP or TAR_ZSTD from the archive's leading bytes; anything that is not a
+    zstd frame is treated as zip (and rejected by the zip reader if it is not)."""
+    with open(path, "rb") as fh:
+        return TAR_ZSTD if fh.read(4) == ZSTD_MAGIC else ZIP
+
+
+def archive_name(backup):
+    """Remote file name for the backup's archive: ``{uuid}.zip`` or
+    ``{uuid}.tar.zst``. Taken from the staged file when it exists, else from
+    the schedule (streaming uploads name the object before any byte is written)."""
+    try:
+        fmt = detect_format(staging_path(backup))
+    except OSError:
+        fmt = archive_format(backup)
+    return f"{backup.uuid}.{EXTENSIONS[fmt]}"
+
+
+def _zstd_compressor():
+    return f"zstd -{settings.ARCHIVE_ZSTD_LEVEL} -T{settings.ARCHIVE_ZSTD_THREADS}"
+
+
+def write_tar_zstd(source_dir, dest, timeout=None):
+    """Archive the contents of source_dir (member paths relative to it) into
+    dest as tar + multi-threaded zstd. Raises RuntimeError on failure."""
+    dest = os.path.abspath(dest)
+    result = subprocess.run(
+        ["tar", "--create", f"--use-compress-program={_zstd_compressor()}", f"--file={dest}", "."],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=timeout,
+        cwd=source_dir,
+    )
+    if result.returncode != 0:
+        if os.path.exists(dest):
+            os.remove(dest)
+        stderr = result.stderr.decode("utf-8", "replace").strip()[-500:]
+        raise RuntimeError(f"tar/zstd archive failed (exit {result.returncode}): {stderr}")
+    return dest
+
+
+class TreeArchiver:
+    """Archive source_dir into dest from the member names of the caller's own
+    scan (manifest.walk_tree), so zip / tar never walk the tree a second time.
+    The archiver runs while the scan feeds it: add() every directory and file,
+    then close() (or abort()).
+
+      * zip      -- ``zip -y dest -@`` with the names on stdin. With an existing
+        reference_zip (the previous snapshot of the same tree) dest starts as a
+        copy of it and ``-FS`` syncs it to the names: entries of files with the
+        same size and mtime are copied still compressed, only new / changed
+        files are compressed and entries of missing files are dropped. Names
+        holding a newline cannot go through -@; those trees, and a failed sync,
+        are archived again with a plain ``zip -r``.
+      * tar_zstd -- ``tar --no-recursion --null --files-from=-`` through zstd.
+    """
+
+    def __init__(self, fmt, source_dir, dest, *, reference_zip=None, timeout=None):
+        self.fmt = fmt
+        self.source_dir = source_dir
+        self.dest = os.path.abspath(dest)
+        self.timeout = timeout
+        self._sync = False
+        self._walk_fallback = False
+        if fmt == TAR_ZSTD:
+            command = [
+                "tar", "--create", f"--use-compress-program={_zstd_compressor()}",
+                f"--file={self.dest}", "--no-recursion", "--null", "--verbatim-files-from",
+                "--files-from=-",
+            ]
+        else:
+            command = ["zip", "-y", "-q", self.dest, "-@"]
+            if reference_zip and os.path.exists(reference_zip):
+                # A copy, not a hard link: zip rewrites a multiply-linked archive in place.
+                shutil.copyfile(reference_zip, self.dest)
+                command.insert(1, "-FS")
+                self._sync = True
+        # stderr goes to a file: a pipe nobody reads while names are fed could fill up.
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr,
+            cwd=source_dir,
+        )
+
+    def add(self, rel, is_dir=False):
+        if self.fmt == TAR_ZSTD:
+            data = os.fsencode(rel) + b"\0"
+        elif "\n" in rel:
+            self._walk_fallback = True
+            return
+        else:
+            data = os.fsencode(rel + "/" if is_dir else rel) + b"\n"
+        try:
+            self._proc.stdin.write(data)
+        except BrokenPipeError:
+            # The archiver died; close() reports it.
+            pass
+
+    def close(self):
+        """Wait for the archive; returns dest. Raises RuntimeError when tar/zstd
+        fails (zip failures leave dest missing, which callers check)."""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            returncode = self._proc.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self.abort()
+            raise
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode("utf-8", "replace").strip()[-500:]
+        self._stderr.close()
+        if self.fmt == TAR_ZSTD:
+            if returncode != 0:
+                self._remove_dest()
+                raise RuntimeError(f"tar/zstd archive failed (exit {returncode}): {stderr}")
+        elif self._walk_fallback or (self._sync and returncode != 0):
+            self._remove_dest()
+            subprocess.run(
+                ["zip", "-y", "-r", self.dest, ".", "-i", "*"],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout,
+                cwd=self.source_dir,
+            )
+        return self.dest
+
+    def abort(self):
+        """Stop the archiver and discard the partial archive."""
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
+        if not self._stderr.closed:
+            self._stderr.close()
+        self._remove_dest()
+
+    def _remove_dest(self):
+        if os.path.exists(self.dest):
+            os.remove(self.dest)
+
+
+def write_dump_archive(backup, source_dir, dest, log_file):
+    """Archive a database engine's dump directory in the backup's format and log
+    every dump as ``name (size bytes)``, both from a single scan of source_dir.
+    Dumps already compressed in transit (``.gz``) are stored in the zip as-is;
+    per-file errors propagate, so an unreadable dump fails the backup."""
+    if archive_format(backup) == TAR_ZSTD:
+        archiver, zipf = TreeArchiver(TAR_ZSTD, source_dir, dest), None
+    else:
+        archiver, zipf = None, zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+    try:
+        for rel, st, is_dir in walk_tree(source_dir):
+            if archiver is not None:
+                archiver.add(rel, is_dir)
+            if is_dir:
+                continue
+            log_file.write(f"{rel} ({st.st_size} bytes)\n")
+            if zipf is not None:
+                zipf.write(
+                    os.path.join(source_dir, rel), rel,
+                    compress_type=zipfile.ZIP_STORED if rel.endswith(".gz") else None,
+                )
+    except BaseException:
+        if archiver is not None:
+            archiver.abort()
+        raise
+    finally:
+        if zipf is not None:
+            zipf.close()
+    if archiver is not None:
+        archiver.close()
+    return dest
@@ -0,0 +1,78 @@
+"""Binary-log increments for MySQL / MariaDB (CoreDatabase.backup_mode incremental).
+
+A chain (backup._incremental) starts with a full mysqldump of the connection's
+database taken with ``--source-data=2`` (``--master-data=2`` on MySQL 5.x and
+MariaDB), which writes the binlog coordinates of the consistent snapshot into
+the dump as a comment; parse_dump_position() reads them back. Every increment
+then reads the binlog from the previous run's coordinates up to the server's
+current ones with ``mysqlbinlog --read-from-remote-server --database=<db>``,
+and stores the decoded events as ``{db}.binlog`` (SQL text). Each run records
+where it stopped in CoreDatabaseBackup.metadata (binlog_file / binlog_pos).
+The base dump always runs with ``--single-transaction``, and every run checks
+the server logs with ``binlog_format=ROW``: under statement-based logging
+``--database`` keeps events by their default database, so statements written
+from another database would silently drop out of the increment.
+
+Restores import the base dump and then feed every ``{db}.binlog`` of the chain
+to the mysql client, in chain order.
+"""
+import re
+
+BINLOG_SUFFIX = ".binlog"
+BINLOG_FORMAT_QUERY = "SELECT @@GLOBAL.binlog_format"
+
+# Only the head of a dump is searched for the coordinates comment.
+_HEAD_LINES = 200
+_DUMP_POSITION = re.compile(
+    r"(?:MASTER|SOURCE)_LOG_FILE='([^']+)',\s*(?:MASTER|SOURCE)_LOG_POS=(\d+)"
+)
+
+
+def source_data_flag(version):
+    """mysqldump flag that records the snapshot's binlog coordinates as a comment
+    (MySQL 8.0.26 renamed --master-data, which 8.4 no longer accepts)."""
+    if version.startswith("mysql_") and not version.startswith("mysql_5"):
+        return "--source-data=2"
+    return "--master-data=2"
+
+
+def status_query(version):
+    """Statement reporting the server's current binlog file and position."""
+    if version.startswith("mysql_") and not version.startswith(("mysql_5", "mysql_8_0")):
+        return "SHOW BINARY LOG STATUS"
+    return "SHOW MASTER STATUS"
+
+
+def parse_dump_position(dump_path):
+    """(binlog file, position) from the coordinates comment of a dump, or None."""
+    with open(dump_path, "r", encoding="utf-8", errors="replace") as fh:
+        for _ in range(_HEAD_LINES):
+            line = fh.readline()
+            if not line:
+                break
+            match = _DUMP_POSITION.search(line)
+            if match:
+                return match.group(1), int(match.group(2))
+    return None
+
+
+def parse_status(text):
+    """(binlog file, position) from tab-separated status_query() output, or None
+    when binary logging is disabled (empty result)."""
+    for line in text.splitlines():
+        fields = line.split("\t")
+        if len(fields) >= 2 and fields[0].strip() and fields[1].strip().isdigit():
+            return fields[0].strip(), int(fields[1])
+    return None
+
+
+def binlog_range(listing, start_file, end_file):
+    """The binlog files from start_file to end_file (inclusive), in server order,
+    from tab-separated ``SHOW BINARY LOGS`` output. Raises ValueError when
+    start_file has already been purged."""
+    names = [line.split("\t")[0].strip() for line in listing.splitlines() if line.strip()]
+    if start_file not in names:
+        raise ValueError(f"binlog {start_file} is no longer on the server")
+    start = names.index(start_file)
+    end = names.index(end_file) if end_file in names else len(names) - 1
+    return names[start:end + 1]
@@ -0,0 +1,65 @@
+"""Backup chains: CoreDatabase.backup_mode ``incremental`` and the website
+server-side tar BackupType INCREMENTAL_V2.
+
+An incremental node alternates between two kinds of run:
+
+* a full base (chain_position 0, no base_backup) -- for PostgreSQL a
+  ``pg_basebackup`` of the cluster, for MySQL / MariaDB a mysqldump that
+  records its binlog coordinates (backup._binlog), for websites a level-0
+  ``tar --listed-incremental``, and
+* increments (chain_position 1, 2, ...) carrying only the changes since the
+  previous run of the same chain -- the WAL segments streamed from the node's
+  replication slot, the binlog events read with mysqlbinlog, or a tar of the
+  files changed since the previous run's snapshot (.snar) state.
+
+A restore needs the base plus every increment up to the chosen point, so a
+chain is only extended while it is unbroken: a new base is taken when there is
+no completed base yet, when the latest base is older than
+full_backup_interval_days, or when the latest run of the chain did not
+complete (e.g. its WAL may already have been consumed from the slot without
+reaching storage). Retention keeps chains whole (helper/retention.py).
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.console.utils.models import UtilBackup
+
+
+def plan_chain(backup, owner_field="database"):
+    """(base_backup, chain_position) for a new incremental-mode `backup`:
+    (None, 0) when it must be a full base. owner_field names the backup's node
+    model (database / website), which holds full_backup_interval_days."""
+    model = backup.__class__
+    owner = getattr(backup, owner_field)
+    base = (
+        model.objects.filter(
+            **{owner_field: owner}, chain_position=0, status=UtilBackup.Status.COMPLETE
+        )
+        .exclude(id=backup.id)
+        .order_by("-created")
+        .first()
+    )
+    if base is None:
+        return None, 0
+    interval = timedelta(days=max(1, owner.full_backup_interval_days or 1))
+    if timezone.now() - base.created >= interval:
+        return None, 0
+    last = (
+        model.objects.filter(base_backup=base)
+        .exclude(id=backup.id)
+        .order_by("-created")
+        .first()
+    )
+    if last is None:
+        return base, 1
+    if last.status != UtilBackup.Status.COMPLETE:
+        return None, 0
+    return base, (last.chain_position or 0) + 1
+
+
+def previous_link(base, chain_position):
+    """The backup an increment at chain_position continues from."""
+    if chain_position <= 1:
+        return base
+    return base.increments.get(chain_position=chain_position - 1)
@@ -0,0 +1,126 @@
+"""Adaptive lftp parallelism for website mirrors (website._snapshot_lftp).
+
+Each node learns its own transfer settings across runs, stored in
+CoreWebsite.transfer_tuning:
+
+  * parallel / pget -- what the next run uses: files mirrored at once
+    (``mirror --parallel``, also lftp's net:connection-limit) and segments per
+    file (``--use-pget``).
+  * best_rate / best_parallel / best_pget -- the fastest clean run seen so far,
+    in bytes per second. best_rate decays a little every run so a server that
+    got faster (or slower) is re-learned.
+  * ceiling -- the highest parallelism the server has tolerated.
+
+The first run starts from CoreWebsite.parallel. After every run learn()
+compares the run's throughput (bytes downloaded / seconds spent in lftp) with
+best_rate:
+
+  * server push-back in lftp's output (421 / "too many connections" /
+    repeated connection errors) halves parallel, drops pget to 1 and lowers
+    the ceiling below the level that failed, so a fragile shared host is not
+    hammered again;
+  * a clear improvement ramps up -- parallel grows by half up to the ceiling,
+    then pget grows up to LFTP_MAX_PGET, then the ceiling is probed one step
+    at a time;
+  * a clear regression returns to the best settings;
+  * anything else, and runs too small to measure, keep the settings.
+"""
+from django.conf import settings
+
+# Runs that move less, or finish sooner, say nothing about throughput.
+MIN_SAMPLE_BYTES = 64 * 1024 * 1024
+MIN_SAMPLE_SECONDS = 30
+IMPROVEMENT = 1.05
+REGRESSION = 0.85
+BEST_RATE_DECAY = 0.97
+# Connection errors lftp recovered from; this many in one run count as push-back.
+TRANSIENT_ERROR_LIMIT = 3
+
+_THROTTLE_MARKERS = ("421 ", "too many connections", "too many users", "maximum number of")
+_ERROR_MARKERS = ("connection refused", "connection reset", "connection lost",
+                  "connection timed out", "timeout", "max-retries exceeded")
+_PROGRESS_PREFIXES = ("transferring file", "removing old", "making directory",
+                      "making symbolic link", "total:", "new:", "modified:", "removed:")
+
+
+def _clamp(value, upper):
+    return max(1, min(int(value), upper))
+
+
+def plan(website):
+    """(parallel, pget) for the next mirror of `website` (a CoreWebsite)."""
+    state = website.transfer_tuning or {}
+    parallel = _clamp(state.get("parallel") or website.parallel or 3, settings.LFTP_MAX_PARALLEL)
+    pget = _clamp(state.get("pget") or 1, settings.LFTP_MAX_PGET)
+    return parallel, pget
+
+
+class OutputStats:
+    """Counts server push-back in lftp's output lines (feed())."""
+
+    def __init__(self):
+        self.throttled = False
+        self.errors = 0
+
+    def feed(self, line):
+        low = line.lower()
+        if low.startswith(_PROGRESS_PREFIXES):
+            # --verbose progress lines name files, which may contain anything.
+            return
+        if any(marker in low for marker in _THROTTLE_MARKERS):
+            self.throttled = True
+        elif any(marker in low for marker in _ERROR_MARKERS):
+            self.errors += 1
+
+    @property
+    def pushed_back(self):
+        return self.throttled or self.errors >= TRANSIENT_ERROR_LIMIT
+
+
+def learn(website, *, parallel, pget, transferred, seconds, stats):
+    """Update website.transfer_tuning from a run made with (parallel, pget) that
+    downloaded `transferred` bytes in `seconds`; returns a one-line summary for
+    the run log. A failed run passes transferred=0: only its push-back counts."""
+    state = dict(website.transfer_tuning or {})
+    max_parallel, max_pget = settings.LFTP_MAX_PARALLEL, settings.LFTP_MAX_PGET
+    ceiling = _clamp(state.get("ceiling") or max_parallel, max_parallel)
+    best_rate = state.get("best_rate")
+    if best_rate:
+        best_rate *= BEST_RATE_DECAY
+    best_parallel = state.get("best_parallel") or parallel
+    best_pget = state.get("best_pget") or pget
+    rate = transferred / seconds if seconds > 0 else 0
+
+    if stats.pushed_back:
+        ceiling = max(1, parallel - 1)
+        parallel, pget = max(1, parallel // 2), 1
+        best_rate, best_parallel, best_pget = None, parallel, pget
+        decision = "server push-back, backing off"
+    elif transferred < MIN_SAMPLE_BYTES or seconds < MIN_SAMPLE_SECONDS:
+        decision = "run too small to measure, keeping settings"
+    elif not best_rate or rate >= best_rate * IMPROVEMENT:
+        best_rate, best_parallel, best_pget = rate, parallel, pget
+        if parallel < ceiling:
+            parallel = min(ceiling, parallel + max(1, parallel // 2))
+        elif pget < max_pget:
+            pget += 1
+        elif ceiling < max_parallel:
+            ceiling += 1
+            parallel = ceiling
+        decision = "faster, ramping up"
+    elif rate < best_rate * REGRESSION:
+        parallel, pget = best_parallel, best_pget
+        decision = "slower, returning to the best settings"
+    else:
+        decision = "keeping settings"
+
+    state.update(
+        parallel=_clamp(parallel, max_parallel), pget=_clamp(pget, max_pget), ceiling=ceiling,
+        best_rate=best_rate, best_parallel=best_parallel, best_pget=best_pget,
+    )
+    website.transfer_tuning = state
+    website.save(update_fields=["transfer_tuning"])
+    return (
+        f"Transfer tuning: {rate / 1024 / 1024:.1f} MiB/s, {stats.errors} connection errors; "
+        f"{decision} (next run: parallel {state['parallel']}, pget {state['pget']})\n"
+    )
@@ -0,0 +1,556 @@
+"""In-process mirror engine for website backups (CoreWebsite.mirror_engine
+"native"), the alternative to the lftp subprocess in website._snapshot_lftp.
+
+asyncio schedules the work; the transfers run over the clients the rest of the
+app already uses -- paramiko for SFTP, ftputil / ftplib for FTP and FTPS. Both
+are blocking and a session must never be shared between threads, so each of
+the `connections` connections is owned by one worker with its own thread
+(_Connection) and the event loop hands every worker one job at a time:
+
+  * listing a directory queues its subdirectories ahead of its files, so the
+    tree opens up quickly and every connection stays busy; with delete=True,
+    local entries the server no longer has are removed;
+  * a file is skipped when the cached copy has the same size and mtime. When
+    only the mtime differs and the server can hash files (SFTP check-file,
+    FTP HASH), equal digests just refresh the cached mtime. Anything else is
+    downloaded to a temporary name, given the remote mtime and renamed into
+    place; SFTP keeps PREFETCH_REQUESTS reads of a file in flight at once.
+
+Every step emits an Event to on_event, and a file that cannot be mirrored is
+recorded as a FileError instead of aborting the run. Connection failures
+reconnect and retry the job up to ATTEMPTS times; their messages are fed to an
+_lftp_tuning.OutputStats, so server push-back teaches the tuner the same lesson
+as it does with lftp.
+"""
+import asyncio
+import errno
+import ftplib
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import ssl
+import stat
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from itertools import count
+
+import ftputil
+import paramiko
+
+from apps.api.v1.utils.api_helpers import FtpSession, ImplicitFTP_TLS
+from apps.console.connection.models import CoreAuthWebsite
+
+ATTEMPTS = 3
+# Seconds before the n-th retry of a job: n * RETRY_DELAY.
+RETRY_DELAY = 1
+# Outstanding SFTP read requests per file download.
+PREFETCH_REQUESTS = 64
+# Seconds between PROGRESS events.
+PROGRESS_INTERVAL = 30
+# ftputil lists a directory once into its stat cache; keep big directories whole.
+STAT_CACHE_SIZE = 100_000
+_PART_SUFFIX = ".bs-part"
+# Local failures no retry can fix.
+_FATAL_ERRNOS = (errno.ENOSPC, errno.EDQUOT, errno.EROFS)
+_PERMANENT_ERRORS = (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError,
+                     ftplib.error_perm)
+_FTP_HASH_ALGORITHMS = {"SHA-256": "sha256", "SHA-512": "sha512", "SHA-1": "sha1", "MD5": "md5"}
+
+DIR, FILE, LINK = "dir", "file", "link"
+
+# Event kinds.
+LISTED = "listed"
+DOWNLOADED = "downloaded"
+SKIPPED = "skipped"
+VERIFIED = "verified"
+LINKED = "linked"
+DELETED = "deleted"
+RECONNECTED = "reconnected"
+FAILED = "failed"
+PROGRESS = "progress"
+
+# size: bytes downloaded (PROGRESS: so far); connection: the worker's number.
+Event = namedtuple("Event", "kind path size seconds connection")
+FileError = namedtuple("FileError", "path operation message")
+RemoteEntry = namedtuple("RemoteEntry", "name kind size mtime")
+_Job = namedtuple("_Job", "kind remote local rel entry")
+
+
+class MirrorError(Exception):
+    """The mirror cannot run at all (no connection could be opened)."""
+
+
+def _kind(mode):
+    if stat.S_ISDIR(mode):
+        return DIR
+    if stat.S_ISLNK(mode):
+        return LINK
+    if stat.S_ISREG(mode):
+        return FILE
+    # Sockets, FIFOs and devices are not mirrored.
+    return None
+
+
+def _entry(name, st):
+    return RemoteEntry(name, _kind(st.st_mode or 0), st.st_size or 0, int(st.st_mtime or 0))
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def _local_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+class Filters:
+    """lftp mirror's include / exclude options, matched against paths relative
+    to the mirrored source (directories with a trailing slash): a regex is
+    searched in the path, a glob matches the name -- or the path when it
+    contains a slash. With includes, only matching files are mirrored;
+    directories are always descended."""
+
+    def __init__(self, *, includes_regex=None, includes_glob=None, excludes_regex=None, excludes_glob=None):
+        self._includes_regex = [re.compile(rx) for rx in includes_regex or ()]
+        self._includes_glob = list(includes_glob or ())
+        self._excludes_regex = [re.compile(rx) for rx in excludes_regex or ()]
+        self._excludes_glob = list(excludes_glob or ())
+
+    @staticmethod
+    def _match(path, regexes, globs):
+        name = posixpath.basename(path.rstrip("/"))
+        return (any(rx.search(path) for rx in regexes)
+                or any(fnmatchcase(path.rstrip("/") if "/" in gl else name, gl.rstrip("/")) for gl in globs))
+
+    def wanted(self, rel, is_dir):
+        path = rel + "/" if is_dir else rel
+        if self._match(path, self._excludes_regex, self._excludes_glob):
+            return False
+        if is_dir or not (self._includes_regex or self._includes_glob):
+            return True
+        return self._match(path, self._includes_regex, self._includes_glob)
+
+
+class SFTPTransport:
+    """One paramiko SFTP session (CoreAuthWebsite.get_sftp_client)."""
+
+    def __init__(self, auth):
+        self._sftp, self._ssh, ssh_key_path = auth.get_sftp_client()
+        # The decrypted key is only needed to connect.
+        if ssh_key_path and os.path.exists(ssh_key_path):
+            os.remove(ssh_key_path)
+        self._can_hash = True
+
+    def listdir(self, path):
+        return [_entry(attr.filename, attr) for attr in self._sftp.listdir_attr(path)]
+
+    def stat(self, path):
+        return _entry(posixpath.basename(path), self._sftp.lstat(path))
+
+    def readlink(self, path):
+        return self._sftp.readlink(path)
+
+    def download(self, path, local_path):
+        self._sftp.get(path, local_path, prefetch=True, max_concurrent_prefetch_requests=PREFETCH_REQUESTS)
+
+    def digest(self, path):
+        """(hashlib algorithm, digest) of the remote file from the check-file
+        extension, or None when the server does not support it."""
+        if not self._can_hash:
+            return None
+        with self._sftp.open(path, "rb") as fh:
+            try:
+                return "sha256", fh.check("sha256")
+            except (OSError, paramiko.SFTPError):
+                self._can_hash = False
+                return None
+
+    def close(self):
+        self._sftp.close()
+        self._ssh.close()
+
+
+class _ImplicitTlsSession(ImplicitFTP_TLS):
+    """ImplicitFTP_TLS that sends the host name, so certificates can be verified."""
+
+    @property
+    def sock(self):
+        return self._sock
+
+    @sock.setter
+    def sock(self, value):
+        if value is not None and not isinstance(value, ssl.SSLSocket):
+            value = self.context.wrap_socket(value, server_hostname=self.host)
+        self._sock = value
+
+
+def _ftp_session_factory(auth):
+    """ftputil session class for the connection: plain FTP, explicit FTPS (AUTH
+    TLS) or implicit FTPS, verifying the certificate per auth.verify_ssl."""
+    if auth.protocol == CoreAuthWebsite.Protocol.FTP:
+        return FtpSession
+    base = ftplib.FTP_TLS if auth.ftps_use_explicit_ssl else _ImplicitTlsSession
+    context = ssl.create_default_context()
+    if not getattr(auth, "verify_ssl", True):
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+
+    class Session(base):
+        def __init__(self, host, userid, password, port):
+            base.__init__(self, context=context)
+            self.connect(host, port, 10)
+            self.login(userid, password)
+            # Set up encrypted data connection.
+            self.prot_p()
+
+    return Session
+
+
+class FTPTransport:
+    """One ftputil FTP / FTPS session."""
+
+    def __init__(self, auth, username, password):
+        self._host = ftputil.FTPHost(
+            auth.host, username, password, port=auth.port, session_factory=_ftp_session_factory(auth),
+        )
+        # Hidden files (.htaccess) are part of the site.
+        self._host.use_list_a_option = True
+        self._host.stat_cache.resize(STAT_CACHE_SIZE)
+        self._can_hash = True
+
+    def listdir(self, path):
+        return [self.stat(posixpath.join(path, name)) for name in self._host.listdir(path)]
+
+    def stat(self, path):
+        return _entry(posixpath.basename(path), self._host.lstat(path))
+
+    def readlink(self, path):
+        target = getattr(self._host.lstat(path), "_st_target", None)
+        if not target:
+            raise FileNotFoundError(errno.ENOENT, "the server does not report the link target", path)
+        return target
+
+    def download(self, path, local_path):
+        self._host.download(path, local_path)
+
+    def digest(self, path):
+        """(hashlib algorithm, digest) of the remote file from the HASH command,
+        or None when the server does not support it."""
+        if not self._can_hash:
+            return None
+        try:
+            # "213 SHA-256 0-1234 <hex digest> <path>"
+            reply = self._host._session.sendcmd(f"HASH {path}").split(" ", 4)
+            return _FTP_HASH_ALGORITHMS[reply[1].upper()], bytes.fromhex(reply[3])
+        except (ftplib.error_perm, ftplib.error_reply, IndexError, KeyError, ValueError):
+            self._can_hash = False
+            return None
+
+    def close(self):
+        self._host.close()
+
+
+class _Connection:
+    """A worker's connection and the thread it is used from."""
+
+    def __init__(self, number, connect):
+        self.number = number
+        self._connect = connect
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"mirror-{number}")
+        self.transport = None
+        self.files = self.bytes = 0
+        self.busy = 0.0
+
+    async def call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def open(self):
+        if self.transport is None:
+            self.transport = await self.call(self._connect)
+
+    async def reset(self):
+        transport, self.transport = self.transport, None
+        if transport is not None:
+            try:
+                await self.call(transport.close)
+            except Exception:
+                pass
+
+    def shutdown(self):
+        """Close from the event loop's thread: the run is over or aborted, and
+        closing the session interrupts a transfer still blocking the worker."""
+        transport, self.transport = self.transport, None
+        if transport is not None:
+            try:
+                transport.close()
+            except Exception:
+                pass
+        self._executor.shutdown(wait=False)
+
+
+class Mirror:
+    """Mirrors remote sources into local paths over `connections` connections
+    made by connect() (a transport factory). With delete, local entries
+    missing on the server are removed (the incremental cache); timeout bounds
+    the whole run. After run(), the counters, errors (FileError list) and
+    per-connection figures describe what happened."""
+
+    def __init__(self, connect, *, connections, delete=False, filters=None, on_event=None,
+                 stats=None, timeout=None):
+        self._connections = [_Connection(number, connect) for number in range(1, max(1, connections) + 1)]
+        self._delete = delete
+        self._filters = filters or Filters()
+        self._on_event = on_event
+        self._stats = stats
+        self._timeout = timeout
+        self._sequence = count()
+        self._started = 0.0
+        self._unreachable = 0
+        self.listed = self.downloaded = self.skipped = self.verified = self.linked = self.deleted = 0
+        self.downloaded_bytes = 0
+        self.reconnects = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def run(self, sources):
+        """Mirror every (remote path, local path, is_file) source; a directory
+        source is mirrored into the local directory, a file source is fetched
+        to the local path."""
+        asyncio.run(self._run(sources))
+        return self
+
+    def summary(self):
+        rate = self.downloaded_bytes / self.elapsed if self.elapsed > 0 else 0
+        lines = [
+            f"Mirror: {self.listed} directories listed, {self.downloaded} files downloaded "
+            f"({self.downloaded_bytes} bytes, {rate / 1024 / 1024:.1f} MiB/s), {self.skipped} unchanged, "
+            f"{self.verified} verified by hash, {self.linked} links, {self.deleted} deleted, "
+            f"{self.reconnects} reconnects, {len(self.errors)} failed in {self.elapsed:.1f}s"
+        ]
+        for connection in self._connections:
+            lines.append(
+                f"Connection {connection.number}: {connection.files} files, {connection.bytes} bytes, "
+                f"busy {connection.busy:.1f}s"
+            )
+        return "\n".join(lines) + "\n"
+
+    def _emit(self, kind, path, size=0, seconds=0.0, connection=None):
+        if self._on_event is not None:
+            self._on_event(Event(kind, path, size, seconds, connection))
+
+    def _put(self, queue, job):
+        # Directories first: listing them is what feeds every connection.
+        queue.put_nowait((0 if job.kind == DIR else 1, next(self._sequence), job))
+
+    async def _run(self, sources):
+        self._started = time.monotonic()
+        queue = asyncio.PriorityQueue()
+        for remote, local, is_file in sources:
+            self._put(queue, _Job(FILE if is_file else DIR, remote, local, "", None))
+        workers = [asyncio.create_task(self._worker(connection, queue)) for connection in self._connections]
+        progress = asyncio.create_task(self._progress())
+        finished = asyncio.create_task(queue.join())
+        pending = {finished, *workers}
+        deadline = self._started + self._timeout if self._timeout else None
+        try:
+            while finished in pending:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError(f"Mirror timed out after {self._timeout} seconds")
+                for task in done:
+                    if task is not finished and task.exception() is not None:
+                        raise task.exception()
+        finally:
+            for task in (progress, finished, *workers):
+                task.cancel()
+            await asyncio.gather(progress, finished, *workers, return_exceptions=True)
+            for connection in self._connections:
+                connection.shutdown()
+            self.elapsed = time.monotonic() - self._started
+
+    async def _progress(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            self._emit(PROGRESS, "", self.downloaded_bytes, time.monotonic() - self._started)
+
+    async def _worker(self, connection, queue):
+        try:
+            await connection.open()
+        except Exception as e:
+            self._feed(e)
+            self._unreachable += 1
+            if self._unreachable == len(self._connections):
+                raise MirrorError(f"Could not connect: {e}") from e
+            # Fewer connections than planned: the server limits them.
+            return
+        while True:
+            _, _, job = await queue.get()
+            try:
+                await self._process(connection, job, queue)
+            finally:
+                queue.task_done()
+
+    def _feed(self, error):
+        if self._stats is not None:
+            self._stats.feed(str(error) or type(error).__name__)
+
+    async def _process(self, connection, job, queue):
+        operation = "list" if job.kind == DIR else "download"
+        for attempt in range(1, ATTEMPTS + 1):
+            started = time.monotonic()
+            try:
+                await connection.open()
+                if job.kind == DIR:
+                    result = await connection.call(self._list, connection.transport, job)
+                else:
+                    result = await connection.call(self._fetch, connection.transport, job)
+            except OSError as e:
+                if e.errno in _FATAL_ERRNOS:
+                    raise
+                if isinstance(e, _PERMANENT_ERRORS) or attempt == ATTEMPTS:
+                    return self._fail(job, operation, e, connection)
+                error = e
+            except _PERMANENT_ERRORS as e:
+                return self._fail(job, operation, e, connection)
+            except Exception as e:
+                if attempt == ATTEMPTS:
+                    return self._fail(job, operation, e, connection)
+                error = e
+            else:
+                seconds = time.monotonic() - started
+                connection.busy += seconds
+                if job.kind == DIR:
+                    self._listed(job, result, seconds, connection, queue)
+                else:
+                    self._fetched(job, result, seconds, connection)
+                return
+            # The session is probably gone: reconnect and try again.
+            connection.busy += time.monotonic() - started
+            self._feed(error)
+            self.reconnects += 1
+            self._emit(RECONNECTED, job.remote, connection=connection.number)
+            await connection.reset()
+            await asyncio.sleep(attempt * RETRY_DELAY)
+
+    def _fail(self, job, operation, error, connection):
+        message = str(error) or type(error).__name__
+        self.errors.append(FileError(job.remote, operation, message))
+        self._emit(FAILED, job.remote, connection=connection.number)
+
+    def _listed(self, job, result, seconds, connection, queue):
+        entries, deleted = result
+        self.listed += 1
+        self._emit(LISTED, job.remote, seconds=seconds, connection=connection.number)
+        for path in deleted:
+            self.deleted += 1
+            self._emit(DELETED, path, connection=connection.number)
+        for entry in entries:
+            rel = posixpath.join(job.rel, entry.name) if job.rel else entry.name
+            self._put(queue, _Job(
+                DIR if entry.kind == DIR else FILE,
+                posixpath.join(job.remote, entry.name), os.path.join(job.local, entry.name), rel, entry,
+            ))
+
+    def _fetched(self, job, result, seconds, connection):
+        kind, size = result
+        if kind == DOWNLOADED:
+            self.downloaded += 1
+            self.downloaded_bytes += size
+            connection.files += 1
+            connection.bytes += size
+        elif kind == SKIPPED:
+            self.skipped += 1
+        elif kind == VERIFIED:
+            self.verified += 1
+        elif kind == LINKED:
+            self.linked += 1
+        self._emit(kind, job.remote, size, seconds, connection.number)
+
+    # The methods below run in the connection's thread.
+
+    def _list(self, transport, job):
+        """(entries to mirror, local paths deleted) of the directory job."""
+        entries = []
+        for entry in transport.listdir(job.remote):
+            if entry.name in (".", "..") or entry.kind is None:
+                continue
+            rel = posixpath.join(job.rel, entry.name) if job.rel else entry.name
+            if self._filters.wanted(rel, entry.kind == DIR):
+                entries.append(entry)
+        # A symlink is replaced even when it points to a directory: the mirror
+        # would otherwise write (and delete) through it, outside the tree.
+        if os.path.islink(job.local) or (os.path.lexists(job.local) and not os.path.isdir(job.local)):
+            _remove(job.local)
+        os.makedirs(job.local, exist_ok=True)
+        deleted = []
+        if self._delete:
+            names = {entry.name for entry in entries}
+            with os.scandir(job.local) as it:
+                extras = [local.name for local in it if local.name not in names]
+            for name in extras:
+                _remove(os.path.join(job.local, name))
+                deleted.append(posixpath.join(job.remote, name))
+        return entries, deleted
+
+    def _fetch(self, transport, job):
+        """(event kind, bytes downloaded) of the file or link job."""
+        entry = job.entry or transport.stat(job.remote)
+        if entry.kind == DIR:
+            raise IsADirectoryError(errno.EISDIR, "is a directory", job.remote)
+        try:
+            st = os.lstat(job.local)
+        except FileNotFoundError:
+            st = None
+
+        if entry.kind == LINK:
+            target = transport.readlink(job.remote)
+            if st is not None and stat.S_ISLNK(st.st_mode) and os.readlink(job.local) == target:
+                return SKIPPED, 0
+            if st is not None:
+                _remove(job.local)
+            os.symlink(target, job.local)
+            return LINKED, 0
+
+        if st is not None and not stat.S_ISREG(st.st_mode):
+            _remove(job.local)
+        elif st is not None and st.st_size == entry.size:
+            if int(st.st_mtime) == entry.mtime:
+                return SKIPPED, 0
+            remote = transport.digest(job.remote)
+            if remote and _local_digest(job.local, remote[0]) == remote[1]:
+                os.utime(job.local, (entry.mtime, entry.mtime))
+                return VERIFIED, 0
+
+        part = job.local + _PART_SUFFIX
+        try:
+            transport.download(job.remote, part)
+            os.utime(part, (entry.mtime, entry.mtime))
+            os.replace(part, job.local)
+        except BaseException:
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+        return DOWNLOADED, os.path.getsize(job.local)
+
+
+def describe(event):
+    """One run-log line for an Event."""
+    if event.kind == PROGRESS:
+        rate = event.size / event.seconds if event.seconds > 0 else 0
+        return f"progress: {event.size} bytes downloaded, {rate / 1024 / 1024:.1f} MiB/s"
+    line = f"[{event.connection}] {event.kind} {event.path}"
+    if event.kind == DOWNLOADED:
+        line += f" ({event.size} bytes, {event.seconds:.2f}s)"
+    return line
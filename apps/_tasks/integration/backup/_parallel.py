@@ -0,0 +1,43 @@
+"""Bounded worker pool for the database backup engines.
+
+mysql.py / mariadb.py / postgresql.py build one dump job per database (or per
+table in tables mode) and hand the list to run_dumps(), which runs up to
+CoreDatabase.dump_parallelism of them at once. Every job is an independent
+mysqldump / pg_dump process (local subprocess, or its own channel on the shared
+SSH transport) writing its own dump file, so the jobs share nothing but the
+run log, whose writes are whole lines.
+
+Streaming mode (storage.streaming) writes all members into a single zip
+stream, so it always dumps one at a time. Over SSH every dump is a session
+channel and sshd refuses more than MaxSessions (10 by default) per
+connection, so SSH dumps are capped at SSH_MAX_CHANNELS.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+SSH_MAX_CHANNELS = 8
+
+
+def dump_workers(database, stream=None, ssh=False):
+    """How many dumps of `database` (a CoreDatabase) may run at once."""
+    if stream is not None:
+        return 1
+    workers = max(1, database.dump_parallelism or 1)
+    return min(workers, SSH_MAX_CHANNELS) if ssh else workers
+
+
+def run_dumps(jobs, workers):
+    """Call every job, up to `workers` at a time. The first failure cancels the
+    jobs that have not started and is re-raised once the running ones finish."""
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            job()
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(job) for job in jobs]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
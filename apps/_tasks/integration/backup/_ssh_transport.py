@@ -0,0 +1,68 @@
+"""Remote dump transport for the database engines' SSH mode.
+
+mysql.py / mariadb.py / postgresql.py run the dump client on the database host
+and read its stdout back over a paramiko channel. Two things keep that read
+from being the bottleneck on a WAN link:
+
+* widen_window() raises the per-channel receive window from paramiko's 2 MiB
+  to WINDOW_SIZE, so a high-latency link is not throttled waiting for window
+  adjustments; the engines read in READ_SIZE blocks.
+* With CoreDatabase.option_ssh_compress the dump is piped through gzip on the
+  database host (gzip_command). SQL text shrinks ~5x before it crosses the
+  network, and the ``{name}.sql.gz`` file is archived as-is (zip STORED), so
+  the worker never compresses it again. Restores inflate it before import.
+
+POSIX sh has no pipefail, so gzip_command reports the dump's own exit status
+on stderr and split_exit_status() recovers it.
+"""
+import re
+
+WINDOW_SIZE = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+GZIP_LEVEL = 3
+GZIP_SUFFIX = ".gz"
+# gzip of empty input: 10-byte header, 2-byte empty deflate block, 8-byte trailer.
+EMPTY_GZIP_SIZE = 20
+
+EXIT_MARKER = "BS_DUMP_EXIT="
+_EXIT_LINE = re.compile(rf"^{EXIT_MARKER}(\d+)$")
+
+
+def widen_window(ssh):
+    """Open later channels of `ssh` with a WINDOW_SIZE receive window."""
+    get_transport = getattr(ssh, "get_transport", None)
+    transport = get_transport() if callable(get_transport) else None
+    if transport is not None:
+        transport.default_window_size = WINDOW_SIZE
+
+
+def gzip_command(command):
+    """`command` with its stdout gzip'ed on the remote host and its exit status
+    echoed to stderr as ``BS_DUMP_EXIT=<n>``."""
+    return f'{{ {command}; echo "{EXIT_MARKER}$?" >&2; }} | gzip -{GZIP_LEVEL}'
+
+
+def split_exit_status(err_text, pipeline_status):
+    """(dump exit status, stderr without the marker line) for a gzip_command.
+
+    A failing gzip fails the dump; a missing marker means the shell never
+    finished the dump, which is reported as 255."""
+    status = None
+    lines = []
+    for line in err_text.splitlines():
+        match = _EXIT_LINE.match(line.strip())
+        if match:
+            status = int(match.group(1))
+        else:
+            lines.append(line)
+    if pipeline_status != 0:
+        status = pipeline_status
+    elif status is None:
+        status = 255
+    return status, "\n".join(lines)
+
+
+def is_empty_dump(written, compressed):
+    """True when a dump of `written` bytes carries no data."""
+    return written <= (EMPTY_GZIP_SIZE if compressed else 0)
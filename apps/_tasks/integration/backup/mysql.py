@@ -13,25 +13,64 @@ Two modes:
   removed (best-effort) in ``finally``. stdout is streamed back over the
   channel into the local .sql files in binary append mode.
 
+Per-database / per-table dumps run up to CoreDatabase.dump_parallelism at a
+time (backup._parallel).
+
 Error detection (fixes the BS-10 silent-failure hole): every command's exit
 status is checked and a non-zero status raises NodeBackupFailedError with the
 redacted stderr tail. stderr of successful commands is written to the run log
 as warnings (never fatal). A 0-byte dump file is always treated as a failure.
-On success the .sql files are zipped to ``_storage/{uuid}.zip`` and the dump
-directory is deleted; on any failure everything is deleted and
-NodeBackupFailedError is raised. A disk-space preflight (~2x the node's most
+On success the .sql files are archived to ``_storage/{uuid}.zip`` (zip, or
+tar.zst per the schedule's archive_format) and the dump directory is deleted;
+on any failure everything is deleted and NodeBackupFailedError is raised. A disk-space preflight (~2x the node's most
 recent COMPLETE backup, 1 GiB floor) runs before anything is dumped so a huge
 database fails fast instead of filling the shared _storage volume mid-run.
+
+Incremental mode (CoreDatabase.backup_mode incremental, direct connections
+and whole-database nodes only): each run is part of a backup chain
+(backup._incremental). A full base is a single mysqldump of the database that
+records its binlog coordinates; each increment captures only the binlog
+events since the previous run with ``mysqlbinlog --read-from-remote-server``
+into ``_storage/{uuid}/{db}.binlog`` (backup._binlog). The login needs the
+RELOAD, REPLICATION CLIENT and REPLICATION SLAVE privileges.
+
+Streaming mode (CoreDatabase.option_stream_upload): when every destination is
+S3-compatible, each dump is written into a storage.streaming.StreamingArchive
+member instead of a local .sql file, the archive is uploaded as it is produced,
+and the storage points are marked complete here; no local dump or zip exists
+and the disk preflight is skipped.
 """
 
 import subprocess
-import zipfile
+from functools import partial
 import os
 from sentry_sdk import capture_exception
 from apps._tasks.exceptions import NodeBackupFailedError
 from apps._tasks.helper.tasks import delete_from_disk
-from apps.api.v1.utils.api_helpers import bs_decrypt, ensure_disk_space
-from apps.api.v1.utils.api_helpers import zipdir, mkdir_p
+from apps._tasks.integration.archive import write_dump_archive
+from apps._tasks.integration.backup._binlog import (
+    BINLOG_FORMAT_QUERY,
+    BINLOG_SUFFIX,
+    binlog_range,
+    parse_dump_position,
+    parse_status,
+    source_data_flag,
+    status_query,
+)
+from apps._tasks.integration.backup._incremental import plan_chain, previous_link
+from apps._tasks.integration.backup._parallel import dump_workers, run_dumps
+from apps._tasks.integration.backup._ssh_transport import (
+    GZIP_SUFFIX,
+    READ_SIZE,
+    gzip_command,
+    is_empty_dump,
+    split_exit_status,
+    widen_window,
+)
+from apps._tasks.integration.storage.streaming import open_streaming_archive
+from apps._tasks.helper.disk_ledger import estimate_bytes, reserve_disk_space
+from apps.api.v1.utils.api_helpers import bs_decrypt
+from apps.api.v1.utils.api_helpers import mkdir_p
 from apps._tasks.integration.backup._sanitize import safe_token, safe_password
 
 from apps.console.utils.models import UtilBackup
@@ -87,43 +126,184 @@ def _decode(data):
     return data.decode("utf-8", "replace") if isinstance(data, bytes) else (data or "")
 
 
-def _run_direct_dump(node, backup, argv, db_file, log_file, username, password):
-    """Run a local mysqldump, streaming stdout to db_file; raise on any failure."""
+def _run_direct_dump(node, backup, argv, db_file, log_file, username, password, stream=None,
+                     what="mysqldump"):
+    """Run a local mysqldump (or mysqlbinlog), streaming stdout to db_file (or into
+    the streaming archive's member of the same name); raise on any failure."""
     log_file.write(f"MYSQL: {_redact(' '.join(argv), username, password)}\n")
-    with open(db_file, "wb") as out:
-        proc = subprocess.run(
-            argv,
-            stdout=out,
-            stderr=subprocess.PIPE,
-            timeout=COMMAND_TIMEOUT,
+    if stream is not None:
+        returncode, stderr, written = stream.dump_command(
+            argv, os.path.basename(db_file), timeout=COMMAND_TIMEOUT
         )
-    err_text = _decode(proc.stderr)
-    if proc.returncode != 0:
+    else:
+        with open(db_file, "wb") as out:
+            proc = subprocess.run(
+                argv,
+                stdout=out,
+                stderr=subprocess.PIPE,
+                timeout=COMMAND_TIMEOUT,
+            )
+        returncode, stderr = proc.returncode, proc.stderr
+        written = os.path.getsize(db_file)
+    err_text = _decode(stderr)
+    if returncode != 0:
         raise NodeBackupFailedError(
             node,
             backup.uuid_str,
             backup.attempt_no,
             backup.type,
-            message=f"mysqldump failed with exit code {proc.returncode}: "
+            message=f"{what} failed with exit code {returncode}: "
                     f"{_redact(err_text[-2000:], username, password)}",
         )
     for line in err_text.splitlines():
         if line.strip():
             log_file.write(f"WARNING: {_redact(line, username, password)}\n")
-    if os.path.getsize(db_file) == 0:
+    if written == 0:
         raise NodeBackupFailedError(
             node,
             backup.uuid_str,
             backup.attempt_no,
             backup.type,
-            message="mysqldump produced an empty dump file (0 bytes).",
+            message=f"{what} produced an empty dump file (0 bytes).",
         )
 
 
-def _ssh_check_result(node, backup, stdout, stderr, log_file, username, password, what):
-    """Raise NodeBackupFailedError on non-zero remote exit status; log stderr as warnings."""
+def _run_client(node, backup, argv, log_file, username, password, what):
+    """Run a local mysql client query and return its stdout text; raise on a
+    non-zero exit status."""
+    log_file.write(f"MYSQL: {_redact(' '.join(argv), username, password)}\n")
+    proc = subprocess.run(
+        argv,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=COMMAND_TIMEOUT,
+    )
+    if proc.returncode != 0:
+        raise NodeBackupFailedError(
+            node,
+            backup.uuid_str,
+            backup.attempt_no,
+            backup.type,
+            message=f"{what} failed with exit code {proc.returncode}: "
+                    f"{_redact(_decode(proc.stderr)[-2000:], username, password)}",
+        )
+    return _decode(proc.stdout)
+
+
+def _incremental_backup(node, backup, local_dir, log_file, bin_path, defaults_path,
+                        dump_flags, username, password):
+    """Incremental mode: a full dump that records its binlog coordinates, or the
+    binlog events since the previous run of the chain."""
+    auth = node.connection.auth_database
+    database = auth.database_name
+    base, position = plan_chain(backup)
+    defaults = f"--defaults-extra-file={defaults_path}"
+    mysql = [f"{bin_path}mysql", defaults, "--batch", "--skip-column-names", "-e"]
+
+    binlog_format = _run_client(node, backup, mysql + [BINLOG_FORMAT_QUERY],
+                                log_file, username, password, "mysql binlog format").strip()
+    if binlog_format.upper() != "ROW":
+        raise NodeBackupFailedError(
+            node,
+            backup.uuid_str,
+            backup.attempt_no,
+            backup.type,
+            message=f"incremental mode needs binlog_format=ROW, the server uses {binlog_format[:20]!r}.",
+        )
+
+    if base is None:
+        log_file.write(f"Backup: Full Base (binlog coordinates recorded) \n")
+        dump_file = f"{local_dir}{database}.sql"
+        # The recorded coordinates are only those of the dumped data when the
+        # whole dump is one consistent snapshot.
+        if "--single-transaction" not in dump_flags:
+            dump_flags = dump_flags + ["--single-transaction"]
+        _run_direct_dump(
+            node,
+            backup,
+            [f"{bin_path}mysqldump", defaults]
+            + dump_flags
+            + [source_data_flag(auth.version), database],
+            dump_file,
+            log_file,
+            username,
+            password,
+        )
+        coordinates = parse_dump_position(dump_file)
+        if coordinates is None:
+            raise NodeBackupFailedError(
+                node,
+                backup.uuid_str,
+                backup.attempt_no,
+                backup.type,
+                message="mysqldump recorded no binlog position; is binary logging enabled?",
+            )
+    else:
+        previous = previous_link(base, position)
+        start_file = previous.metadata["binlog_file"]
+        start_pos = previous.metadata["binlog_pos"]
+        log_file.write(f"Backup: Binlog Increment {position} of base {base.uuid_str} \n")
+        coordinates = parse_status(
+            _run_client(node, backup, mysql + [status_query(auth.version)],
+                        log_file, username, password, "mysql binlog status")
+        )
+        if coordinates is None:
+            raise NodeBackupFailedError(
+                node,
+                backup.uuid_str,
+                backup.attempt_no,
+                backup.type,
+                message="binary logging is disabled on the server.",
+            )
+        listing = _run_client(node, backup, mysql + ["SHOW BINARY LOGS"],
+                              log_file, username, password, "mysql show binary logs")
+        try:
+            files = binlog_range(listing, start_file, coordinates[0])
+        except ValueError as e:
+            raise NodeBackupFailedError(
+                node,
+                backup.uuid_str,
+                backup.attempt_no,
+                backup.type,
+                message=f"{e}; the next run takes a new full base.",
+            )
+        for name in files:
+            safe_token(name, "binlog")
+        binlog_argv = [
+            f"{bin_path}mysqlbinlog", defaults, "--read-from-remote-server",
+            f"--database={database}",
+            f"--start-position={start_pos}", f"--stop-position={coordinates[1]}",
+        ]
+        if "mysql_5_5" not in auth.version:
+            # Replayed events must not carry their GTIDs: the server that already
+            # executed them would skip them.
+            binlog_argv.append("--skip-gtids")
+        _run_direct_dump(
+            node,
+            backup,
+            binlog_argv + files,
+            f"{local_dir}{database}{BINLOG_SUFFIX}",
+            log_file,
+            username,
+            password,
+            what="mysqlbinlog",
+        )
+
+    log_file.write(f"Binlog Position: {coordinates[0]}:{coordinates[1]} \n")
+    backup.metadata = {"binlog_file": coordinates[0], "binlog_pos": coordinates[1]}
+    backup.base_backup = base
+    backup.chain_position = position
+    backup.save()
+
+
+def _ssh_check_result(node, backup, stdout, stderr, log_file, username, password, what,
+                      compressed=False):
+    """Raise NodeBackupFailedError on non-zero remote exit status; log stderr as warnings.
+    For a gzip_command the dump's own exit status is taken from stderr."""
     err_text = _decode(stderr.read())
     exit_status = stdout.channel.recv_exit_status()
+    if compressed:
+        exit_status, err_text = split_exit_status(err_text, exit_status)
     if exit_status != 0:
         raise NodeBackupFailedError(
             node,
@@ -148,19 +328,29 @@ def _ssh_run_capture(node, backup, ssh, command, log_file, username, password, w
     return out_text
 
 
-def _ssh_dump_to_file(node, backup, ssh, command, db_file, log_file, username, password):
-    """Run a remote mysqldump, streaming stdout to db_file (binary append); raise on failure."""
+def _ssh_dump_to_file(node, backup, ssh, command, db_file, log_file, username, password,
+                      stream=None, compress=False):
+    """Run a remote mysqldump, streaming stdout to db_file (binary append); raise on failure.
+    With compress the dump is gzip'ed on the remote host and kept as db_file + ".gz"."""
     log_file.write(f"MYSQL: {_redact(command, username, password)}\n")
+    if compress:
+        command = gzip_command(command)
+        db_file += GZIP_SUFFIX
     stdin, stdout, stderr = ssh.exec_command(command)
     stdout._set_mode("rb")
-    with open(db_file, "ab") as tmp:
-        while True:
-            chunk = stdout.read(65536)
-            if not chunk:
-                break
-            tmp.write(chunk)
-    _ssh_check_result(node, backup, stdout, stderr, log_file, username, password, "mysqldump")
-    if os.path.getsize(db_file) == 0:
+    if stream is not None:
+        written = stream.copy_stream(os.path.basename(db_file), stdout.read, stored=compress)
+    else:
+        with open(db_file, "ab") as tmp:
+            while True:
+                chunk = stdout.read(READ_SIZE)
+                if not chunk:
+                    break
+                tmp.write(chunk)
+        written = os.path.getsize(db_file)
+    _ssh_check_result(node, backup, stdout, stderr, log_file, username, password, "mysqldump",
+                      compressed=compress)
+    if is_empty_dump(written, compress):
         raise NodeBackupFailedError(
             node,
             backup.uuid_str,
@@ -181,6 +371,7 @@ def snapshot_mysql(backup):
     local_zip = f"_storage/{backup.uuid}.zip"
     mkdir_p(local_dir)
     ssh_key_path = None
+    stream = None
     local_defaults_path = None
 
     # Backup Log
@@ -192,18 +383,27 @@ def snapshot_mysql(backup):
     log_file.write(f"Attempt Number: {backup.attempt_no} \n")
 
     try:
-        # Disk-space preflight: a huge dump must not fill the shared _storage
-        # volume mid-run. Estimate ~2x the node's most recent COMPLETE backup
-        # (dump files plus the final zip), floored at 1 GiB.
-        last = (
-            backup.__class__.objects.filter(
-                database__node=node, status=UtilBackup.Status.COMPLETE)
-            .order_by("-created").first()
-        )
-        ensure_disk_space(
-            int(max(2 * (last.size if last and last.size else 0), 1 << 30)),
-            what="database backup",
-        )
+        # Opt-in streaming mode: dumps go straight into multipart uploads and
+        # nothing is written under local_dir / local_zip.
+        incremental = node.database.backup_mode == node.database.BackupMode.INCREMENTAL
+        if not incremental:
+            stream = open_streaming_archive(backup, log_file)
+
+        # Disk-space reservation: a huge dump must not fill the shared _storage
+        # volume mid-run, nor may concurrent dumps together. Estimate ~2x the
+        # node's most recent COMPLETE backup (dump files plus the final zip), or
+        # the node's dump / zip ratio once known, floored at 1 GiB.
+        if stream is None:
+            last = (
+                backup.__class__.objects.filter(
+                    database__node=node, status=UtilBackup.Status.COMPLETE)
+                .order_by("-created").first()
+            )
+            reserve_disk_space(
+                backup.uuid_str,
+                estimate_bytes(node, last.size if last and last.size else 0, multiplier=2),
+                node=node, what="database backup",
+            )
 
         """
         Checking for connection
@@ -267,7 +467,19 @@ def snapshot_mysql(backup):
             node.connection.auth_database.use_public_key
             or node.connection.auth_database.use_private_key
         ):
+            if incremental:
+                raise NodeBackupFailedError(
+                    node,
+                    backup.uuid_str,
+                    backup.attempt_no,
+                    backup.type,
+                    message="Incremental (binlog) backups need a direct database connection.",
+                )
             ssh, ssh_key_path = node.connection.auth_database.get_ssh_client()
+            widen_window(ssh)
+            compress = node.database.option_ssh_compress
+            workers = dump_workers(node.database, stream, ssh=True)
+            log_file.write(f"Parallel dumps: {workers} \n")
             remote_defaults_name = f"bs_{backup.uuid_str}.cnf"
 
             try:
@@ -314,29 +526,46 @@ def snapshot_mysql(backup):
 
                     for database in databases:
                         safe_token(database, "database")
-                        _ssh_dump_to_file(
-                            node,
-                            backup,
-                            ssh,
-                            remote_mysqldump([database]),
-                            f"{local_dir}{database}.sql",
-                            log_file,
-                            username,
-                            password,
-                        )
+                    run_dumps(
+                        [
+                            partial(
+                                _ssh_dump_to_file,
+                                node,
+                                backup,
+                                ssh,
+                                remote_mysqldump([database]),
+                                f"{local_dir}{database}.sql",
+                                log_file,
+                                username,
+                                password,
+                                stream=stream,
+                                compress=compress,
+                            )
+                            for database in databases
+                        ],
+                        workers,
+                    )
                 # Selected databases on node
                 elif node.database.databases:
-                    for database in node.database.databases:
-                        _ssh_dump_to_file(
-                            node,
-                            backup,
-                            ssh,
-                            remote_mysqldump([database]),
-                            f"{local_dir}{database}.sql",
-                            log_file,
-                            username,
-                            password,
-                        )
+                    run_dumps(
+                        [
+                            partial(
+                                _ssh_dump_to_file,
+                                node,
+                                backup,
+                                ssh,
+                                remote_mysqldump([database]),
+                                f"{local_dir}{database}.sql",
+                                log_file,
+                                username,
+                                password,
+                                stream=stream,
+                                compress=compress,
+                            )
+                            for database in node.database.databases
+                        ],
+                        workers,
+                    )
                 # Means database name is selected at account level.
                 elif node.database.all_tables:
                     _ssh_dump_to_file(
@@ -348,20 +577,30 @@ def snapshot_mysql(backup):
                         log_file,
                         username,
                         password,
+                        stream=stream,
+                        compress=compress,
                     )
                 # Again! means database name is selected at account level.
                 elif node.database.tables:
-                    for table in node.database.tables:
-                        _ssh_dump_to_file(
-                            node,
-                            backup,
-                            ssh,
-                            remote_mysqldump([node.connection.auth_database.database_name, table]),
-                            f"{local_dir}{table}.sql",
-                            log_file,
-                            username,
-                            password,
-                        )
+                    run_dumps(
+                        [
+                            partial(
+                                _ssh_dump_to_file,
+                                node,
+                                backup,
+                                ssh,
+                                remote_mysqldump([node.connection.auth_database.database_name, table]),
+                                f"{local_dir}{table}.sql",
+                                log_file,
+                                username,
+                                password,
+                                stream=stream,
+                                compress=compress,
+                            )
+                            for table in node.database.tables
+                        ],
+                        workers,
+                    )
             finally:
                 try:
                     ssh.exec_command(f"rm -f {remote_defaults_name}")
@@ -369,6 +608,9 @@ def snapshot_mysql(backup):
                     pass
                 ssh.close()
         else:
+            workers = dump_workers(node.database, stream)
+            log_file.write(f"Parallel dumps: {workers} \n")
+
             local_defaults_path = f"_storage/my_{backup.uuid}.cnf"
             _write_local_defaults_file(
                 local_defaults_path,
@@ -388,7 +630,27 @@ def snapshot_mysql(backup):
                     + targets
                 )
 
-            if node.database.all_tables:
+            if incremental:
+                if not node.database.all_tables:
+                    raise NodeBackupFailedError(
+                        node,
+                        backup.uuid_str,
+                        backup.attempt_no,
+                        backup.type,
+                        message="Incremental (binlog) backups cover the whole database; select all tables.",
+                    )
+                _incremental_backup(
+                    node,
+                    backup,
+                    local_dir,
+                    log_file,
+                    database_version_path,
+                    local_defaults_path,
+                    dump_flags,
+                    username,
+                    password,
+                )
+            elif node.database.all_tables:
                 _run_direct_dump(
                     node,
                     backup,
@@ -397,37 +659,50 @@ def snapshot_mysql(backup):
                     log_file,
                     username,
                     password,
+                    stream=stream,
                 )
             else:
-                for table in node.database.tables:
-                    _run_direct_dump(
-                        node,
-                        backup,
-                        local_mysqldump([node.connection.auth_database.database_name, table]),
-                        f"{local_dir}{table}.sql",
-                        log_file,
-                        username,
-                        password,
-                    )
-
-        # Generate Report (no external binaries; sudo does not exist in the container).
-        log_file.write(f"---Directory Tree--- \n")
-        for root, dirs, files in os.walk(local_dir):
-            for name in sorted(files):
-                full_path = os.path.join(root, name)
-                log_file.write(
-                    f"{os.path.relpath(full_path, local_dir)} ({os.path.getsize(full_path)} bytes)\n"
+                run_dumps(
+                    [
+                        partial(
+                            _run_direct_dump,
+                            node,
+                            backup,
+                            local_mysqldump([node.connection.auth_database.database_name, table]),
+                            f"{local_dir}{table}.sql",
+                            log_file,
+                            username,
+                            password,
+                            stream=stream,
+                        )
+                        for table in node.database.tables
+                    ],
+                    workers,
                 )
 
-        zipf = zipfile.ZipFile(local_zip, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
-        zipdir(local_dir, zipf)
-        zipf.close()
+        if stream is not None:
+            log_file.write(f"---Archive Members--- \n")
+            for name, size in stream.members:
+                log_file.write(f"{name} ({size} bytes)\n")
 
-        if path.exists(local_zip):
-            backup.size = os.stat(local_zip).st_size
+            # Completes the uploads and marks the storage points, so
+            # create_snapshot finds nothing left to upload.
+            backup.size = stream.close()
+            stream = None
             backup.status = UtilBackup.Status.DOWNLOAD_COMPLETE
             backup.save()
             log_file.write(f"Size (compressed): {backup.size_display()} \n")
+        else:
+            # Directory-tree report and archive from one scan of local_dir (no
+            # external binaries; sudo does not exist in the container).
+            log_file.write(f"---Directory Tree--- \n")
+            write_dump_archive(backup, local_dir, local_zip, log_file)
+
+            if path.exists(local_zip):
+                backup.size = os.stat(local_zip).st_size
+                backup.status = UtilBackup.Status.DOWNLOAD_COMPLETE
+                backup.save()
+                log_file.write(f"Size (compressed): {backup.size_display()} \n")
 
         """
         Delete directory because no need for it now that we have zip
@@ -439,6 +714,8 @@ def snapshot_mysql(backup):
     except Exception as e:
         log_file.write(f"Error: {e.__str__()} \n")
         capture_exception(e)
+        if stream is not None:
+            stream.abort()
         """
         Delete files
         """
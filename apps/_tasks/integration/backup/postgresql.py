@@ -5,7 +5,10 @@ Two modes:
 - DIRECT: runs the local pg_dump binary via subprocess with an argv list (no
   ``shell=True``, no ``>`` redirect). The password is passed through the
   ``PGPASSWORD`` environment variable (``env=``), never inline on a shell
-  string. Dump stdout is streamed to ``_storage/{uuid}/{db|table}.sql``.
+  string. Dump stdout is streamed to ``_storage/{uuid}/{db|table}.sql``. With
+  CoreDatabase.option_postgres_directory the database is instead dumped once
+  with ``pg_dump -Fd -j N`` into ``_storage/{uuid}/{db}.pgdump/`` (restored
+  with pg_restore).
 - SSH: runs psql/pg_dump on the remote host via paramiko. A pgpass file
   ``bs_{backup.uuid_str}.pgpass`` (chmod 600, ``host:port:*:user:password``) is
   SFTP-uploaded to the remote home directory, referenced with a
@@ -15,26 +18,63 @@ Two modes:
   enumeration filters out template0/template1 (template0 has
   datallowconn=false and cannot be dumped).
 
+Per-database / per-table dumps run up to CoreDatabase.dump_parallelism at a
+time (backup._parallel); N for ``-j`` is the same setting.
+
 Error detection (fixes the BS-10 silent-failure hole): every command's exit
 status is checked and a non-zero status raises NodeBackupFailedError with the
 redacted stderr tail. stderr of successful commands is written to the run log
 as warnings (never fatal — pg_dump emits non-fatal warnings on stderr). A
 0-byte dump file is always treated as a failure. On success the .sql files are
-zipped to ``_storage/{uuid}.zip`` and the dump directory is deleted; on any
-failure everything is deleted and NodeBackupFailedError is raised. A
-disk-space preflight (~2x the node's most recent COMPLETE backup, 1 GiB
-floor) runs before anything is dumped so a huge database fails fast instead of
-filling the shared _storage volume mid-run.
+archived to ``_storage/{uuid}.zip`` (zip, or tar.zst per the schedule's
+archive_format) and the dump directory is deleted; on any failure everything
+is deleted and NodeBackupFailedError is raised. A disk-space preflight (~2x
+the node's most recent COMPLETE backup, 1 GiB floor) runs before anything is
+dumped so a huge database fails fast instead of filling the shared _storage
+volume mid-run.
+
+Incremental mode (CoreDatabase.backup_mode incremental, direct connections
+only): instead of pg_dump the run is part of a backup chain
+(backup._incremental). A full base is ``pg_basebackup -Ft -X stream`` of the
+cluster into ``_storage/{uuid}/base/``, which (re)creates the node's physical
+replication slot ``bs_node_{node.id}``; each increment forces a WAL switch and
+streams the WAL written since the previous run from that slot with
+``pg_receivewal --endpos`` into ``_storage/{uuid}/wal/``. The last segment of
+an increment stops at that end and is kept as ``<segment>.partial``; the next
+increment streams it again in full. PostgreSQL 15 or later is required (see
+PG_INCREMENTAL_MIN_VERSION). The login needs the REPLICATION attribute (and
+EXECUTE on pg_switch_wal). These backups are recovered with PostgreSQL
+point-in-time recovery, not the one-click restore.
+
+Streaming mode (CoreDatabase.option_stream_upload): when every destination is
+S3-compatible, each dump is written into a storage.streaming.StreamingArchive
+member instead of a local .sql file, the archive is uploaded as it is produced,
+and the storage points are marked complete here; no local dump or zip exists
+and the disk preflight is skipped.
 """
 
+import re
 import subprocess
-import zipfile
+from functools import partial
 import os
 from sentry_sdk import capture_exception
 from apps._tasks.exceptions import NodeBackupFailedError
 from apps._tasks.helper.tasks import delete_from_disk
-from apps.api.v1.utils.api_helpers import bs_decrypt, ensure_disk_space
-from apps.api.v1.utils.api_helpers import zipdir, mkdir_p
+from apps._tasks.integration.archive import write_dump_archive
+from apps._tasks.integration.backup._incremental import plan_chain
+from apps._tasks.integration.backup._parallel import dump_workers, run_dumps
+from apps._tasks.integration.backup._ssh_transport import (
+    GZIP_SUFFIX,
+    READ_SIZE,
+    gzip_command,
+    is_empty_dump,
+    split_exit_status,
+    widen_window,
+)
+from apps._tasks.integration.storage.streaming import open_streaming_archive
+from apps._tasks.helper.disk_ledger import estimate_bytes, reserve_disk_space
+from apps.api.v1.utils.api_helpers import bs_decrypt
+from apps.api.v1.utils.api_helpers import mkdir_p
 from apps.console.utils.models import UtilBackup
 from apps._tasks.integration.backup._sanitize import (
     safe_token,
@@ -45,6 +85,19 @@ from os import path
 
 COMMAND_TIMEOUT = 12 * 3600
 
+# Directory-format dumps (CoreDatabase.option_postgres_directory) are written to
+# {database}.pgdump/ and restored with pg_restore instead of psql.
+PG_DIRECTORY_SUFFIX = ".pgdump"
+
+# Incremental mode: base backups land in base/, WAL increments in wal/.
+PG_BASE_DIR = "base"
+PG_WAL_DIR = "wal"
+# pg_receivewal has no start position option; from 15 on it starts at the
+# slot's restart_lsn, before that at the server's current position, which
+# would lose the WAL written between two runs.
+PG_INCREMENTAL_MIN_VERSION = 15
+_LSN = re.compile(r"^[0-9A-F]{1,8}/[0-9A-F]{1,8}$")
+
 
 def _redact(text, username, password):
     out = text or ""
@@ -74,17 +127,58 @@ def _decode(data):
     return data.decode("utf-8", "replace") if isinstance(data, bytes) else (data or "")
 
 
-def _run_direct_dump(node, backup, argv, db_file, log_file, username, password, env):
-    """Run a local pg_dump, streaming stdout to db_file; raise on any failure."""
+def _run_direct_dump(node, backup, argv, db_file, log_file, username, password, env, stream=None):
+    """Run a local pg_dump, streaming stdout to db_file (or into the streaming
+    archive's member of the same name); raise on any failure."""
     log_file.write(f"PostgreSQL: {_redact(' '.join(argv), username, password)}\n")
-    with open(db_file, "wb") as out:
-        proc = subprocess.run(
-            argv,
-            stdout=out,
-            stderr=subprocess.PIPE,
-            timeout=COMMAND_TIMEOUT,
-            env=env,
+    if stream is not None:
+        returncode, stderr, written = stream.dump_command(
+            argv, os.path.basename(db_file), timeout=COMMAND_TIMEOUT, env=env
+        )
+    else:
+        with open(db_file, "wb") as out:
+            proc = subprocess.run(
+                argv,
+                stdout=out,
+                stderr=subprocess.PIPE,
+                timeout=COMMAND_TIMEOUT,
+                env=env,
+            )
+        returncode, stderr = proc.returncode, proc.stderr
+        written = os.path.getsize(db_file)
+    err_text = _decode(stderr)
+    if returncode != 0:
+        raise NodeBackupFailedError(
+            node,
+            backup.uuid_str,
+            backup.attempt_no,
+            backup.type,
+            message=f"pg_dump failed with exit code {returncode}: "
+                    f"{_redact(err_text[-2000:], username, password)}",
+        )
+    for line in err_text.splitlines():
+        if line.strip():
+            log_file.write(f"WARNING: {_redact(line, username, password)}\n")
+    if written == 0:
+        raise NodeBackupFailedError(
+            node,
+            backup.uuid_str,
+            backup.attempt_no,
+            backup.type,
+            message="pg_dump produced an empty dump file (0 bytes).",
         )
+
+
+def _run_directory_dump(node, backup, argv, dump_dir, log_file, username, password, env):
+    """Run a local ``pg_dump -Fd`` into dump_dir; raise on any failure."""
+    log_file.write(f"PostgreSQL: {_redact(' '.join(argv), username, password)}\n")
+    proc = subprocess.run(
+        argv,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=COMMAND_TIMEOUT,
+        env=env,
+    )
     err_text = _decode(proc.stderr)
     if proc.returncode != 0:
         raise NodeBackupFailedError(
@@ -98,20 +192,137 @@ def _run_direct_dump(node, backup, argv, db_file, log_file, username, password,
     for line in err_text.splitlines():
         if line.strip():
             log_file.write(f"WARNING: {_redact(line, username, password)}\n")
-    if os.path.getsize(db_file) == 0:
+    if not os.path.isfile(os.path.join(dump_dir, "toc.dat")):
         raise NodeBackupFailedError(
             node,
             backup.uuid_str,
             backup.attempt_no,
             backup.type,
-            message="pg_dump produced an empty dump file (0 bytes).",
+            message="pg_dump did not produce a directory-format dump (toc.dat missing).",
         )
 
 
-def _ssh_check_result(node, backup, stdout, stderr, log_file, username, password, what):
-    """Raise NodeBackupFailedError on non-zero remote exit status; log stderr as warnings."""
+def _run_client(node, backup, argv, log_file, username, password, env, what):
+    """Run a local PostgreSQL client binary and return its stdout text; raise on
+    a non-zero exit status, log stderr as warnings otherwise."""
+    log_file.write(f"PostgreSQL: {_redact(' '.join(argv), username, password)}\n")
+    proc = subprocess.run(
+        argv,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=COMMAND_TIMEOUT,
+        env=env,
+    )
+    err_text = _decode(proc.stderr)
+    if proc.returncode != 0:
+        raise NodeBackupFailedError(
+            node,
+            backup.uuid_str,
+            backup.attempt_no,
+            backup.type,
+            message=f"{what} failed with exit code {proc.returncode}: "
+                    f"{_redact(err_text[-2000:], username, password)}",
+        )
+    for line in err_text.splitlines():
+        if line.strip():
+            log_file.write(f"WARNING: {_redact(line, username, password)}\n")
+    return _decode(proc.stdout)
+
+
+def _slot_name(node):
+    return f"bs_node_{node.id}"
+
+
+def _incremental_backup(node, backup, local_dir, log_file, bin_path, username, password, env):
+    """Incremental mode: a pg_basebackup base, or the WAL streamed from the
+    node's replication slot since the previous run of the chain."""
+    auth = node.connection.auth_database
+    if int(auth.version.split("_")[1]) < PG_INCREMENTAL_MIN_VERSION:
+        raise NodeBackupFailedError(
+            node,
+            backup.uuid_str,
+            backup.attempt_no,
+            backup.type,
+            message=f"Incremental mode needs PostgreSQL {PG_INCREMENTAL_MIN_VERSION} or later.",
+        )
+    base, position = plan_chain(backup)
+    slot = _slot_name(node)
+    conn = ["-h", str(auth.host), "-p", str(auth.port), "-U", username, "-w"]
+    psql = [f"{bin_path}psql", *conn, "-d", auth.database_name or "postgres", "-At", "-c"]
+
+    if base is None:
+        log_file.write(f"Backup: Physical Base (pg_basebackup) \n")
+        # A new chain gets a fresh slot; the old one would otherwise pin the
+        # server's WAL from before this base.
+        _run_client(
+            node, backup,
+            psql + [
+                "SELECT pg_drop_replication_slot(slot_name) FROM pg_replication_slots"
+                f" WHERE slot_name = '{slot}'"
+            ],
+            log_file, username, password, env, "psql",
+        )
+        base_dir = f"{local_dir}{PG_BASE_DIR}"
+        _run_client(
+            node, backup,
+            [
+                f"{bin_path}pg_basebackup", *conn,
+                "-D", base_dir, "-Ft", "-X", "stream", "-c", "fast",
+                "--create-slot", f"--slot={slot}", "-l", f"backupsheep {backup.uuid_str}",
+            ],
+            log_file, username, password, env, "pg_basebackup",
+        )
+        if not os.path.isfile(os.path.join(base_dir, "base.tar")):
+            raise NodeBackupFailedError(
+                node,
+                backup.uuid_str,
+                backup.attempt_no,
+                backup.type,
+                message="pg_basebackup did not produce base.tar.",
+            )
+        backup.metadata = {"engine": "pg_basebackup", "slot": slot}
+    else:
+        log_file.write(f"Backup: WAL Increment {position} of base {base.uuid_str} \n")
+        # Close the current segment so everything committed so far is in
+        # complete segments; its end is where this increment stops.
+        end_lsn = _run_client(
+            node, backup, psql + ["SELECT pg_switch_wal()"],
+            log_file, username, password, env, "psql",
+        ).strip()
+        if not _LSN.match(end_lsn):
+            raise NodeBackupFailedError(
+                node,
+                backup.uuid_str,
+                backup.attempt_no,
+                backup.type,
+                message=f"pg_switch_wal returned an unexpected position: {end_lsn[:100]}",
+            )
+        wal_dir = f"{local_dir}{PG_WAL_DIR}"
+        os.makedirs(wal_dir, exist_ok=True)
+        _run_client(
+            node, backup,
+            [
+                f"{bin_path}pg_receivewal", *conn,
+                "-D", wal_dir, f"--slot={slot}", f"--endpos={end_lsn}", "--no-loop",
+            ],
+            log_file, username, password, env, "pg_receivewal",
+        )
+        log_file.write(f"WAL Segments: {len(os.listdir(wal_dir))} (up to {end_lsn}) \n")
+        backup.metadata = {"engine": "pg_receivewal", "slot": slot, "end_lsn": end_lsn}
+
+    backup.base_backup = base
+    backup.chain_position = position
+    backup.save()
+
+
+def _ssh_check_result(node, backup, stdout, stderr, log_file, username, password, what,
+                      compressed=False):
+    """Raise NodeBackupFailedError on non-zero remote exit status; log stderr as warnings.
+    For a gzip_command the dump's own exit status is taken from stderr."""
     err_text = _decode(stderr.read())
     exit_status = stdout.channel.recv_exit_status()
+    if compressed:
+        exit_status, err_text = split_exit_status(err_text, exit_status)
     if exit_status != 0:
         raise NodeBackupFailedError(
             node,
@@ -136,19 +347,29 @@ def _ssh_run_capture(node, backup, ssh, command, log_file, username, password, w
     return out_text
 
 
-def _ssh_dump_to_file(node, backup, ssh, command, db_file, log_file, username, password):
-    """Run a remote pg_dump, streaming stdout to db_file (binary append); raise on failure."""
+def _ssh_dump_to_file(node, backup, ssh, command, db_file, log_file, username, password,
+                      stream=None, compress=False):
+    """Run a remote pg_dump, streaming stdout to db_file (binary append); raise on failure.
+    With compress the dump is gzip'ed on the remote host and kept as db_file + ".gz"."""
     log_file.write(f"PostgreSQL: {_redact(command, username, password)}\n")
+    if compress:
+        command = gzip_command(command)
+        db_file += GZIP_SUFFIX
     stdin, stdout, stderr = ssh.exec_command(command)
     stdout._set_mode("rb")
-    with open(db_file, "ab") as tmp:
-        while True:
-            chunk = stdout.read(65536)
-            if not chunk:
-                break
-            tmp.write(chunk)
-    _ssh_check_result(node, backup, stdout, stderr, log_file, username, password, "pg_dump")
-    if os.path.getsize(db_file) == 0:
+    if stream is not None:
+        written = stream.copy_stream(os.path.basename(db_file), stdout.read, stored=compress)
+    else:
+        with open(db_file, "ab") as tmp:
+            while True:
+                chunk = stdout.read(READ_SIZE)
+                if not chunk:
+                    break
+                tmp.write(chunk)
+        written = os.path.getsize(db_file)
+    _ssh_check_result(node, backup, stdout, stderr, log_file, username, password, "pg_dump",
+                      compressed=compress)
+    if is_empty_dump(written, compress):
         raise NodeBackupFailedError(
             node,
             backup.uuid_str,
@@ -169,6 +390,7 @@ def snapshot_postgresql(backup):
     local_zip = f"_storage/{backup.uuid}.zip"
     mkdir_p(local_dir)
     ssh_key_path = None
+    stream = None
 
     # Backup Log
     log_file_path = f"_storage/{backup.uuid}.log"
@@ -179,18 +401,27 @@ def snapshot_postgresql(backup):
     log_file.write(f"Attempt Number: {backup.attempt_no} \n")
 
     try:
-        # Disk-space preflight: a huge dump must not fill the shared _storage
-        # volume mid-run. Estimate ~2x the node's most recent COMPLETE backup
-        # (dump files plus the final zip), floored at 1 GiB.
-        last = (
-            backup.__class__.objects.filter(
-                database__node=node, status=UtilBackup.Status.COMPLETE)
-            .order_by("-created").first()
-        )
-        ensure_disk_space(
-            int(max(2 * (last.size if last and last.size else 0), 1 << 30)),
-            what="database backup",
-        )
+        # Opt-in streaming mode: dumps go straight into multipart uploads and
+        # nothing is written under local_dir / local_zip.
+        incremental = node.database.backup_mode == node.database.BackupMode.INCREMENTAL
+        if not incremental:
+            stream = open_streaming_archive(backup, log_file)
+
+        # Disk-space reservation: a huge dump must not fill the shared _storage
+        # volume mid-run, nor may concurrent dumps together. Estimate ~2x the
+        # node's most recent COMPLETE backup (dump files plus the final zip), or
+        # the node's dump / zip ratio once known, floored at 1 GiB.
+        if stream is None:
+            last = (
+                backup.__class__.objects.filter(
+                    database__node=node, status=UtilBackup.Status.COMPLETE)
+                .order_by("-created").first()
+            )
+            reserve_disk_space(
+                backup.uuid_str,
+                estimate_bytes(node, last.size if last and last.size else 0, multiplier=2),
+                node=node, what="database backup",
+            )
 
         if node.database.option_postgres:
             option_postgres = f"-w {safe_options(node.database.option_postgres, 'option_postgres')}"
@@ -238,7 +469,21 @@ def snapshot_postgresql(backup):
                 node.connection.auth_database.use_public_key
                 or node.connection.auth_database.use_private_key
         ):
+            if incremental:
+                raise NodeBackupFailedError(
+                    node,
+                    backup.uuid_str,
+                    backup.attempt_no,
+                    backup.type,
+                    message="Incremental (pg_basebackup + WAL) backups need a direct database connection.",
+                )
             ssh, ssh_key_path = node.connection.auth_database.get_ssh_client()
+            widen_window(ssh)
+            compress = node.database.option_ssh_compress
+            workers = dump_workers(node.database, stream, ssh=True)
+            log_file.write(f"Parallel dumps: {workers} \n")
+            if node.database.option_postgres_directory:
+                log_file.write("Directory format needs a direct connection; using plain dumps. \n")
             remote_pgpass_name = f"bs_{backup.uuid_str}.pgpass"
 
             log_file.write(f"Connection: SSH using public/private key\n")
@@ -316,33 +561,49 @@ def snapshot_postgresql(backup):
                     for database in databases:
                         safe_token(database, "database")
                         log_file.write(f"Found Database: {database} \n")
-
-                        _ssh_dump_to_file(
-                            node,
-                            backup,
-                            ssh,
-                            remote_pg_dump(database),
-                            f"{local_dir}{database}.sql",
-                            log_file,
-                            username,
-                            password,
-                        )
+                    run_dumps(
+                        [
+                            partial(
+                                _ssh_dump_to_file,
+                                node,
+                                backup,
+                                ssh,
+                                remote_pg_dump(database),
+                                f"{local_dir}{database}.sql",
+                                log_file,
+                                username,
+                                password,
+                                stream=stream,
+                                compress=compress,
+                            )
+                            for database in databases
+                        ],
+                        workers,
+                    )
                 elif node.database.databases:
                     log_file.write(f"Backup: Specific Databases \n")
 
                     for database in node.database.databases:
                         log_file.write(f"Database: {database} \n")
-
-                        _ssh_dump_to_file(
-                            node,
-                            backup,
-                            ssh,
-                            remote_pg_dump(database),
-                            f"{local_dir}{database}.sql",
-                            log_file,
-                            username,
-                            password,
-                        )
+                    run_dumps(
+                        [
+                            partial(
+                                _ssh_dump_to_file,
+                                node,
+                                backup,
+                                ssh,
+                                remote_pg_dump(database),
+                                f"{local_dir}{database}.sql",
+                                log_file,
+                                username,
+                                password,
+                                stream=stream,
+                                compress=compress,
+                            )
+                            for database in node.database.databases
+                        ],
+                        workers,
+                    )
 
                 # Means database name is selected at account level.
                 elif node.database.all_tables:
@@ -357,6 +618,8 @@ def snapshot_postgresql(backup):
                         log_file,
                         username,
                         password,
+                        stream=stream,
+                        compress=compress,
                     )
 
                 # Again! means database name is selected at account level.
@@ -365,17 +628,25 @@ def snapshot_postgresql(backup):
 
                     for table in node.database.tables:
                         log_file.write(f"Table: {table} \n")
-
-                        _ssh_dump_to_file(
-                            node,
-                            backup,
-                            ssh,
-                            remote_pg_dump(node.connection.auth_database.database_name, table=table),
-                            f"{local_dir}{table}.sql",
-                            log_file,
-                            username,
-                            password,
-                        )
+                    run_dumps(
+                        [
+                            partial(
+                                _ssh_dump_to_file,
+                                node,
+                                backup,
+                                ssh,
+                                remote_pg_dump(node.connection.auth_database.database_name, table=table),
+                                f"{local_dir}{table}.sql",
+                                log_file,
+                                username,
+                                password,
+                                stream=stream,
+                                compress=compress,
+                            )
+                            for table in node.database.tables
+                        ],
+                        workers,
+                    )
             finally:
                 try:
                     ssh.exec_command(f"rm -f ~/{remote_pgpass_name}")
@@ -385,6 +656,9 @@ def snapshot_postgresql(backup):
         else:
             log_file.write(f"Connection: Remote DB Connection \n")
 
+            workers = dump_workers(node.database, stream)
+            log_file.write(f"Parallel dumps: {workers} \n")
+
             # Password travels only in the process environment, never on argv.
             pg_env = os.environ.copy()
             pg_env["PGPASSWORD"] = password
@@ -402,7 +676,39 @@ def snapshot_postgresql(backup):
                 argv += option_postgres.split()
                 return argv
 
-            if node.database.all_tables:
+            if incremental:
+                _incremental_backup(
+                    node,
+                    backup,
+                    local_dir,
+                    log_file,
+                    database_version_path,
+                    username,
+                    password,
+                    pg_env,
+                )
+            elif node.database.option_postgres_directory and stream is None:
+                # One directory-format dump; pg_dump itself dumps `workers`
+                # tables at a time (-j), in tables mode limited to the selection.
+                database = node.connection.auth_database.database_name
+                log_file.write(f"Backup: Directory Format \n")
+                argv = local_pg_dump(database)
+                if not node.database.all_tables:
+                    for table in node.database.tables:
+                        log_file.write(f"Backup Table: {table} \n")
+                        argv += ["-t", table]
+                argv += ["-Fd", "-j", str(workers), "-f", f"{local_dir}{database}{PG_DIRECTORY_SUFFIX}"]
+                _run_directory_dump(
+                    node,
+                    backup,
+                    argv,
+                    f"{local_dir}{database}{PG_DIRECTORY_SUFFIX}",
+                    log_file,
+                    username,
+                    password,
+                    pg_env,
+                )
+            elif node.database.all_tables:
                 log_file.write(f"Backup: All Tables \n")
 
                 _run_direct_dump(
@@ -414,42 +720,55 @@ def snapshot_postgresql(backup):
                     username,
                     password,
                     pg_env,
+                    stream=stream,
                 )
             else:
                 log_file.write(f"Backup: Specific Tables \n")
 
                 for table in node.database.tables:
                     log_file.write(f"Backup Table: {table} \n")
-
-                    _run_direct_dump(
-                        node,
-                        backup,
-                        local_pg_dump(node.connection.auth_database.database_name, table=table),
-                        f"{local_dir}{table}.sql",
-                        log_file,
-                        username,
-                        password,
-                        pg_env,
-                    )
-
-        # Generate Report (no external binaries; sudo does not exist in the container).
-        log_file.write(f"---Directory Tree--- \n")
-        for root, dirs, files in os.walk(local_dir):
-            for name in sorted(files):
-                full_path = os.path.join(root, name)
-                log_file.write(
-                    f"{os.path.relpath(full_path, local_dir)} ({os.path.getsize(full_path)} bytes)\n"
+                run_dumps(
+                    [
+                        partial(
+                            _run_direct_dump,
+                            node,
+                            backup,
+                            local_pg_dump(node.connection.auth_database.database_name, table=table),
+                            f"{local_dir}{table}.sql",
+                            log_file,
+                            username,
+                            password,
+                            pg_env,
+                            stream=stream,
+                        )
+                        for table in node.database.tables
+                    ],
+                    workers,
                 )
 
-        zipf = zipfile.ZipFile(local_zip, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
-        zipdir(local_dir, zipf)
-        zipf.close()
+        if stream is not None:
+            log_file.write(f"---Archive Members--- \n")
+            for name, size in stream.members:
+                log_file.write(f"{name} ({size} bytes)\n")
 
-        if path.exists(local_zip):
-            backup.size = os.stat(local_zip).st_size
+            # Completes the uploads and marks the storage points, so
+            # create_snapshot finds nothing left to upload.
+            backup.size = stream.close()
+            stream = None
             backup.status = UtilBackup.Status.DOWNLOAD_COMPLETE
             backup.save()
             log_file.write(f"Size (compressed): {backup.size_display()} \n")
+        else:
+            # Directory-tree report and archive from one scan of local_dir (no
+            # external binaries; sudo does not exist in the container).
+            log_file.write(f"---Directory Tree--- \n")
+            write_dump_archive(backup, local_dir, local_zip, log_file)
+
+            if path.exists(local_zip):
+                backup.size = os.stat(local_zip).st_size
+                backup.status = UtilBackup.Status.DOWNLOAD_COMPLETE
+                backup.save()
+                log_file.write(f"Size (compressed): {backup.size_display()} \n")
 
         """
         Delete directory because no need for it now that we have zip
@@ -460,6 +779,8 @@ def snapshot_postgresql(backup):
     except Exception as e:
         log_file.write(f"Error: {e.__str__()} \n")
         capture_exception(e)
+        if stream is not None:
+            stream.abort()
         """
         Delete files
         """
@@ -6,7 +6,9 @@ One public entry point -- `snapshot_website(backup)` -- which dispatches between
     FTP / FTPS / SFTP source into a per-node persistent cache under
     ``_storage/website_cache/{node.uuid}/``. Unchanged files are never
     re-downloaded; ``--delete`` keeps the cache an exact mirror. Every backup zip
-    is still a complete standalone snapshot, built from the full cache contents.
+    is still a complete standalone snapshot of the full cache contents, built
+    from the previous run's zip (``_storage/website_cache/{node.uuid}.zip``) so
+    only new / changed files are compressed again.
     An exclusive flock on ``_storage/website_cache/{node.uuid}.lock`` serializes
     concurrent backups of the same node around the whole mirror+zip, and a
     fingerprint of the backup configuration
@@ -18,6 +20,15 @@ One public entry point -- `snapshot_website(backup)` -- which dispatches between
   * Server-side tar (backup_type FULL_V2 with private/public-key auth): the
     remote server tars the configured paths over SSH, the tar is pulled down via
     SFTP, listed for the file manifest and zipped locally.
+  * Incremental server-side tar (backup_type INCREMENTAL_V2, same auth): as
+    above, but the remote tar runs with ``--listed-incremental`` against the
+    node's snapshot state, kept between runs at
+    ``_storage/website_cache/{node.uuid}.snar`` and uploaded next to the tar for
+    each run. A level-0 base is followed by increments holding only changed
+    files (plus the directory listings tar uses to replay deletions); the chain
+    is planned by backup._incremental and restored link by link. Each link
+    records the digest of the state it left, and the chain only continues
+    while the local state still matches its last completed link.
 
 Differences from the old SaaS implementation:
   * lftp is the locally-installed binary (the worker image builds it) -- no
@@ -28,13 +39,16 @@ Differences from the old SaaS implementation:
   * lftp's process exit code is checked after every transfer (`_check_lftp_result`):
     a mirror/get with failed transfers fails the backup loudly with the offending
     file names instead of producing a "successful" partial snapshot.
-  * a disk-space preflight (`ensure_disk_space`) runs before any download, sized
-    from the node's most recent COMPLETE backup.
-  * the per-backup file manifest lives at top-level ``_storage/{uuid}.files``,
-    OUTSIDE the zip (it used to bloat every archive by tens of MB on large sites).
+  * disk space on _storage is reserved (`helper.disk_ledger`) before any
+    download, sized from the node's most recent COMPLETE backup.
+  * the per-backup file manifest lives at top-level ``_storage/{uuid}.manifest``
+    (integration.manifest: sorted, compressed, with per-file digests), OUTSIDE
+    the zip (it used to bloat every archive by tens of MB on large sites).
   * SFTP uses the system `ssh`, so every key type works (Ed25519/ECDSA/RSA), and
     passphrase-protected keys are normalized to an unencrypted temp key so ssh never
     prompts.
+  * with CoreWebsite.mirror_engine "native", both mirrors run in-process
+    (backup._mirror) instead of through lftp, with per-file events and errors.
 
 FTPS TLS certificate verification follows the connection's `verify_ssl` flag (default
 on); turn it off per-connection for hosts with self-signed/mismatched certs.
@@ -46,14 +60,21 @@ import os
 import shlex
 import shutil
 import subprocess
+import time
+from functools import partial
 
 import paramiko
 from sentry_sdk import capture_exception
 
 from apps._tasks.exceptions import NodeBackupFailedError, NodeBackupTimeoutError
-from apps.api.v1.utils.api_helpers import bs_decrypt, mkdir_p, create_directory_v2, ensure_disk_space
+from apps._tasks.helper.disk_ledger import estimate_bytes, reserve_disk_space
+from apps.api.v1.utils.api_helpers import bs_decrypt, mkdir_p, create_directory_v2
 from apps.console.connection.models import CoreAuthWebsite
 from apps._tasks.helper.tasks import delete_from_disk
+from apps._tasks.integration.archive import TAR_ZSTD, TreeArchiver, archive_format, write_tar_zstd
+from apps._tasks.integration.backup import _lftp_tuning, _mirror
+from apps._tasks.integration.backup._incremental import plan_chain, previous_link
+from apps._tasks.integration.manifest import ManifestBuilder, file_digest, manifest_path, walk_tree
 from apps.console.utils.models import UtilBackup
 
 # Hard cap on a single lftp transfer (12h).
@@ -223,6 +244,16 @@ def _cache_paths(node):
     return base + "/", base + ".meta.json", base + ".lock"
 
 
+def _cache_zip_path(node):
+    """The previous incremental snapshot zip, kept as the base of the next one."""
+    return f"_storage/website_cache/{node.uuid_str}.zip"
+
+
+def _snar_path(node):
+    """Local copy of a node's tar --listed-incremental snapshot state."""
+    return f"_storage/website_cache/{node.uuid_str}.snar"
+
+
 def _cache_fingerprint(website, auth, username):
     """sha256 fingerprint of everything that defines the mirror cache contents; any
     change (host, port, protocol, credentials, paths, include/exclude filters) means
@@ -249,45 +280,136 @@ def _cache_fingerprint(website, auth, username):
 def _finalize_zip(backup, local_dir, *, keep_dir):
     """Build the standalone snapshot zip from a downloaded tree.
 
-    Writes the file manifest to TOP-LEVEL ``_storage/{backup.uuid}.files`` (NOT
-    inside the tree): on a million-file site a ~50-100MB manifest would
-    otherwise bloat every backup zip. The zip therefore contains pure site
-    content; the manifest sits next to the run log, where `delete_old_logs`
-    prunes it after the retention window. Records backup.total_files, zips the
-    tree to ``_storage/{backup.uuid}.zip`` and marks the backup
-    DOWNLOAD_COMPLETE. With keep_dir (incremental cache) the tree is left in
-    place for the next run; otherwise the working directory is discarded once
-    the zip exists."""
+    Writes the file manifest (integration.manifest) to TOP-LEVEL
+    ``_storage/{backup.uuid}.manifest`` (NOT inside the tree): on a
+    million-file site it would otherwise bloat every backup zip. The zip
+    therefore contains pure site content; the manifest sits next to the run
+    log, where `delete_old_logs` prunes it after the retention window. Digests
+    of files unchanged since the website's previous backup are taken from that
+    backup's manifest. Records total_files / total_folders / raw_size, zips
+    the tree to ``_storage/{backup.uuid}.zip`` and marks the backup
+    DOWNLOAD_COMPLETE. A single scan (manifest.walk_tree) feeds the manifest,
+    the counts and the archiver (archive.TreeArchiver) at once. With keep_dir
+    (incremental cache) the tree is left in place for the next run and the zip
+    is synced from the previous run's zip, so only changed files are
+    compressed again; otherwise the working directory is discarded once the
+    zip exists. Returns the bytes of the files that are new or changed since
+    the previous backup's manifest."""
     local_zip = f"_storage/{backup.uuid}.zip"
-    backup_file_list_path = f"_storage/{backup.uuid}.files"
-
-    # File list + count (Python walk; no `sudo find` / md5sum). The manifest is
-    # outside local_dir, so the walk never sees it.
-    backup.total_files = 0
-    with open(backup_file_list_path, "w") as flist:
-        for root, _dirs, files in os.walk(local_dir):
-            for name in files:
-                rel = os.path.relpath(os.path.join(root, name), local_dir)
-                flist.write(rel + "\n")
-                backup.total_files += 1
-    backup.save()
+    fmt = archive_format(backup)
+    reference_zip = _cache_zip_path(backup.website.node) if keep_dir else None
 
-    # Zip the downloaded tree (no sudo / no chown). The zip path must be absolute:
-    # cwd is local_dir, which in incremental mode is the node's cache directory.
-    subprocess.run(
-        ["zip", "-y", "-r", os.path.abspath(local_zip), ".", "-i", "*"],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=COMMAND_TIMEOUT, cwd=local_dir,
+    # The manifest is outside local_dir, so the scan never sees it.
+    previous = (
+        backup.__class__.objects.filter(website=backup.website, status=UtilBackup.Status.COMPLETE)
+        .exclude(id=backup.id)
+        .order_by("-created")
+        .first()
+    )
+    total_files = total_folders = raw_size = 0
+    # Archive the downloaded tree (no sudo / no chown) in the schedule's format.
+    archiver = TreeArchiver(
+        fmt, local_dir, local_zip,
+        reference_zip=reference_zip if fmt != TAR_ZSTD else None, timeout=COMMAND_TIMEOUT,
     )
+    try:
+        with ManifestBuilder(
+                manifest_path(backup), local_dir, previous=previous and manifest_path(previous),
+        ) as manifest:
+            for rel, st, is_dir in walk_tree(local_dir):
+                archiver.add(rel, is_dir)
+                if is_dir:
+                    total_folders += 1
+                else:
+                    manifest.add_file(rel, st)
+                    total_files += 1
+                    raw_size += st.st_size
+    except BaseException:
+        archiver.abort()
+        raise
+    archiver.close()
+
+    backup.total_files = total_files
+    backup.total_folders = total_folders
+    backup.raw_size = raw_size
+    backup.save()
 
     if os.path.exists(local_zip):
         backup.size = os.stat(local_zip).st_size
         backup.status = UtilBackup.Status.DOWNLOAD_COMPLETE
         backup.save()
         _write_log(backup, f"Size (compressed): {backup.size_display()}\n")
+        if reference_zip and fmt != TAR_ZSTD:
+            # Hard-link this zip as the next run's base; the upload's later
+            # deletion of local_zip leaves the link in place.
+            os.makedirs(os.path.dirname(reference_zip), exist_ok=True)
+            if os.path.exists(reference_zip + ".new"):
+                os.remove(reference_zip + ".new")
+            os.link(local_zip, reference_zip + ".new")
+            os.replace(reference_zip + ".new", reference_zip)
 
     if not keep_dir:
         # The working directory is no longer needed; the zip is what gets uploaded.
         delete_from_disk.apply_async(args=[backup.uuid_str, "dir"])
+    return manifest.changed_bytes
+
+
+def _mirror_native(backup, auth, username, password, local_dir, sources, *, connections, incremental, stats):
+    """Mirror `sources` into local_dir with the in-process engine (backup._mirror)
+    over `connections` connections, logging its events to the run log (every
+    file with website.verbose, otherwise progress, reconnects and failures).
+    Files that could not be mirrored fail the backup, like lftp's failed
+    transfers do (_check_lftp_result)."""
+    node = backup.website.node
+    website = node.website
+
+    if auth.protocol == CoreAuthWebsite.Protocol.SFTP:
+        connect = partial(_mirror.SFTPTransport, auth)
+    else:
+        connect = partial(_mirror.FTPTransport, auth, username, password)
+    filters = _mirror.Filters(
+        includes_regex=website.includes_regex, includes_glob=website.includes_glob,
+        excludes_regex=website.excludes_regex, excludes_glob=["*.sock", *(website.excludes_glob or [])],
+    )
+
+    def on_event(event):
+        if website.verbose or event.kind in (_mirror.PROGRESS, _mirror.RECONNECTED, _mirror.FAILED):
+            _write_log(backup, "MIRROR: " + _redact(_mirror.describe(event), username, password) + "\n")
+
+    targets = []
+    for source in sources:
+        target = local_dir if source["path"] == "." else (local_dir + source["path"]).replace("//", "/")
+        create_directory_v2(target)
+        targets.append((source["path"], target, source["type"] == "file"))
+        _write_log(backup, f"\nPath: {source['path']} -> {target}\n")
+
+    engine = _mirror.Mirror(
+        connect, connections=connections, delete=incremental, filters=filters,
+        on_event=on_event, stats=stats, timeout=COMMAND_TIMEOUT,
+    )
+    try:
+        engine.run(targets)
+    except _mirror.MirrorError as e:
+        raise NodeBackupFailedError(
+            node, backup.uuid_str, backup.attempt_no, backup.type,
+            message=_redact(str(e), username, password),
+        )
+    finally:
+        _write_log(backup, engine.summary())
+
+    if engine.errors:
+        for error in engine.errors:
+            _write_log(backup, f"MIRROR: {error.operation} failed: {error.path}: "
+                               f"{_redact(error.message, username, password)}\n")
+        listed = "\n".join(f"{error.path}: {error.message}" for error in engine.errors[:10])
+        raise NodeBackupFailedError(
+            node, backup.uuid_str, backup.attempt_no, backup.type,
+            message=(
+                f"{len(engine.errors)} files could not be mirrored. Fix the permissions of the "
+                "files below or add excludes for them (full list in the run log):\n"
+                f"{_redact(listed, username, password)}"
+            ),
+        )
 
 
 def snapshot_website(backup):
@@ -310,12 +432,17 @@ def snapshot_website(backup):
             auth.use_private_key or auth.use_public_key
     ):
         _snapshot_tar(backup)
+    elif node.website.backup_type == node.website.BackupType.INCREMENTAL_V2 and (
+            auth.use_private_key or auth.use_public_key
+    ):
+        _snapshot_tar(backup, incremental=True)
     else:
         _snapshot_lftp(backup, base_dir=f"_storage/{backup.uuid}/", incremental=False)
 
 
 def _snapshot_lftp(backup, *, base_dir, incremental):
-    """Mirror the remote source with lftp and zip the result.
+    """Mirror the remote source with lftp (or, with website.mirror_engine
+    "native", the in-process engine) and zip the result.
 
     incremental=False: full re-download into a per-backup working directory which is
     discarded after zipping (historical behavior). incremental=True: base_dir is the
@@ -334,14 +461,17 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
     lock_file = None
 
     try:
-        # Disk-space preflight before a single byte is downloaded: a full mirror
-        # needs the tree plus the zip (~2x the last snapshot); the incremental
-        # cache already exists, so only the new zip needs headroom (~1.2x).
-        multiplier = 1.2 if incremental else 2
-        ensure_disk_space(
-            int(max(multiplier * _last_complete_zip_size(backup, website__node=node),
-                    _PREFLIGHT_FLOOR)),
-            what="website backup",
+        # Disk-space reservation before a single byte is downloaded: a full
+        # mirror needs the tree plus the zip (~2x the last snapshot, or the
+        # node's tree / zip ratio once known); the incremental cache already
+        # exists, so only the new zip needs headroom (~1.2x).
+        reserve_disk_space(
+            backup.uuid_str,
+            estimate_bytes(
+                node, _last_complete_zip_size(backup, website__node=node),
+                multiplier=1.2 if incremental else 2, floor=_PREFLIGHT_FLOOR, refine=not incremental,
+            ),
+            node=node, what="website backup",
         )
 
         auth.check_connection()
@@ -354,7 +484,8 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
                 "Use a private key or username/password.",
             )
 
-        if auth.use_private_key:
+        native = website.mirror_engine == website.MirrorEngine.NATIVE
+        if auth.use_private_key and not native:
             ssh_key_path = f"_storage/ssh_{backup.uuid}"
             with open(ssh_key_path, "w") as fh:
                 fh.write(bs_decrypt(auth.private_key, encryption_key) or "")
@@ -366,7 +497,7 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
             protocol = "ftp"  # explicit FTPS connects as ftp:// then upgrades
         host_url = f"{protocol}://{auth.host}"
 
-        parallel = website.parallel or 3
+        parallel, pget = _lftp_tuning.plan(website)
         verbose = "--verbose=3" if website.verbose else ""
 
         exclude_rules = ["--exclude-glob=*.sock"]
@@ -385,12 +516,12 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
             # are skipped) plus --delete (so the cache stays an exact mirror).
             mirror_opts = (
                 f"--continue --recursion=always --no-perms --no-umask --delete "
-                f"--use-pget=1 --parallel={parallel} {verbose}"
+                f"--use-pget={pget} --parallel={parallel} {verbose}"
             )
         else:
             mirror_opts = (
                 f"--continue --recursion=always --ignore-time --no-perms --no-umask "
-                f"--ignore-size --use-pget=1 --parallel={parallel} {verbose}"
+                f"--ignore-size --use-pget={pget} --parallel={parallel} {verbose}"
             )
 
         if website.all_paths:
@@ -398,8 +529,11 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
         else:
             sources = [{"path": p["path"], "type": p["type"]} for p in (website.paths or [])]
 
-        _write_log(backup, f"Parallel: {parallel}\nIncludes: {' '.join(include_rules)}\n"
-                           f"Excludes: {' '.join(exclude_rules)}\n")
+        if native:
+            _write_log(backup, f"Engine: native\nConnections: {parallel}\n")
+        else:
+            _write_log(backup, f"Parallel: {parallel}\nSegments per file: {pget}\n")
+        _write_log(backup, f"Includes: {' '.join(include_rules)}\nExcludes: {' '.join(exclude_rules)}\n")
 
         if incremental:
             cache_dir, meta_path, lock_path = _cache_paths(node)
@@ -408,6 +542,8 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
             # Serialize concurrent backups of this node around the whole mirror+zip.
             fcntl.flock(lock_file, fcntl.LOCK_EX)
 
+        transfer_seconds, transferred = 0, 0
+        output_stats = _lftp_tuning.OutputStats()
         try:
             if incremental:
                 fingerprint = _cache_fingerprint(website, auth, username)
@@ -421,6 +557,8 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
                 if stored_fingerprint != fingerprint:
                     # Missing/stale fingerprint: the cache cannot be trusted.
                     shutil.rmtree(local_dir, ignore_errors=True)
+                    if os.path.exists(_cache_zip_path(node)):
+                        os.remove(_cache_zip_path(node))
                     os.makedirs(local_dir, exist_ok=True)
                     _write_log(backup, "Backup configuration changed; initializing snapshot cache.\n")
                     if stored_fingerprint is None:
@@ -430,71 +568,91 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
             else:
                 mkdir_p(local_dir)
 
-            for source in sources:
-                target = local_dir if source["path"] == "." else (local_dir + source["path"]).replace("//", "/")
-                create_directory_v2(target)
-
-                if source["type"] == "file":
-                    # NB: `-P` is a BOOLEAN flag for get/put in lftp 4.9.2 (pget with
-                    # net:connection-limit connections). `-P 3` makes lftp fetch an
-                    # extra file literally named "3" and exit non-zero (verified).
-                    transfer = f'get -P {_lftp_quote(source["path"])} -o {_lftp_quote(target)}'
-                    mirror = False
-                else:
-                    transfer = (
-                        f'mirror {mirror_opts} {" ".join(include_rules)} {" ".join(exclude_rules)} '
-                        f'{_lftp_quote(source["path"])} {_lftp_quote(target)}'
-                    )
-                    mirror = True
-
-                script = _build_lftp_script(
-                    auth=auth, host_url=host_url, port=auth.port, username=username,
-                    password=password, ssh_key_path=ssh_key_path, parallel=parallel,
-                    transfer=transfer, mirror=mirror,
-                )
-                _write_log(backup, f"\nPath: {source['path']} -> {target}\n")
-                _write_log(backup, _redact(script, username, password) + "\n")
-
+            if native:
+                started = time.monotonic()
                 try:
-                    proc = subprocess.run(
-                        ["lftp"], input=script, stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT, timeout=COMMAND_TIMEOUT, text=True, errors="ignore",
+                    _mirror_native(
+                        backup, auth, username, password, local_dir, sources,
+                        connections=parallel, incremental=incremental, stats=output_stats,
                     )
-                except FileNotFoundError:
-                    raise NodeBackupFailedError(
-                        node, backup.uuid_str, backup.attempt_no, backup.type,
-                        "lftp is not installed in the worker image.",
+                finally:
+                    transfer_seconds += time.monotonic() - started
+            else:
+                for source in sources:
+                    target = local_dir if source["path"] == "." else (local_dir + source["path"]).replace("//", "/")
+                    create_directory_v2(target)
+
+                    if source["type"] == "file":
+                        # NB: `-P` is a BOOLEAN flag for get/put in lftp 4.9.2 (pget with
+                        # net:connection-limit connections). `-P 3` makes lftp fetch an
+                        # extra file literally named "3" and exit non-zero (verified).
+                        transfer = f'get -P {_lftp_quote(source["path"])} -o {_lftp_quote(target)}'
+                        mirror = False
+                    else:
+                        transfer = (
+                            f'mirror {mirror_opts} {" ".join(include_rules)} {" ".join(exclude_rules)} '
+                            f'{_lftp_quote(source["path"])} {_lftp_quote(target)}'
+                        )
+                        mirror = True
+
+                    script = _build_lftp_script(
+                        auth=auth, host_url=host_url, port=auth.port, username=username,
+                        password=password, ssh_key_path=ssh_key_path, parallel=parallel,
+                        transfer=transfer, mirror=mirror,
                     )
+                    _write_log(backup, f"\nPath: {source['path']} -> {target}\n")
+                    _write_log(backup, _redact(script, username, password) + "\n")
 
-                for line in (proc.stdout or "").splitlines():
-                    _write_log(backup, "LFTP: " + _redact(line, username, password) + "\n")
-                    low = line.lower()
-                    if "421 too many connections" in low and (website.parallel or 0) > 1:
-                        website.parallel = max(1, (website.parallel or 2) // 2)
-                        website.save()
-                    if ("login failed" in low or "login incorrect" in low
-                            or ("fatal error" in low and "too many" in low)):
+                    started = time.monotonic()
+                    try:
+                        proc = subprocess.run(
+                            ["lftp"], input=script, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, timeout=COMMAND_TIMEOUT, text=True, errors="ignore",
+                        )
+                    except FileNotFoundError:
                         raise NodeBackupFailedError(
                             node, backup.uuid_str, backup.attempt_no, backup.type,
-                            message=_redact(line, username, password),
+                            "lftp is not installed in the worker image.",
                         )
 
-                # A mirror with failed transfers must not produce a "successful"
-                # (partial) backup: lftp's exit code reports them (see the helper
-                # for the verified mechanism).
-                _check_lftp_result(node, backup, proc, username, password)
+                    finally:
+                        transfer_seconds += time.monotonic() - started
 
-            _finalize_zip(backup, local_dir, keep_dir=incremental)
+                    for line in (proc.stdout or "").splitlines():
+                        _write_log(backup, "LFTP: " + _redact(line, username, password) + "\n")
+                        output_stats.feed(line)
+                        low = line.lower()
+                        if ("login failed" in low or "login incorrect" in low
+                                or ("fatal error" in low and "too many" in low)):
+                            raise NodeBackupFailedError(
+                                node, backup.uuid_str, backup.attempt_no, backup.type,
+                                message=_redact(line, username, password),
+                            )
+
+                    # A mirror with failed transfers must not produce a "successful"
+                    # (partial) backup: lftp's exit code reports them (see the helper
+                    # for the verified mechanism).
+                    _check_lftp_result(node, backup, proc, username, password)
+
+            changed_bytes = _finalize_zip(backup, local_dir, keep_dir=incremental)
 
             if incremental:
                 # Only stamp the cache after a successful mirror+zip, so a failed run
                 # never marks a partial cache as current.
                 with open(meta_path, "w") as fh:
                     json.dump({"fingerprint": fingerprint}, fh)
+            # A full mirror downloads every file; an incremental one only the
+            # new / changed ones.
+            transferred = changed_bytes if incremental else (backup.raw_size or 0)
         finally:
             if lock_file is not None:
                 fcntl.flock(lock_file, fcntl.LOCK_UN)
                 lock_file.close()
+            # Failed runs still teach the controller about server push-back.
+            _write_log(backup, _lftp_tuning.learn(
+                website, parallel=parallel, pget=pget, transferred=transferred,
+                seconds=transfer_seconds, stats=output_stats,
+            ))
 
     except NodeBackupFailedError:
         delete_from_disk.apply_async(args=[backup.uuid_str, "both"])
@@ -511,10 +669,11 @@ def _snapshot_lftp(backup, *, base_dir, incremental):
             os.remove(ssh_key_path)
 
 
-def _snapshot_tar(backup):
+def _snapshot_tar(backup, incremental=False):
     """Server-side tar transport: the remote server tars the configured paths over
     SSH, the tar is downloaded via SFTP, listed for the file manifest and zipped
-    locally (the zip wraps the tar)."""
+    locally (the zip wraps the tar). With incremental the tar is a link of a
+    --listed-incremental chain (see the module docstring)."""
     node = backup.website.node
     auth_website = node.connection.auth_website
 
@@ -531,12 +690,15 @@ def _snapshot_tar(backup):
     ssh_key_path = None
 
     try:
-        # Disk-space preflight before the tar is pulled down (~2x the last
+        # Disk-space reservation before the tar is pulled down (~2x the last
         # snapshot: downloaded tar plus the final zip).
-        ensure_disk_space(
-            int(max(2 * _last_complete_zip_size(backup, website__node=node),
-                    _PREFLIGHT_FLOOR)),
-            what="website backup",
+        reserve_disk_space(
+            backup.uuid_str,
+            estimate_bytes(
+                node, _last_complete_zip_size(backup, website__node=node),
+                multiplier=2, floor=_PREFLIGHT_FLOOR,
+            ),
+            node=node, what="website backup",
         )
 
         sources = []
@@ -572,6 +734,7 @@ def _snapshot_tar(backup):
         bs_backup_directory = f"{node.website.tar_temp_backup_dir}/{node.uuid_str}"
         bs_backup_tar = f"{bs_backup_directory}/{backup.uuid_str}.tar"
         bs_backup_sources = " ".join(shlex.quote(x) for x in sources)
+        bs_backup_snar = f"{bs_backup_directory}/{node.uuid_str}.snar"
 
         # Create backup directory
         _stdin, _stdout, _stderr = ssh.exec_command(f"mkdir -p {shlex.quote(bs_backup_directory)}")
@@ -583,6 +746,30 @@ def _snapshot_tar(backup):
         _stdout.channel.set_combine_stderr(True)
         output = _stdout.readlines()
 
+        if incremental:
+            # A link continues the chain only from the snapshot state the
+            # previous link left behind (its recorded .snar digest), for the
+            # same sources and filters.
+            fingerprint = hashlib.sha256(
+                f"{bs_backup_sources} {exclude_rules}".encode("utf-8")
+            ).hexdigest()
+            base, position = plan_chain(backup, "website")
+            if base is not None and (
+                    not os.path.exists(_snar_path(node))
+                    or (base.metadata or {}).get("fingerprint") != fingerprint
+                    or (previous_link(base, position).metadata or {}).get("snar")
+                    != file_digest(_snar_path(node)).hex()
+            ):
+                base, position = None, 0
+            if base is None:
+                _write_log(backup, "Incremental tar: level-0 base\n")
+                _stdin, _stdout, _stderr = ssh.exec_command(f"rm -f {shlex.quote(bs_backup_snar)}")
+                _stdout.channel.recv_exit_status()
+            else:
+                _write_log(backup, f"Incremental tar: increment {position} of base {base.uuid_str}\n")
+                sftp.put(_snar_path(node), bs_backup_snar)
+            exclude_rules += f" --listed-incremental={shlex.quote(bs_backup_snar)}"
+
         command = (
             f"tar --create --no-check-device {exclude_rules} "
             f"--file={shlex.quote(bs_backup_tar)} {bs_backup_sources}"
@@ -597,6 +784,24 @@ def _snapshot_tar(backup):
         # Cleanup files from remote server.
         sftp.remove(bs_backup_tar)
 
+        if incremental:
+            # The updated state is what the next link continues from. It is
+            # recorded by digest: should this run not complete, the local state
+            # no longer matches the chain's last completed link and the next
+            # run restarts the chain at level 0.
+            os.makedirs(os.path.dirname(_snar_path(node)), exist_ok=True)
+            sftp.get(bs_backup_snar, f"{_snar_path(node)}.new")
+            sftp.remove(bs_backup_snar)
+            os.replace(f"{_snar_path(node)}.new", _snar_path(node))
+            backup.metadata = {
+                **(backup.metadata or {}),
+                "fingerprint": fingerprint,
+                "snar": file_digest(_snar_path(node)).hex(),
+            }
+            backup.base_backup = base
+            backup.chain_position = position
+            backup.save()
+
         """
         Get list of files in tar.
         """
@@ -622,15 +827,18 @@ def _snapshot_tar(backup):
         """
         Create final backup zip folder
         """
-        execstr = rf"/usr/bin/zip -y -r ../{backup.uuid_str} . -i \*"
-        subprocess.run(
-            execstr,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=command_timeout,
-            shell=True,
-            cwd=local_dir,
-        )
+        if archive_format(backup) == TAR_ZSTD:
+            write_tar_zstd(local_dir, local_zip, timeout=command_timeout)
+        else:
+            execstr = rf"/usr/bin/zip -y -r ../{backup.uuid_str} . -i \*"
+            subprocess.run(
+                execstr,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=command_timeout,
+                shell=True,
+                cwd=local_dir,
+            )
 
         if os.path.exists(local_zip):
             backup.size = os.stat(local_zip).st_size
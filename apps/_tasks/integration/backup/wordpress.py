@@ -7,6 +7,7 @@ from apps._tasks.exceptions import NodeBackupFailedError
 from apps.api.v1.utils.api_helpers import check_string_in_file, aws_s3_upload_log_file
 from apps.api.v1.utils.api_helpers import mkdir_p, safe_basename, ssrf_safe_get
 from apps._tasks.helper.tasks import delete_from_disk
+from apps._tasks.integration.archive import TAR_ZSTD, archive_format, write_tar_zstd
 from apps.console.utils.models import UtilBackup
 import time
 
@@ -276,16 +277,19 @@ def snapshot_wordpress(backup):
             cwd=local_dir,
         )
 
-        # ZIP all downloaded files.
-        execstr = rf"/usr/bin/zip -y -r ../{backup.uuid_str} . -i \*"
-        subprocess.run(
-            execstr,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=43200,
-            shell=True,
-            cwd=local_dir,
-        )
+        # Archive all downloaded files (zip, or tar.zst per the schedule).
+        if archive_format(backup) == TAR_ZSTD:
+            write_tar_zstd(local_dir, local_zip, timeout=43200)
+        else:
+            execstr = rf"/usr/bin/zip -y -r ../{backup.uuid_str} . -i \*"
+            subprocess.run(
+                execstr,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=43200,
+                shell=True,
+                cwd=local_dir,
+            )
 
         # Generate Report
         try:
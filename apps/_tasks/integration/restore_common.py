@@ -7,16 +7,25 @@ A restore starts by materializing the stored backup zip onto the local disk:
     copied from there, confined to the storage root.
   * Every remote backend yields a 24h download URL via
     stored_backup.generate_download_url() -- streamed to disk in chunks.
+  * Dedup repository backups (storage.dedup) are rebuilt into an archive
+    from their manifest and chunks.
   * Glacier/Deep Archive copies are cold: generate_download_url() returns the
     "restore_requested" / "restore_in_progress" sentinels instead of a URL,
     which becomes a clear RestoreError telling the user to thaw the archive
     with the storage provider first.
 
-Extraction is path-traversal-safe for both the outer zip and the legacy
-tar-wrapped website layout (backup_type FULL_V2 zips wrap {uuid}.tar).
+Extraction is path-traversal-safe for the outer archive (zip or tar.zst, see
+integration/archive.py) and the legacy tar-wrapped website layout
+(backup_type FULL_V2 archives wrap {uuid}.tar).
+
+Incremental backups (chain_position set, see backup/_incremental.py) are only
+restorable together with their chain; chain_links() resolves every link on
+the storage the restore was created from, and extract_incremental_tar()
+applies the links of a website tar --listed-incremental chain in order.
 """
 import os
 import shutil
+import subprocess
 import tarfile
 import zipfile
 
@@ -24,6 +33,9 @@ import requests
 from django.conf import settings
 from sentry_sdk import capture_exception
 
+from apps._tasks.integration.archive import TAR_ZSTD, detect_format
+from apps.console.utils.models import UtilBackup
+
 # (connect, read) timeout for the download URL fetch; 1 MiB stream chunks.
 DOWNLOAD_TIMEOUT = (30, 300)
 CHUNK_SIZE = 1024 * 1024
@@ -48,7 +60,14 @@ def _local_source_path(storage_file_id):
 
 def fetch_backup_zip(stored_backup, dest_zip_path):
     """Materialize the stored backup zip at dest_zip_path (a local file path)."""
-    if stored_backup.storage.type.code == "local":
+    from apps._tasks.integration.storage.dedup import is_dedup_point, restore_archive
+
+    if is_dedup_point(stored_backup):
+        try:
+            restore_archive(stored_backup, dest_zip_path)
+        except Exception as e:
+            raise RestoreError(f"unable to rebuild the backup from the dedup repository: {e}")
+    elif stored_backup.storage.type.code == "local":
         shutil.copyfile(_local_source_path(stored_backup.storage_file_id), dest_zip_path)
     else:
         url = stored_backup.generate_download_url()
@@ -80,9 +99,20 @@ def _check_members(names, dest_root, kind):
 
 
 def extract_backup_zip(zip_path, dest_dir):
-    """Extract a backup zip into dest_dir, rejecting path-traversal members."""
+    """Extract a backup archive into dest_dir, rejecting path-traversal members.
+
+    The format is taken from the file itself (archive.detect_format): zip, or
+    tar.zst for schedules with archive_format tar_zstd."""
     dest_root = os.path.realpath(dest_dir)
     os.makedirs(dest_root, exist_ok=True)
+    if detect_format(zip_path) == TAR_ZSTD:
+        try:
+            with tarfile.open(zip_path, "r:zst") as tf:
+                _check_members(tf.getnames(), dest_root, "tar.zst")
+                tf.extractall(dest_root, filter="data")
+        except tarfile.TarError as e:
+            raise RestoreError(f"stored backup is not a valid tar.zst archive: {e}")
+        return dest_root
     try:
         with zipfile.ZipFile(zip_path) as zf:
             _check_members(zf.namelist(), dest_root, "zip")
@@ -112,6 +142,68 @@ def maybe_extract_tar(dest_dir, backup_uuid_str):
     return dest_root
 
 
+def chain_links(backup, stored_backup):
+    """(backup, storage point) for every link a restore of `backup` applies,
+    base first; a backup outside a chain is its own single link."""
+    if not backup.chain_position:
+        return [(backup, stored_backup)]
+    base = backup.base_backup
+    if base is None or base.status != UtilBackup.Status.COMPLETE:
+        raise RestoreError("the full base of this incremental backup no longer exists.")
+    earlier = {
+        link.chain_position: link
+        for link in base.increments.filter(
+            chain_position__lt=backup.chain_position, status=UtilBackup.Status.COMPLETE
+        )
+    }
+    chain = [base] + [earlier.get(n) for n in range(1, backup.chain_position)]
+    if None in chain:
+        raise RestoreError(
+            "the incremental chain of this backup is incomplete (an earlier increment "
+            "failed or was deleted)."
+        )
+    links = []
+    for link in chain:
+        point = stored_backup.__class__.objects.filter(
+            backup=link,
+            storage=stored_backup.storage,
+            status=stored_backup.Status.UPLOAD_COMPLETE,
+        ).first()
+        if point is None:
+            raise RestoreError(
+                f"backup {link.uuid_str} of the incremental chain is not stored on "
+                f"{stored_backup.storage.name}."
+            )
+        links.append((link, point))
+    links.append((backup, stored_backup))
+    return links
+
+
+def extract_incremental_tar(tar_path, dest_dir):
+    """Apply one link of a tar --listed-incremental chain onto dest_dir and remove
+    the tar. GNU tar does the extraction: it also deletes the files the link
+    records as gone, which Python's tarfile does not understand."""
+    dest_root = os.path.realpath(dest_dir)
+    try:
+        with tarfile.open(tar_path) as tf:
+            _check_members(tf.getnames(), dest_root, "tar")
+    except tarfile.TarError as e:
+        raise RestoreError(f"stored backup holds an invalid tar: {e}")
+    result = subprocess.run(
+        [
+            "tar", "--extract", "--listed-incremental=/dev/null", "--no-same-owner",
+            f"--file={os.path.abspath(tar_path)}", "--directory", dest_root,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", "replace").strip()[-500:]
+        raise RestoreError(f"unable to apply the incremental tar: {stderr}")
+    os.remove(tar_path)
+    return dest_root
+
+
 # ---------------------------------------------------------------------------
 # Restore notifications (email + activity log)
 #
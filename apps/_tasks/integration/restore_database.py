@@ -2,13 +2,21 @@
 
 One public entry point -- `restore_database(backup, restore)`:
 
-  1. fetch the stored backup zip and extract the .sql dumps,
+  1. fetch the stored backup zip and extract the .sql dumps (and PostgreSQL
+     {db}.pgdump/ directory dumps, which are restored with pg_restore -j),
   2. classify each dump: a tables-mode backup (backup.tables without all_tables)
      imports every {table}.sql into the connection's database_name; otherwise the
      file stem is the target database name,
   3. ensure each target database exists, then import the dump with the native
      client.
 
+An incremental MySQL/MariaDB backup (CoreDatabase.backup_mode incremental) is
+restored as its whole chain: the base's dumps are imported first, then the
+{db}.binlog events of every increment up to the chosen one, in chain order.
+Each link is fetched from the storage the restore was created from.
+Incremental PostgreSQL chains (pg_basebackup + WAL) are physical and need a
+manual point-in-time recovery instead.
+
 The hardened patterns of the backup engines are mirrored exactly:
 
   * DIRECT mode runs the local client binaries as argv lists (no shell): creds
@@ -27,13 +35,16 @@ importing into a non-empty database can fail -- that surfaces as a normal FAILED
 restore carrying the server's message. A disk-space preflight (~3x the stored
 zip: zip copy + extraction + import headroom) runs before the zip is fetched.
 """
+import gzip
 import os
+import shutil
 import subprocess
 
 from sentry_sdk import capture_exception
 
 from apps._tasks.exceptions import NodeBackupFailedError
 from apps._tasks.helper.tasks import delete_from_disk
+from apps._tasks.integration.backup._binlog import BINLOG_SUFFIX
 from apps._tasks.integration.backup._sanitize import safe_password, safe_token
 from apps._tasks.integration.backup.mysql import (
     _decode,
@@ -42,18 +53,23 @@ from apps._tasks.integration.backup.mysql import (
     _sftp_write_remote_file,
     _write_local_defaults_file,
 )
-from apps._tasks.integration.backup.postgresql import _pgpass_escape
+from apps._tasks.integration.backup.postgresql import PG_DIRECTORY_SUFFIX, _pgpass_escape
 from apps._tasks.integration.restore_common import (
     RestoreError,
+    chain_links,
     extract_backup_zip,
     fetch_backup_zip,
 )
-from apps.api.v1.utils.api_helpers import bs_decrypt, ensure_disk_space
+from apps._tasks.helper.disk_ledger import estimate_bytes, reserve_disk_space
+from apps.api.v1.utils.api_helpers import bs_decrypt
 from apps.console.connection.models import CoreAuthDatabase
 
 # Hard cap on a single client invocation (12h), same as the backup engines.
 COMMAND_TIMEOUT = 12 * 3600
 
+# Increments of a chain restore are fetched below {restore dir}/_chain/.
+CHAIN_DIR = "_chain"
+
 
 def _write_log(backup, text):
     """Append to the restore's run log (_storage/restore_{uuid}.log)."""
@@ -61,23 +77,42 @@ def _write_log(backup, text):
         log_file.write(text)
 
 
+def _is_directory_dump(path):
+    """A PostgreSQL directory-format dump ({db}.pgdump/ holding toc.dat)."""
+    return path.endswith(PG_DIRECTORY_SUFFIX) and os.path.isfile(os.path.join(path, "toc.dat"))
+
+
+def _inflate_dumps(tree_root):
+    """Inflate {name}.sql.gz dumps (SSH compressed transport) to {name}.sql in place."""
+    for name in os.listdir(tree_root):
+        path = os.path.join(tree_root, name)
+        if name.endswith(".sql.gz") and os.path.isfile(path):
+            with gzip.open(path, "rb") as src, open(path[:-3], "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.remove(path)
+
+
 def _classify_dumps(backup, auth, tree_root):
-    """Map the extracted *.sql dumps to (database_name, sql_path) import targets.
+    """Map the extracted dumps to (database_name, dump_path) import targets.
 
-    Tables-mode dumps ({table}.sql) always import into the connection's
-    database_name; otherwise the file stem is the database name. The
-    backupsheep.txt placeholder and the {uuid}.files manifest never match *.sql.
+    Dumps are *.sql files (*.sql.gz ones are inflated first), plus
+    {db}.pgdump/ directory-format dumps for PostgreSQL. Tables-mode dumps
+    ({table}.sql) always import into the connection's database_name;
+    otherwise the file stem is the database name.
+    The backupsheep.txt placeholder and the {uuid}.files manifest never match.
     """
     tables_mode = (not backup.all_tables) and backup.tables
-    sql_files = sorted(
+    _inflate_dumps(tree_root)
+    dumps = sorted(
         name
         for name in os.listdir(tree_root)
-        if name.endswith(".sql") and os.path.isfile(os.path.join(tree_root, name))
+        if (name.endswith(".sql") and os.path.isfile(os.path.join(tree_root, name)))
+        or _is_directory_dump(os.path.join(tree_root, name))
     )
-    if not sql_files:
+    if not dumps:
         raise RestoreError("the backup archive does not contain any .sql dumps.")
     targets = []
-    for name in sql_files:
+    for name in dumps:
         if tables_mode:
             database = auth.database_name
         else:
@@ -86,6 +121,23 @@ def _classify_dumps(backup, auth, tree_root):
     return targets
 
 
+def _fetch_increments(links, tree_root):
+    """Fetch and extract the increments of a chain; their (database, {db}.binlog)
+    replay targets in chain order."""
+    targets = []
+    for link, point in links:
+        link_dir = os.path.join(tree_root, CHAIN_DIR, str(link.chain_position))
+        link_zip = f"{link_dir}.zip"
+        os.makedirs(os.path.dirname(link_zip), exist_ok=True)
+        fetch_backup_zip(point, link_zip)
+        extract_backup_zip(link_zip, link_dir)
+        os.remove(link_zip)
+        for name in sorted(os.listdir(link_dir)):
+            if name.endswith(BINLOG_SUFFIX):
+                targets.append((name[:-len(BINLOG_SUFFIX)], os.path.join(link_dir, name)))
+    return targets
+
+
 def _run_direct(node, backup, argv, username, password, label, what,
                 stdin_path=None, env=None):
     """Run a local client binary (argv list, no shell); raise on non-zero exit.
@@ -246,6 +298,10 @@ def _restore_postgresql(node, backup, auth, targets, username, password):
                     f":{_pgpass_escape(auth.port)}"
                     f":*:{_pgpass_escape(username)}:{_pgpass_escape(password)}\n",
                 )
+                if any(_is_directory_dump(sql_path) for _database, sql_path in targets):
+                    raise RestoreError(
+                        "directory-format (pg_dump -Fd) backups can only be restored over a direct connection."
+                    )
                 for database, sql_path in targets:
                     out_text = _ssh_run(
                         node, backup, ssh,
@@ -306,6 +362,18 @@ def _restore_postgresql(node, backup, auth, targets, username, password):
                         username, password, "PostgreSQL", "createdb",
                         env=pg_env,
                     )
+                if _is_directory_dump(sql_path):
+                    argv = [f"{bin_path}pg_restore", "-h", str(auth.host), "-p", str(auth.port),
+                            "-U", username, "-d", database,
+                            "-j", str(max(1, backup.database.dump_parallelism or 1))]
+                    if "--clean" in (backup.option_postgres or ""):
+                        argv += ["--clean", "--if-exists"]
+                    _run_direct(
+                        node, backup, argv + [sql_path],
+                        username, password, "PostgreSQL",
+                        f"pg_restore into {database}", env=pg_env,
+                    )
+                    continue
                 _run_direct(
                     node, backup,
                     [f"{bin_path}psql", "-h", str(auth.host), "-p", str(auth.port),
@@ -331,23 +399,40 @@ def restore_database(backup, restore):
     _write_log(backup, f"Restore: {restore.name}\n")
 
     try:
-        # Disk-space preflight: the fetched zip plus the extracted .sql dumps
-        # plus import headroom (~3x the stored zip) must fit before fetching.
-        ensure_disk_space(
-            int(max(3 * (backup.size or 0), 1 << 30)),
-            what="database restore",
-        )
+        if (
+            backup.chain_position is not None
+            and auth.type == CoreAuthDatabase.DatabaseType.POSTGRESQL
+        ):
+            raise RestoreError(
+                "incremental (pg_basebackup + WAL) backups are recovered with PostgreSQL "
+                "point-in-time recovery: download the base and its WAL increments and "
+                "follow the manual recovery steps in the documentation."
+            )
 
         stored_backup = restore.storage_point
         if stored_backup is None:
             raise RestoreError(
                 "the storage point this restore was created from no longer exists."
             )
+        links = chain_links(backup, stored_backup)
+
+        # Disk-space reservation: the fetched zips plus the extracted .sql dumps
+        # plus import headroom (~3x the stored zips, or the node's dump / zip
+        # ratio once known) must fit before fetching.
+        reserve_disk_space(
+            f"restore_{backup.uuid_str}",
+            estimate_bytes(node, sum(link.size or 0 for link, _point in links), multiplier=3),
+            node=node, what="database restore",
+        )
 
+        base, base_point = links[0]
         _write_log(backup, f"Fetching backup zip from storage: {stored_backup.storage.name}\n")
-        fetch_backup_zip(stored_backup, local_zip)
+        if len(links) > 1:
+            _write_log(backup, f"Incremental chain: base {base.uuid_str} + {len(links) - 1} increment(s)\n")
+        fetch_backup_zip(base_point, local_zip)
         extract_backup_zip(local_zip, local_dir)
-        targets = _classify_dumps(backup, auth, local_dir)
+        targets = _classify_dumps(base, auth, local_dir)
+        targets += _fetch_increments(links[1:], local_dir)
         _write_log(
             backup,
             "Import targets: " + ", ".join(database for database, _ in targets) + "\n",
@@ -3,7 +3,9 @@
 One public entry point -- `restore_website(backup, restore)`:
 
   1. fetch the stored backup zip (local copy or streamed download URL),
-  2. extract it (unwrapping the legacy server-side tar transport when present),
+  2. extract it (unwrapping the legacy server-side tar transport when present;
+     an INCREMENTAL_V2 backup is rebuilt from its whole chain, base first, each
+     link's tar applied with GNU tar so deleted files stay deleted),
   3. push the tree back onto the source server with lftp -- the exact reverse of
      the backup mirror: `mirror -R` for directories, `put` for file sources.
 
@@ -42,11 +44,14 @@ from apps._tasks.integration.backup.website import (
 )
 from apps._tasks.integration.restore_common import (
     RestoreError,
+    chain_links,
     extract_backup_zip,
+    extract_incremental_tar,
     fetch_backup_zip,
     maybe_extract_tar,
 )
-from apps.api.v1.utils.api_helpers import bs_decrypt, ensure_disk_space
+from apps._tasks.helper.disk_ledger import estimate_bytes, reserve_disk_space
+from apps.api.v1.utils.api_helpers import bs_decrypt
 from apps.console.connection.models import CoreAuthWebsite
 
 
@@ -71,23 +76,39 @@ def restore_website(backup, restore):
     _write_log(backup, f"Restore: {restore.name}\n")
 
     try:
-        # Disk-space preflight: the fetched zip plus its extracted tree plus
-        # import headroom (~3x the stored zip) must fit before fetching.
-        ensure_disk_space(
-            int(max(3 * (backup.size or 0), _PREFLIGHT_FLOOR)),
-            what="website restore",
-        )
-
         stored_backup = restore.storage_point
         if stored_backup is None:
             raise RestoreError(
                 "the storage point this restore was created from no longer exists."
             )
+        links = chain_links(backup, stored_backup)
+
+        # Disk-space reservation: the fetched zips plus the extracted tree plus
+        # import headroom (~3x the stored zips, or the node's tree / zip ratio
+        # once known) must fit before fetching.
+        reserve_disk_space(
+            f"restore_{backup.uuid_str}",
+            estimate_bytes(node, sum(link.size or 0 for link, _point in links), multiplier=3, floor=_PREFLIGHT_FLOOR),
+            node=node, what="website restore",
+        )
 
         _write_log(backup, f"Fetching backup zip from storage: {stored_backup.storage.name}\n")
-        fetch_backup_zip(stored_backup, local_zip)
-        extract_backup_zip(local_zip, local_dir)
-        tree_root = maybe_extract_tar(local_dir, backup.uuid_str)
+        if backup.chain_position is None:
+            fetch_backup_zip(stored_backup, local_zip)
+            extract_backup_zip(local_zip, local_dir)
+            tree_root = maybe_extract_tar(local_dir, backup.uuid_str)
+        else:
+            _write_log(backup, f"Incremental chain: {len(links)} link(s)\n")
+            for link, point in links:
+                fetch_backup_zip(point, local_zip)
+                extract_backup_zip(local_zip, local_dir)
+                tree_root = extract_incremental_tar(
+                    os.path.join(local_dir, f"{link.uuid_str}.tar"), local_dir
+                )
+                # Only the restored backup's own manifest is excluded below.
+                manifest = os.path.join(local_dir, f"{link.uuid_str}.files")
+                if link is not backup and os.path.exists(manifest):
+                    os.remove(manifest)
 
         auth.check_connection()
 
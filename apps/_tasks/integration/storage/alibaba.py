@@ -1,5 +1,6 @@
 import boto3
 from apps._tasks.exceptions import StorageAliBabaUploadFailedError
+from apps._tasks.integration.archive import archive_name
 from apps.api.v1.utils.api_helpers import bs_decrypt
 import oss2
 
@@ -13,7 +14,7 @@ def storage_alibaba(stored_backup):
         encryption_key = storage.account.get_encryption_key()
         prefix = storage.storage_alibaba.prefix
 
-        file_name = f"{backup.node.name_slug}/{stored_backup.backup.uuid}.zip"
+        file_name = f"{backup.node.name_slug}/{archive_name(backup)}"
 
         auth = oss2.AuthV4(bs_decrypt(storage.storage_alibaba.access_key, encryption_key), bs_decrypt(storage.storage_alibaba.secret_key, encryption_key))
 
@@ -1,6 +1,7 @@
 import uuid
 from azure.storage.blob import BlobBlock
 from apps._tasks.exceptions import StorageAzureUploadFailedError
+from apps._tasks.integration.archive import archive_name
 
 
 def storage_azure(stored_backup):
@@ -13,7 +14,7 @@ def storage_azure(stored_backup):
 
         prefix = storage.storage_azure.prefix
 
-        file_name = f"{backup.node.name_slug}/{stored_backup.backup.uuid}.zip"
+        file_name = f"{backup.node.name_slug}/{archive_name(backup)}"
 
         blob_service_client = storage.storage_azure.get_client()
 
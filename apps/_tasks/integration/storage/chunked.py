@@ -0,0 +1,156 @@
+"""Chunked uploads for the OAuth cloud-drive backends (Google Drive, OneDrive,
+Dropbox, pCloud).
+
+* ChunkReader reads the next chunk on a background thread while the current one
+  is on the wire, so disk reads overlap the upload and at most ``prefetch + 1``
+  chunks are ever held in memory.
+* AdaptiveChunkSize picks each chunk's size from the measured throughput: it
+  starts small, doubles while chunks finish well inside TARGET_SECONDS and halves
+  after a slow chunk or a throttled request, always within the provider's
+  granularity and per-request maximum.
+* retry_request / retry_call retry 429, 5xx and connection errors with
+  exponential backoff (honouring Retry-After) instead of failing the whole
+  storage_upload attempt.
+"""
+import queue
+import random
+import threading
+import time
+
+import requests
+
+MiB = 1024 * 1024
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 8
+MAX_BACKOFF = 120
+
+# A chunk should take about this long on the wire: long enough to amortize the
+# per-request overhead, short enough that a retry repeats little work.
+TARGET_SECONDS = 20
+
+# (connect, read) timeout for one chunk request.
+CHUNK_TIMEOUT = (30, 900)
+
+
+class AdaptiveChunkSize:
+    def __init__(self, minimum, maximum, multiple=1, initial=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.multiple = multiple
+        self.size = self._bound(initial or minimum)
+
+    def _bound(self, size):
+        size = max(self.minimum, min(self.maximum, size))
+        return max(self.multiple, size // self.multiple * self.multiple)
+
+    def record(self, seconds):
+        """Adjust after a chunk of the current size took `seconds` to send."""
+        if seconds < TARGET_SECONDS / 2:
+            self.size = self._bound(self.size * 2)
+        elif seconds > TARGET_SECONDS * 2:
+            self.size = self._bound(self.size // 2)
+
+    def backoff(self):
+        self.size = self._bound(self.size // 2)
+
+
+class ChunkReader:
+    """Context manager iterating ``(offset, data)`` chunks of `path` from `offset`,
+    sized by `sizer` at read time and read ahead on a background thread."""
+
+    def __init__(self, path, offset, sizer, prefetch=1):
+        self.path = path
+        self.offset = offset
+        self.sizer = sizer
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read, daemon=True)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        try:
+            with open(self.path, "rb") as fh:
+                fh.seek(self.offset)
+                position = self.offset
+                while not self._stop.is_set():
+                    data = fh.read(self.sizer.size)
+                    if not data:
+                        break
+                    if not self._put((position, data)):
+                        return
+                    position += len(data)
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(None)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def _delay(attempt, retry_after=None):
+    if retry_after:
+        try:
+            return min(MAX_BACKOFF, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+    return min(MAX_BACKOFF, 2 ** attempt) + random.uniform(0, 1)
+
+
+def retry_request(send, sizer=None):
+    """Call send() -> requests.Response until it is neither 429 nor 5xx (or the
+    attempts run out) and return that response. Connection errors and timeouts
+    are retried too; the last one is raised."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_ATTEMPTS:
+                raise
+            response = None
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            return response
+        if attempt == MAX_ATTEMPTS:
+            return response
+        if sizer:
+            sizer.backoff()
+        time.sleep(_delay(attempt, response.headers.get("Retry-After") if response is not None else None))
+
+
+def retry_call(call, retryable, sizer=None):
+    """call() retried on the `retryable` exception types (SDK-based backends).
+    An exception carrying a ``backoff`` attribute (Dropbox RateLimitError) sets
+    the wait."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return call()
+        except retryable as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            if sizer:
+                sizer.backoff()
+            time.sleep(_delay(attempt, getattr(e, "backoff", None)))
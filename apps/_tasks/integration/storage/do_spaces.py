@@ -1,11 +1,11 @@
 import boto3
-from botocore.client import Config
 
 from apps._tasks.exceptions import (
     NodeBackupFailedError,
     NodeSnapshotDeleteFailed, NodeDoSpacesUploadFailedError, NodeDigitalOceanSpacesBucketDeletedError,
     NodeDigitalOceanSpacesNoSuchBucketError, StorageDOSpacesUploadFailedError,
 )
+from apps._tasks.integration.storage.s3_compat import s3_upload_file
 from apps.api.v1.utils.api_helpers import bs_decrypt
 from apps.console.backup.models import (
     CoreWebsiteBackup,
@@ -16,38 +16,7 @@ from apps.console.node.models import CoreNode
 
 def storage_do_spaces(stored_backup):
     try:
-        local_zip = f"_storage/{stored_backup.backup.uuid}.zip"
-        storage = stored_backup.storage
-        encryption_key = storage.account.get_encryption_key()
-        prefix = storage.storage_do_spaces.prefix
-
-        file_name = f"{stored_backup.backup.uuid}.zip"
-        session = boto3.Session(
-            aws_access_key_id=bs_decrypt(storage.storage_do_spaces.access_key, encryption_key),
-            aws_secret_access_key=bs_decrypt(storage.storage_do_spaces.secret_key, encryption_key),
-        )
-        config = Config(
-            request_checksum_calculation="when_required",
-            response_checksum_validation="when_required",
-        )
-        s3 = session.resource(
-            "s3", endpoint_url=f"https://{storage.storage_do_spaces.region.endpoint}",
-            config=config,
-        )
-
-        if prefix:
-            if (prefix != "") and (prefix.endswith("/") is False):
-                prefix += "/"
-            file_key = prefix + file_name
-        else:
-            file_key = file_name
-        s3.meta.client.upload_file(
-            local_zip, storage.storage_do_spaces.bucket_name, file_key
-        )
-        storage_file_id = file_key
-        stored_backup.storage_file_id = storage_file_id
-        stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
-        stored_backup.save()
+        s3_upload_file(stored_backup)
     except FileNotFoundError as e:
         stored_backup.status = stored_backup.Status.UPLOAD_FAILED_FILE_NOT_FOUND
         stored_backup.save()
@@ -1,5 +1,10 @@
-import dropbox
 import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import dropbox
+import requests
 
 from django.conf import settings
 from dropbox.files import WriteMode
@@ -11,6 +16,13 @@ from apps._tasks.exceptions import (
     NodeDropboxFileIDMissingError,
     NodeDropboxTokenExpiredError,
 )
+from apps._tasks.integration.archive import archive_name
+from apps._tasks.integration.storage.chunked import (
+    MiB,
+    AdaptiveChunkSize,
+    ChunkReader,
+    retry_call,
+)
 from apps.api.v1.utils.api_helpers import bs_decrypt
 from apps.console.backup.models import (
     CoreWebsiteBackup,
@@ -19,6 +31,64 @@ from apps.console.backup.models import (
 )
 from apps.console.node.models import CoreNode
 
+# Archives up to this size go up in a single files_upload call.
+DROPBOX_SINGLE_UPLOAD = 8 * MiB
+# Concurrent appends per upload session.
+DROPBOX_PARALLEL = 4
+DROPBOX_RETRYABLE = (
+    dropbox.exceptions.RateLimitError,
+    dropbox.exceptions.InternalServerError,
+    requests.ConnectionError,
+    requests.Timeout,
+)
+
+
+def _dropbox_upload_session(dbx, local_zip, file_size, dest_path):
+    """Upload local_zip through a concurrent upload session: up to
+    DROPBOX_PARALLEL appends (4 MiB-aligned, adaptively sized chunks) are in
+    flight while the next chunk is read. The closing append waits for the others
+    so the session is complete before it is finished. Returns the file id."""
+    sizer = AdaptiveChunkSize(minimum=8 * MiB, maximum=64 * MiB, multiple=4 * MiB)
+    session_id = retry_call(
+        lambda: dbx.files_upload_session_start(
+            b"", session_type=dropbox.files.UploadSessionType.concurrent
+        ).session_id,
+        DROPBOX_RETRYABLE,
+    )
+
+    def append(offset, data, close=False):
+        cursor = dropbox.files.UploadSessionCursor(session_id, offset=offset)
+        started = time.monotonic()
+        retry_call(
+            lambda: dbx.files_upload_session_append_v2(data, cursor, close=close),
+            DROPBOX_RETRYABLE,
+            sizer,
+        )
+        sizer.record(time.monotonic() - started)
+
+    inflight = deque()
+    with ThreadPoolExecutor(max_workers=DROPBOX_PARALLEL) as pool, ChunkReader(local_zip, 0, sizer) as chunks:
+        try:
+            for offset, data in chunks:
+                if offset + len(data) >= file_size:
+                    for future in inflight:
+                        future.result()
+                    inflight.clear()
+                    append(offset, data, close=True)
+                    break
+                inflight.append(pool.submit(append, offset, data))
+                while len(inflight) >= DROPBOX_PARALLEL:
+                    inflight.popleft().result()
+        except BaseException:
+            for future in inflight:
+                future.cancel()
+            raise
+
+    cursor = dropbox.files.UploadSessionCursor(session_id, offset=file_size)
+    commit = dropbox.files.CommitInfo(path=dest_path, mode=dropbox.files.WriteMode.overwrite)
+    dbx_file = retry_call(lambda: dbx.files_upload_session_finish(b"", cursor, commit), DROPBOX_RETRYABLE)
+    return dbx_file.id
+
 
 def storage_dropbox(stored_backup):
     storage_file_id = None
@@ -30,9 +100,7 @@ def storage_dropbox(stored_backup):
         local_zip = f"_storage/{stored_backup.backup.uuid}.zip"
 
         file_size = os.path.getsize(local_zip)
-        # Files uploaded through the API must be 350GB or smaller.
-        chunk_size = 140 * 1024 * 1024
-        dest_path = f"/{stored_backup.backup.uuid}.zip"
+        dest_path = f"/{archive_name(stored_backup.backup)}"
         access_token = bs_decrypt(stored_backup.storage.storage_dropbox.access_token, encryption_key)
         refresh_token = bs_decrypt(stored_backup.storage.storage_dropbox.refresh_token, encryption_key)
 
@@ -44,37 +112,20 @@ def storage_dropbox(stored_backup):
             timeout=900 * 2,
         )
 
-        with open(local_zip, "rb") as file_to_upload:
-            if file_size <= chunk_size:
-                dbx_file = dbx.files_upload(
-                    file_to_upload.read(),
+        if file_size <= DROPBOX_SINGLE_UPLOAD:
+            with open(local_zip, "rb") as file_to_upload:
+                file_data = file_to_upload.read()
+            dbx_file = retry_call(
+                lambda: dbx.files_upload(
+                    file_data,
                     str(dest_path),
                     dropbox.files.WriteMode.overwrite,
-                )
-                storage_file_id = dbx_file.id
-            else:
-                upload_session_start_result = dbx.files_upload_session_start(
-                    file_to_upload.read(chunk_size)
-                )
-                session_id = upload_session_start_result.session_id
-                cursor = dropbox.files.UploadSessionCursor(
-                    session_id, offset=file_to_upload.tell()
-                )
-                commit = dropbox.files.CommitInfo(
-                    path=dest_path, mode=dropbox.files.WriteMode.overwrite
-                )
-                while file_to_upload.tell() < file_size:
-                    if (file_size - file_to_upload.tell()) <= chunk_size:
-                        dbx_file = dbx.files_upload_session_finish(
-                            file_to_upload.read(chunk_size), cursor, commit
-                        )
-                        storage_file_id = dbx_file.id
-                    else:
-                        dbx.files_upload_session_append_v2(
-                            file_to_upload.read(chunk_size), cursor
-                        )
-                        # This is needed to upload. Ignore read only warning
-                        cursor.offset = file_to_upload.tell()
+                ),
+                DROPBOX_RETRYABLE,
+            )
+            storage_file_id = dbx_file.id
+        else:
+            storage_file_id = _dropbox_upload_session(dbx, local_zip, file_size, dest_path)
         try:
             dbx.sharing_create_shared_link_with_settings(dest_path)
         except:
@@ -0,0 +1,34 @@
+"""Remote folder-ID cache for the cloud-drive backends.
+
+Google Drive resolves ``BackupSheep/{node}`` with two files.list searches (and
+up to two creates) and pCloud calls createfolderifnotexists before every
+upload. The resolved IDs are kept in the Django cache per storage for
+STORAGE_FOLDER_CACHE_TTL seconds, so an upload to a known folder goes straight
+to the upload call. A backend that gets a 404 / missing-folder answer for a
+cached ID calls forget_folder() so the next attempt resolves it again.
+
+OneDrive and Dropbox address uploads by path and create missing folders
+themselves, so they need no cache.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _cache_key(storage, path):
+    return f"storage_folder:{storage.id}:{path}"
+
+
+def cached_folder_id(storage, path, resolve):
+    """The remote folder ID for `path` on `storage`; resolve() is only called
+    (and its result cached) when the ID is not cached yet."""
+    key = _cache_key(storage, path)
+    folder_id = cache.get(key)
+    if folder_id is None:
+        folder_id = resolve()
+        if folder_id:
+            cache.set(key, folder_id, settings.STORAGE_FOLDER_CACHE_TTL)
+    return folder_id
+
+
+def forget_folder(storage, *paths):
+    cache.delete_many([_cache_key(storage, path) for path in paths])
@@ -1,4 +1,5 @@
 from apps._tasks.exceptions import StorageGoogleCloudUploadFailedError
+from apps._tasks.integration.archive import archive_name
 from google.cloud import storage as gc_storage
 
 
@@ -12,7 +13,7 @@ def storage_google_cloud(stored_backup):
 
         prefix = storage.storage_google_cloud.prefix
 
-        file_name = f"{backup.node.name_slug}/{stored_backup.backup.uuid}.zip"
+        file_name = f"{backup.node.name_slug}/{archive_name(backup)}"
 
         storage_client = gc_storage.Client(credentials=storage.storage_google_cloud.get_credentials())
 
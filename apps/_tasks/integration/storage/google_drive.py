@@ -1,4 +1,6 @@
 import os
+import time
+
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient import discovery
@@ -9,6 +11,21 @@ from apps._tasks.exceptions import (
     NodeGoogleDriveUploadFailedError,
     NodeGoogleDriveNotEnoughStorageError, NodeGoogleDriveTooManyRequestsError,
 )
+from apps._tasks.integration.archive import archive_name
+from apps._tasks.integration.storage.chunked import (
+    CHUNK_TIMEOUT,
+    MiB,
+    AdaptiveChunkSize,
+    ChunkReader,
+    retry_request,
+)
+from apps._tasks.integration.storage.folders import cached_folder_id, forget_folder
+from apps._tasks.integration.storage.resumable import (
+    clear_session,
+    file_fingerprint,
+    load_session,
+    save_session,
+)
 from apps.api.v1.utils.api_helpers import bs_encrypt, bs_decrypt
 from apps.api.v1.utils.api_mail import *
 from apps.console.backup.models import (
@@ -18,6 +35,148 @@ from apps.console.backup.models import (
 from apps.console.node.models import CoreNode
 
 
+GOOGLE_DRIVE_ROOT_FOLDER = "BackupSheep"
+
+
+def _google_drive_folder(client, name, parent=None):
+    """ID of the folder `name` (under `parent`), created when missing; None when
+    the search fails."""
+    query = f"name = '{name}' and trashed = False and mimeType='application/vnd.google-apps.folder'"
+    if parent:
+        query += f" and '{parent}' in parents"
+
+    result = client.get(
+        f"https://www.googleapis.com/drive/v3/files",
+        params={"q": query, "fields": "files(id, name, trashed)"},
+        headers={"Content-Type": "application/json; charset=UTF-8"},
+    )
+
+    if result.status_code != 200:
+        return None
+
+    files = result.json().get("files")
+    folder_list = [d['id'] for d in files if d['name'] == name and d['trashed'] is False]
+
+    if len(folder_list) > 0:
+        return folder_list[0]
+
+    file_metadata = {
+        "name": name,
+        "mimeType": "application/vnd.google-apps.folder",
+    }
+    if parent:
+        file_metadata["parents"] = [parent]
+
+    file_withmetadata = {"data": ("metadata", json.dumps(file_metadata), "application/json; charset=UTF-8")}
+
+    result = client.post(
+        f"https://www.googleapis.com/upload/drive/v3/files",
+        files=file_withmetadata,
+    )
+
+    return result.json()["id"]
+
+
+def _google_drive_next_offset(response):
+    # Range: bytes=0-N is what Drive has stored; no header means nothing yet.
+    received = response.headers.get("Range")
+    return int(received.split("-")[1]) + 1 if received else 0
+
+
+def _google_drive_complete(stored_backup, response):
+    stored_backup.storage_file_id = response.json()["id"]
+    stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
+    clear_session(stored_backup)
+    stored_backup.save()
+
+
+def _google_drive_session(client, stored_backup, local_zip, node_folder):
+    """(resumable upload URL, next byte offset). Reuses the session persisted by a
+    previous attempt (resumable.py) while Drive still knows it, else opens a new one."""
+    fingerprint = file_fingerprint(local_zip)
+    total_file_size = fingerprint["size"]
+
+    session = load_session(stored_backup, "google_drive", fingerprint)
+    if session:
+        r = client.put(session["url"], headers={"Content-Range": f"bytes */{total_file_size}"})
+        if r.status_code == 308:
+            return session["url"], _google_drive_next_offset(r)
+        elif r.status_code == 201 or r.status_code == 200:
+            # The last attempt finished the upload but died before recording it.
+            _google_drive_complete(stored_backup, r)
+            return session["url"], total_file_size
+        # 404/410: the session expired (Drive keeps them a week); start over.
+
+    file_metadata = {
+        "name": archive_name(stored_backup.backup),
+        "mimeType": "application/zip",
+        "parents": [node_folder],
+    }
+
+    result = client.post(
+        f"https://www.googleapis.com/upload/drive/v3/files/?uploadType=resumable",
+        data=json.dumps(file_metadata),
+        headers={"Content-Type": "application/json; charset=UTF-8"}
+    )
+
+    if result.status_code == 404:
+        # The cached node (or BackupSheep) folder was deleted; resolve both again next attempt.
+        forget_folder(
+            stored_backup.storage,
+            GOOGLE_DRIVE_ROOT_FOLDER,
+            f"{GOOGLE_DRIVE_ROOT_FOLDER}/{stored_backup.backup.node.name_slug}",
+        )
+        raise NodeGoogleDriveUploadFailedError(
+            message="Backup folder is missing in Google Drive. We will retry upload.")
+
+    gdrive_upload_url = result.headers.get("Location")
+    save_session(stored_backup, "google_drive", fingerprint, url=gdrive_upload_url)
+    return gdrive_upload_url, 0
+
+
+def _google_drive_upload_chunks(client, stored_backup, local_zip, gdrive_upload_url, offset, total_file_size):
+    """Send local_zip from `offset` in adaptively sized chunks (multiples of the
+    256 KiB Drive requires), reading the next chunk while this one uploads."""
+    sizer = AdaptiveChunkSize(minimum=8 * MiB, maximum=256 * MiB, multiple=256 * 1024)
+
+    with ChunkReader(local_zip, offset, sizer) as chunks:
+        for chunk_offset, chunk_data in chunks:
+            # Drive may acknowledge only part of a chunk; re-send the rest of it.
+            while offset < chunk_offset + len(chunk_data):
+                if offset < chunk_offset:
+                    raise NodeGoogleDriveUploadFailedError(
+                        message="Google Drive lost part of the upload. We will retry upload.")
+                data = chunk_data if offset == chunk_offset else chunk_data[offset - chunk_offset:]
+                # Setting the header with the appropriate chunk data location in the file
+                headers = {
+                    "Content-Range": "bytes {}-{}/{}".format(offset, offset + len(data) - 1, total_file_size),
+                }
+                started = time.monotonic()
+                r = retry_request(
+                    lambda: client.put(gdrive_upload_url, data=data, headers=headers, timeout=CHUNK_TIMEOUT),
+                    sizer,
+                )
+                sizer.record(time.monotonic() - started)
+
+                # Chunk accepted
+                if r.status_code == 201 or r.status_code == 200:
+                    _google_drive_complete(stored_backup, r)
+                    return
+                elif r.status_code == 308:
+                    # A 308 Resume Incomplete response indicates that you need to continue to
+                    # upload the file, from the byte after the acknowledged range.
+                    offset = _google_drive_next_offset(r)
+                elif r.status_code == 404:
+                    # A 404 Not Found response indicates the upload session has expired and
+                    # the upload must be restarted from the beginning.
+                    clear_session(stored_backup)
+                    raise NodeGoogleDriveUploadFailedError(
+                        message="Upload file is missing in Google Drive. We will retry upload.")
+                else:
+                    raise NodeGoogleDriveUploadFailedError(
+                        message="Unable to get final upload status from Google Drive API.")
+
+
 def storage_google_drive(stored_backup):
     try:
         # sleep(randint(60, 900))
@@ -31,141 +190,26 @@ def storage_google_drive(stored_backup):
         client = storage.storage_google_drive.get_client()
 
         """
-        Find or create BackupSheep folder
+        Find or create BackupSheep and Node folder (IDs cached per storage, folders.py)
         """
-        search_params = {
-            "q": "name='BackupSheep' and trashed = False and mimeType='application/vnd.google-apps.folder'",
-            "fields": "files(id, name, trashed)",
-        }
-
-        result = client.get(
-            f"https://www.googleapis.com/drive/v3/files",
-            params=search_params,
-            headers={"Content-Type": "application/json; charset=UTF-8"},
+        bs_folder = cached_folder_id(
+            storage, GOOGLE_DRIVE_ROOT_FOLDER, lambda: _google_drive_folder(client, GOOGLE_DRIVE_ROOT_FOLDER)
         )
 
-        if result.status_code == 200:
-            files = result.json().get("files")
-
-            bs_folder_list = [d['id'] for d in files if d['name'] == 'BackupSheep' and d['trashed'] is False]
-
-            if len(bs_folder_list) > 0:
-                bs_folder = bs_folder_list[0]
-            else:
-                file_metadata = {
-                    "name": "BackupSheep",
-                    "mimeType": "application/vnd.google-apps.folder",
-                    # 'parents': [folder_id]
-                }
-
-                file_withmetadata = {"data": ("metadata", json.dumps(file_metadata), "application/json; charset=UTF-8")}
-
-                result = client.post(
-                    f"https://www.googleapis.com/upload/drive/v3/files",
-                    files=file_withmetadata,
-                )
-
-                bs_folder = result.json()["id"]
-
         if bs_folder:
-            """
-            Find or create Node folder
-            """
-            search_params = {
-                "q": f"name = '{backup.node.name_slug}' and '{bs_folder}' in parents and trashed = False and mimeType='application/vnd.google-apps.folder'",
-                "fields": "files(id, name, trashed)",
-            }
-
-            result = client.get(
-                f"https://www.googleapis.com/drive/v3/files",
-                params=search_params,
-                headers={"Content-Type": "application/json; charset=UTF-8"},
+            node_folder = cached_folder_id(
+                storage,
+                f"{GOOGLE_DRIVE_ROOT_FOLDER}/{backup.node.name_slug}",
+                lambda: _google_drive_folder(client, backup.node.name_slug, bs_folder),
             )
 
-            if result.status_code == 200:
-                files = result.json().get("files")
-
-                node_folder_list = [d['id'] for d in files if d['name'] == backup.node.name_slug and d['trashed'] is False]
-
-                if len(node_folder_list) > 0:
-                    node_folder = node_folder_list[0]
-                else:
-                    file_metadata = {
-                        "name": f"{backup.node.name_slug}",
-                        "mimeType": "application/vnd.google-apps.folder",
-                        'parents': [bs_folder]
-                    }
-
-                    file_withmetadata = {
-                        "data": ("metadata", json.dumps(file_metadata), "application/json; charset=UTF-8")}
-
-                    result = client.post(
-                        f"https://www.googleapis.com/upload/drive/v3/files",
-                        files=file_withmetadata,
-                    )
-
-                    node_folder = result.json()["id"]
-
         if bs_folder and node_folder:
             """
-            Now upload file.
+            Now upload file, resuming the previous attempt's session if Drive still has it.
             """
-            file_metadata = {
-                "name": f"{stored_backup.backup.uuid_str}.zip",
-                "mimeType": "application/zip",
-                "parents": [node_folder],
-            }
-
-            result = client.post(
-                f"https://www.googleapis.com/upload/drive/v3/files/?uploadType=resumable",
-                data=json.dumps(file_metadata),
-                headers={"Content-Type": "application/json; charset=UTF-8"}
-            )
-
-            gdrive_upload_url = result.headers.get("Location")
-
-            with open(local_zip, "rb") as f:
-                total_file_size = os.path.getsize(local_zip)
-                chunk_size = 262144 * 8192
-                chunk_number = total_file_size // chunk_size
-                chunk_leftover = total_file_size - chunk_size * chunk_number
-                i = 0
-                while True:
-                    chunk_data = f.read(chunk_size)
-                    start_index = i * chunk_size
-                    end_index = start_index + chunk_size
-                    # If end of file, break
-                    if not chunk_data:
-                        break
-                    if i == chunk_number:
-                        end_index = start_index + chunk_leftover
-                    # Setting the header with the appropriate chunk data location in the file
-                    headers = {
-                        "Content-Length": "{}".format(total_file_size),
-                        "Content-Range": "bytes {}-{}/{}".format(start_index, end_index - 1, total_file_size),
-                    }
-                    # Upload one chunk at a time
-                    r = client.put(gdrive_upload_url, data=chunk_data, headers=headers, timeout=24*3600)
-                    i = i + 1
-
-                    # Chunk accepted
-                    if r.status_code == 201 or r.status_code == 200:
-                        storage_file_id = r.json()["id"]
-                        storage_file_id = storage_file_id
-                        stored_backup.storage_file_id = storage_file_id
-                        stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
-                        stored_backup.save()
-                    elif r.status_code == 308:
-                        # A 308 Resume Incomplete response indicates that you need to continue to upload the file.
-                        pass
-                    elif r.status_code == 404:
-                        # A 404 Not Found response indicates the upload session has expired and
-                        # the upload must be restarted from the beginning.
-                        raise NodeGoogleDriveUploadFailedError(
-                            message="Upload file is missing in Google Drive. We will retry upload.")
-                    else:
-                        raise NodeGoogleDriveUploadFailedError(
-                            message="Unable to get final upload status from Google Drive API.")
+            total_file_size = os.path.getsize(local_zip)
+            gdrive_upload_url, offset = _google_drive_session(client, stored_backup, local_zip, node_folder)
+            _google_drive_upload_chunks(client, stored_backup, local_zip, gdrive_upload_url, offset, total_file_size)
         else:
             raise NodeGoogleDriveUploadFailedError(
                 message="Unable to get ID of BackupSheep and Node folder in your Google Drive.")
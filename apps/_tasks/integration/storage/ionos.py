@@ -1,51 +1,13 @@
-import boto3
 from botocore.config import Config
 from apps._tasks.exceptions import (
     StorageScalewayUploadFailedError, StorageIonosUploadFailedError,
 )
-from apps.api.v1.utils.api_helpers import bs_decrypt
+from apps._tasks.integration.storage.s3_compat import s3_upload_file
 
 
 def storage_ionos(stored_backup):
     try:
-        backup = stored_backup.backup
-
-        local_zip = f"_storage/{stored_backup.backup.uuid}.zip"
-        storage = stored_backup.storage
-        encryption_key = storage.account.get_encryption_key()
-        prefix = storage.storage_ionos.prefix
-
-        file_name = f"{backup.node.name_slug}/{stored_backup.backup.uuid}.zip"
-
-        session = boto3.Session(
-            aws_access_key_id=bs_decrypt(storage.storage_ionos.access_key, encryption_key),
-            aws_secret_access_key=bs_decrypt(storage.storage_ionos.secret_key, encryption_key),
-        )
-        # boto3 >= 1.36 sends checksums IONOS rejects (InvalidTrailer) unless
-        # checksum calculation/validation is set to "when_required".
-        # https://docs.ionos.com/cloud/managed-services/s3-object-storage/s3-tools/boto3-python-sdk
-        s3 = session.resource(
-            "s3",
-            region_name=storage.storage_ionos.region.code,
-            endpoint_url=f"https://{storage.storage_ionos.endpoint}",
-            config=Config(
-                signature_version="s3v4",
-                request_checksum_calculation="when_required",
-                response_checksum_validation="when_required",
-            ),
-        )
-
-        if prefix:
-            if (prefix != "") and (prefix.endswith("/") is False):
-                prefix += "/"
-            file_key = prefix + file_name
-        else:
-            file_key = file_name
-        s3.meta.client.upload_file(local_zip, storage.storage_ionos.bucket_name, file_key)
-        storage_file_id = file_key
-        stored_backup.storage_file_id = storage_file_id
-        stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
-        stored_backup.save()
+        s3_upload_file(stored_backup)
     except FileNotFoundError as e:
         stored_backup.status = stored_backup.Status.UPLOAD_FAILED_FILE_NOT_FOUND
         stored_backup.save()
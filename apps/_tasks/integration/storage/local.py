@@ -1,9 +1,80 @@
+import errno
 import os
 import shutil
 
 from apps._tasks.exceptions import (
     StorageLocalUploadFailedError,
 )
+from apps._tasks.integration.archive import archive_name
+
+# ioctl(2) FICLONE: share the source's extents copy-on-write (btrfs, XFS, bcachefs).
+FICLONE = 0x40049409
+
+# Errors meaning "this placement method is not available here, try the next one".
+UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EPERM, errno.EMLINK}
+
+
+def _reflink(src, dst):
+    import fcntl
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def _kernel_copy(src, dst):
+    """copy_file_range (server-side / reflinked on filesystems that can), else
+    sendfile; the bytes never pass through user space."""
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        remaining = os.fstat(s.fileno()).st_size
+        copy = getattr(os, "copy_file_range", None)
+        offset = 0
+        while remaining > 0:
+            try:
+                if copy:
+                    sent = copy(s.fileno(), d.fileno(), remaining)
+                else:
+                    sent = os.sendfile(d.fileno(), s.fileno(), offset, remaining)
+            except OSError as e:
+                if copy and e.errno in UNSUPPORTED:
+                    copy = None
+                    continue
+                raise
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+
+
+def _buffered_copy(src, dst):
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        shutil.copyfileobj(s, d)
+
+
+def place_file(src, dst):
+    """Put a copy of src at dst as cheaply as the filesystem allows: reflink,
+    hardlink (same filesystem; the archive is never modified after it is
+    written), in-kernel copy, then a plain buffered copy. dst appears
+    atomically. Returns the method used."""
+    partial = f"{dst}.part"
+    methods = (
+        ("reflink", _reflink),
+        ("hardlink", os.link),
+        ("copy_file_range", _kernel_copy),
+        ("copy", _buffered_copy),
+    )
+    for name, method in methods:
+        if os.path.lexists(partial):
+            os.remove(partial)
+        try:
+            method(src, partial)
+        except OSError as e:
+            if e.errno in UNSUPPORTED and name != "copy":
+                continue
+            if os.path.lexists(partial):
+                os.remove(partial)
+            raise
+        os.replace(partial, dst)
+        return name
 
 
 def storage_local(stored_backup):
@@ -15,11 +86,10 @@ def storage_local(stored_backup):
         target_dir = storage.storage_local.resolve_path()
         os.makedirs(target_dir, exist_ok=True)
 
-        target_file = os.path.join(target_dir, f"{backup.uuid}.zip")
+        target_file = os.path.join(target_dir, archive_name(backup))
         source_size = os.path.getsize(local_zip)
 
-        with open(local_zip, "rb") as src, open(target_file, "wb") as dst:
-            shutil.copyfileobj(src, dst)
+        place_file(local_zip, target_file)
 
         if os.path.getsize(target_file) != source_size:
             raise IOError(
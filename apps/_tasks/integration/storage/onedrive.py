@@ -1,10 +1,109 @@
 import os
+import time
 
 import requests
 from django.conf import settings
 from apps._tasks.exceptions import (
     NodeOneDriveUploadFailedError,
 )
+from apps._tasks.integration.archive import archive_name
+from apps._tasks.integration.storage.chunked import (
+    CHUNK_TIMEOUT,
+    AdaptiveChunkSize,
+    ChunkReader,
+    retry_request,
+)
+from apps._tasks.integration.storage.resumable import (
+    clear_session,
+    file_fingerprint,
+    load_session,
+    save_session,
+)
+
+# Upload session chunks must be multiples of 320 KiB.
+ONEDRIVE_CHUNK_UNIT = 327680
+# Folder under the drive root holding one folder per node.
+ONEDRIVE_ROOT_FOLDER = "backupsheep"
+
+
+def _onedrive_next_offset(status, default):
+    # nextExpectedRanges: ["12345-"] (or ["12345-67890", ...] for gaps).
+    ranges = status.get("nextExpectedRanges")
+    return int(ranges[0].split("-")[0]) if ranges else default
+
+
+def _onedrive_session(stored_backup, local_zip, onedrive_destination):
+    """(upload URL, next byte offset). Reuses the session persisted by a previous
+    attempt (resumable.py) while OneDrive still knows it, else creates a new one."""
+    fingerprint = file_fingerprint(local_zip)
+
+    session = load_session(stored_backup, "onedrive", fingerprint)
+    if session:
+        # The upload URL is pre-authenticated; no bearer token needed.
+        r = requests.get(session["url"])
+        if r.status_code == 200:
+            return session["url"], _onedrive_next_offset(r.json(), 0)
+        # 404: the session expired or was cancelled; start over.
+
+    upload_session = requests.post(
+        onedrive_destination + ":/createUploadSession",
+        headers=stored_backup.storage.storage_onedrive.get_client(),
+    ).json()
+    save_session(stored_backup, "onedrive", fingerprint, url=upload_session["uploadUrl"])
+    return upload_session["uploadUrl"], 0
+
+
+def _onedrive_upload_chunks(stored_backup, local_zip, upload_url, offset, total_file_size, target_file_path):
+    """Send local_zip from `offset` in adaptively sized chunks (multiples of the
+    320 KiB OneDrive requires, under its 60 MiB request limit), reading the next
+    chunk while this one uploads. Returns the storage file id."""
+    sizer = AdaptiveChunkSize(
+        minimum=ONEDRIVE_CHUNK_UNIT * 20,
+        maximum=ONEDRIVE_CHUNK_UNIT * 180,
+        multiple=ONEDRIVE_CHUNK_UNIT,
+    )
+
+    with ChunkReader(local_zip, offset, sizer) as chunks:
+        for chunk_offset, chunk_data in chunks:
+            # OneDrive may expect a later offset than the chunk start; send the rest of it.
+            while offset < chunk_offset + len(chunk_data):
+                if offset < chunk_offset:
+                    raise NodeOneDriveUploadFailedError(
+                        stored_backup.backup.uuid_str,
+                        stored_backup.backup.attempt_no,
+                        stored_backup.backup.type,
+                        "OneDrive expects bytes that were already sent.",
+                    )
+                data = chunk_data if offset == chunk_offset else chunk_data[offset - chunk_offset:]
+                end_index = offset + len(data)
+                # Setting the header with the appropriate chunk data location in the file
+                headers = {
+                    "Content-Length": "{}".format(len(data)),
+                    "Content-Range": "bytes {}-{}/{}".format(offset, end_index - 1, total_file_size),
+                }
+                started = time.monotonic()
+                r = retry_request(
+                    lambda: requests.put(upload_url, data=data, headers=headers, timeout=CHUNK_TIMEOUT),
+                    sizer,
+                )
+                sizer.record(time.monotonic() - started)
+
+                # Chunk accepted
+                if r.status_code == 202:
+                    offset = _onedrive_next_offset(r.json(), end_index)
+                # File created
+                elif r.status_code == 201 or r.status_code == 200:
+                    return target_file_path
+                else:
+                    if r.status_code == 404:
+                        # The session expired; the next attempt starts a new one.
+                        clear_session(stored_backup)
+                    raise NodeOneDriveUploadFailedError(
+                        stored_backup.backup.uuid_str,
+                        stored_backup.backup.attempt_no,
+                        stored_backup.backup.type,
+                    )
+    return None
 
 
 def storage_onedrive(stored_backup):
@@ -16,7 +115,7 @@ def storage_onedrive(stored_backup):
 
         local_zip = f"_storage/{stored_backup.backup.uuid}.zip"
 
-        target_file_path = f"backupsheep/{backup.node.name_slug}/{stored_backup.backup.uuid}.zip"
+        target_file_path = f"{ONEDRIVE_ROOT_FOLDER}/{backup.node.name_slug}/{archive_name(backup)}"
 
         file_size = os.stat(local_zip).st_size
         file_data = open(local_zip, "rb")
@@ -36,51 +135,17 @@ def storage_onedrive(stored_backup):
                     stored_backup.backup.type,
                 )
         else:
-            # Creating an upload session
-            upload_session = requests.post(
-                onedrive_destination + ":/createUploadSession", headers=storage.storage_onedrive.get_client()
-            ).json()
-
-            with open(local_zip, "rb") as f:
-                total_file_size = os.path.getsize(local_zip)
-                chunk_size = 6553600
-                chunk_number = total_file_size // chunk_size
-                chunk_leftover = total_file_size - chunk_size * chunk_number
-                i = 0
-                while True:
-                    chunk_data = f.read(chunk_size)
-                    start_index = i * chunk_size
-                    end_index = start_index + chunk_size
-                    # If end of file, break
-                    if not chunk_data:
-                        break
-                    if i == chunk_number:
-                        end_index = start_index + chunk_leftover
-                    # Setting the header with the appropriate chunk data location in the file
-                    headers = {
-                        "Content-Length": "{}".format(chunk_size),
-                        "Content-Range": "bytes {}-{}/{}".format(start_index, end_index - 1, total_file_size),
-                    }
-                    # Upload one chunk at a time
-                    r = requests.put(upload_session["uploadUrl"], data=chunk_data, headers=headers)
-                    i = i + 1
-
-                    # Chunk accepted
-                    if r.status_code == 202:
-                        pass
-                    # File created
-                    elif r.status_code == 201:
-                        storage_file_id = target_file_path
-                    else:
-                        raise NodeOneDriveUploadFailedError(
-                            stored_backup.backup.uuid_str,
-                            stored_backup.backup.attempt_no,
-                            stored_backup.backup.type,
-                        )
+            # Upload session: resumed from a previous attempt when OneDrive still has it.
+            upload_url, offset = _onedrive_session(stored_backup, local_zip, onedrive_destination)
+
+            storage_file_id = _onedrive_upload_chunks(
+                stored_backup, local_zip, upload_url, offset, file_size, target_file_path
+            )
         file_data.close()
 
         stored_backup.storage_file_id = storage_file_id
         stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
+        clear_session(stored_backup)
         stored_backup.save()
     except FileNotFoundError as e:
         stored_backup.status = stored_backup.Status.UPLOAD_FAILED_FILE_NOT_FOUND
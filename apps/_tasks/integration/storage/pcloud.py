@@ -1,11 +1,71 @@
-import mimetypes
-import os
+import time
 
 import requests
-from pcloud import PyCloud
-from requests_toolbelt import MultipartEncoder
 
 from apps._tasks.exceptions import StoragePCloudUploadFailedError
+from apps._tasks.integration.archive import archive_name
+from apps._tasks.integration.storage.chunked import (
+    CHUNK_TIMEOUT,
+    MiB,
+    AdaptiveChunkSize,
+    ChunkReader,
+    retry_request,
+)
+from apps._tasks.integration.storage.folders import cached_folder_id, forget_folder
+from apps._tasks.integration.storage.resumable import (
+    clear_session,
+    file_fingerprint,
+    load_session,
+    save_session,
+)
+
+
+def _pcloud_call(stored_backup, method, params, data=None):
+    """One pCloud API call (retried on 429/5xx); returns the JSON body and raises
+    when pCloud reports a non-zero result."""
+    pcloud = stored_backup.storage.storage_pcloud
+    r = retry_request(
+        lambda: requests.request(
+            "PUT" if data is not None else "POST",
+            f"https://{pcloud.hostname}/{method}",
+            params=params,
+            data=data,
+            headers=pcloud.get_client(file_upload=data is not None),
+            timeout=CHUNK_TIMEOUT,
+        )
+    )
+    result = r.json()
+    if result.get("result") != 0:
+        raise StoragePCloudUploadFailedError(
+            stored_backup.backup.uuid_str,
+            stored_backup.backup.attempt_no,
+            stored_backup.backup.type,
+            result,
+        )
+    return result
+
+
+def _pcloud_folder(stored_backup, path):
+    return _pcloud_call(stored_backup, "createfolderifnotexists", {"path": path})["metadata"]["folderid"]
+
+
+def _pcloud_session(stored_backup, local_zip):
+    """(upload id, next byte offset). Reuses the upload persisted by a previous
+    attempt (resumable.py) while pCloud still knows it, else creates a new one."""
+    fingerprint = file_fingerprint(local_zip)
+
+    session = load_session(stored_backup, "pcloud", fingerprint)
+    if session:
+        try:
+            info = _pcloud_call(stored_backup, "upload_info", {"uploadid": session["upload_id"]})
+            return session["upload_id"], info.get("size", 0)
+        except StoragePCloudUploadFailedError:
+            # The upload expired or was saved; start over.
+            pass
+
+    upload_id = _pcloud_call(stored_backup, "upload_create", {})["uploadid"]
+    save_session(stored_backup, "pcloud", fingerprint, upload_id=upload_id)
+    return upload_id, 0
 
 
 def storage_pcloud(stored_backup):
@@ -14,28 +74,42 @@ def storage_pcloud(stored_backup):
         storage = stored_backup.storage
         backup = stored_backup.backup
 
-        file_name = f"{stored_backup.backup.uuid}.zip"
+        file_name = archive_name(stored_backup.backup)
 
-        # create node folder if it doesn't exist
-        requests.post(
-            f"https://{storage.storage_pcloud.hostname}/createfolderifnotexists?path=/{backup.node.name_slug}",
-            headers=storage.storage_pcloud.get_client(),
-            verify=True,
-        )
+        # create node folder if it doesn't exist (ID cached per storage, folders.py)
+        folder_path = f"/{backup.node.name_slug}"
+        folder_id = cached_folder_id(storage, folder_path, lambda: _pcloud_folder(stored_backup, folder_path))
 
-        pc = PyCloud(
-            username=storage.storage_pcloud.userid,
-            password=storage.storage_pcloud.get_access_token(),
-            endpoint=storage.storage_pcloud.hostname.split(".")[0],
-            oauth2=True,
-        )
+        # Upload in adaptively sized chunks, reading the next one while this one
+        # uploads, into an upload session a retry can resume.
+        upload_id, offset = _pcloud_session(stored_backup, local_zip)
+        sizer = AdaptiveChunkSize(minimum=8 * MiB, maximum=128 * MiB)
+
+        with ChunkReader(local_zip, offset, sizer) as chunks:
+            for chunk_offset, chunk_data in chunks:
+                started = time.monotonic()
+                _pcloud_call(
+                    stored_backup,
+                    "upload_write",
+                    {"uploadid": upload_id, "uploadoffset": chunk_offset},
+                    data=chunk_data,
+                )
+                sizer.record(time.monotonic() - started)
 
-        result = pc.uploadfile(files=[local_zip], path=f"/{backup.node.name_slug}")
+        try:
+            result = _pcloud_call(
+                stored_backup, "upload_save", {"uploadid": upload_id, "folderid": folder_id, "name": file_name}
+            )
+        except StoragePCloudUploadFailedError:
+            # Most likely the cached folder was deleted; resolve it again next attempt.
+            forget_folder(storage, folder_path)
+            raise
 
         if result.get("metadata"):
-            metadata = result.get("metadata")[0]
+            metadata = result.get("metadata")
             if metadata.get("fileid"):
-                stored_backup.storage_file_id = metadata.get("path")
+                clear_session(stored_backup)
+                stored_backup.storage_file_id = metadata.get("path") or f"{folder_path}/{file_name}"
                 stored_backup.metadata = metadata
                 stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
                 stored_backup.save()
@@ -0,0 +1,758 @@
+"""Storage backend registry.
+
+Every storage type code maps to one StorageBackend exposing the same five
+operations: upload (the storage_<code> task function), delete, presign, head
+and list, plus delete_many, the batched delete retention uses (one
+DeleteObjects request per 1000 S3 keys, one Drive batch request per 100 files,
+one delete per file elsewhere). storage_upload, BaseBackupStoragePoints.generate_download_url and
+BaseBackupStoragePoints.soft_delete dispatch through get_backend() instead of
+switching on ``storage.type.code`` themselves, so behaviour shared by a family
+of providers (e.g. every S3-compatible service) is written once.
+
+The provider modules import the backup models, so apps.console.backup.models
+must import this module lazily (inside the method).
+"""
+import datetime
+import os
+import re
+import uuid
+
+import requests
+from botocore.exceptions import ClientError
+from django.conf import settings
+from sentry_sdk import capture_exception
+
+from apps._tasks.integration.storage.alibaba import storage_alibaba
+from apps._tasks.integration.storage.aws_s3 import storage_aws_s3
+from apps._tasks.integration.storage.azure import storage_azure
+from apps._tasks.integration.storage.backblaze_b2 import storage_backblaze_b2
+from apps._tasks.integration.storage.cloudflare import storage_cloudflare
+from apps._tasks.integration.storage.dedup import storage_dedup
+from apps._tasks.integration.storage.do_spaces import storage_do_spaces
+from apps._tasks.integration.storage.dropbox import storage_dropbox
+from apps._tasks.integration.storage.exoscale import storage_exoscale
+from apps._tasks.integration.storage.filebase import storage_filebase
+from apps._tasks.integration.storage.google_cloud import storage_google_cloud
+from apps._tasks.integration.storage.google_drive import GOOGLE_DRIVE_ROOT_FOLDER, storage_google_drive
+from apps._tasks.integration.storage.ibm import storage_ibm
+from apps._tasks.integration.storage.idrive import storage_idrive
+from apps._tasks.integration.storage.ionos import storage_ionos
+from apps._tasks.integration.storage.leviia import storage_leviia
+from apps._tasks.integration.storage.linode import storage_linode
+from apps._tasks.integration.storage.local import storage_local
+from apps._tasks.integration.storage.onedrive import ONEDRIVE_ROOT_FOLDER, storage_onedrive
+from apps._tasks.integration.storage.oracle import storage_oracle
+from apps._tasks.integration.storage.pcloud import storage_pcloud
+from apps._tasks.integration.storage.rackcorp import storage_rackcorp
+from apps._tasks.integration.storage.resumable import SESSION_KEY, clear_session
+from apps._tasks.integration.storage.s3_compat import s3_bucket, s3_client
+from apps._tasks.integration.storage.scaleway import storage_scaleway
+from apps._tasks.integration.storage.tencent import storage_tencent
+from apps._tasks.integration.storage.upcloud import storage_upcloud
+from apps._tasks.integration.storage.vultr import storage_vultr
+from apps._tasks.integration.storage.wasabi import storage_wasabi
+from apps.api.v1.utils.api_helpers import bs_decrypt
+
+PRESIGN_EXPIRES = 24 * 3600
+DRIVE_FOLDER = "application/vnd.google-apps.folder"
+# Most keys one S3 DeleteObjects request takes, and requests one Drive batch takes.
+DELETE_OBJECTS_LIMIT = 1000
+DRIVE_BATCH_LIMIT = 100
+
+BACKENDS = {}
+
+
+def register(backend):
+    BACKENDS[backend.code] = backend
+    return backend
+
+
+def get_backend(code):
+    """The registered backend for a storage type code, or None if unsupported."""
+    return BACKENDS.get(code)
+
+
+class StorageBackend:
+    """Operations on one storage type. `uploader` is the storage_<code>(stored_backup)
+    function; it records storage_file_id/status on the point itself.
+
+    Capability flags:
+        streaming -- accepts a multipart stream (storage.streaming).
+        dedup -- can hold a deduplicating repository (storage.dedup); used
+                 instead of `uploader` when the storage has dedup_repository on.
+    """
+
+    streaming = False
+    dedup = False
+
+    def __init__(self, code, uploader):
+        self.code = code
+        self.uploader = uploader
+
+    def upload(self, stored_backup):
+        if self.dedup and stored_backup.storage.dedup_repository:
+            storage_dedup(stored_backup)
+        else:
+            self.uploader(stored_backup)
+
+    def abort_upload(self, stored_backup):
+        """Drop the resumable session (resumable.py) once storage_upload gives up."""
+        clear_session(stored_backup)
+
+    def delete(self, stored_backup):
+        raise NotImplementedError(f"{self.code}: delete is not supported.")
+
+    def delete_many(self, stored_backups):
+        """Delete the stored files of several points of one storage. Returns
+        {stored backup id: error} for the ones that could not be deleted."""
+        errors = {}
+        for stored_backup in stored_backups:
+            try:
+                self.delete(stored_backup)
+            except Exception as e:
+                capture_exception(e)
+                errors[stored_backup.id] = e
+        return errors
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        """Temporary download URL for the stored file (None when unavailable)."""
+        raise NotImplementedError(f"{self.code}: presign is not supported.")
+
+    def head(self, stored_backup):
+        """Size in bytes of the stored file, or None when it no longer exists."""
+        raise NotImplementedError(f"{self.code}: head is not supported.")
+
+    def list(self, storage, prefix=""):
+        """(key, size) for every object under `prefix` on `storage`."""
+        raise NotImplementedError(f"{self.code}: list is not supported.")
+
+
+class S3CompatibleBackend(StorageBackend):
+    """Any provider described in s3_compat.S3_COMPATIBLE."""
+
+    streaming = True
+    dedup = True
+
+    def client(self, storage):
+        return s3_client(storage, signature_version="s3v4")
+
+    def abort_upload(self, stored_backup):
+        # An open multipart upload keeps its parts billed until aborted.
+        session = (stored_backup.metadata or {}).get(SESSION_KEY)
+        if session and session.get("kind") == "s3":
+            try:
+                self.client(stored_backup.storage).abort_multipart_upload(
+                    Bucket=session["bucket"], Key=session["key"], UploadId=session["upload_id"]
+                )
+            except ClientError:
+                pass
+        clear_session(stored_backup)
+
+    def delete(self, stored_backup):
+        storage = stored_backup.storage
+        self.client(storage).delete_object(
+            Bucket=s3_bucket(storage), Key=f"{stored_backup.storage_file_id}"
+        )
+
+    def delete_many(self, stored_backups):
+        stored_backups = list(stored_backups)
+        if not stored_backups:
+            return {}
+        storage = stored_backups[0].storage
+        client, bucket = self.client(storage), s3_bucket(storage)
+        by_key = {}
+        for stored_backup in stored_backups:
+            by_key.setdefault(f"{stored_backup.storage_file_id}", []).append(stored_backup)
+        keys = list(by_key)
+        errors = {}
+        for start in range(0, len(keys), DELETE_OBJECTS_LIMIT):
+            batch = keys[start:start + DELETE_OBJECTS_LIMIT]
+            try:
+                # Quiet: the response only lists the keys that failed.
+                response = client.delete_objects(
+                    Bucket=bucket, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+            except ClientError as e:
+                errors.update((point.id, e) for key in batch for point in by_key[key])
+                continue
+            for failure in response.get("Errors", []):
+                error = ClientError({"Error": failure}, "DeleteObjects")
+                errors.update((point.id, error) for point in by_key.get(failure.get("Key"), ()))
+        return errors
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        storage = stored_backup.storage
+        return self.client(storage).generate_presigned_url(
+            "get_object",
+            Params={"Bucket": s3_bucket(storage), "Key": f"{stored_backup.storage_file_id}"},
+            ExpiresIn=expires,
+        )
+
+    def head(self, stored_backup):
+        storage = stored_backup.storage
+        try:
+            response = self.client(storage).head_object(
+                Bucket=s3_bucket(storage), Key=f"{stored_backup.storage_file_id}"
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response["ContentLength"]
+
+    def list(self, storage, prefix=""):
+        paginator = self.client(storage).get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=s3_bucket(storage), Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"], item["Size"]
+
+
+class AWSS3Backend(S3CompatibleBackend):
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        """Objects moved to Glacier / Deep Archive by a lifecycle rule must be
+        restored first: returns "restore_requested" / "restore_in_progress"
+        until the temporary copy is available."""
+        storage = stored_backup.storage
+        client = self.client(storage)
+        key = f"{stored_backup.storage_file_id}"
+        s3_object = client.head_object(Bucket=s3_bucket(storage), Key=key)
+
+        if s3_object.get("StorageClass") in ("GLACIER", "DEEP_ARCHIVE"):
+            restore = s3_object.get("Restore")
+            if not restore:
+                client.restore_object(
+                    Bucket=s3_bucket(storage),
+                    Key=key,
+                    RestoreRequest={
+                        "Days": 2,
+                        "GlacierJobParameters": {
+                            "Tier": "Expedited",
+                        },
+                    },
+                )
+                return "restore_requested"
+            elif 'ongoing-request="true"' in restore:
+                return "restore_in_progress"
+
+        return client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": s3_bucket(storage), "Key": key},
+            ExpiresIn=expires,
+        )
+
+
+class DropboxBackend(StorageBackend):
+    def client(self, storage):
+        import dropbox
+
+        encryption_key = storage.account.get_encryption_key()
+        return dropbox.Dropbox(bs_decrypt(storage.storage_dropbox.access_token, encryption_key))
+
+    def delete(self, stored_backup):
+        dbx = self.client(stored_backup.storage)
+        file_path = dbx.files_get_metadata(stored_backup.storage_file_id).path_lower
+        dbx.files_delete_v2(file_path)
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        # Dropbox temporary links always live four hours.
+        dbx = self.client(stored_backup.storage)
+        return dbx.files_get_temporary_link(stored_backup.storage_file_id).link
+
+    def head(self, stored_backup):
+        from dropbox.exceptions import ApiError
+
+        dbx = self.client(stored_backup.storage)
+        try:
+            return dbx.files_get_metadata(stored_backup.storage_file_id).size
+        except ApiError:
+            return None
+
+    def list(self, storage, prefix=""):
+        # Keys are the file paths in the app folder, without the leading "/".
+        from dropbox.files import FileMetadata
+
+        dbx = self.client(storage)
+        result = dbx.files_list_folder("", recursive=True)
+        while True:
+            for entry in result.entries:
+                key = entry.path_display.lstrip("/")
+                if isinstance(entry, FileMetadata) and key.startswith(prefix):
+                    yield key, entry.size
+            if not result.has_more:
+                break
+            result = dbx.files_list_folder_continue(result.cursor)
+
+
+def drive_batch_statuses(response):
+    """{Content-ID: HTTP status} of the parts of a Drive batch response."""
+    boundary = re.search(r"boundary=\"?([^\";]+)", response.headers.get("Content-Type", ""))
+    if not boundary:
+        return {}
+    statuses = {}
+    for part in response.text.split(f"--{boundary.group(1)}"):
+        content_id = re.search(r"Content-ID:\s*<response-([^>]+)>", part, re.IGNORECASE)
+        status = re.search(r"^HTTP/\d(?:\.\d)? (\d{3})", part, re.MULTILINE)
+        if content_id and status:
+            statuses[content_id.group(1)] = int(status.group(1))
+    return statuses
+
+
+class GoogleDriveBackend(StorageBackend):
+    FILES_URL = "https://www.googleapis.com/drive/v3/files"
+    BATCH_URL = "https://www.googleapis.com/batch/drive/v3"
+
+    def delete(self, stored_backup):
+        client = stored_backup.storage.storage_google_drive.get_client()
+        result = client.delete(
+            f"{self.FILES_URL}/{stored_backup.storage_file_id}",
+            headers={"Content-Type": "application/json; charset=UTF-8"},
+        )
+        if result.status_code not in (204, 404):
+            result.raise_for_status()
+
+    def delete_many(self, stored_backups):
+        stored_backups = list(stored_backups)
+        if len(stored_backups) < 2:
+            return super().delete_many(stored_backups)
+        client = stored_backups[0].storage.storage_google_drive.get_client()
+        errors = {}
+        for start in range(0, len(stored_backups), DRIVE_BATCH_LIMIT):
+            batch = stored_backups[start:start + DRIVE_BATCH_LIMIT]
+            boundary = f"batch_{uuid.uuid4().hex}"
+            body = "".join(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <{point.id}>\r\n\r\n"
+                f"DELETE /drive/v3/files/{point.storage_file_id} HTTP/1.1\r\n\r\n"
+                for point in batch
+            ) + f"--{boundary}--\r\n"
+            try:
+                result = client.post(
+                    self.BATCH_URL, data=body.encode("utf-8"),
+                    headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+                )
+                result.raise_for_status()
+            except requests.RequestException as e:
+                errors.update((point.id, e) for point in batch)
+                continue
+            statuses = drive_batch_statuses(result)
+            for point in batch:
+                status = statuses.get(str(point.id))
+                if status not in (200, 204, 404):
+                    errors[point.id] = requests.HTTPError(
+                        f"Google Drive batch delete of {point.storage_file_id} returned {status}."
+                    )
+        return errors
+
+    def _get(self, stored_backup, fields):
+        client = stored_backup.storage.storage_google_drive.get_client()
+        return client.get(
+            f"{self.FILES_URL}/{stored_backup.storage_file_id}",
+            params={"fields": fields},
+            headers={"Content-Type": "application/json; charset=UTF-8"},
+        )
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        # Drive has no signed URLs; the web view link needs the owner's session.
+        result = self._get(stored_backup, "webViewLink")
+        if result.status_code == 200:
+            return result.json()["webViewLink"]
+        return None
+
+    def head(self, stored_backup):
+        result = self._get(stored_backup, "size")
+        if result.status_code == 404:
+            return None
+        result.raise_for_status()
+        return int(result.json()["size"])
+
+    def _children(self, client, query):
+        params = {"q": query, "fields": "nextPageToken, files(id, name, mimeType, size)", "pageSize": 1000}
+        while True:
+            result = client.get(self.FILES_URL, params=params)
+            result.raise_for_status()
+            body = result.json()
+            yield from body.get("files", [])
+            if not body.get("nextPageToken"):
+                break
+            params["pageToken"] = body["nextPageToken"]
+
+    def list(self, storage, prefix=""):
+        # Keys are paths from the BackupSheep folder down, e.g.
+        # "BackupSheep/<node>/<uuid>.zip"; Drive itself only knows file ids.
+        client = storage.storage_google_drive.get_client()
+        folders = [
+            (GOOGLE_DRIVE_ROOT_FOLDER, item["id"])
+            for item in self._children(
+                client,
+                f"name = '{GOOGLE_DRIVE_ROOT_FOLDER}' and trashed = False and mimeType='{DRIVE_FOLDER}'",
+            )
+        ]
+        while folders:
+            path, folder_id = folders.pop()
+            for item in self._children(client, f"'{folder_id}' in parents and trashed = False"):
+                key = f"{path}/{item['name']}"
+                if item["mimeType"] == DRIVE_FOLDER:
+                    folders.append((key, item["id"]))
+                elif key.startswith(prefix):
+                    yield key, int(item.get("size", 0))
+
+
+class PCloudBackend(StorageBackend):
+    def delete(self, stored_backup):
+        pcloud = stored_backup.storage.storage_pcloud
+        requests.post(
+            f"https://{pcloud.hostname}/deletefile?fileid={stored_backup.metadata.get('fileid')}",
+            headers=pcloud.get_client(),
+            verify=True,
+        )
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        return (
+            f"https://my.pcloud.com/#page=filemanager"
+            f"&q=name:{stored_backup.backup.uuid_str}"
+            f"&folderid={stored_backup.metadata.get('parentfolderid')}"
+            f"&filter=all"
+        )
+
+    def head(self, stored_backup):
+        pcloud = stored_backup.storage.storage_pcloud
+        result = requests.get(
+            f"https://{pcloud.hostname}/stat?fileid={stored_backup.metadata.get('fileid')}",
+            headers=pcloud.get_client(),
+            verify=True,
+        ).json()
+        if result.get("result") != 0:
+            return None
+        return result["metadata"]["size"]
+
+    def list(self, storage, prefix=""):
+        # Keys are the file paths, as recorded in storage_file_id ("/<node>/<uuid>.zip").
+        pcloud = storage.storage_pcloud
+        result = requests.get(
+            f"https://{pcloud.hostname}/listfolder",
+            params={"path": "/", "recursive": 1},
+            headers=pcloud.get_client(),
+            verify=True,
+        ).json()
+        if result.get("result") != 0:
+            raise requests.HTTPError(f"pCloud listfolder failed: {result.get('error', result)}")
+        folders = [("", result["metadata"])]
+        while folders:
+            path, folder = folders.pop()
+            for item in folder.get("contents", []):
+                key = f"{path}/{item['name']}"
+                if item.get("isfolder"):
+                    folders.append((key, item))
+                elif key.startswith(prefix):
+                    yield key, item["size"]
+
+
+class OneDriveBackend(StorageBackend):
+    def _item_url(self, stored_backup):
+        onedrive = stored_backup.storage.storage_onedrive
+        return f"{settings.MS_GRAPH_ENDPOINT}/drives/{onedrive.drive_id}/root:/{stored_backup.storage_file_id}"
+
+    def abort_upload(self, stored_backup):
+        session = (stored_backup.metadata or {}).get(SESSION_KEY)
+        if session and session.get("kind") == "onedrive":
+            requests.delete(session["url"])
+        clear_session(stored_backup)
+
+    def delete(self, stored_backup):
+        requests.delete(
+            self._item_url(stored_backup),
+            headers=stored_backup.storage.storage_onedrive.get_client(),
+        )
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        r = requests.get(
+            self._item_url(stored_backup),
+            headers=stored_backup.storage.storage_onedrive.get_client(),
+        )
+        return r.json().get("@microsoft.graph.downloadUrl")
+
+    def head(self, stored_backup):
+        r = requests.get(
+            self._item_url(stored_backup),
+            headers=stored_backup.storage.storage_onedrive.get_client(),
+        )
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.json()["size"]
+
+    def list(self, storage, prefix=""):
+        # Keys are the paths under the drive root, as recorded in storage_file_id
+        # ("backupsheep/<node>/<uuid>.zip").
+        onedrive = storage.storage_onedrive
+        headers = onedrive.get_client()
+        root = f"{settings.MS_GRAPH_ENDPOINT}/drives/{onedrive.drive_id}/root:/{ONEDRIVE_ROOT_FOLDER}:/children"
+        folders = [(ONEDRIVE_ROOT_FOLDER, root)]
+        while folders:
+            path, url = folders.pop()
+            while url:
+                r = requests.get(url, headers=headers)
+                if r.status_code == 404:
+                    # Nothing uploaded yet.
+                    break
+                r.raise_for_status()
+                body = r.json()
+                for item in body.get("value", []):
+                    key = f"{path}/{item['name']}"
+                    if "folder" in item:
+                        folders.append((
+                            key,
+                            f"{settings.MS_GRAPH_ENDPOINT}/drives/{onedrive.drive_id}/items/{item['id']}/children",
+                        ))
+                    elif key.startswith(prefix):
+                        yield key, item["size"]
+                url = body.get("@odata.nextLink")
+
+
+class GoogleCloudBackend(StorageBackend):
+    def bucket(self, storage):
+        from google.cloud import storage as gc_storage
+
+        storage_client = gc_storage.Client(credentials=storage.storage_google_cloud.get_credentials())
+        return storage_client.bucket(storage.storage_google_cloud.bucket_name)
+
+    def delete(self, stored_backup):
+        bucket = self.bucket(stored_backup.storage)
+        if bucket.exists():
+            blob = bucket.blob(stored_backup.storage_file_id)
+            if blob.exists():
+                blob.delete()
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        bucket = self.bucket(stored_backup.storage)
+        if bucket.exists():
+            blob = bucket.blob(stored_backup.storage_file_id)
+            if blob.exists():
+                return blob.generate_signed_url(
+                    version="v4",
+                    expiration=datetime.timedelta(seconds=expires),
+                    method="GET",
+                )
+        return None
+
+    def head(self, stored_backup):
+        blob = self.bucket(stored_backup.storage).get_blob(stored_backup.storage_file_id)
+        return blob.size if blob else None
+
+    def list(self, storage, prefix=""):
+        for blob in self.bucket(storage).list_blobs(prefix=prefix or None):
+            yield blob.name, blob.size
+
+
+class AzureBackend(StorageBackend):
+    def delete(self, stored_backup):
+        azure = stored_backup.storage.storage_azure
+        blob_client = azure.get_client().get_blob_client(
+            container=azure.bucket_name, blob=stored_backup.storage_file_id
+        )
+        blob_client.delete_blob()
+
+    def presign(self, stored_backup, expires=48 * 3600):
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        bucket_name = stored_backup.storage.storage_azure.bucket_name
+        blob_service_client = stored_backup.storage.storage_azure.get_client()
+
+        sas_token = generate_blob_sas(
+            account_name=blob_service_client.account_name,
+            container_name=bucket_name,
+            blob_name=stored_backup.storage_file_id,
+            account_key=blob_service_client.credential.account_key,
+            permission=BlobSasPermissions(read=True, write=False, delete=False),
+            expiry=datetime.datetime.utcnow() + datetime.timedelta(seconds=expires),
+        )
+        return (
+            f"https://{blob_service_client.account_name}.blob.core.windows.net/"
+            f"{bucket_name}/{stored_backup.storage_file_id}?{sas_token}"
+        )
+
+    def head(self, stored_backup):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        azure = stored_backup.storage.storage_azure
+        blob_client = azure.get_client().get_blob_client(
+            container=azure.bucket_name, blob=stored_backup.storage_file_id
+        )
+        try:
+            return blob_client.get_blob_properties().size
+        except ResourceNotFoundError:
+            return None
+
+    def list(self, storage, prefix=""):
+        container = storage.storage_azure.get_client().get_container_client(
+            storage.storage_azure.bucket_name
+        )
+        for blob in container.list_blobs(name_starts_with=prefix or None):
+            yield blob.name, blob.size
+
+
+class AlibabaBackend(StorageBackend):
+    def bucket(self, storage):
+        import oss2
+
+        alibaba = storage.storage_alibaba
+        encryption_key = storage.account.get_encryption_key()
+        auth = oss2.AuthV4(
+            bs_decrypt(alibaba.access_key, encryption_key),
+            bs_decrypt(alibaba.secret_key, encryption_key),
+        )
+        # Signature V4 requires the region ID, e.g. "us-east-1" from endpoint "oss-us-east-1.aliyuncs.com".
+        region_id = alibaba.endpoint.split(".")[0].removeprefix("oss-").removesuffix("-internal")
+        return oss2.Bucket(auth, f"https://{alibaba.endpoint}", alibaba.bucket_name, region=region_id)
+
+    def delete(self, stored_backup):
+        self.bucket(stored_backup.storage).delete_object(stored_backup.storage_file_id)
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        return self.bucket(stored_backup.storage).sign_url(
+            "GET",
+            stored_backup.storage_file_id,
+            expires,
+            headers={"content-disposition": "attachment"},
+            slash_safe=True,
+        )
+
+    def head(self, stored_backup):
+        import oss2
+
+        try:
+            return self.bucket(stored_backup.storage).head_object(stored_backup.storage_file_id).content_length
+        except oss2.exceptions.NotFound:
+            return None
+
+    def list(self, storage, prefix=""):
+        import oss2
+
+        for item in oss2.ObjectIteratorV2(self.bucket(storage), prefix=prefix):
+            yield item.key, item.size
+
+
+class TencentBackend(StorageBackend):
+    def client(self, storage):
+        from qcloud_cos import CosConfig, CosS3Client
+
+        tencent = storage.storage_tencent
+        encryption_key = storage.account.get_encryption_key()
+        config = CosConfig(
+            Region=tencent.region.code,
+            SecretId=bs_decrypt(tencent.access_key, encryption_key),
+            SecretKey=bs_decrypt(tencent.secret_key, encryption_key),
+            Scheme="https",
+        )
+        return CosS3Client(config)
+
+    def delete(self, stored_backup):
+        self.client(stored_backup.storage).delete_object(
+            Bucket=stored_backup.storage.storage_tencent.bucket_name,
+            Key=stored_backup.storage_file_id,
+        )
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        return self.client(stored_backup.storage).get_presigned_url(
+            Method="GET",
+            Bucket=stored_backup.storage.storage_tencent.bucket_name,
+            Key=stored_backup.storage_file_id,
+            Expired=expires,
+        )
+
+    def head(self, stored_backup):
+        from qcloud_cos.cos_exception import CosServiceError
+
+        try:
+            response = self.client(stored_backup.storage).head_object(
+                Bucket=stored_backup.storage.storage_tencent.bucket_name,
+                Key=stored_backup.storage_file_id,
+            )
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return None
+            raise
+        return int(response["Content-Length"])
+
+    def list(self, storage, prefix=""):
+        client = self.client(storage)
+        marker = ""
+        while True:
+            response = client.list_objects(
+                Bucket=storage.storage_tencent.bucket_name, Prefix=prefix, Marker=marker
+            )
+            for item in response.get("Contents", []):
+                yield item["Key"], int(item["Size"])
+            if response.get("IsTruncated") != "true":
+                break
+            marker = response["NextMarker"]
+
+
+class LocalBackend(StorageBackend):
+    dedup = True
+
+    def _target(self, stored_backup):
+        # storage_file_id is the absolute path written by the local upload
+        # backend; only ever touch files inside the storage root.
+        local_root = os.path.realpath(settings.LOCAL_STORAGE_ROOT)
+        target = os.path.realpath(stored_backup.storage_file_id)
+        if target != local_root and not target.startswith(local_root + os.sep):
+            raise ValueError(
+                f"Refusing to delete '{stored_backup.storage_file_id}': "
+                f"outside the local storage root."
+            )
+        return target
+
+    def delete(self, stored_backup):
+        if stored_backup.storage.storage_local.no_delete:
+            return
+        target = self._target(stored_backup)
+        if os.path.exists(target):
+            os.remove(target)
+
+    def presign(self, stored_backup, expires=PRESIGN_EXPIRES):
+        # Local Storage files never leave this server; the download view streams
+        # them through the app (session-authenticated, account-scoped).
+        return f"/api/v1/storage/local/file/{stored_backup.id}/"
+
+    def head(self, stored_backup):
+        target = self._target(stored_backup)
+        return os.path.getsize(target) if os.path.exists(target) else None
+
+    def list(self, storage, prefix=""):
+        root = storage.storage_local.resolve_path()
+        if not os.path.isdir(root):
+            return
+        for entry in os.scandir(root):
+            if entry.is_file() and entry.name.startswith(prefix):
+                yield entry.path, entry.stat().st_size
+
+
+register(AWSS3Backend("aws_s3", storage_aws_s3))
+for _code, _uploader in (
+    ("wasabi", storage_wasabi),
+    ("do_spaces", storage_do_spaces),
+    ("filebase", storage_filebase),
+    ("backblaze_b2", storage_backblaze_b2),
+    ("linode", storage_linode),
+    ("vultr", storage_vultr),
+    ("upcloud", storage_upcloud),
+    ("exoscale", storage_exoscale),
+    ("oracle", storage_oracle),
+    ("scaleway", storage_scaleway),
+    ("cloudflare", storage_cloudflare),
+    ("leviia", storage_leviia),
+    ("idrive", storage_idrive),
+    ("ionos", storage_ionos),
+    ("rackcorp", storage_rackcorp),
+    ("ibm", storage_ibm),
+):
+    register(S3CompatibleBackend(_code, _uploader))
+register(DropboxBackend("dropbox", storage_dropbox))
+register(GoogleDriveBackend("google_drive", storage_google_drive))
+register(PCloudBackend("pcloud", storage_pcloud))
+register(OneDriveBackend("onedrive", storage_onedrive))
+register(GoogleCloudBackend("google_cloud", storage_google_cloud))
+register(AzureBackend("azure", storage_azure))
+register(AlibabaBackend("alibaba", storage_alibaba))
+register(TencentBackend("tencent", storage_tencent))
+register(LocalBackend("local", storage_local))
@@ -0,0 +1,159 @@
+"""Upload sessions that survive storage_upload retries.
+
+storage_upload retries a failed upload up to 96 times. Backends that support
+resumable uploads keep their session on the storage point
+(``stored_backup.metadata["upload_session"]``) so the next attempt continues
+from the last part the provider acknowledged instead of from byte zero:
+
+* S3-compatible: the multipart UploadId; acknowledged parts and their ETags are
+  read back with ListParts (s3_multipart_upload below). storage_upload_fanout
+  records the same session for each destination it streams to.
+* Google Drive / OneDrive: the resumable session URL; the provider reports the
+  next expected byte offset.
+* pCloud: the upload_create upload id; upload_info reports the bytes received.
+
+A session is tied to the local archive's size and mtime, so a rebuilt archive
+never resumes a stale session. It is cleared once the upload completes, and
+StorageBackend.abort_upload drops it when storage_upload gives up.
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from botocore.exceptions import ClientError
+
+SESSION_KEY = "upload_session"
+
+# S3 allows at most 10000 parts per multipart upload.
+MAX_PARTS = 10000
+
+
+def file_fingerprint(local_zip):
+    stat = os.stat(local_zip)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def load_session(stored_backup, kind, fingerprint):
+    """The persisted session of `kind` for this exact archive, or None."""
+    session = (stored_backup.metadata or {}).get(SESSION_KEY)
+    if not session or session.get("kind") != kind:
+        return None
+    if session.get("size") != fingerprint["size"] or session.get("mtime") != fingerprint["mtime"]:
+        return None
+    return session
+
+
+def save_session(stored_backup, kind, fingerprint, **values):
+    metadata = dict(stored_backup.metadata or {})
+    metadata[SESSION_KEY] = {"kind": kind, **fingerprint, **values}
+    stored_backup.metadata = metadata
+    stored_backup.save()
+    return metadata[SESSION_KEY]
+
+
+def clear_session(stored_backup):
+    if stored_backup.metadata and SESSION_KEY in stored_backup.metadata:
+        metadata = dict(stored_backup.metadata)
+        del metadata[SESSION_KEY]
+        stored_backup.metadata = metadata or None
+        stored_backup.save()
+
+
+class Throttle:
+    """Caps the combined rate of every thread calling consume() (bytes/s; None = no cap)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._sent = 0
+
+    def consume(self, size):
+        if not self.rate:
+            return
+        with self._lock:
+            self._sent += size
+            delay = self._started + self._sent / self.rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _acknowledged_parts(client, bucket, key, upload_id):
+    parts = {}
+    kwargs = {"Bucket": bucket, "Key": key, "UploadId": upload_id}
+    while True:
+        response = client.list_parts(**kwargs)
+        for part in response.get("Parts", []):
+            parts[part["PartNumber"]] = {"ETag": part["ETag"], "Size": part["Size"]}
+        if not response.get("IsTruncated"):
+            return parts
+        kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+
+
+def s3_multipart_upload(client, stored_backup, local_zip, bucket, key, extra_args, transfer):
+    """Multipart-upload local_zip to bucket/key, resuming the UploadId persisted
+    on the storage point when there is one. `transfer` (s3_transfer_config)
+    supplies part size, concurrency and bandwidth cap. On failure the
+    multipart upload is left open for the next attempt."""
+    fingerprint = file_fingerprint(local_zip)
+    size = fingerprint["size"]
+    done = {}
+
+    session = load_session(stored_backup, "s3", fingerprint)
+    if session and (session.get("bucket"), session.get("key")) == (bucket, key):
+        try:
+            done = _acknowledged_parts(client, bucket, key, session["upload_id"])
+        except ClientError:
+            # NoSuchUpload: aborted or expired by a lifecycle rule.
+            session = None
+    else:
+        session = None
+
+    if session is None:
+        part_size = max(transfer.multipart_chunksize, -(-size // MAX_PARTS))
+        upload_id = client.create_multipart_upload(Bucket=bucket, Key=key, **extra_args)["UploadId"]
+        session = save_session(
+            stored_backup, "s3", fingerprint,
+            bucket=bucket, key=key, upload_id=upload_id, part_size=part_size,
+        )
+
+    upload_id = session["upload_id"]
+    part_size = session["part_size"]
+    part_count = max(1, -(-size // part_size))
+    # A part is only trusted if it has the size this attempt would upload.
+    expected = {n: min(part_size, size - (n - 1) * part_size) for n in range(1, part_count + 1)}
+    done = {n: p for n, p in done.items() if expected.get(n) == p["Size"]}
+    throttle = Throttle(transfer.max_bandwidth)
+
+    def upload_part(number):
+        with open(local_zip, "rb") as fh:
+            fh.seek((number - 1) * part_size)
+            data = fh.read(part_size)
+        throttle.consume(len(data))
+        response = client.upload_part(
+            Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data,
+        )
+        return {"ETag": response["ETag"], "Size": len(data)}
+
+    pending = [n for n in range(1, part_count + 1) if n not in done]
+    with ThreadPoolExecutor(max_workers=transfer.max_request_concurrency) as pool:
+        futures = {pool.submit(upload_part, n): n for n in pending}
+        finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in finished:
+            if future.exception():
+                for other in futures:
+                    other.cancel()
+                raise future.exception()
+        for future, number in futures.items():
+            done[number] = future.result()
+
+    client.complete_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={
+            "Parts": [{"PartNumber": n, "ETag": done[n]["ETag"]} for n in sorted(done)]
+        },
+    )
+    clear_session(stored_backup)
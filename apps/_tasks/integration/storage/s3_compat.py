@@ -0,0 +1,238 @@
+"""boto3 client factory for the S3-compatible storage backends.
+
+S3_COMPATIBLE mirrors, per storage type code, how the matching storage_<code>
+upload function builds its client (endpoint, region, checksum config) and its
+object key (flat ``{uuid}.zip`` or per-node ``{name_slug}/{uuid}.zip``, below
+the optional prefix). Code that needs to talk to these buckets outside the
+per-backend upload functions goes through s3_client()/s3_object_key() so the
+key layout never drifts from what storage_upload writes.
+
+s3_upload_file() is the upload engine every S3-compatible storage_<code>
+function delegates to. Part size, concurrency and an optional bandwidth cap come
+from the storage (CoreStorage.upload_*) with the S3_UPLOAD_* settings as
+defaults, so a fat link can run many large parts while a small shared host is
+throttled. Multipart uploads resume across retries (see resumable.py).
+"""
+import os
+
+import boto3
+from botocore.client import Config
+from django.conf import settings
+
+from apps._tasks.integration.archive import archive_name
+from apps.api.v1.utils.api_helpers import bs_decrypt
+
+
+def _https(host):
+    # Allow a full URL (e.g. http://minio:9000) for self-hosted endpoints.
+    return host if "://" in host else f"https://{host}"
+
+
+def _region_code(model):
+    return model.region.code if model.region else None
+
+
+# code -> endpoint(model), region(model), node_folder, extra Config kwargs, sdk
+S3_COMPATIBLE = {
+    "aws_s3": {
+        "endpoint": lambda m: None,
+        "region": _region_code,
+        "node_folder": False,
+        "checksums": False,
+    },
+    "wasabi": {
+        "endpoint": lambda m: _https(m.region.endpoint),
+        "node_folder": False,
+        "config": {"connect_timeout": 300, "retries": {"max_attempts": 12}},
+    },
+    "do_spaces": {"endpoint": lambda m: _https(m.region.endpoint), "node_folder": False},
+    "exoscale": {"endpoint": lambda m: _https(m.region.endpoint), "node_folder": False},
+    "filebase": {"endpoint": lambda m: "https://s3.filebase.io", "node_folder": False},
+    "linode": {"endpoint": lambda m: _https(m.endpoint), "node_folder": False},
+    "vultr": {"endpoint": lambda m: _https(m.endpoint), "node_folder": False},
+    "upcloud": {"endpoint": lambda m: _https(m.endpoint), "node_folder": False},
+    "backblaze_b2": {"endpoint": lambda m: _https(m.endpoint), "node_folder": False},
+    "oracle": {
+        "endpoint": lambda m: _https(m.endpoint),
+        "region": _region_code,
+        "node_folder": False,
+    },
+    "scaleway": {
+        "endpoint": lambda m: _https(m.endpoint),
+        "region": _region_code,
+        "node_folder": False,
+    },
+    "cloudflare": {
+        "endpoint": lambda m: _https(m.endpoint),
+        "region": lambda m: "auto",
+        "node_folder": True,
+        "checksums": False,
+    },
+    "leviia": {
+        "endpoint": lambda m: _https(m.endpoint),
+        "region": lambda m: "auto",
+        "node_folder": True,
+    },
+    "idrive": {"endpoint": lambda m: _https(m.endpoint), "node_folder": True},
+    "ionos": {
+        "endpoint": lambda m: _https(m.endpoint),
+        "region": _region_code,
+        "node_folder": True,
+        "config": {"signature_version": "s3v4"},
+    },
+    "rackcorp": {
+        "endpoint": lambda m: _https(m.endpoint),
+        "region": _region_code,
+        "node_folder": True,
+    },
+    "ibm": {
+        "endpoint": lambda m: _https(m.endpoint),
+        "region": _region_code,
+        "node_folder": True,
+        "checksums": False,
+        "sdk": "ibm",
+    },
+}
+
+
+def is_s3_compatible(storage):
+    return storage.type.code in S3_COMPATIBLE
+
+
+def has_upload_tuning(storage):
+    """Whether `storage` overrides the upload defaults (CoreStorage.upload_*).
+    Only s3_upload_file applies them, so such storages stay out of the shared
+    fan-out and streaming uploads."""
+    return bool(
+        storage.upload_part_size_mb
+        or storage.upload_max_concurrency
+        or storage.upload_bandwidth_limit_mbps
+    )
+
+
+def storage_model(storage):
+    """The provider row (storage.storage_<code>) holding credentials and bucket."""
+    return getattr(storage, f"storage_{storage.type.code}")
+
+
+def s3_bucket(storage):
+    return storage_model(storage).bucket_name
+
+
+def s3_object_key(storage, backup):
+    """Object key storage_upload uses for `backup` on `storage` (prefix + file name)."""
+    spec = S3_COMPATIBLE[storage.type.code]
+    if spec["node_folder"]:
+        file_name = f"{backup.node.name_slug}/{archive_name(backup)}"
+    else:
+        file_name = archive_name(backup)
+    prefix = storage_model(storage).prefix
+    if prefix:
+        if not prefix.endswith("/"):
+            prefix += "/"
+        return prefix + file_name
+    return file_name
+
+
+def s3_upload_args(storage, backup):
+    """Extra create/put arguments the storage's upload function sets on the object."""
+    if storage.type.code == "aws_s3":
+        from apps._tasks.integration.storage.aws_s3 import aws_s3_object_args
+
+        return aws_s3_object_args(storage, backup)
+    return {}
+
+
+def s3_client(storage, **config_kwargs):
+    """A boto3 (or ibm_boto3) S3 client configured like the storage's upload function."""
+    spec = S3_COMPATIBLE[storage.type.code]
+    model = storage_model(storage)
+    encryption_key = storage.account.get_encryption_key()
+
+    options = dict(spec.get("config", {}))
+    if spec.get("checksums", True):
+        options.update(
+            request_checksum_calculation="when_required",
+            response_checksum_validation="when_required",
+        )
+    options.update(config_kwargs)
+
+    if spec.get("sdk") == "ibm":
+        import ibm_boto3
+        from ibm_botocore.client import Config as IBMConfig
+
+        session = ibm_boto3.Session(
+            aws_access_key_id=bs_decrypt(model.access_key, encryption_key),
+            aws_secret_access_key=bs_decrypt(model.secret_key, encryption_key),
+        )
+        config = IBMConfig(**options)
+    else:
+        session = boto3.Session(
+            aws_access_key_id=bs_decrypt(model.access_key, encryption_key),
+            aws_secret_access_key=bs_decrypt(model.secret_key, encryption_key),
+        )
+        config = Config(**options)
+
+    region = spec.get("region")
+    return session.client(
+        "s3",
+        endpoint_url=spec["endpoint"](model),
+        region_name=region(model) if region else None,
+        config=config,
+    )
+
+
+def s3_transfer_config(storage):
+    """TransferConfig for `storage`: CoreStorage.upload_* overrides, else settings."""
+    if S3_COMPATIBLE[storage.type.code].get("sdk") == "ibm":
+        from ibm_boto3.s3.transfer import TransferConfig
+    else:
+        from boto3.s3.transfer import TransferConfig
+
+    part_size = (
+        storage.upload_part_size_mb * 1024 * 1024
+        if storage.upload_part_size_mb
+        else settings.S3_UPLOAD_PART_SIZE
+    )
+    options = {
+        "multipart_threshold": part_size,
+        "multipart_chunksize": part_size,
+        "max_concurrency": storage.upload_max_concurrency or settings.S3_UPLOAD_MAX_CONCURRENCY,
+    }
+    if storage.upload_bandwidth_limit_mbps:
+        # Mbit/s -> bytes/s
+        options["max_bandwidth"] = storage.upload_bandwidth_limit_mbps * 125000
+    return TransferConfig(**options)
+
+
+def s3_upload_file(stored_backup, local_zip=None):
+    """Upload the backup zip to an S3-compatible storage point and mark it
+    UPLOAD_COMPLETE. Archives above one part go through the resumable multipart
+    engine, so a retried upload continues where the last attempt stopped.
+    Errors propagate to the calling storage_<code> function."""
+    from apps._tasks.integration.storage.resumable import s3_multipart_upload
+
+    storage = stored_backup.storage
+    backup = stored_backup.backup
+    local_zip = local_zip or f"_storage/{backup.uuid}.zip"
+    transfer = s3_transfer_config(storage)
+    # One pooled connection per concurrent part (botocore keeps 10 by default).
+    client = s3_client(storage, max_pool_connections=max(10, transfer.max_request_concurrency))
+    file_key = s3_object_key(storage, backup)
+    extra_args = s3_upload_args(storage, backup)
+
+    if os.path.getsize(local_zip) > transfer.multipart_threshold:
+        s3_multipart_upload(
+            client, stored_backup, local_zip, s3_bucket(storage), file_key, extra_args, transfer
+        )
+    else:
+        client.upload_file(
+            local_zip,
+            s3_bucket(storage),
+            file_key,
+            ExtraArgs=extra_args or None,
+            Config=transfer,
+        )
+    stored_backup.storage_file_id = file_key
+    stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
+    stored_backup.save()
@@ -0,0 +1,423 @@
+"""Streaming dump-to-storage pipeline (CoreDatabase.option_stream_upload).
+
+The classic path materializes every database backup twice on the worker
+(``_storage/{uuid}/*.sql``, then ``_storage/{uuid}.zip``) before storage_upload
+reads it back. In streaming mode the engines write each dump straight into a
+zip stream instead: the stream is cut into multipart-upload parts which are
+sent to every destination while the dump is still running, so nothing but the
+in-flight parts ever exists locally and the upload overlaps with the dump.
+
+The archive layout is the same as the on-disk zip (one ``{name}.sql`` member
+per database/table, Zip64, deflate); members carry data descriptors because
+the stream is not seekable, which every zip reader -- including
+restore_common.extract_backup_zip -- handles. Each part is read once and
+shared by all destinations; a destination whose upload fails is aborted and
+marked UPLOAD_FAILED without affecting the others.
+
+The same machinery uploads an existing ``_storage/{uuid}.zip`` to several
+S3-compatible destinations with one sequential read (fan_out_file, used by
+the storage_upload_fanout task) instead of one full read per destination.
+There the parts have one fixed size and every destination's UploadId is
+persisted as its resumable session (resumable.py): a destination that fails
+keeps its multipart upload open, and the retry continues it through
+resume_file_uploads instead of starting again from byte zero.
+
+Only S3-compatible destinations (s3_compat.S3_COMPATIBLE) without their own
+upload tuning or a dedup repository accept a stream, and only zip archives are
+streamed. When streaming is not enabled, the
+schedule archives as tar.zst, or any selected destination cannot take a
+stream, open_streaming_archive() returns None and the engine keeps the
+on-disk path.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from sentry_sdk import capture_exception
+
+from apps._tasks.integration.archive import ZIP, archive_format
+from apps._tasks.integration.storage.resumable import clear_session, file_fingerprint, save_session
+from apps._tasks.integration.storage.s3_compat import (
+    has_upload_tuning,
+    is_s3_compatible,
+    s3_bucket,
+    s3_client,
+    s3_object_key,
+    s3_upload_args,
+    s3_upload_file,
+)
+
+# S3 allows at most 10000 parts per upload, so the part size doubles every
+# PARTS_PER_STEP parts: 64 MiB parts cover ~64 TiB before the cap.
+PARTS_PER_STEP = 1000
+MAX_PARTS = 10000
+READ_SIZE = 1024 * 1024
+
+
+class StreamingUploadError(Exception):
+    """Every destination of a streaming upload failed."""
+
+
+class MultipartDestination:
+    """One storage point receiving the stream as an S3 multipart upload."""
+
+    def __init__(self, stored_backup, client=None):
+        storage = stored_backup.storage
+        self.stored_backup = stored_backup
+        self.client = client or s3_client(storage)
+        self.bucket = s3_bucket(storage)
+        self.key = s3_object_key(storage, stored_backup.backup)
+        self.extra_args = s3_upload_args(storage, stored_backup.backup)
+        self.upload_id = None
+        self.parts = []
+        self.error = None
+
+    def start(self):
+        response = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=self.key, **self.extra_args
+        )
+        self.upload_id = response["UploadId"]
+
+    def upload_part(self, number, data):
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=data,
+        )
+        self.parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    def complete(self):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": sorted(self.parts, key=lambda p: p["PartNumber"])},
+        )
+
+    def abort(self):
+        if not self.upload_id:
+            return
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+        except Exception as e:
+            capture_exception(e)
+
+
+class StreamingUpload:
+    """Write-only, non-seekable file object that fans its bytes out as multipart
+    parts to every live destination. At most `max_inflight` parts are buffered
+    or uploading at once, which bounds memory to (max_inflight + 1) parts and
+    applies back-pressure to the writer (and so to the dump process)."""
+
+    def __init__(self, destinations, part_size=None, max_inflight=None, *, grow=True, keep_failed=False):
+        self.destinations = list(destinations)
+        self.part_size = part_size or settings.STREAM_UPLOAD_PART_SIZE
+        self.max_inflight = max_inflight or settings.STREAM_UPLOAD_MAX_INFLIGHT
+        # grow: double the part size every PARTS_PER_STEP parts (streams of
+        # unknown length). keep_failed: leave a failed destination's multipart
+        # upload open for a resumed retry instead of aborting it.
+        self.grow = grow
+        self.keep_failed = keep_failed
+        self._buffer = bytearray()
+        self._position = 0
+        self._part_number = 0
+        self._pending = deque()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, len(self.destinations) * self.max_inflight)
+        )
+        for destination in self.destinations:
+            try:
+                destination.start()
+            except Exception as e:
+                destination.error = e
+        self._check_alive()
+
+    @property
+    def live_destinations(self):
+        return [d for d in self.destinations if d.error is None]
+
+    def _check_alive(self):
+        if not self.live_destinations:
+            errors = "; ".join(str(d.error) for d in self.destinations)
+            raise StreamingUploadError(f"streaming upload failed on every destination: {errors}")
+
+    def _current_part_size(self):
+        if not self.grow:
+            return self.part_size
+        return self.part_size * 2 ** (self._part_number // PARTS_PER_STEP)
+
+    def _fail(self, destination, error):
+        destination.error = error
+        if not self.keep_failed:
+            destination.abort()
+
+    def _settle(self, futures):
+        for destination, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self._fail(destination, e)
+        self._check_alive()
+
+    def _submit(self, data):
+        self._part_number += 1
+        if self._part_number > MAX_PARTS:
+            raise StreamingUploadError("streaming upload exceeded the multipart part limit.")
+        futures = [
+            (d, self._pool.submit(d.upload_part, self._part_number, data))
+            for d in self.live_destinations
+        ]
+        self._pending.append(futures)
+        while len(self._pending) >= self.max_inflight:
+            self._settle(self._pending.popleft())
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        size = self._current_part_size()
+        while len(self._buffer) >= size:
+            self._submit(bytes(self._buffer[:size]))
+            del self._buffer[:size]
+            size = self._current_part_size()
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """Upload the tail part and complete every live destination; returns
+        the total stream size in bytes."""
+        try:
+            if self._buffer or self._part_number == 0:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._settle(self._pending.popleft())
+            for destination in self.live_destinations:
+                try:
+                    destination.complete()
+                except Exception as e:
+                    self._fail(destination, e)
+            self._check_alive()
+        finally:
+            self._pool.shutdown(wait=True)
+        return self._position
+
+    def abort(self):
+        for futures in self._pending:
+            for _destination, future in futures:
+                future.cancel()
+        self._pending.clear()
+        self._pool.shutdown(wait=True)
+        for destination in self.destinations:
+            if destination.error is None:
+                destination.abort()
+
+
+class StreamingArchive:
+    """Zip archive written straight into a StreamingUpload; the streaming
+    counterpart of ``zipfile.ZipFile(_storage/{uuid}.zip)`` + zipdir."""
+
+    def __init__(self, upload):
+        self.upload = upload
+        self.members = []
+        self.zipf = zipfile.ZipFile(upload, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    def member(self, name, stored=False):
+        """Writable zip member; sizes are unknown up front, so always Zip64.
+        stored members (already compressed data) skip deflate."""
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+        return self.zipf.open(info, "w", force_zip64=True)
+
+    def copy_stream(self, name, read, stored=False):
+        """Copy read(n) chunks into member `name`; returns the bytes written."""
+        written = 0
+        with self.member(name, stored=stored) as out:
+            while True:
+                chunk = read(READ_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                written += len(chunk)
+        self.members.append((name, written))
+        return written
+
+    def dump_command(self, argv, name, *, timeout, env=None):
+        """Run argv with stdout streamed into member `name`.
+
+        Returns (returncode, stderr bytes, bytes written). stderr goes to an
+        anonymous temp file so a chatty process can never dead-lock the pipe.
+        Raises subprocess.TimeoutExpired when the process is still running
+        after `timeout` seconds -- a watchdog kills it even while it holds
+        stdout open without writing.
+        """
+        with tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=err, env=env)
+            timed_out = threading.Event()
+
+            def expire():
+                timed_out.set()
+                proc.kill()
+
+            watchdog = threading.Timer(timeout, expire)
+            watchdog.daemon = True
+            watchdog.start()
+            try:
+                written = self.copy_stream(name, proc.stdout.read)
+                returncode = proc.wait()
+            except BaseException:
+                proc.kill()
+                proc.wait()
+                raise
+            finally:
+                watchdog.cancel()
+                proc.stdout.close()
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(argv, timeout)
+            err.seek(0)
+            return returncode, err.read(), written
+
+    def close(self):
+        """Finish the zip, complete the uploads and record the outcome on every
+        storage point. Returns the archive size in bytes."""
+        self.zipf.close()
+        size = self.upload.close()
+        for destination in self.upload.destinations:
+            stored_backup = destination.stored_backup
+            if destination.error is None:
+                stored_backup.storage_file_id = destination.key
+                stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
+            else:
+                stored_backup.status = stored_backup.Status.UPLOAD_FAILED
+            stored_backup.save()
+        return size
+
+    def abort(self):
+        self.upload.abort()
+        for destination in self.upload.destinations:
+            destination.stored_backup.status = destination.stored_backup.Status.UPLOAD_FAILED
+            destination.stored_backup.save()
+
+
+def fan_out_file(local_zip, stored_backups):
+    """Upload local_zip to every storage point in one pass over the file.
+
+    Returns the MultipartDestination list; a destination whose upload failed
+    carries the exception in .error (all of them may have failed) and keeps
+    its multipart upload and session for resume_file_uploads, a completed one
+    has its point's storage_file_id set (not saved). Raises FileNotFoundError
+    before any upload is started when local_zip is missing.
+    """
+    fingerprint = file_fingerprint(local_zip)
+    # One part size throughout, as s3_multipart_upload resumes with.
+    part_size = max(settings.STREAM_UPLOAD_PART_SIZE, -(-fingerprint["size"] // MAX_PARTS))
+    with open(local_zip, "rb") as fh:
+        destinations = [MultipartDestination(p) for p in stored_backups]
+        try:
+            upload = StreamingUpload(destinations, part_size=part_size, grow=False, keep_failed=True)
+        except StreamingUploadError:
+            return destinations
+        for destination in upload.live_destinations:
+            save_session(
+                destination.stored_backup, "s3", fingerprint,
+                bucket=destination.bucket, key=destination.key,
+                upload_id=destination.upload_id, part_size=part_size,
+            )
+        try:
+            shutil.copyfileobj(fh, upload, READ_SIZE)
+            upload.close()
+        except StreamingUploadError:
+            pass
+        except BaseException:
+            upload.abort()
+            raise
+    for destination in destinations:
+        if destination.error is None:
+            destination.stored_backup.storage_file_id = destination.key
+            clear_session(destination.stored_backup)
+    return destinations
+
+
+def resume_file_uploads(local_zip, stored_backups):
+    """Retry fan_out_file's failed destinations one by one through
+    s3_upload_file, which continues each point's persisted multipart upload
+    (ListParts) rather than re-sending acknowledged parts. Returns
+    [(stored backup, error or None)]; s3_upload_file marks the completed ones.
+    Raises FileNotFoundError when local_zip is missing."""
+    if not os.path.exists(local_zip):
+        raise FileNotFoundError(f"{local_zip} does not exist.")
+    results = []
+    for stored_backup in stored_backups:
+        try:
+            s3_upload_file(stored_backup, local_zip)
+        except Exception as e:
+            results.append((stored_backup, e))
+        else:
+            results.append((stored_backup, None))
+    return results
+
+
+def streaming_destinations(backup):
+    """Storage points of `backup` waiting for upload, or None when any of them
+    cannot take a stream (the whole backup then uses the on-disk path): it is
+    not S3-compatible, it has its own upload tuning, which only s3_upload_file
+    applies (the stream sends the same parts everywhere), or it holds a dedup
+    repository, which storage_dedup fills from the local archive."""
+    points = list(
+        backup.stored_database_backups.filter(
+            status=backup.stored_database_backups.model.Status.UPLOAD_READY
+        ).select_related("storage__type")
+    )
+    if not points or not all(
+        is_s3_compatible(p.storage)
+        and not has_upload_tuning(p.storage)
+        and not p.storage.dedup_repository
+        for p in points
+    ):
+        return None
+    return points
+
+
+def open_streaming_archive(backup, log_file):
+    """Start a StreamingArchive for a database backup when its node opted in
+    (option_stream_upload), its schedule archives as zip and every destination
+    can take a stream (streaming_destinations); else None."""
+    if not backup.database.option_stream_upload:
+        return None
+    if archive_format(backup) != ZIP:
+        log_file.write("Streaming upload: skipped, streaming writes zip only; using local archive.\n")
+        return None
+    points = streaming_destinations(backup)
+    if points is None:
+        log_file.write(
+            "Streaming upload: skipped, a destination is not S3-compatible, has its own "
+            "upload tuning or holds a dedup repository; using local archive.\n"
+        )
+        return None
+    for point in points:
+        point.status = point.Status.UPLOAD_IN_PROGRESS
+        point.save()
+    try:
+        upload = StreamingUpload([MultipartDestination(p) for p in points])
+    except Exception:
+        for point in points:
+            point.status = point.Status.UPLOAD_FAILED
+            point.save()
+        raise
+    log_file.write(f"Streaming upload: {len(points)} destination(s)\n")
+    return StreamingArchive(upload)
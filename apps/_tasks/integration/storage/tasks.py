@@ -3,7 +3,7 @@ import time
 from billiard.exceptions import SoftTimeLimitExceeded
 from boto3.exceptions import S3UploadFailedError
 from celery import current_app
-from celery.exceptions import MaxRetriesExceededError
+from celery.exceptions import MaxRetriesExceededError, Retry
 from django.db.models import Q
 from sentry_sdk import capture_exception, capture_message
 
@@ -12,55 +12,14 @@ from apps._tasks.exceptions import (
     NodeGoogleDriveNotEnoughStorageError,
     NodeDropboxNotEnoughStorageError,
     NodeDropboxFileIDMissingError,
-    NodeAWSS3UploadFailedError,
-    NodeDropboxUploadFailedError,
-    NodeBackupSheepUploadFailedError,
     NodeDigitalOceanSpacesBucketDeletedError,
     NodeDropboxTokenExpiredError,
     NodeDigitalOceanSpacesNoSuchBucketError,
     StorageFilebaseQuotaExceededError,
 )
-from apps._tasks.integration.storage.alibaba import storage_alibaba
-from apps._tasks.integration.storage.aws_s3 import (
-    storage_aws_s3,
-)
-from apps._tasks.integration.storage.azure import storage_azure
-from apps._tasks.integration.storage.backblaze_b2 import (
-    storage_backblaze_b2,
-)
-from apps._tasks.integration.storage.cloudflare import storage_cloudflare
-from apps._tasks.integration.storage.do_spaces import (
-    storage_do_spaces,
-    storage_do_spaces_delete,
-)
-from apps._tasks.integration.storage.dropbox import (
-    storage_dropbox,
-)
-from apps._tasks.integration.storage.exoscale import storage_exoscale
-from apps._tasks.integration.storage.google_cloud import storage_google_cloud
-from apps._tasks.integration.storage.ibm import storage_ibm
-from apps._tasks.integration.storage.idrive import storage_idrive
-from apps._tasks.integration.storage.ionos import storage_ionos
-from apps._tasks.integration.storage.leviia import storage_leviia
-from apps._tasks.integration.storage.onedrive import storage_onedrive
-from apps._tasks.integration.storage.oracle import storage_oracle
-from apps._tasks.integration.storage.filebase import storage_filebase
-from apps._tasks.integration.storage.google_drive import (
-    storage_google_drive,
-    storage_google_drive_delete,
-)
-from apps._tasks.integration.storage.linode import storage_linode
-from apps._tasks.integration.storage.local import storage_local
-from apps._tasks.integration.storage.pcloud import storage_pcloud
-from apps._tasks.integration.storage.rackcorp import storage_rackcorp
-from apps._tasks.integration.storage.scaleway import storage_scaleway
-from apps._tasks.integration.storage.tencent import storage_tencent
-from apps._tasks.integration.storage.upcloud import storage_upcloud
-from apps._tasks.integration.storage.vultr import storage_vultr
-from apps._tasks.integration.storage.wasabi import (
-    storage_wasabi,
-    storage_wasabi_delete,
-)
+from apps._tasks.integration.storage.registry import get_backend
+from apps._tasks.integration.storage.s3_compat import has_upload_tuning, is_s3_compatible
+from apps._tasks.integration.storage.streaming import fan_out_file, resume_file_uploads
 from apps.console.backup.models import (
     CoreWebsiteBackup,
     CoreDatabaseBackup,
@@ -72,6 +31,41 @@ from apps.console.storage.models import CoreStorage
 from apps.console.utils.models import UtilBackup
 
 
+# Upload errors that fail the storage point right away (no retry), in match
+# order, with the storage point status each one maps to.
+UPLOAD_FAILURE_STATUS = (
+    (NodeGoogleDriveNotEnoughStorageError, "UPLOAD_FAILED_STORAGE_LIMIT"),
+    (NodeDigitalOceanSpacesBucketDeletedError, "UPLOAD_FAILED_STORAGE_LIMIT"),
+    (NodeDigitalOceanSpacesNoSuchBucketError, "UPLOAD_FAILED_STORAGE_LIMIT"),
+    (NodeDropboxNotEnoughStorageError, "UPLOAD_FAILED_STORAGE_LIMIT"),
+    (StorageFilebaseQuotaExceededError, "UPLOAD_FAILED_STORAGE_LIMIT"),
+    (NodeDropboxTokenExpiredError, "UPLOAD_FAILED_STORAGE_LIMIT"),
+    (NodeDropboxFileIDMissingError, "UPLOAD_FAILED"),
+    # An error occurred (NoSuchBucket) when calling the
+    # CreateMultipartUpload operation: The specified bucket does not exist
+    (S3UploadFailedError, "UPLOAD_FAILED"),
+    (SoftTimeLimitExceeded, "UPLOAD_TIME_LIMIT_REACHED"),
+)
+UPLOAD_FAILURES = tuple(error for error, _status in UPLOAD_FAILURE_STATUS)
+
+
+def upload_failure_status(stored_backup, error):
+    for error_class, status in UPLOAD_FAILURE_STATUS:
+        if isinstance(error, error_class):
+            return getattr(stored_backup.Status, status)
+    return stored_backup.Status.UPLOAD_FAILED
+
+
+def _abort_upload(stored_backup):
+    """Abort the storage point's open resumable upload, if any."""
+    try:
+        backend = get_backend(stored_backup.storage.type.code)
+        if backend:
+            backend.abort_upload(stored_backup)
+    except Exception as e:
+        capture_exception(e)
+
+
 @current_app.task(
     name="storage_upload",
     track_started=True,
@@ -116,58 +110,13 @@ def storage_upload(self, node_id, backup_id, stored_backup_id):
         stored_backup.celery_task_id = self.request.id
         stored_backup.save()
 
-        if stored_backup.storage.type.code == "dropbox":
-            storage_dropbox(stored_backup)
-        elif stored_backup.storage.type.code == "google_drive":
-            storage_google_drive(stored_backup)
-        elif stored_backup.storage.type.code == "aws_s3":
-            storage_aws_s3(stored_backup)
-        elif stored_backup.storage.type.code == "wasabi":
-            storage_wasabi(stored_backup)
-        elif stored_backup.storage.type.code == "do_spaces":
-            storage_do_spaces(stored_backup)
-        elif stored_backup.storage.type.code == "filebase":
-            storage_filebase(stored_backup)
-        elif stored_backup.storage.type.code == "backblaze_b2":
-            storage_backblaze_b2(stored_backup)
-        elif stored_backup.storage.type.code == "linode":
-            storage_linode(stored_backup)
-        elif stored_backup.storage.type.code == "vultr":
-            storage_vultr(stored_backup)
-        elif stored_backup.storage.type.code == "upcloud":
-            storage_upcloud(stored_backup)
-        elif stored_backup.storage.type.code == "exoscale":
-            storage_exoscale(stored_backup)
-        elif stored_backup.storage.type.code == "oracle":
-            storage_oracle(stored_backup)
-        elif stored_backup.storage.type.code == "scaleway":
-            storage_scaleway(stored_backup)
-        elif stored_backup.storage.type.code == "pcloud":
-            storage_pcloud(stored_backup)
-        elif stored_backup.storage.type.code == "onedrive":
-            storage_onedrive(stored_backup)
-        elif stored_backup.storage.type.code == "cloudflare":
-            storage_cloudflare(stored_backup)
-        elif stored_backup.storage.type.code == "google_cloud":
-            storage_google_cloud(stored_backup)
-        elif stored_backup.storage.type.code == "azure":
-            storage_azure(stored_backup)
-        elif stored_backup.storage.type.code == "leviia":
-            storage_leviia(stored_backup)
-        elif stored_backup.storage.type.code == "idrive":
-            storage_idrive(stored_backup)
-        elif stored_backup.storage.type.code == "ionos":
-            storage_ionos(stored_backup)
-        elif stored_backup.storage.type.code == "alibaba":
-            storage_alibaba(stored_backup)
-        elif stored_backup.storage.type.code == "tencent":
-            storage_tencent(stored_backup)
-        elif stored_backup.storage.type.code == "rackcorp":
-            storage_rackcorp(stored_backup)
-        elif stored_backup.storage.type.code == "ibm":
-            storage_ibm(stored_backup)
-        elif stored_backup.storage.type.code == "local":
-            storage_local(stored_backup)
+        backend = get_backend(stored_backup.storage.type.code)
+        if backend:
+            started = time.monotonic()
+            backend.upload(stored_backup)
+            log_file.write(
+                f"{storage_type_name}: Upload took {time.monotonic() - started:.1f}s \n"
+            )
         else:
             stored_backup.status = stored_backup.Status.UPLOAD_FAILED
             stored_backup.save()
@@ -182,83 +131,10 @@ def storage_upload(self, node_id, backup_id, stored_backup_id):
         # after every upload finishes.
         log_file.write(f"{storage_type_name}: {stored_backup.get_status_display()} \n")
 
-    except NodeGoogleDriveNotEnoughStorageError as e:
-        node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_FAILED_STORAGE_LIMIT
-        stored_backup.save()
-        node.connection.account.create_storage_log(
-            e.__str__(), node, backup, stored_backup.storage
-        )
-        log_file.write(f"Error: {e.__str__()} \n")
-    except NodeDigitalOceanSpacesBucketDeletedError as e:
-        node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_FAILED_STORAGE_LIMIT
-        stored_backup.save()
-        node.connection.account.create_storage_log(
-            e.__str__(), node, backup, stored_backup.storage
-        )
-        log_file.write(f"Error: {e.__str__()} \n")
-    except NodeDigitalOceanSpacesNoSuchBucketError as e:
-        node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_FAILED_STORAGE_LIMIT
-        stored_backup.save()
-        node.connection.account.create_storage_log(
-            e.__str__(), node, backup, stored_backup.storage
-        )
-        log_file.write(f"Error: {e.__str__()} \n")
-    except NodeDropboxNotEnoughStorageError as e:
-        node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_FAILED_STORAGE_LIMIT
-        stored_backup.save()
-        node.connection.account.create_storage_log(
-            e.__str__(), node, backup, stored_backup.storage
-        )
-        log_file.write(f"Error: {e.__str__()} \n")
-    except StorageFilebaseQuotaExceededError as e:
-        node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_FAILED_STORAGE_LIMIT
-        stored_backup.save()
-        node.connection.account.create_storage_log(
-            e.__str__(), node, backup, stored_backup.storage
-        )
-        log_file.write(f"Error: {e.__str__()} \n")
-    except NodeDropboxTokenExpiredError as e:
-        node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_FAILED_STORAGE_LIMIT
-        stored_backup.save()
-        node.connection.account.create_storage_log(
-            e.__str__(), node, backup, stored_backup.storage
-        )
-        log_file.write(f"Error: {e.__str__()} \n")
-    except NodeDropboxFileIDMissingError as e:
-        node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_FAILED
-        stored_backup.save()
-        node.connection.account.create_storage_log(
-            e.__str__(), node, backup, stored_backup.storage
-        )
-        log_file.write(f"Error: {e.__str__()} \n")
-    #    An error occurred (NoSuchBucket) when calling the
-    #    CreateMultipartUpload operation: The specified bucket does not exist
-    except S3UploadFailedError as e:
-        node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_FAILED
-        stored_backup.save()
-        node.connection.account.create_storage_log(
-            e.__str__(), node, backup, stored_backup.storage
-        )
-        log_file.write(f"Error: {e.__str__()} \n")
-
-    # #     An error occurred (InvalidAccessKeyId) when calling the
-    # PutObject operation: The AWS Access Key Id you provided does not exist in our records.
-    # except NodeAWSS3UploadFailedError as e:
-    #     node.notify_upload_fail(e, backup, stored_backup.storage)
-    #     stored_backup.status = stored_backup.Status.UPLOAD_FAILED
-    #     stored_backup.save()
-    #     node.connection.account.create_storage_log(e, node, backup, stored_backup.storage)
-    except SoftTimeLimitExceeded as e:
+    except UPLOAD_FAILURES as e:
+        # Quota, missing bucket, revoked token, time limit: retrying cannot help.
         node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
-        stored_backup.status = stored_backup.Status.UPLOAD_TIME_LIMIT_REACHED
+        stored_backup.status = upload_failure_status(stored_backup, e)
         stored_backup.save()
         node.connection.account.create_storage_log(
             e.__str__(), node, backup, stored_backup.storage
@@ -295,6 +171,161 @@ def storage_upload(self, node_id, backup_id, stored_backup_id):
                 stored_backup.status = stored_backup.Status.UPLOAD_FAILED
                 stored_backup.save()
                 log_file.write(f"Error: Giving up after max retries \n")
+                _abort_upload(stored_backup)
+    finally:
+        log_file.close()
+
+
+def upload_signatures(node_id, backup_id, stored_backups):
+    """Chord header uploading `backup` to `stored_backups` (storage points ready
+    for upload). Two or more S3-compatible points share one storage_upload_fanout
+    task, so the archive is read from disk once for all of them; every other
+    point keeps its own storage_upload task. Storages with their own upload
+    tuning (part size, concurrency or a bandwidth cap) stay on storage_upload,
+    where s3_upload_file applies it -- the fan-out sends the same parts to every
+    destination -- and so do storages holding a dedup repository (storage.dedup)."""
+    stored_backups = list(stored_backups)
+    fan_out_ids = [
+        p.id for p in stored_backups
+        if is_s3_compatible(p.storage)
+        and not has_upload_tuning(p.storage)
+        and not p.storage.dedup_repository
+    ]
+    if len(fan_out_ids) < 2:
+        fan_out_ids = []
+
+    signatures = [
+        storage_upload.s(node_id, backup_id, p.id).set()
+        for p in stored_backups
+        if p.id not in fan_out_ids
+    ]
+    if fan_out_ids:
+        signatures.append(storage_upload_fanout.s(node_id, backup_id, fan_out_ids).set())
+    return signatures
+
+
+def _get_backup(node, backup_id):
+    """(backup, storage points manager) for a file-based node's backup id."""
+    if node.type == CoreNode.Type.WEBSITE:
+        backup = CoreWebsiteBackup.objects.get(id=backup_id)
+        return backup, backup.stored_website_backups
+    elif node.type == CoreNode.Type.DATABASE:
+        backup = CoreDatabaseBackup.objects.get(id=backup_id)
+        return backup, backup.stored_database_backups
+    elif node.type == CoreNode.Type.SAAS:
+        if node.connection.integration.code == "wordpress":
+            backup = CoreWordPressBackup.objects.get(id=backup_id)
+            return backup, backup.stored_wordpress_backups
+        elif node.connection.integration.code == "basecamp":
+            backup = CoreBasecampBackup.objects.get(id=backup_id)
+            return backup, backup.stored_basecamp_backups
+    raise TaskParamsNotProvided()
+
+
+@current_app.task(
+    name="storage_upload_fanout",
+    track_started=True,
+    bind=True,
+    default_retry_delay=900,
+    max_retries=96,
+    time_limit=(48 * 3600),
+    soft_time_limit=(48 * 3600),
+)
+def storage_upload_fanout(self, node_id, backup_id, stored_backup_ids):
+    """Upload one backup zip to several S3-compatible storage points with a single
+    read of _storage/{uuid}.zip (see storage.streaming.fan_out_file).
+
+    Destinations succeed or fail independently: completed points are marked
+    UPLOAD_COMPLETE right away and the task retries with only the failed ones.
+    A failed point keeps its multipart upload open, so the retries continue it
+    one point at a time (storage.streaming.resume_file_uploads) instead of
+    sending the whole archive again.
+    """
+    node = CoreNode.objects.get(id=node_id)
+    attempt_no = self.request.retries + 1
+    backup, points = _get_backup(node, backup_id)
+    stored_backups = list(points.filter(id__in=stored_backup_ids).select_related("storage__type"))
+
+    log_file_path = f"_storage/{backup.uuid_str}.log"
+    log_file = open(log_file_path, "a+")
+    names = ", ".join(p.storage.name for p in stored_backups)
+    log_file.write(f"Storage (fan-out): Starting Upload to {names} \n")
+    log_file.write(f"Storage (fan-out): Attempt Number: {attempt_no} \n")
+
+    try:
+        for stored_backup in stored_backups:
+            stored_backup.status = stored_backup.Status.UPLOAD_IN_PROGRESS
+            stored_backup.celery_task_id = self.request.id
+            stored_backup.save()
+
+        local_zip = f"_storage/{backup.uuid}.zip"
+        if self.request.retries == 0:
+            results = [(d.stored_backup, d.error) for d in fan_out_file(local_zip, stored_backups)]
+        else:
+            results = resume_file_uploads(local_zip, stored_backups)
+
+        failed = []
+        for stored_backup, error in results:
+            storage_type_name = f"Storage ({stored_backup.storage.type.name})"
+            if error is None:
+                stored_backup.status = stored_backup.Status.UPLOAD_COMPLETE
+                stored_backup.save()
+                # An archive below the multipart threshold is re-sent whole;
+                # drop the multipart upload the fan-out left open for it.
+                _abort_upload(stored_backup)
+            else:
+                capture_exception(error)
+                if attempt_no <= 3:
+                    node.notify_upload_fail(error.__str__(), backup, stored_backup.storage)
+                stored_backup.status = stored_backup.Status.UPLOAD_RETRY
+                stored_backup.save()
+                node.connection.account.create_storage_log(
+                    error.__str__(), node, backup, stored_backup.storage
+                )
+                log_file.write(f"{storage_type_name}: Error: {error.__str__()} \n")
+                failed.append(stored_backup)
+            log_file.write(f"{storage_type_name}: {stored_backup.get_status_display()} \n")
+
+        if failed:
+            try:
+                raise self.retry(args=[node_id, backup_id, [p.id for p in failed]])
+            except MaxRetriesExceededError:
+                for stored_backup in failed:
+                    stored_backup.status = stored_backup.Status.UPLOAD_FAILED
+                    stored_backup.save()
+                    _abort_upload(stored_backup)
+                log_file.write(f"Error: Giving up after max retries \n")
+    except FileNotFoundError as e:
+        for stored_backup in stored_backups:
+            stored_backup.status = stored_backup.Status.UPLOAD_FAILED_FILE_NOT_FOUND
+            stored_backup.save()
+        log_file.write(f"Error (not retryable): {e.__str__()} \n")
+    except SoftTimeLimitExceeded as e:
+        for stored_backup in stored_backups:
+            if stored_backup.status != stored_backup.Status.UPLOAD_COMPLETE:
+                node.notify_upload_fail(e.__str__(), backup, stored_backup.storage)
+                stored_backup.status = stored_backup.Status.UPLOAD_TIME_LIMIT_REACHED
+                stored_backup.save()
+        log_file.write(f"Error: {e.__str__()} \n")
+    except Retry:
+        raise
+    except Exception as e:
+        capture_exception(e)
+        pending = [
+            p for p in stored_backups if p.status != p.Status.UPLOAD_COMPLETE
+        ]
+        for stored_backup in pending:
+            stored_backup.status = stored_backup.Status.UPLOAD_RETRY
+            stored_backup.save()
+        log_file.write(f"Error: {e.__str__()} \n")
+        try:
+            raise self.retry(args=[node_id, backup_id, [p.id for p in pending]])
+        except MaxRetriesExceededError:
+            for stored_backup in pending:
+                stored_backup.status = stored_backup.Status.UPLOAD_FAILED
+                stored_backup.save()
+                _abort_upload(stored_backup)
+            log_file.write(f"Error: Giving up after max retries \n")
     finally:
         log_file.close()
 
@@ -314,6 +345,7 @@ def finalize_backup(self, node_id, backup_id):
     Marking completion here (instead of inside each parallel storage_upload) removes
     the previous race conditions and the false "complete on first success".
     """
+    from apps._tasks.helper.retention import apply_retention
     from apps._tasks.helper.tasks import delete_from_disk
 
     node = CoreNode.objects.get(id=node_id)
@@ -341,17 +373,9 @@ def finalize_backup(self, node_id, backup_id):
                 node.notify_backup_success(backup)
 
                 # Retention: keep only the newest `keep_last` completed backups of
-                # this schedule (applies to every file-based node type, incl. basecamp).
-                if backup.schedule and (backup.schedule.keep_last or 0) > 0:
-                    keep_last = backup.schedule.keep_last
-                    completed = list(
-                        backup.__class__.objects.filter(
-                            schedule=backup.schedule,
-                            status=UtilBackup.Status.COMPLETE,
-                        ).order_by("created")
-                    )
-                    for old_backup in completed[:-keep_last]:
-                        old_backup.soft_delete()
+                # this schedule (applies to every file-based node type, incl. basecamp;
+                # incremental database chains are kept whole).
+                apply_retention(backup)
         else:
             # Nothing was stored anywhere -> failure (do not silently mark complete).
             if backup.status != UtilBackup.Status.COMPLETE:
@@ -1,5 +1,6 @@
 import boto3
 from apps._tasks.exceptions import StorageAliBabaUploadFailedError, StorageTencentUploadFailedError
+from apps._tasks.integration.archive import archive_name
 from apps.api.v1.utils.api_helpers import bs_decrypt
 import oss2
 from qcloud_cos import CosConfig
@@ -15,7 +16,7 @@ def storage_tencent(stored_backup):
         encryption_key = storage.account.get_encryption_key()
         prefix = storage.storage_tencent.prefix
 
-        file_name = f"{backup.node.name_slug}/{stored_backup.backup.uuid}.zip"
+        file_name = f"{backup.node.name_slug}/{archive_name(backup)}"
 
         config = CosConfig(
             Region=storage.storage_tencent.region.code,
@@ -0,0 +1,130 @@
+"""Storage-point validation at backup start (CoreNode.backup_initiate).
+
+CoreStorage.validate() writes and reads a test object on the provider -- a few
+network round trips per storage point. backup_initiate validates every
+selected point through validate_storage_points() instead:
+
+  * results are kept in the Django cache per storage and credential
+    fingerprint (a keyed hash of the provider row's settings and decrypted
+    secrets, token fields that rotate on refresh excluded) for
+    STORAGE_VALIDATION_CACHE_TTL seconds, failures for
+    STORAGE_VALIDATION_FAILURE_CACHE_TTL, so editing a storage's credentials
+    or bucket validates it afresh on the next backup;
+  * points without a cached result are validated concurrently, on up to
+    STORAGE_VALIDATION_CONCURRENCY threads;
+  * a backup start that finds another worker validating the same storage
+    (a short cache claim) waits up to CLAIM_WAIT seconds for that result
+    instead of validating it again -- hundreds of backups scheduled for
+    midnight validate a shared bucket once.
+
+Cache reads and writes stay on the calling thread; the worker threads only run
+validate(), which may refresh and save OAuth tokens on their own database
+connections.
+"""
+import hashlib
+import hmac
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models
+
+from apps.api.v1.utils.api_helpers import bs_decrypt
+
+# Seconds a claim on validating one storage is held, and waited for.
+CLAIM_TIMEOUT = 120
+CLAIM_WAIT = 60
+_POLL_INTERVAL = 0.5
+# Provider fields that change without the destination changing.
+_VOLATILE_FIELDS = {"id", "created", "modified", "access_token", "expiry", "encryption_updated"}
+
+
+def credential_fingerprint(storage):
+    """Keyed hash of everything that decides whether `storage` validates: the
+    provider row's fields (secrets decrypted), minus _VOLATILE_FIELDS."""
+    provider = storage.get_provider()
+    values = {"type": storage.type_id}
+    if provider is not None:
+        encryption_key = storage.account.get_encryption_key()
+        for field in provider._meta.concrete_fields:
+            if field.name in _VOLATILE_FIELDS:
+                continue
+            value = field.value_from_object(provider)
+            if isinstance(field, models.BinaryField):
+                value = bs_decrypt(value, encryption_key)
+            values[field.attname] = value
+    payload = json.dumps(values, sort_keys=True, default=str).encode("utf-8")
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), payload, hashlib.sha256).hexdigest()
+
+
+def _cache_key(storage):
+    return f"storage_validation:{storage.id}:{credential_fingerprint(storage)}"
+
+
+def _validate(storage):
+    try:
+        return bool(storage.validate())
+    finally:
+        # The worker thread opened its own connection if validate() used the database.
+        connection.close()
+
+
+def _validate_all(storages):
+    if len(storages) == 1:
+        return [bool(storages[0].validate())]
+    workers = max(1, min(len(storages), settings.STORAGE_VALIDATION_CONCURRENCY))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage-validate") as pool:
+        return list(pool.map(_validate, storages))
+
+
+def _store(key, ok):
+    ttl = settings.STORAGE_VALIDATION_CACHE_TTL if ok else settings.STORAGE_VALIDATION_FAILURE_CACHE_TTL
+    cache.set(key, ok, ttl)
+    cache.delete(key + ":claim")
+
+
+def validate_storage_points(storage_points):
+    """(storage, ok) for every storage point, in order (see the module docstring)."""
+    storage_points = list(storage_points)
+    results, keys = {}, {}
+    claimed, waiting = [], []
+    for storage in storage_points:
+        key = keys[storage.id] = _cache_key(storage)
+        cached = cache.get(key)
+        if cached is not None:
+            results[storage.id] = cached
+        elif cache.add(key + ":claim", True, CLAIM_TIMEOUT):
+            claimed.append(storage)
+        else:
+            waiting.append(storage)
+
+    if claimed:
+        try:
+            outcomes = _validate_all(claimed)
+        except BaseException:
+            cache.delete_many([keys[storage.id] + ":claim" for storage in claimed])
+            raise
+        for storage, ok in zip(claimed, outcomes):
+            results[storage.id] = ok
+            _store(keys[storage.id], ok)
+
+    deadline = time.monotonic() + CLAIM_WAIT
+    while waiting and time.monotonic() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        still_waiting = []
+        for storage in waiting:
+            cached = cache.get(keys[storage.id])
+            if cached is None:
+                still_waiting.append(storage)
+            else:
+                results[storage.id] = cached
+        waiting = still_waiting
+    if waiting:
+        # The other worker never finished: validate them here after all.
+        for storage, ok in zip(waiting, _validate_all(waiting)):
+            results[storage.id] = ok
+            _store(keys[storage.id], ok)
+
+    return [(storage, results[storage.id]) for storage in storage_points]
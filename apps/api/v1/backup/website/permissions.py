@@ -7,6 +7,7 @@ class CoreWebsiteBackupViewPermissions(MemberGroupPermissions):
         "download": "backup_download",
         "download_transfer_log": "backup_download",
         "download_dir_tree": "backup_download",
+        "diff": "backup_download",
         "destroy": "backup_delete",
     }
 
@@ -1,4 +1,5 @@
 import json
+import os
 from datetime import timedelta
 
 import arrow
@@ -7,6 +8,7 @@ import pytz
 from botocore.config import Config
 from django.conf import settings
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.utils.dateparse import parse_datetime
 from django.utils.timezone import get_current_timezone
 from django_filters.rest_framework import DjangoFilterBackend
@@ -18,6 +20,7 @@ from rest_framework_datatables.filters import DatatablesFilterBackend
 from rest_framework.response import Response
 
 from apps._tasks.exceptions import (
+    BackupManifestNotFound,
     SnapshotCreateMissingParams,
     SnapshotCreateError,
     DownloadMissingParams,
@@ -29,6 +32,7 @@ from apps._tasks.exceptions import (
     RestoreStoragePointNotFound,
     RestoreStoragePointRequired,
 )
+from apps._tasks.integration.manifest import diff_manifests, manifest_path
 from apps.api.v1.backup.website.filters import CoreWebsiteBackupFilter
 from apps.api.v1.backup.website.permissions import (
     CoreWebsiteBackupViewPermissions,
@@ -306,6 +310,45 @@ class CoreWebsiteBackupView(viewsets.ModelViewSet):
             )
             return Response({"url": response, "expire_in": 24 * 3600}, status=status.HTTP_201_CREATED)
 
+    @action(detail=True)
+    def diff(self, request, pk=None):
+        """Files added / removed / modified since another backup of the same
+        website (``?against=<backup id>``, default: the previous completed one),
+        streamed as one JSON object per line from the two file manifests."""
+        backup = self.get_object()
+        against_id = self.request.query_params.get("against")
+        if against_id:
+            other = self.get_queryset().filter(id=against_id, website=backup.website).first()
+        else:
+            other = (
+                self.get_queryset()
+                .filter(website=backup.website, status=CoreWebsiteBackup.Status.COMPLETE,
+                        created__lt=backup.created)
+                .order_by("-created")
+                .first()
+            )
+        if other is None:
+            raise BackupManifestNotFound("There is no earlier backup of this website to compare with.")
+        old_manifest = os.path.join(settings.BASE_DIR, manifest_path(other))
+        new_manifest = os.path.join(settings.BASE_DIR, manifest_path(backup))
+        if other.created > backup.created:
+            old_manifest, new_manifest = new_manifest, old_manifest
+        if not (os.path.exists(old_manifest) and os.path.exists(new_manifest)):
+            raise BackupManifestNotFound()
+
+        def lines():
+            for change, old, new in diff_manifests(old_manifest, new_manifest):
+                yield json.dumps({
+                    "change": change,
+                    "path": (new or old).path,
+                    "size": new.size if new else None,
+                    "old_size": old.size if old else None,
+                }) + "\n"
+
+        response = StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+        response["X-Compared-Backup"] = str(other.id)
+        return response
+
     @action(detail=True)
     def storage_points(self, request, pk=None):
         try:
@@ -290,10 +290,11 @@ class CoreNodeView(viewsets.ModelViewSet):
         cache_base = os.path.realpath(os.path.join(storage_dir, "website_cache", node.uuid_str))
         if cache_base != storage_dir and os.path.commonpath([storage_dir, cache_base]) == storage_dir:
             shutil.rmtree(cache_base, ignore_errors=True)
-            try:
-                os.remove(cache_base + ".meta.json")
-            except FileNotFoundError:
-                pass
+            for suffix in (".meta.json", ".zip"):
+                try:
+                    os.remove(cache_base + suffix)
+                except FileNotFoundError:
+                    pass
         _log_activity(
             request,
             CoreLog.Type.NODE,
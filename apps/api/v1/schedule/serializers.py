@@ -49,6 +49,7 @@ class CoreScheduleRunSerializer(serializers.ModelSerializer):
     class Meta:
         model = CoreScheduleRun
         fields = "__all__"
+        read_only_fields = ("status", "not_before", "admitted", "resources")
 
     def validate(self, data):
         schedule = data["schedule"]
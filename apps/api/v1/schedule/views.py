@@ -11,6 +11,7 @@ from rest_framework_datatables.filters import DatatablesFilterBackend
 from rest_framework.response import Response
 from sentry_sdk import capture_exception
 
+from apps._tasks.helper.admission import mark_admitted, queue_depth
 from apps.api.v1.schedule.filters import CoreScheduleFilter
 from apps.api.v1.schedule.permissions import CoreScheduleViewPermissions
 from apps.api.v1.schedule.serializers import CoreScheduleSerializer, CoreScheduleRunSerializer
@@ -156,6 +157,8 @@ class CoreScheduleView(viewsets.ModelViewSet):
             self.perform_create(serializer)
 
             schedule_run = serializer.instance
+            # Manual triggers start at once, but count against the admission limits.
+            mark_admitted(schedule_run)
 
             current_app.send_task(
                 schedule.node.backup_task_name(),
@@ -183,6 +186,14 @@ class CoreScheduleView(viewsets.ModelViewSet):
         else:
             raise ExceptionDefault(detail=serializer.errors)
 
+    @action(detail=False, methods=["get"])
+    def queue(self, request):
+        """Admission queue depth for the schedules the member can see."""
+        runs = CoreScheduleRun.objects.filter(schedule__node__in=visible_nodes(request.user.member))
+        if request.query_params.get("node"):
+            runs = runs.filter(schedule__node_id=request.query_params.get("node"))
+        return Response(queue_depth(runs), status=status.HTTP_200_OK)
+
     @action(detail=True, methods=["post"])
     def pause(self, request, pk=None):
         schedule = self.get_object()
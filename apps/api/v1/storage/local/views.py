@@ -115,5 +115,5 @@ class LocalStorageFileDownloadView(APIView):
         return FileResponse(
             open(target, "rb"),
             as_attachment=True,
-            filename=f"{stored_backup.backup.uuid_str}.zip",
+            filename=os.path.basename(target),
         )
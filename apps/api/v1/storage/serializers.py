@@ -15,3 +15,37 @@ class CoreStorageSerializer(serializers.ModelSerializer):
     class Meta:
         model = CoreStorage
         fields = "__all__"
+
+
+class CoreStorageUploadTuningSerializer(serializers.ModelSerializer):
+    """Per-storage multipart tuning for S3-compatible storages (null = defaults)
+    and the dedup repository switch (S3-compatible and Local Storage)."""
+
+    upload_part_size_mb = serializers.IntegerField(
+        allow_null=True, required=False, min_value=5, max_value=5120
+    )
+    upload_max_concurrency = serializers.IntegerField(
+        allow_null=True, required=False, min_value=1, max_value=64
+    )
+    upload_bandwidth_limit_mbps = serializers.IntegerField(
+        allow_null=True, required=False, min_value=1
+    )
+    dedup_repository = serializers.BooleanField(required=False)
+
+    class Meta:
+        model = CoreStorage
+        fields = (
+            "upload_part_size_mb",
+            "upload_max_concurrency",
+            "upload_bandwidth_limit_mbps",
+            "dedup_repository",
+        )
+
+    def validate_dedup_repository(self, value):
+        from apps._tasks.integration.storage.dedup import supports_dedup
+
+        if value and not supports_dedup(self.instance):
+            raise serializers.ValidationError(
+                "Dedup repositories are available for S3-compatible and Local Storage only."
+            )
+        return value
@@ -15,7 +15,7 @@ from apps.console.log.models import CoreLog
 from apps.console.node.models import CoreNode
 from apps.console.storage.models import CoreStorage
 from .filters import CoreStorageFilter
-from .serializers import CoreStorageSerializer
+from .serializers import CoreStorageSerializer, CoreStorageUploadTuningSerializer
 from ..utils.api_filters import DateRangeFilter
 from ..utils.api_serializers import ReadWriteSerializerMixin
 
@@ -83,6 +83,25 @@ class CoreStorageView(mixins.ListModelMixin, viewsets.GenericViewSet):
         )
         return Response({"detail": "Storage is resumed."}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["post"])
+    def upload_tuning(self, request, pk=None):
+        storage = self.get_object()
+        serializer = CoreStorageUploadTuningSerializer(storage, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        _log_activity(
+            request,
+            CoreLog.Type.STORAGE,
+            {
+                "message": f"Storage '{storage.name}' upload settings changed.",
+                "action": "upload_tuning",
+                "actor_email": request.user.email,
+                "storage_id": storage.id,
+                "storage_name": storage.name,
+            },
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=["post"])
     def delete(self, request, pk=None):
         storage = self.get_object()
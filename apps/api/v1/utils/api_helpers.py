@@ -10,6 +10,7 @@ from ....models import *
 import socket
 import os
 import shutil
+import zipfile
 from stat import S_ISDIR, ST_SIZE, S_ISLNK, S_ISREG
 import errno
 import re
@@ -309,11 +310,13 @@ def zipdir(path, ziph):
     # ziph is zipfile handle
     # Per-file errors are intentionally NOT swallowed: a dump file that cannot
     # be zipped must fail the backup instead of producing a silent empty zip.
+    # Already-compressed .gz dumps (SSH compressed transport) are stored as-is.
     for root, dirs, files in os.walk(path, onerror=None, followlinks=False):
         for file in files:
             ziph.write(
                 os.path.join(root, file),
                 os.path.relpath(os.path.join(root, file), os.path.join(path, ".")),
+                compress_type=zipfile.ZIP_STORED if file.endswith(".gz") else None,
             )
 
 
@@ -1,9 +1,7 @@
 import subprocess
 import time
 
-import dropbox
 import humanfriendly
-import ibm_boto3
 import paramiko
 import requests
 from botocore.exceptions import ClientError
@@ -30,7 +28,6 @@ from apps.api.v1.utils.api_helpers import bs_decrypt, bs_encrypt
 from ..utils.models import UtilBackup
 from apps._tasks.helper.tasks import delete_from_disk
 from backupsheep.celery import app
-from botocore.config import Config
 
 
 class CoreBackupType(TimeStampedModel):
@@ -124,6 +121,9 @@ class CoreAWSRDSBackupStatus(TimeStampedModel):
 
 
 class CoreDigitalOceanBackup(UtilBackup):
+    # Pages of 200 recent account actions poll_many reads looking for snapshot actions.
+    POLL_ACTION_PAGES = 3
+
     digitalocean = models.ForeignKey(
         "CoreDigitalOcean", related_name="backups", on_delete=models.CASCADE
     )
@@ -142,7 +142,8 @@ class CoreDigitalOceanBackup(UtilBackup):
         db_table = "core_digitalocean_backup"
 
     def poll_status(self):
-        """Single snapshot status check (no blocking loop); used by poll_cloud_backup.
+        """Single snapshot status check (no blocking loop); used by the snapshot
+        poller (helper.snapshot_poller) when poll_many cannot resolve it.
 
         Returns COMPLETE / IN_PROGRESS / FAILED and records snapshot details on
         completion. A transient API error returns IN_PROGRESS so the async poller simply
@@ -163,47 +164,10 @@ class CoreDigitalOceanBackup(UtilBackup):
                 if result.status_code == 200:
                     action = result.json()["action"]
                     if action.get("status") == "completed":
-                        data = {
-                            "resource_type": "droplet",
-                            "per_page": 200,
-                            "page": 1,
-                        }
-                        result = requests.get(
-                            f"{settings.DIGITALOCEAN_API}/v2/snapshots/",
-                            headers=client,
-                            params=data,
-                            verify=True,
-                        )
-                        if result.status_code == 200:
-                            snapshots = result.json()["snapshots"]
-                            snapshots_total = result.json()["meta"]["total"]
-                            while len(snapshots) < snapshots_total:
-                                data["page"] += 1
-                                result = requests.get(
-                                    f"{settings.DIGITALOCEAN_API}/v2/snapshots/",
-                                    headers=client,
-                                    params=data,
-                                    verify=True,
-                                )
-                                if result.status_code == 200:
-                                    snapshots = (
-                                            snapshots + result.json()["snapshots"]
-                                    )
-                                else:
-                                    raise NodeBackupStatusCheckCallError(
-                                        self.digitalocean.node, self.uuid_str
-                                    )
-                            for snapshot in snapshots:
-                                if snapshot["name"] == self.uuid_str:
-                                    self.unique_id = snapshot["id"]
-                                    self.size_gigabytes = snapshot["size_gigabytes"]
-                                    self.status = UtilBackup.Status.COMPLETE
-                                    self.save()
-                            return UtilBackup.Status.COMPLETE
-                        else:
-                            raise NodeBackupStatusCheckCallError(
-                                self.digitalocean.node, self.uuid_str
-                            )
+                        for snapshot in self._droplet_snapshots(client, self.digitalocean.node, self.uuid_str):
+                            if snapshot["name"] == self.uuid_str:
+                                self._record_snapshot(snapshot)
+                        return UtilBackup.Status.COMPLETE
                     elif action.get("status") == "errored":
                         return UtilBackup.Status.FAILED
                 return UtilBackup.Status.IN_PROGRESS
@@ -215,6 +179,80 @@ class CoreDigitalOceanBackup(UtilBackup):
             return UtilBackup.Status.COMPLETE
         return UtilBackup.Status.IN_PROGRESS
 
+    @staticmethod
+    def _droplet_snapshots(client, node, uuid_str):
+        """Every droplet snapshot of the connection's account (all pages)."""
+        data = {"resource_type": "droplet", "per_page": 200, "page": 1}
+        snapshots = []
+        while True:
+            result = requests.get(
+                f"{settings.DIGITALOCEAN_API}/v2/snapshots/",
+                headers=client,
+                params=data,
+                verify=True,
+            )
+            if result.status_code != 200:
+                raise NodeBackupStatusCheckCallError(node, uuid_str)
+            snapshots += result.json()["snapshots"]
+            if len(snapshots) >= result.json()["meta"]["total"] or not result.json()["snapshots"]:
+                return snapshots
+            data["page"] += 1
+
+    def _record_snapshot(self, snapshot):
+        self.unique_id = snapshot["id"]
+        self.size_gigabytes = snapshot["size_gigabytes"]
+        self.status = UtilBackup.Status.COMPLETE
+        self.save()
+
+    @classmethod
+    def poll_many(cls, backups):
+        """poll_status for several droplet snapshots of one connection, used by
+        the snapshot poller: the account's recent actions, and its snapshots
+        once any finished, are listed once for all of them. Returns
+        {backup id: status} for the backups it found; the rest are left to
+        poll_status."""
+        from ..node.models import CoreNode
+
+        wanted = {
+            str(backup.action_id): backup for backup in backups
+            if backup.action_id and backup.digitalocean.node.type == CoreNode.Type.CLOUD
+        }
+        if not wanted:
+            return {}
+        node = next(iter(wanted.values())).digitalocean.node
+        client = node.connection.auth_digitalocean.get_client()
+        actions = {}
+        for page in range(1, cls.POLL_ACTION_PAGES + 1):
+            result = requests.get(
+                f"{settings.DIGITALOCEAN_API}/v2/actions",
+                headers=client,
+                params={"per_page": 200, "page": page},
+                verify=True,
+            )
+            if result.status_code != 200:
+                raise NodeBackupStatusCheckCallError(node, node.uuid_str)
+            for action in result.json()["actions"]:
+                if str(action["id"]) in wanted:
+                    actions[str(action["id"])] = action.get("status")
+            if wanted.keys() <= actions.keys() or not result.json().get("links", {}).get("pages", {}).get("next"):
+                break
+
+        statuses, completed = {}, {}
+        for action_id, status in actions.items():
+            backup = wanted[action_id]
+            if status == "completed":
+                completed[backup.uuid_str] = backup
+            elif status == "errored":
+                statuses[backup.id] = UtilBackup.Status.FAILED
+            else:
+                statuses[backup.id] = UtilBackup.Status.IN_PROGRESS
+        if completed:
+            for snapshot in cls._droplet_snapshots(client, node, node.uuid_str):
+                if snapshot["name"] in completed:
+                    completed[snapshot["name"]]._record_snapshot(snapshot)
+            statuses.update((backup.id, UtilBackup.Status.COMPLETE) for backup in completed.values())
+        return statuses
+
     def delete_requested(self):
         self.status = self.Status.DELETE_REQUESTED
         self.save()
@@ -1482,6 +1520,12 @@ class CoreWebsiteBackup(UtilBackup):
         through="CoreWebsiteBackupStoragePoints",
     )
     metadata = models.JSONField(null=True)
+    # INCREMENTAL_V2 chains: 0 for the level-0 tar, n for the n-th increment on
+    # top of base_backup; null otherwise.
+    chain_position = models.PositiveIntegerField(null=True)
+    base_backup = models.ForeignKey(
+        "self", related_name="increments", null=True, on_delete=models.SET_NULL
+    )
 
     class Meta:
         db_table = "core_website_backup"
@@ -1570,482 +1614,18 @@ class BaseBackupStoragePoints(TimeStampedModel):
         abstract = True
 
     def generate_download_url(self):
-        import boto3
-        encryption_key = self.storage.account.get_encryption_key()
-
-        if self.storage.type.code == "aws_s3":
-            s3_client = boto3.client(
-                "s3",
-                self.storage.storage_aws_s3.region.code,
-                aws_access_key_id=bs_decrypt(self.storage.storage_aws_s3.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_aws_s3.secret_key, encryption_key
-                ),
-            )
-            s3_object = s3_client.head_object(
-                Bucket=self.storage.storage_aws_s3.bucket_name,
-                Key=f"{self.storage_file_id}",
-            )
-            if s3_object.get("StorageClass") and (
-                    s3_object.get("StorageClass") == "GLACIER"
-                    or s3_object.get("StorageClass") == "DEEP_ARCHIVE"
-            ):
-                if not s3_object.get("Restore"):
-                    s3_client.restore_object(
-                        Bucket=self.storage.storage_aws_s3.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                        RestoreRequest={
-                            "Days": 2,
-                            "GlacierJobParameters": {
-                                "Tier": "Expedited",
-                            },
-                        },
-                    )
-                    return "restore_requested"
-                elif 'ongoing-request="true"' in s3_object.get("Restore"):
-                    return "restore_in_progress"
-                elif 'ongoing-request="false"' in s3_object.get("Restore"):
-                    response = s3_client.generate_presigned_url(
-                        "get_object",
-                        Params={
-                            "Bucket": self.storage.storage_aws_s3.bucket_name,
-                            "Key": f"{self.storage_file_id}",
-                        },
-                        ExpiresIn=24 * 3600,
-                    )
-                    return response
-            else:
-                response = s3_client.generate_presigned_url(
-                    "get_object",
-                    Params={
-                        "Bucket": self.storage.storage_aws_s3.bucket_name,
-                        "Key": f"{self.storage_file_id}",
-                    },
-                    ExpiresIn=24 * 3600,
-                )
-                return response
-        elif self.storage.type.code == "do_spaces":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_do_spaces.region.endpoint}",
-                aws_access_key_id=bs_decrypt(
-                    self.storage.storage_do_spaces.access_key, encryption_key
-                ),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_do_spaces.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_do_spaces.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "filebase":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://s3.filebase.com",
-                aws_access_key_id=bs_decrypt(self.storage.storage_filebase.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_filebase.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_filebase.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "exoscale":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_exoscale.region.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_exoscale.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_exoscale.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_exoscale.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "oracle":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_oracle.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_oracle.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_oracle.secret_key, encryption_key
-                ),
-                region_name=self.storage.storage_oracle.region.code
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_oracle.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "scaleway":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_scaleway.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_scaleway.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_scaleway.secret_key, encryption_key
-                ),
-                region_name=self.storage.storage_scaleway.region.code
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_scaleway.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "backblaze_b2":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_backblaze_b2.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_backblaze_b2.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_backblaze_b2.secret_key, encryption_key
-                ),
-                config=Config(signature_version='s3v4')
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_backblaze_b2.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "linode":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_linode.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_linode.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_linode.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_linode.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "vultr":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_vultr.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_vultr.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_vultr.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_vultr.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "upcloud":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_upcloud.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_upcloud.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_upcloud.secret_key, encryption_key
-                ),
-                region_name=self.storage.storage_upcloud.endpoint.split('.')[1],
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_upcloud.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "cloudflare":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_cloudflare.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_cloudflare.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_cloudflare.secret_key, encryption_key
-                ),
-                region_name="auto",
-                config=Config(signature_version='s3v4')
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_cloudflare.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "wasabi":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_wasabi.region.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_wasabi.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_wasabi.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_wasabi.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "dropbox":
-            dbx = dropbox.Dropbox(
-                bs_decrypt(self.storage.storage_dropbox.access_token, encryption_key)
-            )
-            url = dbx.files_get_temporary_link(self.storage_file_id).link
-            return url
-        elif self.storage.type.code == "google_drive":
-            client = self.storage.storage_google_drive.get_client()
-
-            search_params = {
-                "fields": "webViewLink",
-            }
-
-            result = client.get(
-                f"https://www.googleapis.com/drive/v3/files/{self.storage_file_id}",
-                params=search_params,
-                headers={"Content-Type": "application/json; charset=UTF-8"},
-            )
-
-            if result.status_code == 200:
-                response = result.json()["webViewLink"]
-                return response
-            else:
-                return None
-        elif self.storage.type.code == "pcloud":
-            url = f"https://my.pcloud.com/#page=filemanager" \
-                  f"&q=name:{self.backup.uuid_str}" \
-                  f"&folderid={self.metadata.get('parentfolderid')}" \
-                  f"&filter=all"
-            return url
-        elif self.storage.type.code == "onedrive":
-            onedrive_path = f"{settings.MS_GRAPH_ENDPOINT}/drives/{self.storage.storage_onedrive.drive_id}/root:/{self.storage_file_id}"
-
-            r = requests.get(
-                onedrive_path + "", headers=self.storage.storage_onedrive.get_client()
-            )
-
-            url = r.json().get("@microsoft.graph.downloadUrl")
-
-            return url
-        elif self.storage.type.code == "google_cloud":
-            from google.cloud import storage as gc_storage
-            from datetime import timedelta
-
-            storage_client = gc_storage.Client(credentials=self.storage.storage_google_cloud.get_credentials())
-            bucket = storage_client.bucket(self.storage.storage_google_cloud.bucket_name)
-
-            if bucket.exists():
-                blob = bucket.blob(self.storage_file_id)
-                if blob.exists():
-                    url = blob.generate_signed_url(
-                        version="v4",
-                        expiration=timedelta(hours=24),
-                        method="GET",
-                    )
-                    return url
-                else:
-                    return None
-            else:
-                return None
-
-        elif self.storage.type.code == "azure":
-            import time
-            import datetime
-            from azure.storage.blob import BlobSasPermissions, generate_blob_sas
-            from datetime import timedelta
-
-            bucket_name = self.storage.storage_azure.bucket_name
-
-            blob_service_client = self.storage.storage_azure.get_client()
-
-            # Create a SAS token that expires in 1 hour
-            sas_expiry = datetime.datetime.utcnow() + timedelta(hours=48)
-            sas_permissions = BlobSasPermissions(read=True, write=False, delete=False)
-            sas_token = generate_blob_sas(
-                account_name=blob_service_client.account_name,
-                container_name=bucket_name,
-                blob_name=self.storage_file_id,
-                account_key=blob_service_client.credential.account_key,
-                permission=sas_permissions,
-                expiry=sas_expiry,
-            )
+        """Temporary download URL from the storage backend (see storage.registry).
+        None for a dedup repository backup: it only exists as chunks and is
+        rebuilt by a restore (storage.dedup)."""
+        from apps._tasks.integration.storage.dedup import is_dedup_point
+        from apps._tasks.integration.storage.registry import get_backend
 
-            return f"https://{blob_service_client.account_name}.blob.core.windows.net/{bucket_name}/{self.storage_file_id}?{sas_token}"
-
-        elif self.storage.type.code == "alibaba":
-            import oss2
-
-            auth = oss2.AuthV4(
-                bs_decrypt(self.storage.storage_alibaba.access_key, encryption_key),
-                bs_decrypt(self.storage.storage_alibaba.secret_key, encryption_key),
-            )
-            # Signature V4 requires the region ID, e.g. "us-east-1" from endpoint "oss-us-east-1.aliyuncs.com".
-            region_id = self.storage.storage_alibaba.endpoint.split(".")[0].removeprefix("oss-").removesuffix("-internal")
-            bucket = oss2.Bucket(auth, f"https://{self.storage.storage_alibaba.endpoint}", self.storage.storage_alibaba.bucket_name, region=region_id)
-            return bucket.sign_url(
-                "GET", self.storage_file_id, 3600 * 24, headers={"content-disposition": "attachment"}, slash_safe=True
-            )
-
-        elif self.storage.type.code == "tencent":
-            from qcloud_cos import CosConfig
-            from qcloud_cos import CosS3Client
-
-            config = CosConfig(
-                Region=self.storage.storage_tencent.region.code,
-                SecretId=bs_decrypt(self.storage.storage_tencent.access_key, encryption_key),
-                SecretKey=bs_decrypt(self.storage.storage_tencent.secret_key, encryption_key),
-                Scheme="https",
-            )
-            client = CosS3Client(config)
-            return client.get_presigned_url(
-                Method='GET',
-                Bucket=self.storage.storage_tencent.bucket_name,
-                Key=self.storage_file_id,
-                Expired=24 * 3600
-            )
-        elif self.storage.type.code == "leviia":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_leviia.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_leviia.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_leviia.secret_key, encryption_key
-                ),
-                region_name="auto",
-                config=Config(signature_version='s3v4')
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_leviia.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "idrive":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_idrive.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_idrive.access_key, encryption_key),
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_idrive.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_idrive.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "ionos":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_ionos.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_ionos.access_key, encryption_key),
-                region_name=self.storage.storage_ionos.region.code,
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_ionos.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_ionos.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "rackcorp":
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_rackcorp.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_rackcorp.access_key, encryption_key),
-                region_name=self.storage.storage_rackcorp.region.code,
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_rackcorp.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_rackcorp.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "ibm":
-            s3_client = ibm_boto3.client(
-                "s3",
-                endpoint_url=f"https://{self.storage.storage_ibm.endpoint}",
-                aws_access_key_id=bs_decrypt(self.storage.storage_ibm.access_key, encryption_key),
-                region_name=self.storage.storage_ibm.region.code,
-                aws_secret_access_key=bs_decrypt(
-                    self.storage.storage_ibm.secret_key, encryption_key
-                ),
-            )
-            response = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": self.storage.storage_ibm.bucket_name,
-                    "Key": f"{self.storage_file_id}",
-                },
-                ExpiresIn=24 * 3600,
-            )
-            return response
-        elif self.storage.type.code == "local":
-            # Local Storage files never leave this server; the download view streams
-            # them through the app (session-authenticated, account-scoped).
-            return f"/api/v1/storage/local/file/{self.id}/"
+        if is_dedup_point(self):
+            return None
 
+        backend = get_backend(self.storage.type.code)
+        if backend:
+            return backend.presign(self)
 
     def delete_requested(self):
 
@@ -2053,11 +1633,8 @@ class BaseBackupStoragePoints(TimeStampedModel):
         self.save()
 
     def soft_delete(self):
-        import boto3
-        from ..log.models import CoreLog
-        import subprocess
-
-        encryption_key = self.storage.account.get_encryption_key()
+        from apps._tasks.integration.storage.dedup import delete_backup, is_dedup_point, keeps_files
+        from apps._tasks.integration.storage.registry import get_backend
 
         data = {
             "account_id": self.storage.account.id,
@@ -2068,295 +1645,17 @@ class BaseBackupStoragePoints(TimeStampedModel):
             "storage_name": self.storage.name,
         }
 
+        if self.storage_file_id and is_dedup_point(self) and keeps_files(self.storage):
+            # the repository on a no_delete storage is kept, and so is the backup
+            return
+
         try:
             if self.storage_file_id:
-                if self.storage.type.code == "aws_s3":
-                    s3_client = boto3.client(
-                        "s3",
-                        # self.storage.storage_aws_s3.region.code,
-                        aws_access_key_id=bs_decrypt(self.storage.storage_aws_s3.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_aws_s3.secret_key, encryption_key),
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_aws_s3.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "do_spaces":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_do_spaces.region.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_do_spaces.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_do_spaces.secret_key, encryption_key),
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_do_spaces.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "filebase":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://s3.filebase.com",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_filebase.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_filebase.secret_key, encryption_key),
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_filebase.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "exoscale":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_exoscale.region.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_exoscale.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_exoscale.secret_key, encryption_key),
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_exoscale.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "oracle":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_oracle.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_oracle.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_oracle.secret_key, encryption_key),
-                        region_name=self.storage.storage_oracle.region.code,
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_oracle.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "scaleway":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_scaleway.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_scaleway.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_scaleway.secret_key, encryption_key),
-                        region_name=self.storage.storage_scaleway.region.code,
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_scaleway.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "backblaze_b2":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_backblaze_b2.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_backblaze_b2.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_backblaze_b2.secret_key, encryption_key),
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_backblaze_b2.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "linode":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_linode.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_linode.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_linode.secret_key, encryption_key),
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_linode.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "vultr":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_vultr.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_vultr.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_vultr.secret_key, encryption_key),
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_vultr.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "upcloud":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_upcloud.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_upcloud.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_upcloud.secret_key, encryption_key),
-                        region_name=self.storage.storage_upcloud.endpoint.split(".")[1],
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_upcloud.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "cloudflare":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_cloudflare.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_cloudflare.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_cloudflare.secret_key, encryption_key),
-                        region_name="auto",
-                        config=Config(signature_version='s3v4')
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_cloudflare.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "wasabi":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_wasabi.region.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_wasabi.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_wasabi.secret_key, encryption_key),
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_wasabi.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "dropbox":
-                    if self.storage_file_id:
-                        dbx = dropbox.Dropbox(bs_decrypt(self.storage.storage_dropbox.access_token, encryption_key))
-                        file_path = dbx.files_get_metadata(self.storage_file_id).path_lower
-                        dbx.files_delete_v2(file_path)
-                elif self.storage.type.code == "google_drive":
-                    client = self.storage.storage_google_drive.get_client()
-                    result = client.delete(
-                        f"https://www.googleapis.com/drive/v3/files/{self.storage_file_id}",
-                        headers={"Content-Type": "application/json; charset=UTF-8"},
-                    )
-                    if result.status_code == 204:
-                        return True
-                elif self.storage.type.code == "pcloud":
-                    requests.post(
-                        f"https://{self.storage.storage_pcloud.hostname}/deletefile?fileid={self.metadata.get('fileid')}",
-                        headers=self.storage.storage_pcloud.get_client(),
-                        verify=True,
-                    )
-                elif self.storage.type.code == "onedrive":
-                    onedrive_path = f"{settings.MS_GRAPH_ENDPOINT}/drives/{self.storage.storage_onedrive.drive_id}/root:/{self.storage_file_id}"
-                    requests.delete(onedrive_path, headers=self.storage.storage_onedrive.get_client())
-
-                elif self.storage.type.code == "google_cloud":
-                    from google.cloud import storage as gc_storage
-
-                    storage_client = gc_storage.Client(credentials=self.storage.storage_google_cloud.get_credentials())
-                    bucket = storage_client.bucket(self.storage.storage_google_cloud.bucket_name)
-
-                    if bucket.exists():
-                        blob = bucket.blob(self.storage_file_id)
-                        if blob.exists():
-                            blob.delete()
-
-                elif self.storage.type.code == "azure":
-                    import time
-                    import datetime
-                    from azure.storage.blob import BlobSasPermissions, generate_blob_sas
-                    from datetime import timedelta
-
-                    bucket_name = self.storage.storage_azure.bucket_name
-
-                    blob_service_client = self.storage.storage_azure.get_client()
-                    blob_client = blob_service_client.get_blob_client(container=bucket_name, blob=self.storage_file_id)
-                    blob_client.delete_blob()
-
-                elif self.storage.type.code == "alibaba":
-                    import oss2
-
-                    auth = oss2.AuthV4(
-                        bs_decrypt(self.storage.storage_alibaba.access_key, encryption_key),
-                        bs_decrypt(self.storage.storage_alibaba.secret_key, encryption_key),
-                    )
-                    # Signature V4 requires the region ID, e.g. "us-east-1" from endpoint "oss-us-east-1.aliyuncs.com".
-                    region_id = self.storage.storage_alibaba.endpoint.split(".")[0].removeprefix("oss-").removesuffix("-internal")
-                    bucket = oss2.Bucket(auth, f"https://{self.storage.storage_alibaba.endpoint}", self.storage.storage_alibaba.bucket_name, region=region_id)
-                    bucket.delete_object(self.storage_file_id)
-
-                elif self.storage.type.code == "tencent":
-                    from qcloud_cos import CosConfig
-                    from qcloud_cos import CosS3Client
-
-                    config = CosConfig(
-                        Region=self.storage.storage_tencent.region.code,
-                        SecretId=bs_decrypt(self.storage.storage_tencent.access_key, encryption_key),
-                        SecretKey=bs_decrypt(self.storage.storage_tencent.secret_key, encryption_key),
-                        Scheme="https",
-                    )
-                    client = CosS3Client(config)
-
-                    client.delete_object(Bucket=self.storage.storage_tencent.bucket_name, Key=self.storage_file_id)
-
-                elif self.storage.type.code == "leviia":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_leviia.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_leviia.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_leviia.secret_key, encryption_key),
-                        region_name="auto",
-                        config=Config(signature_version='s3v4')
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_leviia.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "idrive":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_idrive.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_idrive.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_idrive.secret_key, encryption_key),
-                        config=Config(signature_version='s3v4')
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_idrive.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "ionos":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_ionos.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_ionos.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_ionos.secret_key, encryption_key),
-                        region_name=self.storage.storage_ionos.region.code,
-                        config=Config(signature_version='s3v4')
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_ionos.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "rackcorp":
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_rackcorp.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_rackcorp.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_rackcorp.secret_key, encryption_key),
-                        region_name=self.storage.storage_rackcorp.region.code,
-                        config=Config(signature_version='s3v4')
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_rackcorp.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "ibm":
-                    s3_client = ibm_boto3.client(
-                        "s3",
-                        endpoint_url=f"https://{self.storage.storage_ibm.endpoint}",
-                        aws_access_key_id=bs_decrypt(self.storage.storage_ibm.access_key, encryption_key),
-                        aws_secret_access_key=bs_decrypt(self.storage.storage_ibm.secret_key, encryption_key),
-                        region_name=self.storage.storage_ibm.region.code,
-                        config=Config(signature_version='s3v4')
-                    )
-                    s3_client.delete_object(
-                        Bucket=self.storage.storage_ibm.bucket_name,
-                        Key=f"{self.storage_file_id}",
-                    )
-                elif self.storage.type.code == "local":
-                    import os
-                    if not self.storage.storage_local.no_delete:
-                        # storage_file_id is the absolute path written by the local
-                        # upload backend; only ever unlink inside the storage root.
-                        local_root = os.path.realpath(settings.LOCAL_STORAGE_ROOT)
-                        target = os.path.realpath(self.storage_file_id)
-                        if target != local_root and not target.startswith(local_root + os.sep):
-                            raise ValueError(
-                                f"Refusing to delete '{self.storage_file_id}': "
-                                f"outside the local storage root."
-                            )
-                        if os.path.exists(target):
-                            os.remove(target)
+                backend = get_backend(self.storage.type.code)
+                if is_dedup_point(self):
+                    delete_backup(self)
+                elif backend:
+                    backend.delete(self)
 
                 self.status = self.Status.DELETE_COMPLETED
                 self.save()
@@ -2838,6 +2137,12 @@ class CoreDatabaseBackup(UtilBackup):
     option_mysql = models.TextField(null=True, blank=True)
     option_mariadb = models.TextField(null=True, blank=True)
     option_mongodb = models.TextField(null=True, blank=True)
+    # Incremental mode (CoreDatabase.backup_mode): 0 for a full base, n for the
+    # n-th increment on top of base_backup; null for ordinary dumps.
+    chain_position = models.PositiveIntegerField(null=True)
+    base_backup = models.ForeignKey(
+        "self", related_name="increments", null=True, on_delete=models.SET_NULL
+    )
 
     class Meta:
         db_table = "core_database_backup"
@@ -2940,6 +2245,9 @@ class CoreDatabaseBackupStoragePoints(BaseBackupStoragePoints):
 
 
 class CoreAWSBackup(UtilBackup):
+    # Image / snapshot ids per DescribeImages / DescribeSnapshots call in poll_many.
+    POLL_BATCH = 200
+
     aws = models.ForeignKey("CoreAWS", related_name="backups", on_delete=models.CASCADE)
     # old_status = models.ForeignKey(
     #     CoreAWSBackupStatus, related_name="backups", on_delete=models.PROTECT
@@ -2966,33 +2274,9 @@ class CoreAWSBackup(UtilBackup):
         if CoreNode.Type.CLOUD == self.aws.node.type:
             try:
                 client = self.aws.node.connection.auth_aws.get_client()
-                if (
-                        len(client.describe_images(ImageIds=[self.unique_id])["Images"])
-                        > 0
-                ):
-                    new_image = client.describe_images(ImageIds=[self.unique_id])[
-                        "Images"
-                    ][0]
-                    if new_image["State"] == "available":
-                        """
-                        Snapshot is good. So we can save size now
-                        """
-                        size_gigabytes = 0
-                        if new_image:
-                            for device in new_image["BlockDeviceMappings"]:
-                                if device.get("Ebs", None):
-                                    size_gigabytes += device["Ebs"]["VolumeSize"]
-                        self.size_gigabytes = size_gigabytes
-                        self.status = UtilBackup.Status.COMPLETE
-                        self.save()
-                        return UtilBackup.Status.COMPLETE
-                    elif (
-                            new_image["State"] == "failed"
-                            or new_image["State"] == "error"
-                            or new_image["State"] == "invalid"
-                    ):
-                        client.deregister_image(ImageId=self.unique_id)
-                        return UtilBackup.Status.FAILED
+                images = client.describe_images(ImageIds=[self.unique_id])["Images"]
+                if images:
+                    return self._image_status(client, images[0])
                 return UtilBackup.Status.IN_PROGRESS
             except Exception as e:
                 return UtilBackup.Status.IN_PROGRESS
@@ -3002,24 +2286,74 @@ class CoreAWSBackup(UtilBackup):
                 new_snapshot = client.describe_snapshots(
                     SnapshotIds=[self.unique_id]
                 )["Snapshots"][0]
-
-                if new_snapshot["State"] == "completed":
-                    """
-                    Snapshot is good. So we can save size now
-                    """
-                    volume_size = new_snapshot["VolumeSize"]
-                    self.size_gigabytes = volume_size
-                    self.status = UtilBackup.Status.COMPLETE
-                    self.save()
-                    return UtilBackup.Status.COMPLETE
-                elif new_snapshot["State"] == "error":
-                    client.delete_snapshot(SnapshotId=self.unique_id)
-                    return UtilBackup.Status.FAILED
-                return UtilBackup.Status.IN_PROGRESS
+                return self._snapshot_status(client, new_snapshot)
             except Exception as e:
                 return UtilBackup.Status.IN_PROGRESS
         return UtilBackup.Status.IN_PROGRESS
 
+    def _image_status(self, client, new_image):
+        if new_image["State"] == "available":
+            """
+            Snapshot is good. So we can save size now
+            """
+            size_gigabytes = 0
+            for device in new_image["BlockDeviceMappings"]:
+                if device.get("Ebs", None):
+                    size_gigabytes += device["Ebs"]["VolumeSize"]
+            self.size_gigabytes = size_gigabytes
+            self.status = UtilBackup.Status.COMPLETE
+            self.save()
+            return UtilBackup.Status.COMPLETE
+        elif new_image["State"] in ("failed", "error", "invalid"):
+            client.deregister_image(ImageId=self.unique_id)
+            return UtilBackup.Status.FAILED
+        return UtilBackup.Status.IN_PROGRESS
+
+    def _snapshot_status(self, client, new_snapshot):
+        if new_snapshot["State"] == "completed":
+            """
+            Snapshot is good. So we can save size now
+            """
+            self.size_gigabytes = new_snapshot["VolumeSize"]
+            self.status = UtilBackup.Status.COMPLETE
+            self.save()
+            return UtilBackup.Status.COMPLETE
+        elif new_snapshot["State"] == "error":
+            client.delete_snapshot(SnapshotId=self.unique_id)
+            return UtilBackup.Status.FAILED
+        return UtilBackup.Status.IN_PROGRESS
+
+    @classmethod
+    def poll_many(cls, backups):
+        """poll_status for several backups of one connection, used by the
+        snapshot poller: one DescribeImages / DescribeSnapshots call per
+        POLL_BATCH ids. Returns {backup id: status} for the backups found."""
+        from ..node.models import CoreNode
+
+        client = backups[0].aws.node.connection.auth_aws.get_client()
+        images = [b for b in backups if b.aws.node.type == CoreNode.Type.CLOUD]
+        volumes = [b for b in backups if b.aws.node.type == CoreNode.Type.VOLUME]
+        statuses = {}
+        for start in range(0, len(images), cls.POLL_BATCH):
+            batch = images[start:start + cls.POLL_BATCH]
+            found = {
+                image["ImageId"]: image
+                for image in client.describe_images(ImageIds=[b.unique_id for b in batch])["Images"]
+            }
+            for backup in batch:
+                if backup.unique_id in found:
+                    statuses[backup.id] = backup._image_status(client, found[backup.unique_id])
+        for start in range(0, len(volumes), cls.POLL_BATCH):
+            batch = volumes[start:start + cls.POLL_BATCH]
+            found = {
+                snapshot["SnapshotId"]: snapshot
+                for snapshot in client.describe_snapshots(SnapshotIds=[b.unique_id for b in batch])["Snapshots"]
+            }
+            for backup in batch:
+                if backup.unique_id in found:
+                    statuses[backup.id] = backup._snapshot_status(client, found[backup.unique_id])
+        return statuses
+
     def delete_requested(self):
         self.status = self.Status.DELETE_REQUESTED
         self.save()
@@ -3350,6 +2684,66 @@ class CoreCloudRestore(TimeStampedModel):
             return self.Status.IN_PROGRESS
 
 
+class CoreSnapshotPoll(TimeStampedModel):
+    """A cloud / volume snapshot the snapshot poller (helper.snapshot_poller)
+    is waiting on, checked again at `next_poll` (epoch seconds).
+
+    Like CoreCloudRestore, the backup row is resolved through
+    node.get_cloud_backup(backup_id). Rows of completed snapshots are kept with
+    `finished` set: they are the node's completion-time history the poller
+    plans its intervals from (the newest few per node are kept).
+    """
+
+    node = models.ForeignKey(
+        "CoreNode", related_name="snapshot_polls", on_delete=models.CASCADE
+    )
+    backup_id = models.BigIntegerField()
+    started = models.FloatField()
+    timeout = models.IntegerField(default=86400)
+    next_poll = models.FloatField(db_index=True)
+    checks = models.IntegerField(default=0)
+    finished = models.FloatField(null=True)
+
+    class Meta:
+        db_table = "core_snapshot_poll"
+        constraints = [
+            UniqueConstraint(
+                fields=["node", "backup_id"],
+                name="unique_snapshot_poll",
+            ),
+        ]
+
+    @property
+    def backup(self):
+        return self.node.get_cloud_backup(self.backup_id)
+
+
+class CoreDiskReservation(TimeStampedModel):
+    """Bytes a dump or restore has reserved on the shared _storage volume
+    (helper.disk_ledger), keyed by its _storage name (the backup uuid, or
+    restore_<uuid>) until delete_from_disk clears its files, or `expires`
+    (epoch seconds) if its worker died first.
+
+    Released rows that recorded the dump and zip sizes are kept as the node's
+    history (the newest few per node): the dump / zip ratio the next estimate
+    is refined from.
+    """
+
+    node = models.ForeignKey(
+        "CoreNode", related_name="disk_reservations", null=True, on_delete=models.CASCADE
+    )
+    key = models.CharField(max_length=255, unique=True)
+    what = models.CharField(max_length=64)
+    bytes = models.BigIntegerField()
+    expires = models.FloatField()
+    released = models.FloatField(null=True, db_index=True)
+    dump_bytes = models.BigIntegerField(null=True)
+    zip_bytes = models.BigIntegerField(null=True)
+
+    class Meta:
+        db_table = "core_disk_reservation"
+
+
 class CoreWebsiteRestore(TimeStampedModel):
     """Tracks a restore of a website/files backup zip back onto its source server.
 
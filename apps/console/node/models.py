@@ -5,6 +5,7 @@ import pytz
 import requests
 from celery import chord
 from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models, transaction
 from django.db.models import UniqueConstraint
 from django.utils.text import slugify
@@ -2333,6 +2334,7 @@ class CoreWebsite(TimeStampedModel):
     class BackupType(models.IntegerChoices):
         FULL = 1, "Full"
         FULL_V2 = 4, "Full (Server-Side Tar)"
+        INCREMENTAL_V2 = 5, "Incremental (Server-Side Tar)"
 
     node = models.OneToOneField(
         "CoreNode", related_name="website", on_delete=models.CASCADE
@@ -2345,6 +2347,19 @@ class CoreWebsite(TimeStampedModel):
     excludes_regex = models.JSONField(null=True)
     excludes_glob = models.JSONField(null=True)
     parallel = models.IntegerField(null=True, default=3)
+    # Transfer settings learned across lftp mirror runs; parallel is only the
+    # starting point (backup._lftp_tuning).
+    transfer_tuning = models.JSONField(null=True, blank=True)
+
+    class MirrorEngine(models.TextChoices):
+        LFTP = "lftp", "lftp"
+        NATIVE = "native", "Native (in-process)"
+
+    # What mirrors FTP / FTPS / SFTP sources: the lftp binary, or the in-process
+    # engine (apps/_tasks/integration/backup/_mirror.py).
+    mirror_engine = models.CharField(
+        max_length=16, choices=MirrorEngine.choices, default=MirrorEngine.LFTP
+    )
     verbose = models.BooleanField(default=False, null=True)
     all_paths = models.BooleanField(null=True)
     notes = models.TextField(null=True, blank=True)
@@ -2355,13 +2370,18 @@ class CoreWebsite(TimeStampedModel):
     tar_exclude_vcs = models.BooleanField(default=False, null=True)
     tar_exclude_backups = models.BooleanField(default=False, null=True)
     tar_exclude_caches = models.BooleanField(default=False, null=True)
+    # INCREMENTAL_V2: a level-0 tar every full_backup_interval_days, changed
+    # files only in between (tar --listed-incremental).
+    full_backup_interval_days = models.PositiveSmallIntegerField(
+        default=7, validators=[MinValueValidator(1), MaxValueValidator(365)]
+    )
 
     class Meta:
         db_table = "core_website"
 
     def create_snapshot(self, backup):
         from apps._tasks.integration.backup.website import snapshot_website
-        from apps._tasks.integration.storage.tasks import storage_upload, finalize_backup
+        from apps._tasks.integration.storage.tasks import upload_signatures, finalize_backup
         from ..backup.models import CoreWebsiteBackupStoragePoints
 
         backup.status = UtilBackup.Status.DOWNLOAD_IN_PROGRESS
@@ -2369,9 +2389,9 @@ class CoreWebsite(TimeStampedModel):
 
         """
         Run a website backup. snapshot_website dispatches internally: incremental
-        mode mirrors into the per-node persistent cache, key-based FULL_V2 sources
-        use the server-side tar transport, and everything else is a full lftp
-        re-download.
+        mode mirrors into the per-node persistent cache, key-based FULL_V2 /
+        INCREMENTAL_V2 sources use the server-side tar transport, and everything
+        else is a full lftp re-download.
         """
         snapshot_website(backup)
 
@@ -2382,15 +2402,13 @@ class CoreWebsite(TimeStampedModel):
             """
             Upload Website Backup
             """
-            storage_upload_task_list = []
-            for stored_website_backup in backup.stored_website_backups.filter(
+            storage_upload_task_list = upload_signatures(
+                self.node.id,
+                backup.id,
+                backup.stored_website_backups.filter(
                     status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_READY
-            ):
-                storage_upload_task_list.append(
-                    storage_upload.s(
-                        self.node.id, backup.id, stored_website_backup.id
-                    ).set()
-                )
+                ).select_related("storage__type"),
+            )
 
             if storage_upload_task_list:
                 backup.status = UtilBackup.Status.UPLOAD_IN_PROGRESS
@@ -2429,6 +2447,34 @@ class CoreDatabase(TimeStampedModel):
     option_mysql = models.TextField(null=True, blank=True)
     option_mariadb = models.TextField(null=True, blank=True)
     option_mongodb = models.TextField(null=True, blank=True)
+    # Zip dumps straight into multipart uploads instead of _storage (S3-compatible
+    # destinations only; see apps/_tasks/integration/storage/streaming.py).
+    option_stream_upload = models.BooleanField(default=False)
+    # Dumps run concurrently per backup (also pg_dump -j); see
+    # apps/_tasks/integration/backup/_parallel.py.
+    dump_parallelism = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1), MaxValueValidator(32)]
+    )
+    # PostgreSQL only: pg_dump -Fd -j dump_parallelism over direct connections.
+    option_postgres_directory = models.BooleanField(default=False)
+    # SSH mode: gzip dumps on the database host before they cross the network
+    # (apps/_tasks/integration/backup/_ssh_transport.py).
+    option_ssh_compress = models.BooleanField(default=False)
+
+    class BackupMode(models.TextChoices):
+        DUMP = "dump", "Full dump every run"
+        INCREMENTAL = "incremental", "Full base + incremental logs"
+
+    # Incremental: a full base every full_backup_interval_days, and only the
+    # changes since the previous run in between (PostgreSQL: pg_basebackup +
+    # WAL; MySQL / MariaDB: mysqldump + binlog). See
+    # apps/_tasks/integration/backup/_incremental.py.
+    backup_mode = models.CharField(
+        max_length=16, choices=BackupMode.choices, default=BackupMode.DUMP
+    )
+    full_backup_interval_days = models.PositiveSmallIntegerField(
+        default=7, validators=[MinValueValidator(1), MaxValueValidator(365)]
+    )
 
     class Meta:
         db_table = "core_database"
@@ -2443,7 +2489,7 @@ class CoreDatabase(TimeStampedModel):
 
     def create_snapshot(self, backup):
         from ..connection.models import CoreAuthDatabase
-        from apps._tasks.integration.storage.tasks import storage_upload, finalize_backup
+        from apps._tasks.integration.storage.tasks import upload_signatures, finalize_backup
         from apps._tasks.integration.backup.mariadb import snapshot_mariadb
         from apps._tasks.integration.backup.mysql import snapshot_mysql
         from apps._tasks.integration.backup.postgresql import snapshot_postgresql
@@ -2488,15 +2534,13 @@ class CoreDatabase(TimeStampedModel):
             """
             Upload Database Backup
             """
-            storage_upload_task_list = []
-            for stored_database_backup in backup.stored_database_backups.filter(
+            storage_upload_task_list = upload_signatures(
+                self.node.id,
+                backup.id,
+                backup.stored_database_backups.filter(
                     status=CoreDatabaseBackupStoragePoints.Status.UPLOAD_READY
-            ):
-                storage_upload_task_list.append(
-                    storage_upload.s(
-                        self.node.id, backup.id, stored_database_backup.id
-                    ).set()
-                )
+                ).select_related("storage__type"),
+            )
 
             if storage_upload_task_list:
                 backup.status = UtilBackup.Status.UPLOAD_IN_PROGRESS
@@ -2534,7 +2578,7 @@ class CoreWordPress(TimeStampedModel):
 
     def create_snapshot(self, backup):
         from apps._tasks.integration.backup.wordpress import snapshot_wordpress
-        from apps._tasks.integration.storage.tasks import storage_upload, finalize_backup
+        from apps._tasks.integration.storage.tasks import upload_signatures, finalize_backup
         from ..backup.models import CoreWordPressBackupStoragePoints
 
         backup.status = UtilBackup.Status.DOWNLOAD_IN_PROGRESS
@@ -2552,15 +2596,13 @@ class CoreWordPress(TimeStampedModel):
             """
             Upload Wordpress Backup
             """
-            storage_upload_task_list = []
-            for stored_wordpress_backup in backup.stored_wordpress_backups.filter(
+            storage_upload_task_list = upload_signatures(
+                self.node.id,
+                backup.id,
+                backup.stored_wordpress_backups.filter(
                     status=CoreWordPressBackupStoragePoints.Status.UPLOAD_READY
-            ):
-                storage_upload_task_list.append(
-                    storage_upload.s(
-                        self.node.id, backup.id, stored_wordpress_backup.id
-                    ).set()
-                )
+                ).select_related("storage__type"),
+            )
 
             if storage_upload_task_list:
                 backup.status = UtilBackup.Status.UPLOAD_IN_PROGRESS
@@ -2592,7 +2634,7 @@ class CoreBasecamp(TimeStampedModel):
 
     def create_snapshot(self, backup):
         from apps._tasks.integration.backup.basecamp import snapshot_basecamp
-        from apps._tasks.integration.storage.tasks import storage_upload, finalize_backup
+        from apps._tasks.integration.storage.tasks import upload_signatures, finalize_backup
         from ..backup.models import CoreBasecampBackupStoragePoints
 
         backup.status = UtilBackup.Status.DOWNLOAD_IN_PROGRESS
@@ -2610,15 +2652,13 @@ class CoreBasecamp(TimeStampedModel):
             """
             Upload Basecamp Backup
             """
-            storage_upload_task_list = []
-            for stored_basecamp_backup in backup.stored_basecamp_backups.filter(
+            storage_upload_task_list = upload_signatures(
+                self.node.id,
+                backup.id,
+                backup.stored_basecamp_backups.filter(
                     status=CoreBasecampBackupStoragePoints.Status.UPLOAD_READY
-            ):
-                storage_upload_task_list.append(
-                    storage_upload.s(
-                        self.node.id, backup.id, stored_basecamp_backup.id
-                    ).set()
-                )
+                ).select_related("storage__type"),
+            )
 
             if storage_upload_task_list:
                 backup.status = UtilBackup.Status.UPLOAD_IN_PROGRESS
@@ -2647,6 +2687,10 @@ class CoreSchedule(TimeStampedModel):
         RATE = "rate", "Rate"
         ONETIME = "at", "One-time"
 
+    class ArchiveFormat(models.TextChoices):
+        ZIP = "zip", "Zip (deflate)"
+        TAR_ZSTD = "tar_zstd", "Tar + zstd (multi-threaded)"
+
     class RateUnit(models.TextChoices):
         MINUTES = "minutes", "Minutes"
         HOURS = "hours", "Hours"
@@ -2684,6 +2728,9 @@ class CoreSchedule(TimeStampedModel):
     compressed_backups_only = models.BooleanField(default=False, null=True)
     delete_remote_backups_time = models.IntegerField(null=True)
     encrypt_backup = models.BooleanField(default=False, null=True)
+    archive_format = models.CharField(
+        choices=ArchiveFormat.choices, default=ArchiveFormat.ZIP, max_length=16
+    )
     timezone = models.CharField(max_length=64)
     notes = models.TextField(null=True, blank=True)
     added_by = models.ForeignKey(
@@ -2802,8 +2849,21 @@ class CoreSchedule(TimeStampedModel):
 
 
 class CoreScheduleRun(TimeStampedModel):
+    """One firing of a schedule. Scheduled runs wait QUEUED until the admission
+    controller (helper.admission) starts them, not before `not_before`, once
+    every resource in `resources` is under its concurrency limit."""
+
+    class Status(models.IntegerChoices):
+        QUEUED = 1, "Queued"
+        ADMITTED = 2, "Admitted"
+        SKIPPED = 3, "Skipped"
+
     schedule = models.ForeignKey(CoreSchedule, related_name="runs", on_delete=models.CASCADE)
     request_id = models.CharField(max_length=1024)
+    status = models.IntegerField(choices=Status.choices, default=Status.ADMITTED)
+    not_before = models.DateTimeField(null=True)
+    admitted = models.DateTimeField(null=True)
+    resources = models.JSONField(null=True)
 
     class Meta:
         db_table = "core_schedule_run"
@@ -2812,6 +2872,9 @@ class CoreScheduleRun(TimeStampedModel):
                 fields=["schedule", "request_id"], name="unique_schedule_trigger_request"
             ),
         ]
+        indexes = [
+            models.Index(fields=["status", "not_before"], name="schedule_run_queue"),
+        ]
 
 
 class CoreNode(TimeStampedModel):
@@ -3067,16 +3130,16 @@ class CoreNode(TimeStampedModel):
 
         # Cloud servers and volumes don't have storage points for now
         if self.type == self.Type.DATABASE or self.type == self.Type.WEBSITE or self.type == self.Type.SAAS:
+            from apps._tasks.integration.storage.validation import validate_storage_points
+
             storage_points = CoreStorage.objects.filter(
                 id__in=storage_ids,
                 account=self.connection.account,
                 status=CoreStorage.Status.ACTIVE,
-            )
-            for storage_point in storage_points:
-                """
-                Validate all storage points
-                """
-                if storage_point.validate():
+            ).select_related("account", "type")
+            # Validated concurrently, reusing recent results (storage.validation).
+            for storage_point, valid in validate_storage_points(storage_points):
+                if valid:
                     backup.storage_points.add(storage_point)
                 else:
                     self.connection.account.create_backup_log(
@@ -2122,6 +2122,14 @@ class CoreStorage(TimeStampedModel):
     stats_wordpress_size = models.BigIntegerField(null=True)
     # Delete this later
     stat_wordpress_size = models.BigIntegerField(null=True)
+    # Upload tuning for S3-compatible storages; None falls back to the
+    # S3_UPLOAD_* settings (no bandwidth cap).
+    upload_part_size_mb = models.PositiveIntegerField(null=True, blank=True)
+    upload_max_concurrency = models.PositiveIntegerField(null=True, blank=True)
+    upload_bandwidth_limit_mbps = models.PositiveIntegerField(null=True, blank=True)
+    # Store backups in a deduplicating chunk repository instead of one zip per
+    # backup (storage.dedup; S3-compatible and Local Storage only).
+    dedup_repository = models.BooleanField(default=False)
 
     class Meta:
         db_table = "core_storage"
@@ -2159,88 +2167,48 @@ class CoreStorage(TimeStampedModel):
         database["backup__size__sum"] = humanfriendly.format_size(database["backup__size__sum"] or 0)
         return database
 
+    # One-to-one relations of the provider-specific rows, in lookup order.
+    PROVIDER_RELATIONS = (
+        "storage_aws_s3",
+        "storage_backblaze_b2",
+        "storage_do_spaces",
+        "storage_dropbox",
+        "storage_exoscale",
+        "storage_filebase",
+        "storage_google_drive",
+        "storage_linode",
+        "storage_upcloud",
+        "storage_oracle",
+        "storage_scaleway",
+        "storage_pcloud",
+        "storage_onedrive",
+        "storage_googlecloud",
+        "storage_vultr",
+        "storage_wasabi",
+        "storage_cloudflare",
+        "storage_leviia",
+        "storage_tencent",
+        "storage_alibaba",
+        "storage_azure",
+        "storage_google_cloud",
+        "storage_idrive",
+        "storage_ionos",
+        "storage_rackcorp",
+        "storage_ibm",
+        "storage_local",
+    )
+
+    def get_provider(self):
+        """The provider-specific row (CoreStorageAWSS3, ...) of this storage, or None."""
+        for relation in self.PROVIDER_RELATIONS:
+            if hasattr(self, relation):
+                return getattr(self, relation)
+        return None
+
     def validate(self, show_error=None):
         try:
-            if hasattr(self, 'storage_aws_s3'):
-                storage = getattr(self, 'storage_aws_s3')
-                return storage.validate()
-            elif hasattr(self, 'storage_backblaze_b2'):
-                storage = getattr(self, 'storage_backblaze_b2')
-                return storage.validate()
-            elif hasattr(self, 'storage_do_spaces'):
-                storage = getattr(self, 'storage_do_spaces')
-                return storage.validate()
-            elif hasattr(self, 'storage_dropbox'):
-                storage = getattr(self, 'storage_dropbox')
-                return storage.validate()
-            elif hasattr(self, 'storage_exoscale'):
-                storage = getattr(self, 'storage_exoscale')
-                return storage.validate()
-            elif hasattr(self, 'storage_filebase'):
-                storage = getattr(self, 'storage_filebase')
-                return storage.validate()
-            elif hasattr(self, 'storage_google_drive'):
-                storage = getattr(self, 'storage_google_drive')
-                return storage.validate()
-            elif hasattr(self, 'storage_linode'):
-                storage = getattr(self, 'storage_linode')
-                return storage.validate()
-            elif hasattr(self, 'storage_upcloud'):
-                storage = getattr(self, 'storage_upcloud')
-                return storage.validate()
-            elif hasattr(self, 'storage_oracle'):
-                storage = getattr(self, 'storage_oracle')
-                return storage.validate()
-            elif hasattr(self, 'storage_scaleway'):
-                storage = getattr(self, 'storage_scaleway')
-                return storage.validate()
-            elif hasattr(self, 'storage_pcloud'):
-                storage = getattr(self, 'storage_pcloud')
-                return storage.validate()
-            elif hasattr(self, 'storage_onedrive'):
-                storage = getattr(self, 'storage_onedrive')
-                return storage.validate()
-            elif hasattr(self, 'storage_googlecloud'):
-                storage = getattr(self, 'storage_googlecloud')
-                return storage.validate()
-            elif hasattr(self, 'storage_vultr'):
-                storage = getattr(self, 'storage_vultr')
-                return storage.validate()
-            elif hasattr(self, 'storage_wasabi'):
-                storage = getattr(self, 'storage_wasabi')
-                return storage.validate()
-            elif hasattr(self, 'storage_cloudflare'):
-                storage = getattr(self, 'storage_cloudflare')
-                return storage.validate()
-            elif hasattr(self, 'storage_leviia'):
-                storage = getattr(self, 'storage_leviia')
-                return storage.validate()
-            elif hasattr(self, 'storage_tencent'):
-                storage = getattr(self, 'storage_tencent')
-                return storage.validate()
-            elif hasattr(self, 'storage_alibaba'):
-                storage = getattr(self, 'storage_alibaba')
-                return storage.validate()
-            elif hasattr(self, 'storage_azure'):
-                storage = getattr(self, 'storage_azure')
-                return storage.validate()
-            elif hasattr(self, 'storage_google_cloud'):
-                storage = getattr(self, 'storage_google_cloud')
-                return storage.validate()
-            elif hasattr(self, 'storage_idrive'):
-                storage = getattr(self, 'storage_idrive')
-                return storage.validate()
-            elif hasattr(self, 'storage_ionos'):
-                storage = getattr(self, 'storage_ionos')
-                return storage.validate()
-            elif hasattr(self, 'storage_rackcorp'):
-                storage = getattr(self, 'storage_rackcorp')
-                return storage.validate()
-            elif hasattr(self, 'storage_ibm'):
-                storage = getattr(self, 'storage_ibm')
-                return storage.validate()
-            elif hasattr(self, 'storage_local'):
-                storage = getattr(self, 'storage_local')
+            storage = self.get_provider()
+            if storage is not None:
                 return storage.validate()
         except Exception as e:
             capture_exception(e)
@@ -1,10 +1,15 @@
+import gzip
+import hashlib
 import io
 import json
 import os
 import shutil
 import stat
+import subprocess
 import tempfile
+import threading
 import time
+import unittest
 import uuid
 import zipfile
 from types import SimpleNamespace
@@ -12,7 +17,7 @@ from unittest import mock
 
 from celery.exceptions import MaxRetriesExceededError, Retry
 from django.conf import settings
-from django.test import TestCase, override_settings
+from django.test import SimpleTestCase, TestCase, override_settings
 from rest_framework.test import APIRequestFactory, force_authenticate
 
 from apps._tasks.exceptions import (
@@ -20,18 +25,36 @@ from apps._tasks.exceptions import (
     NodeBackupFailedError,
     NodeConnectionErrorSFTP,
 )
+from apps._tasks.helper import disk_ledger as LEDGER
+from apps._tasks.helper import snapshot_poller as POLLER
 from apps._tasks.helper import tasks as helper_tasks
+from apps._tasks.integration.backup._binlog import (
+    binlog_range,
+    parse_dump_position,
+    source_data_flag,
+    status_query,
+)
+from apps._tasks.integration.backup import _lftp_tuning as TUNING
+from apps._tasks.integration.backup import _mirror as MIRROR
+from apps._tasks.integration.backup._incremental import plan_chain
 from apps._tasks.integration.backup import mariadb as MDB_ENGINE
 from apps._tasks.integration.backup import mysql as MYSQL_ENGINE
 from apps._tasks.integration.backup import postgresql as PG_ENGINE
 from apps._tasks.integration.backup import website as W
+from apps._tasks.integration import archive as ARCHIVE
+from apps._tasks.integration import manifest as MANIFEST
+from apps._tasks.integration.manifest import read_manifest
 from apps._tasks.integration.database import backup_database
 from apps._tasks.integration.website import backup_website
+from apps.api.v1.backup.website.views import CoreWebsiteBackupView
 from apps.api.v1.node.views import CoreNodeView
 from apps.api.v1.utils.api_helpers import bs_encrypt, ensure_disk_space, zipdir
 from apps.console.backup.models import (
+    CoreAWSBackup,
     CoreDatabaseBackup,
     CoreDigitalOceanBackup,
+    CoreDiskReservation,
+    CoreSnapshotPoll,
     CoreWebsiteBackup,
 )
 from apps.console.connection.models import CoreAuthDatabase, CoreAuthWebsite, CoreConnection
@@ -71,14 +94,17 @@ class PollCloudBackupTests(BaseTestCase):
         self.assertEqual(backup.status, UtilBackup.Status.FAILED)
         notify.assert_called_once()
 
-    def test_in_progress_requeues(self):
+    def test_in_progress_is_left_to_the_poller(self):
         node, backup = self._backup()
         with mock.patch.object(CoreDigitalOceanBackup, "poll_status",
                                return_value=UtilBackup.Status.IN_PROGRESS), \
              mock.patch.object(helper_tasks.poll_cloud_backup, "apply_async") as requeue:
             helper_tasks.poll_cloud_backup.apply(args=[node.id, backup.id])
-        requeue.assert_called_once()
-        self.assertIn("countdown", requeue.call_args.kwargs)
+        requeue.assert_not_called()
+        poll = CoreSnapshotPoll.objects.get(node=node, backup_id=backup.id)
+        self.assertEqual(poll.checks, 1)
+        self.assertGreater(poll.next_poll, time.time() + settings.CLOUD_POLL_MIN_INTERVAL - 5)
+        self.assertIsNone(poll.finished)
 
     def test_timeout_marks_timeout(self):
         node, backup = self._backup()
@@ -99,6 +125,103 @@ class PollCloudBackupTests(BaseTestCase):
         poll.assert_not_called()
 
 
+class SnapshotPollerTests(BaseTestCase):
+    """The consolidated poller batches checks per connection and adapts intervals."""
+
+    def _backups(self, node, count):
+        return [
+            CoreDigitalOceanBackup.objects.create(
+                digitalocean=node.digitalocean, status=UtilBackup.Status.IN_PROGRESS,
+                action_id=f"A{i}", uuid=f"snap-{node.id}-{i}",
+            )
+            for i in range(count)
+        ]
+
+    def _watch(self, node, backups, *, next_poll=0):
+        return [
+            CoreSnapshotPoll.objects.create(node=node, backup_id=backup.id, started=time.time(),
+                                            next_poll=next_poll)
+            for backup in backups
+        ]
+
+    @override_settings(CLOUD_POLL_INTERVAL=120, CLOUD_POLL_MIN_INTERVAL=30, CLOUD_POLL_MAX_INTERVAL=900)
+    def test_next_interval_follows_the_expected_completion_time(self):
+        self.assertEqual(POLLER.next_interval(None, 10), 120)
+        self.assertEqual(POLLER.next_interval(1800, 0), 900)
+        self.assertEqual(POLLER.next_interval(1800, 1000), 400)
+        self.assertEqual(POLLER.next_interval(1800, 1790), 30)
+        self.assertEqual(POLLER.next_interval(1800, 2400), 300)
+
+    def test_expected_seconds_is_the_median_of_finished_snapshots(self):
+        node = factories.make_cloud_node(self.account, self.member)
+        for backup_id, seconds in enumerate((600, 900, 3000), start=1):
+            CoreSnapshotPoll.objects.create(node=node, backup_id=backup_id, started=1000,
+                                            next_poll=0, finished=1000 + seconds)
+        CoreSnapshotPoll.objects.create(node=node, backup_id=9, started=1000, next_poll=0)
+        self.assertEqual(POLLER.expected_seconds(node.id), 900)
+
+    def test_tick_dispatches_one_task_per_connection(self):
+        first = factories.make_cloud_node(self.account, self.member)
+        second = factories.make_cloud_node(self.account, self.member)
+        due = self._watch(first, self._backups(first, 3)) + self._watch(second, self._backups(second, 1))
+        later = self._watch(first, self._backups(first, 1)[:1], next_poll=time.time() + 600)
+        with mock.patch.object(POLLER.poll_connection_snapshots, "apply_async") as dispatch:
+            POLLER.poll_cloud_snapshots.apply()
+
+        self.assertEqual(dispatch.call_count, 2)
+        batches = sorted(sorted(call.kwargs["args"][0]) for call in dispatch.call_args_list)
+        self.assertEqual(batches, sorted([sorted(p.id for p in due[:3]), [due[3].id]]))
+        self.assertNotIn(later[0].id, sum(batches, []))
+        # Claimed: the next tick does not dispatch them again.
+        with mock.patch.object(POLLER.poll_connection_snapshots, "apply_async") as dispatch:
+            POLLER.poll_cloud_snapshots.apply()
+        dispatch.assert_not_called()
+
+    def test_connection_batch_uses_poll_many_and_falls_back_to_poll_status(self):
+        node = factories.make_cloud_node(self.account, self.member)
+        backups = self._backups(node, 3)
+        polls = self._watch(node, backups)
+        resolved = {backups[0].id: UtilBackup.Status.IN_PROGRESS, backups[1].id: UtilBackup.Status.IN_PROGRESS}
+        with mock.patch.object(CoreDigitalOceanBackup, "poll_many", return_value=resolved) as poll_many, \
+             mock.patch.object(CoreDigitalOceanBackup, "poll_status",
+                               return_value=UtilBackup.Status.IN_PROGRESS) as poll_status:
+            POLLER.poll_connection_snapshots.apply(args=[[p.id for p in polls]])
+
+        poll_many.assert_called_once()
+        self.assertEqual(len(poll_many.call_args.args[0]), 3)
+        poll_status.assert_called_once()
+        self.assertEqual(
+            set(CoreSnapshotPoll.objects.filter(id__in=[p.id for p in polls]).values_list("checks", flat=True)), {1}
+        )
+
+    def test_completion_is_recorded_as_history(self):
+        node = factories.make_cloud_node(self.account, self.member)
+        backup, = self._backups(node, 1)
+        poll, = self._watch(node, [backup])
+        with mock.patch.object(CoreDigitalOceanBackup, "poll_status",
+                               return_value=UtilBackup.Status.COMPLETE), \
+             mock.patch.object(CoreNode, "notify_backup_success") as notify:
+            POLLER.poll_connection_snapshots.apply(args=[[poll.id]])
+        notify.assert_called_once()
+        poll.refresh_from_db()
+        self.assertIsNotNone(poll.finished)
+        self.assertIsNotNone(POLLER.expected_seconds(node.id))
+
+    def test_aws_poll_many_describes_all_images_at_once(self):
+        client = mock.Mock()
+        client.describe_images.return_value = {"Images": [{"ImageId": "ami-1", "State": "pending"}]}
+        node = SimpleNamespace(type=CoreNode.Type.CLOUD,
+                               connection=SimpleNamespace(auth_aws=SimpleNamespace(get_client=lambda: client)))
+        backups = [SimpleNamespace(id=i, unique_id=f"ami-{i}", aws=SimpleNamespace(node=node)) for i in (1, 2)]
+        for backup in backups:
+            backup._image_status = lambda client, image: UtilBackup.Status.IN_PROGRESS
+
+        statuses = CoreAWSBackup.poll_many(backups)
+
+        client.describe_images.assert_called_once_with(ImageIds=["ami-1", "ami-2"])
+        self.assertEqual(statuses, {1: UtilBackup.Status.IN_PROGRESS})
+
+
 class ProviderPollStatusResilienceTests(BaseTestCase):
     def test_poll_status_never_raises_on_api_error(self):
         # No auth_digitalocean is configured, so get_client() blows up inside poll_status;
@@ -159,9 +282,13 @@ class CeleryRoutingTests(TestCase):
         self.assertEqual(q("backup_website"), "files")
         self.assertEqual(q("backup_digitalocean"), "cloud")
         self.assertEqual(q("storage_upload"), "storage")
+        self.assertEqual(q("storage_upload_fanout"), "storage")
         self.assertEqual(q("finalize_backup"), "storage")
         self.assertEqual(q("delete_from_disk"), "storage")
         self.assertEqual(q("poll_cloud_backup"), "cloud")
+        self.assertEqual(q("poll_cloud_snapshots"), "cloud")
+        self.assertEqual(q("poll_connection_snapshots"), "cloud")
+        self.assertEqual(q("admit_scheduled_backups"), "cloud")
         self.assertEqual(q("send_log_to_db"), "logs")
 
     def test_celery_imports_register_all_backup_tasks(self):
@@ -176,8 +303,9 @@ class CeleryRoutingTests(TestCase):
             importlib.import_module(module)
         for name in ["backup_website", "backup_database", "backup_digitalocean",
                      "backup_hetzner", "backup_aws", "storage_upload", "finalize_backup",
-                     "delete_from_disk", "poll_cloud_backup", "delete_old_logs",
-                     "run_scheduled_backup"]:
+                     "delete_from_disk", "poll_cloud_backup", "poll_cloud_snapshots",
+                     "poll_connection_snapshots", "delete_expired_backups", "delete_old_logs",
+                     "run_scheduled_backup", "admit_scheduled_backups"]:
             self.assertIn(name, app.tasks)
 
 
@@ -288,6 +416,7 @@ class WebsiteEngineBase(BaseTestCase):
             f"_storage/website_cache/{node.uuid_str}/",
             f"_storage/website_cache/{node.uuid_str}.meta.json",
             f"_storage/website_cache/{node.uuid_str}.lock",
+            f"_storage/{backup.uuid}.manifest",
         ))
         return node, backup
 
@@ -299,7 +428,7 @@ class WebsiteSnapshotDispatchTests(WebsiteEngineBase):
         with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
              mock.patch.object(W, "_snapshot_lftp") as lftp, \
              mock.patch.object(W, "_snapshot_tar") as tar, \
-             mock.patch.object(W, "_finalize_zip"), \
+             mock.patch.object(W, "_finalize_zip", return_value=0), \
              mock.patch.object(W, "delete_from_disk"):
             W.snapshot_website(backup)
         return lftp, tar
@@ -321,6 +450,13 @@ class WebsiteSnapshotDispatchTests(WebsiteEngineBase):
         lftp.assert_not_called()
         tar.assert_called_once()
 
+    def test_incremental_v2_with_private_key_routes_to_incremental_tar(self):
+        node, backup = self._make_backup(
+            backup_type=CoreWebsite.BackupType.INCREMENTAL_V2, use_private_key=True)
+        lftp, tar = self._run(backup)
+        lftp.assert_not_called()
+        tar.assert_called_once_with(backup, incremental=True)
+
     def test_default_routes_to_full_lftp(self):
         node, backup = self._make_backup()
         lftp, tar = self._run(backup)
@@ -336,7 +472,7 @@ class WebsiteSnapshotDispatchTests(WebsiteEngineBase):
         node, backup = self._make_backup(use_public_key=True)
         with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
              mock.patch.object(W.subprocess, "run") as run, \
-             mock.patch.object(W, "_finalize_zip"), \
+             mock.patch.object(W, "_finalize_zip", return_value=0), \
              mock.patch.object(W, "delete_from_disk"):
             with self.assertRaises(NodeBackupFailedError):
                 W.snapshot_website(backup)
@@ -361,7 +497,7 @@ class WebsiteMirrorOptsTests(WebsiteEngineBase):
         with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
              mock.patch.object(W.subprocess, "run", side_effect=fake_run), \
              mock.patch.object(W, "delete_from_disk"), \
-             mock.patch.object(W, "_finalize_zip"):
+             mock.patch.object(W, "_finalize_zip", return_value=0):
             W._snapshot_lftp(backup, base_dir=base_dir, incremental=incremental)
         self.assertTrue(scripts, "expected _snapshot_lftp to invoke lftp")
         return scripts[0]
@@ -382,6 +518,317 @@ class WebsiteMirrorOptsTests(WebsiteEngineBase):
         self.assertNotIn("--delete", s)
 
 
+class _TuningWebsite(SimpleNamespace):
+    def save(self, update_fields=None):
+        self.saved = update_fields
+
+
+@override_settings(LFTP_MAX_PARALLEL=16, LFTP_MAX_PGET=4)
+class LftpTuningTests(SimpleTestCase):
+    """backup._lftp_tuning: per-node parallelism learned across mirror runs."""
+
+    MIB = 1024 * 1024
+
+    def _website(self, **state):
+        return _TuningWebsite(parallel=3, transfer_tuning=state or None)
+
+    def _learn(self, website, *, mib_per_s=10, seconds=100, lines=()):
+        stats = TUNING.OutputStats()
+        for line in lines:
+            stats.feed(line)
+        parallel, pget = TUNING.plan(website)
+        TUNING.learn(website, parallel=parallel, pget=pget,
+                     transferred=mib_per_s * self.MIB * seconds, seconds=seconds, stats=stats)
+        return TUNING.plan(website)
+
+    def test_first_run_starts_from_the_configured_parallelism(self):
+        self.assertEqual(TUNING.plan(self._website()), (3, 1))
+
+    def test_improving_runs_ramp_parallel_then_segments(self):
+        website = self._website()
+        self.assertEqual(self._learn(website, mib_per_s=10), (4, 1))
+        self.assertEqual(website.saved, ["transfer_tuning"])
+        self.assertEqual(self._learn(website, mib_per_s=20), (6, 1))
+        website.transfer_tuning["ceiling"] = 6
+        self.assertEqual(self._learn(website, mib_per_s=30), (6, 2))
+
+    def test_push_back_halves_and_caps_the_ceiling(self):
+        website = self._website(parallel=8, pget=3, best_rate=50 * self.MIB, ceiling=16)
+        self.assertEqual(
+            self._learn(website, lines=["mirror: Access failed: 421 Too many connections (8) from this IP"]),
+            (4, 1),
+        )
+        self.assertEqual(website.transfer_tuning["ceiling"], 7)
+        self.assertIsNone(website.transfer_tuning["best_rate"])
+
+    def test_repeated_connection_errors_count_as_push_back(self):
+        website = self._website(parallel=6)
+        errors = ["get: Fatal error: Connection reset by peer"] * TUNING.TRANSIENT_ERROR_LIMIT
+        self.assertEqual(self._learn(website, lines=errors), (3, 1))
+
+    def test_progress_lines_naming_files_are_ignored(self):
+        website = self._website(parallel=6)
+        self.assertEqual(self._learn(website, lines=["Transferring file `421 too many connections.txt'"]),
+                         (9, 1))
+
+    def test_regression_returns_to_the_best_settings(self):
+        website = self._website(parallel=9, pget=1, best_rate=40 * self.MIB,
+                                best_parallel=6, best_pget=1, ceiling=16)
+        self.assertEqual(self._learn(website, mib_per_s=20), (6, 1))
+
+    def test_small_runs_keep_the_settings(self):
+        website = self._website(parallel=5, pget=2)
+        self.assertEqual(self._learn(website, mib_per_s=1, seconds=5), (5, 2))
+
+    @override_settings(LFTP_MAX_PARALLEL=4)
+    def test_learned_values_respect_the_configured_maximum(self):
+        self.assertEqual(TUNING.plan(self._website(parallel=12, pget=2)), (4, 2))
+
+
+class WebsiteMirrorTuningTests(WebsiteEngineBase):
+    """_snapshot_lftp runs with the learned settings and feeds the run back."""
+
+    def _mirror(self, backup, output=""):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        scripts = []
+
+        def fake_run(cmd, **kwargs):
+            scripts.append(kwargs.get("input") or "")
+            return SimpleNamespace(stdout=output, returncode=0)
+
+        with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
+             mock.patch.object(W.subprocess, "run", side_effect=fake_run), \
+             mock.patch.object(W, "delete_from_disk"), \
+             mock.patch.object(W, "_finalize_zip", return_value=0):
+            W._snapshot_lftp(backup, base_dir=os.path.join(tmp, "full") + os.sep, incremental=False)
+        return scripts[0]
+
+    def test_mirror_uses_the_learned_settings(self):
+        node, backup = self._make_backup()
+        node.website.transfer_tuning = {"parallel": 7, "pget": 3}
+        node.website.save()
+        script = self._mirror(backup)
+        self.assertIn("--parallel=7", script)
+        self.assertIn("--use-pget=3", script)
+        self.assertIn("set net:connection-limit 7", script)
+
+    def test_server_push_back_is_learned(self):
+        node, backup = self._make_backup()
+        self._mirror(backup, output="mirror: Access failed: 421 Too many connections\n")
+        node.website.refresh_from_db()
+        self.assertEqual(node.website.transfer_tuning["parallel"], 1)
+        self.assertEqual(node.website.parallel, 3)
+
+
+class _FakeMirrorTransport:
+    """In-memory server for backup._mirror: TREE maps a path to (kind, data, mtime);
+    FAIL maps a path to the exceptions its next downloads raise."""
+
+    TREE = {}
+    FAIL = {}
+    HASHES = True
+    downloads = []
+
+    def __init__(self):
+        self.closed = False
+
+    @staticmethod
+    def _key(path):
+        return path[2:] if path.startswith("./") else path.lstrip(".")
+
+    def listdir(self, path):
+        parent = self._key(path)
+        return [
+            MIRROR.RemoteEntry(os.path.basename(key), kind, len(data) if kind == MIRROR.FILE else 0, mtime)
+            for key, (kind, data, mtime) in self.TREE.items()
+            if os.path.dirname(key) == parent
+        ]
+
+    def stat(self, path):
+        kind, data, mtime = self.TREE[self._key(path)]
+        return MIRROR.RemoteEntry(os.path.basename(path), kind, len(data), mtime)
+
+    def readlink(self, path):
+        return self.TREE[self._key(path)][1]
+
+    def download(self, path, local_path):
+        key = self._key(path)
+        if self.FAIL.get(key):
+            raise self.FAIL[key].pop(0)
+        self.downloads.append(key)
+        with open(local_path, "wb") as fh:
+            fh.write(self.TREE[key][1])
+
+    def digest(self, path):
+        if not self.HASHES:
+            return None
+        return "sha256", hashlib.sha256(self.TREE[self._key(path)][1]).digest()
+
+    def close(self):
+        self.closed = True
+
+
+@mock.patch.object(MIRROR, "RETRY_DELAY", 0)
+class NativeMirrorTests(SimpleTestCase):
+    """backup._mirror: the in-process FTP / SFTP mirror engine."""
+
+    def setUp(self):
+        self.local = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.local, True)
+        _FakeMirrorTransport.TREE = {
+            "site": (MIRROR.DIR, b"", 0),
+            "site/index.php": (MIRROR.FILE, b"<?php", 1_600_000_000),
+            "site/php.sock": (MIRROR.FILE, b"", 1_600_000_000),
+            "site/cache": (MIRROR.DIR, b"", 0),
+            "site/cache/page.html": (MIRROR.FILE, b"cached", 1_600_000_000),
+            "robots.txt": (MIRROR.FILE, b"User-agent: *", 1_600_000_100),
+            "current": (MIRROR.LINK, "site", 0),
+        }
+        _FakeMirrorTransport.FAIL = {}
+        _FakeMirrorTransport.HASHES = True
+        _FakeMirrorTransport.downloads = []
+
+    def _run(self, *, delete=True, connections=3, excludes_glob=("*.sock",), events=None):
+        return MIRROR.Mirror(
+            _FakeMirrorTransport, connections=connections, delete=delete,
+            filters=MIRROR.Filters(excludes_glob=list(excludes_glob)),
+            on_event=events.append if events is not None else None,
+        ).run([(".", self.local, False)])
+
+    def test_mirrors_the_tree_with_remote_mtimes(self):
+        events = []
+        engine = self._run(events=events)
+        self.assertEqual(engine.downloaded, 3)
+        self.assertEqual(engine.errors, [])
+        with open(os.path.join(self.local, "site", "index.php"), "rb") as fh:
+            self.assertEqual(fh.read(), b"<?php")
+        self.assertEqual(os.stat(os.path.join(self.local, "robots.txt")).st_mtime, 1_600_000_100)
+        self.assertEqual(os.readlink(os.path.join(self.local, "current")), "site")
+        self.assertFalse(os.path.exists(os.path.join(self.local, "site", "php.sock")))
+        self.assertIn(MIRROR.DOWNLOADED, {event.kind for event in events})
+        self.assertIn("Connection 1:", engine.summary())
+
+    def test_incremental_run_only_fetches_changes(self):
+        self._run()
+        tree = _FakeMirrorTransport.TREE
+        tree["site/index.php"] = (MIRROR.FILE, b"<?php echo 1;", 1_600_000_500)
+        # Touched on the server, same contents: the digests match.
+        tree["robots.txt"] = (MIRROR.FILE, b"User-agent: *", 1_600_000_900)
+        del tree["site/cache/page.html"]
+        _FakeMirrorTransport.downloads = []
+
+        engine = self._run()
+        self.assertEqual(_FakeMirrorTransport.downloads, ["site/index.php"])
+        self.assertEqual((engine.verified, engine.deleted), (1, 1))
+        self.assertEqual(os.stat(os.path.join(self.local, "robots.txt")).st_mtime, 1_600_000_900)
+        self.assertEqual(os.listdir(os.path.join(self.local, "site", "cache")), [])
+
+    def test_touched_file_is_downloaded_without_server_hashes(self):
+        self._run()
+        _FakeMirrorTransport.HASHES = False
+        _FakeMirrorTransport.TREE["robots.txt"] = (MIRROR.FILE, b"User-agent: *", 1_600_000_900)
+        _FakeMirrorTransport.downloads = []
+        self._run()
+        self.assertEqual(_FakeMirrorTransport.downloads, ["robots.txt"])
+
+    def test_local_symlink_is_replaced_by_a_remote_directory(self):
+        self._run()
+        tree = _FakeMirrorTransport.TREE
+        tree["current"] = (MIRROR.DIR, b"", 0)
+        tree["current/release.txt"] = (MIRROR.FILE, b"v2", 1_600_000_000)
+        self._run()
+        current = os.path.join(self.local, "current")
+        self.assertFalse(os.path.islink(current))
+        self.assertEqual(os.listdir(current), ["release.txt"])
+        # Nothing was written or deleted through the old link.
+        self.assertEqual(sorted(os.listdir(os.path.join(self.local, "site"))), ["cache", "index.php"])
+
+    def test_per_file_errors_do_not_stop_the_run(self):
+        _FakeMirrorTransport.FAIL = {"robots.txt": [PermissionError(13, "Permission denied")]}
+        engine = self._run()
+        self.assertEqual(len(engine.errors), 1)
+        self.assertEqual(engine.errors[0].path, "./robots.txt")
+        self.assertEqual(engine.errors[0].operation, "download")
+        self.assertTrue(os.path.exists(os.path.join(self.local, "site", "index.php")))
+        self.assertFalse(os.path.exists(os.path.join(self.local, "robots.txt.bs-part")))
+
+    def test_dropped_connection_reconnects_and_retries(self):
+        _FakeMirrorTransport.FAIL = {"robots.txt": [ConnectionResetError("connection reset by peer")]}
+        stats = TUNING.OutputStats()
+        engine = MIRROR.Mirror(_FakeMirrorTransport, connections=1, stats=stats).run(
+            [(".", self.local, False)])
+        self.assertEqual(engine.errors, [])
+        self.assertEqual(engine.reconnects, 1)
+        self.assertEqual(stats.errors, 1)
+
+    def test_no_connection_at_all_is_fatal(self):
+        def refuse():
+            raise ConnectionRefusedError("connection refused")
+
+        with self.assertRaises(MIRROR.MirrorError):
+            MIRROR.Mirror(refuse, connections=2).run([(".", self.local, False)])
+
+    def test_file_source(self):
+        target = os.path.join(self.local, "robots.txt")
+        engine = MIRROR.Mirror(_FakeMirrorTransport, connections=1).run([("robots.txt", target, True)])
+        self.assertEqual(engine.downloaded, 1)
+        self.assertTrue(os.path.isfile(target))
+
+    def test_filters_follow_lftp(self):
+        filters = MIRROR.Filters(includes_glob=["*.php"], excludes_regex=["^site/cache/"])
+        self.assertFalse(filters.wanted("site/cache", True))
+        self.assertTrue(filters.wanted("site", True))
+        self.assertTrue(filters.wanted("site/index.php", False))
+        self.assertFalse(filters.wanted("robots.txt", False))
+
+
+class WebsiteNativeMirrorTests(WebsiteEngineBase):
+    """_snapshot_lftp with website.mirror_engine "native" never runs lftp."""
+
+    def _snapshot(self, backup, errors=()):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        runs = []
+
+        def fake_run(engine, sources):
+            runs.append(sources)
+            engine.errors = list(errors)
+            return engine
+
+        with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
+             mock.patch.object(W.subprocess, "run") as lftp, \
+             mock.patch.object(MIRROR.Mirror, "run", autospec=True, side_effect=fake_run), \
+             mock.patch.object(W, "delete_from_disk"), \
+             mock.patch.object(W, "_finalize_zip", return_value=0):
+            W._snapshot_lftp(backup, base_dir=os.path.join(tmp, "full") + os.sep, incremental=False)
+        lftp.assert_not_called()
+        return runs
+
+    def _native_backup(self):
+        node, backup = self._make_backup()
+        node.website.mirror_engine = CoreWebsite.MirrorEngine.NATIVE
+        node.website.save()
+        return node, backup
+
+    def test_native_engine_mirrors_the_sources(self):
+        node, backup = self._native_backup()
+        runs = self._snapshot(backup)
+        self.assertEqual(len(runs), 1)
+        remote, local, is_file = runs[0][0]
+        self.assertEqual(remote, ".")
+        self.assertFalse(is_file)
+        with open(f"_storage/{backup.uuid}.log") as fh:
+            self.assertIn("Engine: native", fh.read())
+
+    def test_failed_files_fail_the_backup(self):
+        node, backup = self._native_backup()
+        error = MIRROR.FileError("./secret.txt", "download", "Permission denied")
+        with self.assertRaises(NodeBackupFailedError) as ctx:
+            self._snapshot(backup, errors=[error])
+        self.assertIn("secret.txt", str(ctx.exception))
+
+
 class CacheFingerprintTests(TestCase):
     """_cache_fingerprint(website, auth, username) -> stable sha256 hex."""
 
@@ -914,6 +1361,92 @@ class MysqlDirectEngineTests(DatabaseEngineBase):
         self.assertNotIn(DB_PASS, self._read_log(backup))
 
 
+class MysqlStreamingEngineTests(DatabaseEngineBase):
+    """option_stream_upload: the dump goes straight into a multipart upload and
+    nothing is written to _storage."""
+
+    DUMP = b"-- dump\nINSERT INTO t VALUES (1);\n"
+
+    def _fake_popen(self, calls, *, dump, returncode=0):
+        def popen(argv, **kwargs):
+            calls.append(list(argv))
+            return SimpleNamespace(
+                stdout=io.BytesIO(dump),
+                wait=lambda timeout=None: returncode,
+                kill=lambda: None,
+            )
+        return popen
+
+    def _streaming_backup(self):
+        from apps.console.backup.models import CoreDatabaseBackupStoragePoints
+
+        node, backup = self._make_backup(
+            db_type=CoreAuthDatabase.DatabaseType.MYSQL, version="mysql_8_0")
+        node.database.option_stream_upload = True
+        node.database.save()
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        point = CoreDatabaseBackupStoragePoints.objects.create(
+            backup=backup, storage=storage,
+            status=CoreDatabaseBackupStoragePoints.Status.UPLOAD_READY,
+        )
+        return backup, point
+
+    def _run_engine(self, backup, client, popen):
+        with self._patch_check_connection(), \
+             mock.patch("apps._tasks.integration.storage.streaming.s3_client", return_value=client), \
+             mock.patch("apps._tasks.integration.storage.streaming.subprocess.Popen", side_effect=popen), \
+             mock.patch.object(MYSQL_ENGINE, "delete_from_disk"):
+            MYSQL_ENGINE.snapshot_mysql(backup)
+
+    def test_stream_uploads_zip_and_completes_point(self):
+        from apps.tests.test_storage import FakeMultipartClient
+
+        backup, point = self._streaming_backup()
+        client, calls = FakeMultipartClient(), []
+        self._run_engine(backup, client, self._fake_popen(calls, dump=self.DUMP))
+
+        backup.refresh_from_db()
+        point.refresh_from_db()
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        self.assertEqual(backup.size, len(client.body))
+        self.assertEqual(point.status, point.Status.UPLOAD_COMPLETE)
+        self.assertEqual(point.storage_file_id, f"{backup.uuid}.zip")
+        with zipfile.ZipFile(io.BytesIO(client.body)) as zf:
+            self.assertEqual(zf.read("appdb.sql"), self.DUMP)
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(os.path.exists(f"_storage/{backup.uuid}.zip"))
+        self.assertFalse(os.path.exists(f"_storage/{backup.uuid}/appdb.sql"))
+
+    def test_tuned_storage_is_not_streamed(self):
+        from apps._tasks.integration.storage.streaming import streaming_destinations
+
+        backup, point = self._streaming_backup()
+        self.assertEqual(streaming_destinations(backup), [point])
+        point.storage.upload_bandwidth_limit_mbps = 50
+        point.storage.save()
+        self.assertIsNone(streaming_destinations(backup))
+
+    def test_dedup_storage_is_not_streamed(self):
+        from apps._tasks.integration.storage.streaming import streaming_destinations
+
+        backup, point = self._streaming_backup()
+        point.storage.dedup_repository = True
+        point.storage.save()
+        self.assertIsNone(streaming_destinations(backup))
+
+    def test_failed_dump_aborts_upload(self):
+        from apps.tests.test_storage import FakeMultipartClient
+
+        backup, point = self._streaming_backup()
+        client, calls = FakeMultipartClient(), []
+        with self.assertRaises(NodeBackupFailedError):
+            self._run_engine(backup, client, self._fake_popen(calls, dump=b"x", returncode=2))
+        point.refresh_from_db()
+        self.assertTrue(client.aborted)
+        self.assertIsNone(client.body)
+        self.assertEqual(point.status, point.Status.UPLOAD_FAILED)
+
+
 class MariadbDirectEngineTests(DatabaseEngineBase):
     """snapshot_mariadb direct mode: mariadb-appropriate flags."""
 
@@ -967,6 +1500,61 @@ class PostgresDirectEngineTests(DatabaseEngineBase):
         with zipfile.ZipFile(f"_storage/{backup.uuid}.zip") as zf:
             self.assertEqual(zf.read("appdb.sql"), b"-- pg dump\n")
 
+    def test_tables_are_dumped_concurrently(self):
+        node, backup = self._make_backup(
+            db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL,
+            version="postgres_16", port=5432, all_tables=False, tables=["a", "b", "c"])
+        node.database.dump_parallelism = 3
+        node.database.save()
+        calls = []
+        # Each dump waits for the other two: a serial engine would time out here.
+        barrier = threading.Barrier(3, timeout=10)
+        recorded = _recorded_run(calls, dump=b"-- pg dump\n")
+
+        def fake_run(argv, **kwargs):
+            barrier.wait()
+            return recorded(argv, **kwargs)
+
+        with self._patch_check_connection(), \
+             mock.patch.object(PG_ENGINE.subprocess, "run", side_effect=fake_run), \
+             mock.patch.object(PG_ENGINE, "delete_from_disk"):
+            PG_ENGINE.snapshot_postgresql(backup)
+        backup.refresh_from_db()
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        self.assertEqual(len(calls), 3)
+        with zipfile.ZipFile(f"_storage/{backup.uuid}.zip") as zf:
+            # Plus the placeholder mkdir_p writes into every dump directory.
+            self.assertEqual(sorted(zf.namelist()), ["a.sql", "b.sql", "backupsheep.txt", "c.sql"])
+
+    def test_directory_format_runs_one_parallel_pg_dump(self):
+        node, backup = self._make_backup(
+            db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL,
+            version="postgres_16", port=5432)
+        node.database.dump_parallelism = 4
+        node.database.option_postgres_directory = True
+        node.database.save()
+        calls = []
+
+        def fake_run(argv, **kwargs):
+            calls.append(list(argv))
+            dump_dir = argv[argv.index("-f") + 1]
+            os.makedirs(dump_dir)
+            with open(os.path.join(dump_dir, "toc.dat"), "wb") as fh:
+                fh.write(b"PGDMP")
+            return SimpleNamespace(returncode=0, stderr=b"")
+
+        with self._patch_check_connection(), \
+             mock.patch.object(PG_ENGINE.subprocess, "run", side_effect=fake_run), \
+             mock.patch.object(PG_ENGINE, "delete_from_disk"):
+            PG_ENGINE.snapshot_postgresql(backup)
+        backup.refresh_from_db()
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        self.assertEqual(len(calls), 1)
+        self.assertIn("-Fd", calls[0])
+        self.assertEqual(calls[0][calls[0].index("-j") + 1], "4")
+        with zipfile.ZipFile(f"_storage/{backup.uuid}.zip") as zf:
+            self.assertEqual(zf.read("appdb.pgdump/toc.dat"), b"PGDMP")
+
     def test_undecryptable_credentials_fail_before_subprocess(self):
         node, backup = self._make_backup(
             db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL,
@@ -981,6 +1569,263 @@ class PostgresDirectEngineTests(DatabaseEngineBase):
         self.assertEqual(calls, [])
 
 
+class PostgresqlIncrementalEngineTests(DatabaseEngineBase):
+    """backup_mode incremental: pg_basebackup bases and pg_receivewal increments."""
+
+    def _incremental_backup(self, version="postgres_16"):
+        node, backup = self._make_backup(
+            db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL,
+            version=version, port=5432)
+        node.database.backup_mode = CoreDatabase.BackupMode.INCREMENTAL
+        node.database.save()
+        return node, backup
+
+    @staticmethod
+    def _fake_run(calls):
+        def fake_run(argv, **kwargs):
+            calls.append(list(argv))
+            binary = os.path.basename(argv[0])
+            if binary == "pg_basebackup":
+                base_dir = argv[argv.index("-D") + 1]
+                os.makedirs(base_dir)
+                for name in ("base.tar", "pg_wal.tar"):
+                    with open(os.path.join(base_dir, name), "wb") as fh:
+                        fh.write(b"tar")
+            elif binary == "pg_receivewal":
+                wal_dir = argv[argv.index("-D") + 1]
+                with open(os.path.join(wal_dir, "000000010000000000000003"), "wb") as fh:
+                    fh.write(b"wal")
+            stdout = b"0/4000000\n" if "SELECT pg_switch_wal()" in argv else b""
+            return SimpleNamespace(returncode=0, stdout=stdout, stderr=b"")
+
+        return fake_run
+
+    def _snapshot(self, backup, calls):
+        with self._patch_check_connection(), \
+             mock.patch.object(PG_ENGINE.subprocess, "run", side_effect=self._fake_run(calls)), \
+             mock.patch.object(PG_ENGINE, "delete_from_disk"):
+            PG_ENGINE.snapshot_postgresql(backup)
+        backup.refresh_from_db()
+
+    def test_first_run_takes_a_base_backup_with_a_fresh_slot(self):
+        node, backup = self._incremental_backup()
+        calls = []
+        self._snapshot(backup, calls)
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        self.assertEqual(backup.chain_position, 0)
+        self.assertIsNone(backup.base_backup)
+        slot = f"bs_node_{node.id}"
+        self.assertIn("pg_drop_replication_slot", calls[0][-1])
+        basebackup = calls[1]
+        self.assertIn("--create-slot", basebackup)
+        self.assertIn(f"--slot={slot}", basebackup)
+        self.assertEqual(basebackup[basebackup.index("-X") + 1], "stream")
+        self.assertNotIn(DB_PASS, " ".join(basebackup))
+        with zipfile.ZipFile(f"_storage/{backup.uuid}.zip") as zf:
+            self.assertEqual(
+                sorted(zf.namelist()), ["backupsheep.txt", "base/base.tar", "base/pg_wal.tar"])
+
+    def test_next_run_ships_wal_since_the_base(self):
+        node, base = self._incremental_backup()
+        base.status = UtilBackup.Status.COMPLETE
+        base.chain_position = 0
+        base.save()
+        backup = CoreDatabaseBackup.objects.create(
+            database=node.database, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.PENDING, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        self.addCleanup(_cleanup_storage_artifacts(
+            f"_storage/{backup.uuid}.log", f"_storage/{backup.uuid}.zip",
+            f"_storage/{backup.uuid}/",
+        ))
+        calls = []
+        self._snapshot(backup, calls)
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        self.assertEqual(backup.base_backup_id, base.id)
+        self.assertEqual(backup.chain_position, 1)
+        self.assertEqual(backup.metadata["end_lsn"], "0/4000000")
+        receivewal = calls[-1]
+        self.assertEqual(os.path.basename(receivewal[0]), "pg_receivewal")
+        self.assertIn("--endpos=0/4000000", receivewal)
+        self.assertIn(f"--slot=bs_node_{node.id}", receivewal)
+        with zipfile.ZipFile(f"_storage/{backup.uuid}.zip") as zf:
+            self.assertEqual(sorted(zf.namelist()), ["backupsheep.txt", "wal/000000010000000000000003"])
+
+    def test_failed_increment_breaks_the_chain(self):
+        node, base = self._incremental_backup()
+        base.status = UtilBackup.Status.COMPLETE
+        base.chain_position = 0
+        base.save()
+        CoreDatabaseBackup.objects.create(
+            database=node.database, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.FAILED, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND, base_backup=base, chain_position=1,
+        )
+        backup = CoreDatabaseBackup.objects.create(
+            database=node.database, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.PENDING, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        self.assertEqual(plan_chain(backup), (None, 0))
+
+    def test_server_before_15_is_rejected(self):
+        node, backup = self._incremental_backup(version="postgres_14")
+        calls = []
+        with self.assertRaises(NodeBackupFailedError):
+            self._snapshot(backup, calls)
+        self.assertEqual(calls, [])
+
+    def test_ssh_connection_is_rejected(self):
+        node, backup = self._make_backup(
+            db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL,
+            version="postgres_16", port=5432, use_private_key=True)
+        node.database.backup_mode = CoreDatabase.BackupMode.INCREMENTAL
+        node.database.save()
+        with self._patch_check_connection(), \
+             mock.patch.object(CoreAuthDatabase, "get_ssh_client") as m_ssh, \
+             mock.patch.object(PG_ENGINE, "delete_from_disk"):
+            with self.assertRaises(NodeBackupFailedError):
+                PG_ENGINE.snapshot_postgresql(backup)
+        m_ssh.assert_not_called()
+
+
+class MysqlIncrementalEngineTests(DatabaseEngineBase):
+    """backup_mode incremental: binlog-positioned full dumps and mysqlbinlog increments."""
+
+    DUMP = (b"-- CHANGE REPLICATION SOURCE TO SOURCE_LOG_FILE='binlog.000003',"
+            b" SOURCE_LOG_POS=157;\nCREATE TABLE t(id int);\n")
+    BINLOG_FORMAT = b"ROW\n"
+
+    def _incremental_backup(self, version="mysql_8_0", **kwargs):
+        node, backup = self._make_backup(
+            db_type=CoreAuthDatabase.DatabaseType.MYSQL, version=version, **kwargs)
+        node.database.backup_mode = CoreDatabase.BackupMode.INCREMENTAL
+        node.database.save()
+        return node, backup
+
+    def _fake_run(self, calls):
+        def fake_run(argv, **kwargs):
+            calls.append(list(argv))
+            binary = os.path.basename(argv[0])
+            stdout = b""
+            if binary == "mysqldump":
+                kwargs["stdout"].write(self.DUMP)
+            elif binary == "mysqlbinlog":
+                kwargs["stdout"].write(b"INSERT INTO t VALUES (1);\n")
+            elif "SELECT @@GLOBAL.binlog_format" in argv:
+                stdout = self.BINLOG_FORMAT
+            elif "SHOW MASTER STATUS" in argv:
+                stdout = b"binlog.000004\t900\t\t\t\n"
+            elif "SHOW BINARY LOGS" in argv:
+                stdout = b"binlog.000002\t500\tNo\nbinlog.000003\t1000\tNo\nbinlog.000004\t900\tNo\n"
+            return SimpleNamespace(returncode=0, stdout=stdout, stderr=b"")
+
+        return fake_run
+
+    def _snapshot(self, backup, calls):
+        with self._patch_check_connection(), \
+             mock.patch.object(MYSQL_ENGINE.subprocess, "run", side_effect=self._fake_run(calls)), \
+             mock.patch.object(MYSQL_ENGINE, "delete_from_disk"):
+            MYSQL_ENGINE.snapshot_mysql(backup)
+        backup.refresh_from_db()
+
+    def test_base_records_binlog_coordinates(self):
+        node, backup = self._incremental_backup()
+        calls = []
+        self._snapshot(backup, calls)
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        self.assertEqual(backup.chain_position, 0)
+        self.assertEqual(backup.metadata, {"binlog_file": "binlog.000003", "binlog_pos": 157})
+        self.assertEqual(len(calls), 2)
+        self.assertIn("--source-data=2", calls[1])
+        self.assertIn("--single-transaction", calls[1])
+
+    def test_statement_based_binlog_is_rejected(self):
+        node, backup = self._incremental_backup()
+        self.BINLOG_FORMAT = b"STATEMENT\n"
+        calls = []
+        with self.assertRaises(NodeBackupFailedError):
+            self._snapshot(backup, calls)
+        self.assertEqual([os.path.basename(call[0]) for call in calls], ["mysql"])
+
+    def _increment(self, **kwargs):
+        node, base = self._incremental_backup(**kwargs)
+        base.status = UtilBackup.Status.COMPLETE
+        base.chain_position = 0
+        base.metadata = {"binlog_file": "binlog.000003", "binlog_pos": 157}
+        base.save()
+        backup = CoreDatabaseBackup.objects.create(
+            database=node.database, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.PENDING, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        self.addCleanup(_cleanup_storage_artifacts(
+            f"_storage/{backup.uuid}.log", f"_storage/{backup.uuid}.zip",
+            f"_storage/{backup.uuid}/", f"_storage/my_{backup.uuid}.cnf",
+        ))
+        return base, backup
+
+    def test_increment_reads_binlog_range_since_previous_run(self):
+        base, backup = self._increment()
+        calls = []
+        self._snapshot(backup, calls)
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        self.assertEqual(backup.base_backup_id, base.id)
+        self.assertEqual(backup.chain_position, 1)
+        self.assertEqual(backup.metadata, {"binlog_file": "binlog.000004", "binlog_pos": 900})
+        binlog_argv = calls[-1]
+        self.assertEqual(os.path.basename(binlog_argv[0]), "mysqlbinlog")
+        self.assertTrue(binlog_argv[1].startswith("--defaults-extra-file="))
+        self.assertIn("--read-from-remote-server", binlog_argv)
+        self.assertIn("--database=appdb", binlog_argv)
+        self.assertIn("--start-position=157", binlog_argv)
+        self.assertIn("--stop-position=900", binlog_argv)
+        self.assertIn("--skip-gtids", binlog_argv)
+        self.assertEqual(binlog_argv[-2:], ["binlog.000003", "binlog.000004"])
+        with zipfile.ZipFile(f"_storage/{backup.uuid}.zip") as zf:
+            self.assertEqual(sorted(zf.namelist()), ["appdb.binlog", "backupsheep.txt"])
+
+    def test_mysql_5_5_increment_runs_mysqlbinlog_without_gtids(self):
+        _base, backup = self._increment(version="mysql_5_5")
+        calls = []
+        self._snapshot(backup, calls)
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        binlog_argv = calls[-1]
+        self.assertEqual(os.path.basename(binlog_argv[0]), "mysqlbinlog")
+        self.assertNotIn("--skip-gtids", binlog_argv)
+
+    def test_tables_mode_is_rejected(self):
+        node, backup = self._incremental_backup(all_tables=False, tables=["orders"])
+        calls = []
+        with self.assertRaises(NodeBackupFailedError):
+            self._snapshot(backup, calls)
+        self.assertEqual(calls, [])
+
+
+class BinlogHelperTests(TestCase):
+    def test_dump_position_accepts_both_spellings(self):
+        for line in (
+            "-- CHANGE MASTER TO MASTER_LOG_FILE='mysql-bin.000007', MASTER_LOG_POS=344;\n",
+            "-- CHANGE REPLICATION SOURCE TO SOURCE_LOG_FILE='mysql-bin.000007', SOURCE_LOG_POS=344;\n",
+        ):
+            with tempfile.NamedTemporaryFile("w", suffix=".sql", delete=False) as fh:
+                fh.write("-- MySQL dump\n" + line)
+            self.addCleanup(os.remove, fh.name)
+            self.assertEqual(parse_dump_position(fh.name), ("mysql-bin.000007", 344))
+
+    def test_flags_follow_server_version(self):
+        self.assertEqual(source_data_flag("mysql_5_7"), "--master-data=2")
+        self.assertEqual(source_data_flag("mysql_8_0"), "--source-data=2")
+        self.assertEqual(source_data_flag("mariadb_10_11"), "--master-data=2")
+        self.assertEqual(status_query("mysql_8_4"), "SHOW BINARY LOG STATUS")
+        self.assertEqual(status_query("mysql_8_0"), "SHOW MASTER STATUS")
+
+    def test_purged_start_file_is_reported(self):
+        with self.assertRaises(ValueError):
+            binlog_range("binlog.000004\t900\tNo\n", "binlog.000003", "binlog.000004")
+
+
 class MysqlSshEngineTests(DatabaseEngineBase):
     """snapshot_mysql over SSH: remote defaults file, exit-status checks, cleanup."""
 
@@ -1041,6 +1886,52 @@ class MysqlSshEngineTests(DatabaseEngineBase):
         self.assertFalse(os.path.exists(key_path))
 
 
+class SshCompressedTransportTests(DatabaseEngineBase):
+    """option_ssh_compress: dumps are gzip'ed remotely and archived as-is."""
+
+    DUMP = b"-- dump\nINSERT INTO t VALUES (1);\n" * 100
+
+    def _run(self, handler):
+        node, backup = self._make_backup(
+            db_type=CoreAuthDatabase.DatabaseType.MYSQL, version="mysql_8_0",
+            use_private_key=True)
+        node.database.option_ssh_compress = True
+        node.database.save()
+        ssh = _FakeSSH(handler)
+        with self._patch_check_connection(), \
+             mock.patch.object(CoreAuthDatabase, "get_ssh_client",
+                               return_value=(ssh, self._key_file())), \
+             mock.patch.object(MYSQL_ENGINE, "delete_from_disk"):
+            MYSQL_ENGINE.snapshot_mysql(backup)
+        return backup, ssh
+
+    def test_dump_is_gzipped_remotely_and_stored(self):
+        backup, ssh = self._run(lambda command: (
+            (gzip.compress(self.DUMP), b"BS_DUMP_EXIT=0\n", 0) if "| gzip" in command
+            else (b"", b"", 0)
+        ))
+        dump_cmds = [c for c in ssh.commands if "mysqldump " in c]
+        self.assertEqual(len(dump_cmds), 1)
+        self.assertTrue(dump_cmds[0].endswith("| gzip -3"))
+
+        backup.refresh_from_db()
+        self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
+        with zipfile.ZipFile(f"_storage/{backup.uuid}.zip") as zf:
+            info = zf.getinfo("appdb.sql.gz")
+            self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(gzip.decompress(zf.read(info)), self.DUMP)
+        # The exit-status marker is not logged as a warning.
+        self.assertNotIn("BS_DUMP_EXIT", self._read_log(backup))
+
+    def test_dump_failure_behind_gzip_is_detected(self):
+        # gzip itself exits 0; the dump's status comes from the stderr marker.
+        with self.assertRaises(NodeBackupFailedError):
+            self._run(lambda command: (
+                (gzip.compress(b""), b"access denied\nBS_DUMP_EXIT=2\n", 0) if "| gzip" in command
+                else (b"", b"", 0)
+            ))
+
+
 class PostgresSshEngineTests(DatabaseEngineBase):
     """snapshot_postgresql over SSH: all-databases enumeration filters templates."""
 
@@ -1280,7 +2171,7 @@ class LftpFailureDetectionTests(WebsiteEngineBase):
         with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
              mock.patch.object(W.subprocess, "run", side_effect=fake_run), \
              mock.patch.object(W, "delete_from_disk"), \
-             mock.patch.object(W, "_finalize_zip") as finalize:
+             mock.patch.object(W, "_finalize_zip", return_value=0) as finalize:
             W._snapshot_lftp(backup, base_dir=base_dir, incremental=incremental)
         return finalize
 
@@ -1310,7 +2201,7 @@ class LftpFailureDetectionTests(WebsiteEngineBase):
         with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
              mock.patch.object(W.subprocess, "run", side_effect=self._failed_run), \
              mock.patch.object(W, "delete_from_disk") as cleanup, \
-             mock.patch.object(W, "_finalize_zip") as finalize:
+             mock.patch.object(W, "_finalize_zip", return_value=0) as finalize:
             tmp = tempfile.mkdtemp()
             self.addCleanup(shutil.rmtree, tmp, True)
             with self.assertRaises(NodeBackupFailedError):
@@ -1383,7 +2274,7 @@ class LftpFailureDetectionTests(WebsiteEngineBase):
         with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
              mock.patch.object(W.subprocess, "run", side_effect=fake_run), \
              mock.patch.object(W, "delete_from_disk"), \
-             mock.patch.object(W, "_finalize_zip"):
+             mock.patch.object(W, "_finalize_zip", return_value=0):
             W._snapshot_lftp(backup, base_dir=tmp + os.sep, incremental=False)
         self.assertEqual(len(scripts), 1)
         self.assertIn('get -P "index.html"', scripts[0])
@@ -1424,6 +2315,85 @@ class EnsureDiskSpaceHelperTests(TestCase):
             self.assertIsNone(ensure_disk_space(2 << 30))
 
 
+@override_settings(DISK_RESERVATION_WAIT=0, DISK_RESERVATION_TTL=3600)
+class DiskLedgerTests(BaseTestCase):
+    """Concurrent runs reserve their estimates against the same free space."""
+
+    GB = 1 << 30
+
+    def setUp(self):
+        super().setUp()
+        self.node = factories.make_website_node(self.account, self.member)
+        patcher = mock.patch.object(
+            LEDGER.shutil, "disk_usage", return_value=SimpleNamespace(total=0, used=0, free=10 * self.GB)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_second_reservation_is_refused_while_the_first_holds_the_space(self):
+        LEDGER.reserve_disk_space("a", 6 * self.GB, node=self.node)
+        with self.assertRaises(RuntimeError) as ctx:
+            LEDGER.reserve_disk_space("b", 6 * self.GB, node=self.node)
+        self.assertIn("~6.00 GB of it reserved", str(ctx.exception))
+
+        LEDGER.release_disk_space("a")
+        LEDGER.reserve_disk_space("b", 6 * self.GB, node=self.node)
+        self.assertEqual(LEDGER.reserved_bytes(), 6 * self.GB)
+
+    @override_settings(DISK_RESERVATION_WAIT=60)
+    def test_waits_for_other_reservations_to_release(self):
+        LEDGER.reserve_disk_space("a", 6 * self.GB, node=self.node)
+        with mock.patch.object(LEDGER.time, "sleep", side_effect=lambda _s: LEDGER.release_disk_space("a")) as slept:
+            LEDGER.reserve_disk_space("b", 6 * self.GB, node=self.node)
+        slept.assert_called_once()
+        self.assertEqual(list(CoreDiskReservation.objects.values_list("key", flat=True)), ["b"])
+
+    def test_expired_reservations_do_not_count(self):
+        CoreDiskReservation.objects.create(key="dead", what="backup", bytes=9 * self.GB, expires=time.time() - 1)
+        LEDGER.reserve_disk_space("b", 6 * self.GB, node=self.node)
+        self.assertFalse(CoreDiskReservation.objects.filter(key="dead").exists())
+
+    def test_estimate_follows_the_nodes_dump_to_zip_ratio(self):
+        self.assertEqual(LEDGER.estimate_bytes(self.node, 2 * self.GB, multiplier=2), 4 * self.GB)
+        for ratio in (2, 3, 4):
+            CoreDiskReservation.objects.create(
+                node=self.node, key=f"done-{ratio}", what="backup", bytes=self.GB, expires=0,
+                released=time.time(), dump_bytes=ratio * self.GB, zip_bytes=self.GB,
+            )
+        # Median ratio 3: dump (3x) plus zip, with headroom.
+        self.assertEqual(
+            LEDGER.estimate_bytes(self.node, 2 * self.GB, multiplier=2),
+            int(4 * 2 * self.GB * LEDGER.ESTIMATE_MARGIN),
+        )
+        self.assertEqual(LEDGER.estimate_bytes(self.node, 2 * self.GB, multiplier=1.2, refine=False),
+                         int(2.4 * self.GB))
+
+    def test_delete_from_disk_releases_and_records_dump_sizes(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base, True)
+        storage = os.path.join(base, "_storage")
+        os.makedirs(os.path.join(storage, "u1"))
+        with open(os.path.join(storage, "u1", "dump.sql"), "wb") as fh:
+            fh.write(b"x" * 300)
+        with open(os.path.join(storage, "u1.zip"), "wb") as fh:
+            fh.write(b"x" * 100)
+        LEDGER.reserve_disk_space("u1", self.GB, node=self.node)
+
+        with override_settings(BASE_DIR=base):
+            helper_tasks.delete_from_disk.apply(args=["u1", "dir"])
+        reservation = CoreDiskReservation.objects.get(key="u1")
+        self.assertIsNotNone(reservation.released)
+        self.assertEqual((reservation.dump_bytes, reservation.zip_bytes), (300, 100))
+        self.assertEqual(LEDGER.reserved_bytes(), 0)
+        self.assertEqual(LEDGER.dump_ratio(self.node.id), 3)
+
+    def test_failed_run_release_keeps_no_history(self):
+        LEDGER.reserve_disk_space("u2", self.GB, node=self.node)
+        with override_settings(BASE_DIR=tempfile.mkdtemp()):
+            helper_tasks.delete_from_disk.apply(args=["u2", "both"])
+        self.assertFalse(CoreDiskReservation.objects.exists())
+
+
 class DiskSpacePreflightEngineTests(WebsiteEngineBase):
     """The engines run the preflight BEFORE any download/dump, with an estimate
     of max(multiplier * last COMPLETE backup size, 1 GiB)."""
@@ -1527,8 +2497,135 @@ class DiskSpacePreflightEngineTests(WebsiteEngineBase):
                       str(ctx.exception))
 
 
+class _FakeTarChannel:
+    def __init__(self):
+        self.channel = SimpleNamespace(set_combine_stderr=lambda flag: None,
+                                       recv_exit_status=lambda: 0)
+
+    def readlines(self):
+        return []
+
+
+class _FakeTarSFTP:
+    def __init__(self):
+        self.put_calls, self.removed = [], []
+
+    def get(self, remote, local):
+        with open(local, "wb") as fh:
+            fh.write(b"snar" if remote.endswith(".snar") else b"tar")
+
+    def put(self, local, remote):
+        self.put_calls.append((local, remote))
+
+    def remove(self, remote):
+        self.removed.append(remote)
+
+
+class WebsiteIncrementalTarTests(WebsiteEngineBase):
+    """INCREMENTAL_V2: tar --listed-incremental chains with per-node .snar state."""
+
+    def _incremental_backup(self):
+        node, backup = self._make_backup(
+            backup_type=CoreWebsite.BackupType.INCREMENTAL_V2, use_private_key=True)
+        node.website.paths = [{"path": "/var/www/site", "type": "directory"}]
+        node.website.tar_temp_backup_dir = "/tmp/bs"
+        node.website.save()
+        self.addCleanup(_cleanup_storage_artifacts(
+            f"_storage/website_cache/{node.uuid_str}.snar"))
+        return node, backup
+
+    def _snapshot(self, backup):
+        commands = []
+        ssh = SimpleNamespace(
+            exec_command=lambda command, timeout=None: (
+                commands.append(command) or (None, _FakeTarChannel(), None)))
+        sftp = _FakeTarSFTP()
+        with mock.patch.object(CoreAuthWebsite, "check_connection", lambda *a, **k: None), \
+             mock.patch.object(CoreAuthWebsite, "get_sftp_client",
+                               return_value=(sftp, ssh, None)), \
+             mock.patch.object(W.subprocess, "run",
+                               return_value=SimpleNamespace(stdout="", returncode=0)), \
+             mock.patch.object(W, "delete_from_disk"):
+            W._snapshot_tar(backup, incremental=True)
+        backup.refresh_from_db()
+        return commands, sftp
+
+    def test_first_run_is_a_level_zero_base(self):
+        node, backup = self._incremental_backup()
+        commands, sftp = self._snapshot(backup)
+        snar = f"/tmp/bs/{node.uuid_str}/{node.uuid_str}.snar"
+        self.assertIn(f"rm -f {snar}", commands)
+        tar_command = next(c for c in commands if c.startswith("tar --create"))
+        self.assertIn(f"--listed-incremental={snar}", tar_command)
+        self.assertEqual(sftp.put_calls, [])
+        self.assertEqual(backup.chain_position, 0)
+        self.assertIsNone(backup.base_backup)
+        with open(W._snar_path(node), "rb") as fh:
+            self.assertEqual(fh.read(), b"snar")
+
+    def test_next_run_continues_from_the_saved_state(self):
+        node, base = self._incremental_backup()
+        self._snapshot(base)
+        base.status = UtilBackup.Status.COMPLETE
+        base.save()
+        backup = CoreWebsiteBackup.objects.create(
+            website=node.website, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.PENDING, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        self.addCleanup(_cleanup_storage_artifacts(
+            f"_storage/{backup.uuid}.log", f"_storage/{backup.uuid}.zip",
+            f"_storage/{backup.uuid}/"))
+        commands, sftp = self._snapshot(backup)
+        snar = f"/tmp/bs/{node.uuid_str}/{node.uuid_str}.snar"
+        self.assertEqual(sftp.put_calls, [(W._snar_path(node), snar)])
+        self.assertNotIn(f"rm -f {snar}", commands)
+        self.assertEqual(backup.base_backup_id, base.id)
+        self.assertEqual(backup.chain_position, 1)
+
+    def test_state_of_an_incomplete_run_restarts_the_chain(self):
+        node, base = self._incremental_backup()
+        self._snapshot(base)
+        base.status = UtilBackup.Status.COMPLETE
+        base.save()
+        # A later run replaced the local state, then failed before completing.
+        with open(W._snar_path(node), "wb") as fh:
+            fh.write(b"snar of a failed run")
+        backup = CoreWebsiteBackup.objects.create(
+            website=node.website, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.PENDING, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        self.addCleanup(_cleanup_storage_artifacts(
+            f"_storage/{backup.uuid}.log", f"_storage/{backup.uuid}.zip",
+            f"_storage/{backup.uuid}/"))
+        _commands, sftp = self._snapshot(backup)
+        self.assertEqual(sftp.put_calls, [])
+        self.assertEqual(backup.chain_position, 0)
+        self.assertIsNone(backup.base_backup)
+
+    def test_changed_paths_restart_the_chain(self):
+        node, base = self._incremental_backup()
+        self._snapshot(base)
+        base.status = UtilBackup.Status.COMPLETE
+        base.save()
+        node.website.paths = [{"path": "/var/www/other", "type": "directory"}]
+        node.website.save()
+        backup = CoreWebsiteBackup.objects.create(
+            website=node.website, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.PENDING, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        self.addCleanup(_cleanup_storage_artifacts(
+            f"_storage/{backup.uuid}.log", f"_storage/{backup.uuid}.zip",
+            f"_storage/{backup.uuid}/"))
+        _commands, sftp = self._snapshot(backup)
+        self.assertEqual(sftp.put_calls, [])
+        self.assertEqual(backup.chain_position, 0)
+
+
 class FinalizeZipManifestTests(WebsiteEngineBase):
-    """_finalize_zip writes the manifest to TOP-LEVEL _storage/{uuid}.files --
+    """_finalize_zip writes the manifest to TOP-LEVEL _storage/{uuid}.manifest --
     never inside the zip -- so archives hold pure site content."""
 
     def _tree(self):
@@ -1543,9 +2640,10 @@ class FinalizeZipManifestTests(WebsiteEngineBase):
 
     def _finalize(self, backup, tmp, *, keep_dir):
         self.addCleanup(_cleanup_storage_artifacts(
-            f"_storage/{backup.uuid}.files",
+            f"_storage/{backup.uuid}.manifest",
             f"_storage/{backup.uuid}.zip",
             f"_storage/{backup.uuid}.log",
+            W._cache_zip_path(backup.website.node),
         ))
         with mock.patch.object(W, "delete_from_disk") as cleanup:
             W._finalize_zip(backup, tmp + os.sep, keep_dir=keep_dir)
@@ -1556,14 +2654,13 @@ class FinalizeZipManifestTests(WebsiteEngineBase):
         tmp = self._tree()
         self._finalize(backup, tmp, keep_dir=False)
 
-        manifest = f"_storage/{backup.uuid}.files"
+        manifest = f"_storage/{backup.uuid}.manifest"
         self.assertTrue(os.path.exists(manifest))
-        with open(manifest) as fh:
-            entries = set(fh.read().splitlines())
-        self.assertEqual(entries, {"index.html", os.path.join("sub", "world.txt")})
+        entries = {entry.path: entry.size for entry in read_manifest(manifest)}
+        self.assertEqual(entries, {"index.html": 11, "sub/world.txt": 5})
 
         # The tree itself holds no manifest copy...
-        self.assertFalse(os.path.exists(os.path.join(tmp, f"{backup.uuid}.files")))
+        self.assertFalse(os.path.exists(os.path.join(tmp, f"{backup.uuid}.manifest")))
 
         # ...and the zip is pure site content.
         zip_path = f"_storage/{backup.uuid}.zip"
@@ -1572,10 +2669,12 @@ class FinalizeZipManifestTests(WebsiteEngineBase):
             names = zf.namelist()
             self.assertIn("index.html", names)
             self.assertIn(os.path.join("sub", "world.txt"), names)
-            self.assertFalse(any(n.endswith(".files") for n in names))
+            self.assertFalse(any(n.endswith(".manifest") for n in names))
 
         backup.refresh_from_db()
         self.assertEqual(backup.total_files, 2)
+        self.assertEqual(backup.total_folders, 1)
+        self.assertEqual(backup.raw_size, 16)
         self.assertEqual(backup.size, os.stat(zip_path).st_size)
         self.assertEqual(backup.status, UtilBackup.Status.DOWNLOAD_COMPLETE)
 
@@ -1599,6 +2698,229 @@ class FinalizeZipManifestTests(WebsiteEngineBase):
         cleanup = self._finalize(backup, cache, keep_dir=True)
         cleanup.apply_async.assert_not_called()
         # The cache tree is untouched for the next incremental run, and nothing
-        # cache-local was planted: no {uuid}.files inside the cache.
+        # cache-local was planted: no {uuid}.manifest inside the cache.
         self.assertEqual(sorted(os.listdir(cache)), ["index.html", "sub"])
         self.assertTrue(os.path.exists(os.path.join(cache, "sub", "world.txt")))
+
+    def test_cache_mode_keeps_the_zip_as_next_runs_reference(self):
+        node, backup = self._make_backup()
+        tmp = self._tree()
+        self._finalize(backup, tmp, keep_dir=True)
+        reference = W._cache_zip_path(node)
+        self.assertTrue(os.path.samefile(reference, f"_storage/{backup.uuid}.zip"))
+
+
+class TreeArchiverTests(SimpleTestCase):
+    """archive.TreeArchiver: archives from the caller's scan; an incremental
+    snapshot zip is synced from the previous one."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.tree = os.path.join(self.tmp, "tree")
+        os.makedirs(os.path.join(self.tree, "sub"))
+        os.makedirs(os.path.join(self.tree, "empty"))
+        for name, body in (("keep.txt", "keep"), ("change.txt", "old"),
+                           (os.path.join("sub", "gone.txt"), "gone")):
+            with open(os.path.join(self.tree, name), "w") as fh:
+                fh.write(body)
+        self.reference = self._archive("reference.zip")
+
+    def _archive(self, name, fmt=ARCHIVE.ZIP, reference=None):
+        archiver = ARCHIVE.TreeArchiver(
+            fmt, self.tree, os.path.join(self.tmp, name), reference_zip=reference)
+        for rel, _st, is_dir in MANIFEST.walk_tree(self.tree):
+            archiver.add(rel, is_dir)
+        return archiver.close()
+
+    def test_zip_holds_the_fed_tree_without_a_second_walk(self):
+        with mock.patch.object(ARCHIVE.subprocess, "run") as run:
+            target = self._archive("next.zip")
+        run.assert_not_called()
+        with zipfile.ZipFile(target) as zf:
+            self.assertEqual(
+                sorted(zf.namelist()),
+                ["change.txt", "empty/", "keep.txt", "sub/", "sub/gone.txt"],
+            )
+
+    def test_syncs_changes_and_leaves_the_reference_alone(self):
+        with open(os.path.join(self.tree, "change.txt"), "w") as fh:
+            fh.write("new contents")
+        os.remove(os.path.join(self.tree, "sub", "gone.txt"))
+        with open(os.path.join(self.tree, "added.txt"), "w") as fh:
+            fh.write("added")
+        with open(self.reference, "rb") as fh:
+            reference_bytes = fh.read()
+
+        target = self._archive("next.zip", reference=self.reference)
+
+        with zipfile.ZipFile(target) as zf:
+            files = {n for n in zf.namelist() if not n.endswith("/")}
+            self.assertEqual(files, {"keep.txt", "change.txt", "added.txt"})
+            self.assertEqual(zf.read("change.txt"), b"new contents")
+            self.assertEqual(zf.read("keep.txt"), b"keep")
+        with open(self.reference, "rb") as fh:
+            self.assertEqual(fh.read(), reference_bytes)
+
+    def test_unchanged_tree_reuses_every_entry(self):
+        target = self._archive("next.zip", reference=self.reference)
+        with zipfile.ZipFile(self.reference) as before, zipfile.ZipFile(target) as after:
+            self.assertEqual(
+                [(i.filename, i.CRC, i.compress_size) for i in before.infolist()],
+                [(i.filename, i.CRC, i.compress_size) for i in after.infolist()],
+            )
+
+    def test_newline_names_fall_back_to_a_full_zip(self):
+        with open(os.path.join(self.tree, "odd\nname"), "w") as fh:
+            fh.write("odd")
+        target = self._archive("next.zip")
+        with zipfile.ZipFile(target) as zf:
+            self.assertIn("odd\nname", zf.namelist())
+            self.assertIn("keep.txt", zf.namelist())
+
+    @unittest.skipUnless(shutil.which("zstd"), "zstd binary not installed")
+    @override_settings(ARCHIVE_ZSTD_LEVEL=3, ARCHIVE_ZSTD_THREADS=1)
+    def test_tar_zstd_holds_the_fed_tree(self):
+        target = self._archive("next.tar.zst", fmt=ARCHIVE.TAR_ZSTD)
+        listing = subprocess.run(
+            ["tar", "--zstd", "--list", f"--file={target}"],
+            stdout=subprocess.PIPE, check=True, text=True,
+        ).stdout.split()
+        self.assertEqual(
+            sorted(listing), ["change.txt", "empty/", "keep.txt", "sub/", "sub/gone.txt"])
+
+
+class DumpArchiveTests(SimpleTestCase):
+    """archive.write_dump_archive: the database engines' tree report and archive
+    come from one scan."""
+
+    def test_logs_every_dump_and_stores_gzip_members(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        source = os.path.join(tmp, "dumps")
+        os.makedirs(os.path.join(source, "tables"))
+        with open(os.path.join(source, "app.sql"), "w") as fh:
+            fh.write("CREATE TABLE t (id int);")
+        with open(os.path.join(source, "tables", "users.sql.gz"), "wb") as fh:
+            fh.write(gzip.compress(b"INSERT"))
+        log = io.StringIO()
+        dest = os.path.join(tmp, "out.zip")
+        ARCHIVE.write_dump_archive(SimpleNamespace(schedule=None), source, dest, log)
+
+        self.assertEqual(log.getvalue().splitlines(), [
+            "app.sql (24 bytes)",
+            f"tables/users.sql.gz ({os.path.getsize(os.path.join(source, 'tables', 'users.sql.gz'))} bytes)",
+        ])
+        with zipfile.ZipFile(dest) as zf:
+            members = {i.filename: i.compress_type for i in zf.infolist()}
+        self.assertEqual(members, {
+            "app.sql": zipfile.ZIP_DEFLATED,
+            "tables/users.sql.gz": zipfile.ZIP_STORED,
+        })
+
+
+class FileManifestTests(SimpleTestCase):
+    """integration.manifest: sorted compact manifests, digest reuse, streaming diff."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.tree = os.path.join(self.tmp, "tree")
+        os.makedirs(os.path.join(self.tree, "a", "b"))
+        os.makedirs(os.path.join(self.tree, "a.d"))
+        for name in ("a/x", "a/b/y", "a.d/z", "top"):
+            with open(os.path.join(self.tree, name), "w") as fh:
+                fh.write(name)
+        os.symlink("top", os.path.join(self.tree, "link"))
+
+    def _write(self, name, previous=None):
+        path = os.path.join(self.tmp, name)
+        count = MANIFEST.write_manifest(path, self.tree, previous=previous)
+        return path, count
+
+    def test_round_trip_in_component_order(self):
+        path, count = self._write("first")
+        entries = list(read_manifest(path))
+        self.assertEqual(count, 5)
+        # Component-wise order: "a/..." sorts before "a.d/..." although "." < "/".
+        self.assertEqual([e.path for e in entries], ["a/b/y", "a/x", "a.d/z", "link", "top"])
+        by_path = {e.path: e for e in entries}
+        self.assertEqual(by_path["a/b/y"].size, 5)
+        self.assertEqual(by_path["top"].digest, MANIFEST.file_digest(os.path.join(self.tree, "top")))
+        self.assertEqual(len(by_path["link"].digest), MANIFEST.DIGEST_SIZE)
+
+    def test_unchanged_files_reuse_the_previous_digest(self):
+        first, _count = self._write("first")
+        with open(os.path.join(self.tree, "a", "x"), "w") as fh:
+            fh.write("changed contents")
+        with mock.patch.object(MANIFEST, "file_digest", wraps=MANIFEST.file_digest) as digest:
+            self._write("second", previous=first)
+        hashed = {os.path.relpath(call.args[0], self.tree) for call in digest.call_args_list}
+        self.assertEqual(hashed, {os.path.join("a", "x")})
+
+    def test_diff_reports_added_removed_and_modified(self):
+        first, _count = self._write("first")
+        with open(os.path.join(self.tree, "a", "x"), "w") as fh:
+            fh.write("changed contents")
+        os.remove(os.path.join(self.tree, "top"))
+        with open(os.path.join(self.tree, "new"), "w") as fh:
+            fh.write("new")
+        second, _count = self._write("second", previous=first)
+        changes = [(change, (old or new).path)
+                   for change, old, new in MANIFEST.diff_manifests(first, second)]
+        self.assertEqual(changes, [
+            (MANIFEST.MODIFIED, "a/x"),
+            (MANIFEST.ADDED, "new"),
+            (MANIFEST.REMOVED, "top"),
+        ])
+
+    def test_rejects_foreign_files(self):
+        path = os.path.join(self.tmp, "plain")
+        with open(path, "w") as fh:
+            fh.write("index.html\n")
+        with self.assertRaises(OSError):
+            list(read_manifest(path))
+
+
+class WebsiteBackupDiffAPITests(WebsiteEngineBase):
+    def _complete_backup(self, node, files):
+        backup = CoreWebsiteBackup.objects.create(
+            website=node.website, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.COMPLETE, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        self.addCleanup(_cleanup_storage_artifacts(f"_storage/{backup.uuid}.manifest"))
+        tree = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tree, True)
+        for name, body in files.items():
+            with open(os.path.join(tree, name), "w") as fh:
+                fh.write(body)
+        MANIFEST.write_manifest(MANIFEST.manifest_path(backup), tree)
+        return backup
+
+    def _get(self, backup, **params):
+        view = CoreWebsiteBackupView.as_view({"get": "diff"})
+        request = APIRequestFactory().get(f"/api/v1/backups/website/{backup.id}/diff/", params)
+        force_authenticate(request, user=self.user)
+        return view(request, pk=backup.id)
+
+    def test_streams_changes_against_the_previous_backup(self):
+        node, _pending = self._make_backup()
+        old = self._complete_backup(node, {"keep": "k", "gone": "g"})
+        new = self._complete_backup(node, {"keep": "k", "added": "a"})
+        resp = self._get(new)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["X-Compared-Backup"], str(old.id))
+        lines = [json.loads(line) for line in b"".join(resp.streaming_content).splitlines()]
+        self.assertEqual(lines, [
+            {"change": "added", "path": "added", "size": 1, "old_size": None},
+            {"change": "removed", "path": "gone", "size": None, "old_size": 1},
+        ])
+
+    def test_missing_manifest_404(self):
+        node, _pending = self._make_backup()
+        old = self._complete_backup(node, {"keep": "k"})
+        new = self._complete_backup(node, {"keep": "k"})
+        os.remove(MANIFEST.manifest_path(old))
+        resp = self._get(new, against=old.id)
+        self.assertEqual(resp.status_code, 404)
@@ -1,3 +1,4 @@
+import gzip
 import io
 import os
 import tempfile
@@ -329,13 +330,16 @@ class AuthDatabaseSSHSSLFlagTests(BaseTestCase):
 # Website + database restore backend (fetch/extract helpers, engines, tasks, API)
 # ---------------------------------------------------------------------------
 import shutil
+import subprocess
 import tarfile
+import unittest
 import uuid
 import zipfile
 
 from django.test import override_settings
 
 from apps._tasks.exceptions import NodeBackupFailedError
+from apps._tasks.integration import archive
 from apps._tasks.integration import restore as restore_tasks
 from apps._tasks.integration import restore_common
 from apps._tasks.integration import restore_database as RD
@@ -536,6 +540,96 @@ class ExtractBackupZipTests(RestoreBackendBase):
             restore_common.extract_backup_zip(zip_path, os.path.join(self.tmp, "out"))
 
 
+ZSTD_TARFILE = "zst" in tarfile.TarFile.OPEN_METH
+
+
+@unittest.skipUnless(ZSTD_TARFILE, "tarfile without zstd support")
+class ExtractTarZstdTests(RestoreBackendBase):
+    def _make_tar_zst(self, members, name="backup.zip"):
+        # Staged archives keep the .zip name whatever their format.
+        path = os.path.join(self.tmp, name)
+        with tarfile.open(path, "w:zst") as tf:
+            for member_name, data in members.items():
+                payload = data.encode()
+                info = tarfile.TarInfo(member_name)
+                info.size = len(payload)
+                tf.addfile(info, io.BytesIO(payload))
+        return path
+
+    def test_extracts_tree(self):
+        path = self._make_tar_zst({"public_html/index.html": "hi"})
+        self.assertEqual(archive.detect_format(path), archive.TAR_ZSTD)
+        dest = restore_common.extract_backup_zip(path, os.path.join(self.tmp, "out"))
+        with open(os.path.join(dest, "public_html", "index.html")) as fh:
+            self.assertEqual(fh.read(), "hi")
+
+    def test_rejects_path_traversal(self):
+        path = self._make_tar_zst({"../evil.txt": "x"})
+        with self.assertRaises(RestoreError):
+            restore_common.extract_backup_zip(path, os.path.join(self.tmp, "out"))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "evil.txt")))
+
+    @unittest.skipUnless(shutil.which("zstd"), "zstd binary not installed")
+    def test_write_tar_zstd_round_trip(self):
+        source = os.path.join(self.tmp, "src")
+        os.makedirs(os.path.join(source, "db"))
+        with open(os.path.join(source, "db", "app.sql"), "w") as fh:
+            fh.write("CREATE TABLE t (id int);\n" * 1000)
+        path = archive.write_tar_zstd(source, os.path.join(self.tmp, "out.zip"))
+        dest = restore_common.extract_backup_zip(path, os.path.join(self.tmp, "out"))
+        with open(os.path.join(dest, "db", "app.sql")) as fh:
+            self.assertEqual(fh.read(), "CREATE TABLE t (id int);\n" * 1000)
+
+    def test_archive_name_follows_staged_file(self):
+        _node, backup = self._website_backup()
+        staged = archive.staging_path(backup)
+        self.addCleanup(_cleanup_storage_artifacts(staged))
+        self.assertEqual(archive.archive_name(backup), f"{backup.uuid}.zip")
+        shutil.copyfile(self._make_tar_zst({"a.txt": "a"}), staged)
+        self.assertEqual(archive.archive_name(backup), f"{backup.uuid}.tar.zst")
+
+
+@unittest.skipUnless(shutil.which("tar"), "GNU tar not installed")
+class ExtractIncrementalTarTests(RestoreBackendBase):
+    """extract_incremental_tar replays a tar --listed-incremental chain."""
+
+    def _tar(self, source, snar, name):
+        path = os.path.join(self.tmp, name)
+        subprocess.run(
+            ["tar", "--create", f"--listed-incremental={snar}", f"--file={path}",
+             "-C", source, "site"],
+            check=True,
+        )
+        return path
+
+    def test_chain_replays_changes_and_deletions(self):
+        source = os.path.join(self.tmp, "src")
+        os.makedirs(os.path.join(source, "site"))
+        snar = os.path.join(self.tmp, "state.snar")
+        for name in ("keep.txt", "gone.txt"):
+            with open(os.path.join(source, "site", name), "w") as fh:
+                fh.write(name)
+        level0 = self._tar(source, snar, "level0.tar")
+        os.remove(os.path.join(source, "site", "gone.txt"))
+        with open(os.path.join(source, "site", "new.txt"), "w") as fh:
+            fh.write("new.txt")
+        level1 = self._tar(source, snar, "level1.tar")
+
+        dest = os.path.join(self.tmp, "out")
+        os.makedirs(dest)
+        restore_common.extract_incremental_tar(level0, dest)
+        restore_common.extract_incremental_tar(level1, dest)
+        self.assertEqual(sorted(os.listdir(os.path.join(dest, "site"))), ["keep.txt", "new.txt"])
+        self.assertFalse(os.path.exists(level1))
+
+    def test_broken_tar_raises(self):
+        path = os.path.join(self.tmp, "broken.tar")
+        with open(path, "wb") as fh:
+            fh.write(b"not a tar")
+        with self.assertRaises(RestoreError):
+            restore_common.extract_incremental_tar(path, self.tmp)
+
+
 class MaybeExtractTarTests(RestoreBackendBase):
     @staticmethod
     def _tar_bytes(members):
@@ -824,6 +918,42 @@ class DatabaseRestoreEngineTests(RestoreBackendBase):
             self.assertEqual(call["kwargs"]["env"]["PGPASSWORD"], DB_PASS)
             self.assertNotIn(DB_PASS, " ".join(call["argv"]))
 
+    def test_postgres_directory_dump_uses_pg_restore(self):
+        node, backup = self._database_backup(
+            db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL, version="postgres_16"
+        )
+        node.database.dump_parallelism = 4
+        node.database.save()
+        restore = self._db_restore(backup, {"appdb.pgdump/toc.dat": "PGDMP"})
+        calls = []
+        self._run_engine(backup, restore, self._recorded_run(calls, [(0, b"1", b"")]))
+
+        self.assertEqual(len(calls), 2)
+        restore_argv = calls[1]["argv"]
+        self.assertTrue(restore_argv[0].endswith("pg_restore"))
+        self.assertEqual(restore_argv[restore_argv.index("-j") + 1], "4")
+        self.assertEqual(restore_argv[restore_argv.index("-d") + 1], "appdb")
+        self.assertTrue(restore_argv[-1].endswith("appdb.pgdump"))
+
+    def test_gzipped_dump_is_inflated_before_import(self):
+        node, backup = self._database_backup(
+            db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL, version="postgres_16"
+        )
+        stored = self._database_point(backup, self._make_zip(
+            {"appdb.sql.gz": gzip.compress(b"CREATE TABLE t(id int);")}
+        ))
+        restore = CoreDatabaseRestore.objects.create(backup=backup, storage_point=stored, name="r")
+        calls = []
+        imported = []
+
+        def fake_run(argv, **kwargs):
+            if kwargs.get("stdin") is not None:
+                imported.append(kwargs["stdin"].read())
+            return self._recorded_run(calls, [(0, b"1", b"")])(argv, **kwargs)
+
+        self._run_engine(backup, restore, fake_run)
+        self.assertEqual(imported, [b"CREATE TABLE t(id int);"])
+
     def test_postgres_skips_createdb_when_database_exists(self):
         node, backup = self._database_backup(
             db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL, version="postgres_16"
@@ -860,6 +990,83 @@ class DatabaseRestoreEngineTests(RestoreBackendBase):
         run.assert_not_called()
         cleanup.apply_async.assert_called_once()
 
+    def _increment(self, base, chain_position, status=UtilBackup.Status.COMPLETE):
+        link = CoreDatabaseBackup.objects.create(
+            database=base.database, uuid=f"t{uuid.uuid4().hex}",
+            status=status, attempt_no=1, type=UtilBackup.Type.ON_DEMAND,
+            base_backup=base, chain_position=chain_position,
+        )
+        self.addCleanup(_cleanup_storage_artifacts(
+            f"_storage/restore_{link.uuid_str}.log",
+            f"_storage/restore_{link.uuid_str}.zip",
+            f"_storage/restore_{link.uuid_str}/",
+            f"_storage/my_restore_{link.uuid_str}.cnf",
+        ))
+        return link
+
+    def test_mysql_incremental_chain_replays_binlogs_in_order(self):
+        node, base = self._database_backup(
+            db_type=CoreAuthDatabase.DatabaseType.MYSQL, version="mysql_8_0"
+        )
+        base.chain_position = 0
+        base.save()
+        first, second = self._increment(base, 1), self._increment(base, 2)
+        storage = self._make_local_storage()
+        self._database_point(base, self._make_zip(
+            {"appdb.sql": "CREATE TABLE t(id int);"}, name="base.zip"), storage)
+        self._database_point(first, self._make_zip(
+            {"appdb.binlog": "INSERT INTO t VALUES (1);"}, name="inc1.zip"), storage)
+        stored = self._database_point(second, self._make_zip(
+            {"appdb.binlog": "INSERT INTO t VALUES (2);"}, name="inc2.zip"), storage)
+        restore = CoreDatabaseRestore.objects.create(
+            backup=second, storage_point=stored, name="r"
+        )
+        calls = []
+        imported = []
+
+        def fake_run(argv, **kwargs):
+            if kwargs.get("stdin") is not None:
+                imported.append((argv[-1], kwargs["stdin"].read()))
+            return self._recorded_run(calls, [(0, b"", b"")])(argv, **kwargs)
+
+        self._run_engine(second, restore, fake_run)
+        self.assertEqual(imported, [
+            ("appdb", b"CREATE TABLE t(id int);"),
+            ("appdb", b"INSERT INTO t VALUES (1);"),
+            ("appdb", b"INSERT INTO t VALUES (2);"),
+        ])
+
+    def test_incremental_chain_with_a_failed_link_is_refused(self):
+        node, base = self._database_backup(
+            db_type=CoreAuthDatabase.DatabaseType.MYSQL, version="mysql_8_0"
+        )
+        base.chain_position = 0
+        base.save()
+        self._increment(base, 1, status=UtilBackup.Status.FAILED)
+        second = self._increment(base, 2)
+        stored = self._database_point(second, self._make_zip({"appdb.binlog": "x"}))
+        restore = CoreDatabaseRestore.objects.create(
+            backup=second, storage_point=stored, name="r"
+        )
+        with mock.patch.object(RD.subprocess, "run") as run, \
+             mock.patch.object(RD, "delete_from_disk"):
+            with self.assertRaises(RestoreError):
+                RD.restore_database(second, restore)
+        run.assert_not_called()
+
+    def test_postgres_physical_backup_is_refused(self):
+        node, backup = self._database_backup(
+            db_type=CoreAuthDatabase.DatabaseType.POSTGRESQL, version="postgres_16"
+        )
+        backup.chain_position = 0
+        backup.save()
+        restore = self._db_restore(backup, {"base/base.tar": "tar"})
+        with mock.patch.object(RD.subprocess, "run") as run, \
+             mock.patch.object(RD, "delete_from_disk"):
+            with self.assertRaises(RestoreError):
+                RD.restore_database(backup, restore)
+        run.assert_not_called()
+
 
 class WebsiteRestoreTaskTests(RestoreBackendBase):
     def _restore(self):
@@ -1,9 +1,15 @@
+from datetime import timedelta
 from unittest import mock
 
+from django.test import override_settings
+from django.utils import timezone
+
+from apps._tasks.helper import admission, retention
 from apps._tasks.helper import tasks as helper_tasks
+from apps._tasks.helper.retention import expired_backups
 from apps.console.node.models import CoreNode, CoreSchedule, CoreScheduleRun
 from apps.console.utils.models import UtilBackup
-from apps.console.backup.models import CoreDigitalOceanBackup
+from apps.console.backup.models import CoreDigitalOceanBackup, CoreWebsiteBackup
 from apps.tests import factories
 from apps.tests.base import BaseTestCase
 
@@ -13,22 +19,31 @@ class RunScheduledBackupTests(BaseTestCase):
         super().setUp()
         self.node = factories.make_website_node(self.account, self.member)
 
-    def test_active_schedule_dispatches_backup_task_and_records_run(self):
+    @override_settings(SCHEDULER_JITTER_SECONDS=0)
+    def test_active_schedule_queues_run_and_admission_dispatches_backup_task(self):
         schedule = factories.make_schedule(self.node, self.member)
-        with mock.patch.object(helper_tasks, "current_app") as capp:
+        with mock.patch.object(admission, "current_app") as capp:
             helper_tasks.run_scheduled_backup.apply(kwargs={"schedule_id": schedule.id})
+            capp.send_task.assert_not_called()
+            run = CoreScheduleRun.objects.get(schedule=schedule)
+            self.assertEqual(run.status, CoreScheduleRun.Status.QUEUED)
+
+            admission.admit_scheduled_backups.apply()
         capp.send_task.assert_called_once()
         task_name = capp.send_task.call_args.args[0]
         kwargs = capp.send_task.call_args.kwargs["kwargs"]
         self.assertEqual(task_name, "backup_website")
         self.assertEqual(kwargs["node_id"], self.node.id)
         self.assertEqual(kwargs["schedule_id"], schedule.id)
-        self.assertEqual(CoreScheduleRun.objects.filter(schedule=schedule).count(), 1)
+        run.refresh_from_db()
+        self.assertEqual(run.status, CoreScheduleRun.Status.ADMITTED)
+        self.assertIsNotNone(run.admitted)
 
     def test_inactive_schedule_does_not_dispatch(self):
         schedule = factories.make_schedule(self.node, self.member, status=CoreSchedule.Status.PAUSED)
-        with mock.patch.object(helper_tasks, "current_app") as capp:
+        with mock.patch.object(admission, "current_app") as capp:
             helper_tasks.run_scheduled_backup.apply(kwargs={"schedule_id": schedule.id})
+            admission.admit_scheduled_backups.apply()
         capp.send_task.assert_not_called()
         self.assertEqual(CoreScheduleRun.objects.count(), 0)
 
@@ -38,6 +53,109 @@ class RunScheduledBackupTests(BaseTestCase):
         self.assertEqual(do_node.backup_task_name(), "backup_digitalocean")
 
 
+@override_settings(
+    SCHEDULER_JITTER_SECONDS=0,
+    SCHEDULER_MAX_PER_HOST=2,
+    SCHEDULER_MAX_PER_CONNECTION=0,
+    SCHEDULER_MAX_PER_STORAGE=0,
+    SCHEDULER_MAX_LOCAL_DUMPS=0,
+)
+class AdmissionTests(BaseTestCase):
+    def queue_for(self, host):
+        node = factories.make_website_node(self.account, self.member, host=host)
+        return admission.queue(factories.make_schedule(node, self.member))
+
+    def admit(self):
+        with mock.patch.object(admission, "current_app") as capp:
+            admitted = admission.admit()
+        self.assertEqual(capp.send_task.call_count, len(admitted))
+        return admitted
+
+    @override_settings(SCHEDULER_JITTER_SECONDS=900)
+    def test_jitter_is_stable_per_schedule_and_bounded(self):
+        delays = [admission.jitter_seconds(schedule_id) for schedule_id in range(1, 200)]
+        self.assertEqual(delays, [admission.jitter_seconds(schedule_id) for schedule_id in range(1, 200)])
+        self.assertTrue(all(0 <= delay <= 900 for delay in delays))
+        # Spread out, not bunched on a few values.
+        self.assertGreater(len(set(delays)), 100)
+
+    @override_settings(SCHEDULER_JITTER_SECONDS=900)
+    def test_run_waits_for_its_jitter(self):
+        node = factories.make_website_node(self.account, self.member)
+        schedule = factories.make_schedule(node, self.member)
+        fired = timezone.now()
+        run = admission.queue(schedule, now=fired)
+        self.assertEqual(run.not_before, fired + timedelta(seconds=admission.jitter_seconds(schedule.id)))
+
+        with mock.patch.object(admission, "current_app"):
+            early = admission.admit(now=run.not_before - timedelta(seconds=1))
+            on_time = admission.admit(now=run.not_before)
+        self.assertEqual(early, [])
+        self.assertEqual([r.id for r in on_time], [run.id])
+
+    def test_per_host_limit_holds_back_the_third_backup_of_a_host(self):
+        runs = [self.queue_for("db.example.com") for _ in range(3)]
+        other = self.queue_for("other.example.com")
+
+        admitted = self.admit()
+        self.assertEqual({r.id for r in admitted}, {runs[0].id, runs[1].id, other.id})
+        runs[2].refresh_from_db()
+        self.assertEqual(runs[2].status, CoreScheduleRun.Status.QUEUED)
+
+        # Still held while the admitted backups run...
+        CoreNode.objects.filter(id__in=[runs[0].schedule.node_id, runs[1].schedule.node_id]).update(
+            status=CoreNode.Status.BACKUP_IN_PROGRESS
+        )
+        later = timezone.now() + timedelta(seconds=admission.ADMIT_GRACE + 1)
+        with mock.patch.object(admission, "current_app"):
+            self.assertEqual(admission.admit(now=later), [])
+        # ...and admitted once one of them is done.
+        CoreNode.objects.filter(id=runs[0].schedule.node_id).update(status=CoreNode.Status.ACTIVE)
+        with mock.patch.object(admission, "current_app"):
+            self.assertEqual([r.id for r in admission.admit(now=later)], [runs[2].id])
+
+    def test_on_demand_backups_count_against_the_limits(self):
+        busy = factories.make_website_node(self.account, self.member, host="db.example.com")
+        CoreNode.objects.filter(id=busy.id).update(status=CoreNode.Status.BACKUP_IN_PROGRESS)
+        runs = [self.queue_for("db.example.com") for _ in range(2)]
+
+        self.assertEqual([r.id for r in self.admit()], [runs[0].id])
+
+    def test_second_firing_while_queued_is_skipped(self):
+        run = self.queue_for("ftp.example.com")
+        again = admission.queue(run.schedule)
+        self.assertEqual(again.status, CoreScheduleRun.Status.SKIPPED)
+
+    def test_paused_schedule_is_skipped_at_admission(self):
+        run = self.queue_for("ftp.example.com")
+        CoreSchedule.objects.filter(id=run.schedule_id).update(status=CoreSchedule.Status.PAUSED)
+        self.assertEqual(self.admit(), [])
+        run.refresh_from_db()
+        self.assertEqual(run.status, CoreScheduleRun.Status.SKIPPED)
+
+    def test_queue_depth_reports_blocked_runs(self):
+        for _ in range(3):
+            self.queue_for("db.example.com")
+        self.admit()
+
+        depth = admission.queue_depth(CoreScheduleRun.objects.all())
+        self.assertEqual(depth["queued"], 1)
+        self.assertEqual(depth["due"], 1)
+        self.assertEqual(depth["blocked_by"], {"host": 1})
+
+    def test_queue_endpoint(self):
+        self.queue_for("ftp.example.com")
+        self.client.force_login(self.user)
+        r = self.client.get("/api/v1/schedules/queue/")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["queued"], 1)
+
+
+def run_eagerly(task):
+    """apply_async side effect that runs `task` in-process instead of queueing it."""
+    return lambda args=None, kwargs=None, **options: task.apply(args=args, kwargs=kwargs)
+
+
 class KeepLastRetentionTests(BaseTestCase):
     """keep_last is applied when a backup finalizes; exercise the real retention path in
     poll_cloud_backup (cloud snapshots) with the provider status check mocked."""
@@ -64,7 +182,9 @@ class KeepLastRetentionTests(BaseTestCase):
                                return_value=UtilBackup.Status.COMPLETE), \
              mock.patch.object(CoreDigitalOceanBackup, "soft_delete",
                                autospec=True, side_effect=lambda self: soft_deleted.append(self.id)), \
-             mock.patch.object(CoreNode, "notify_backup_success"):
+             mock.patch.object(CoreNode, "notify_backup_success"), \
+             mock.patch.object(retention.delete_expired_backups, "apply_async",
+                               side_effect=run_eagerly(retention.delete_expired_backups)) as queued:
             helper_tasks.poll_cloud_backup.apply(args=[node.id, polling.id])
 
         # 4 completed, keep_last=2 -> 2 are soft-deleted, and the just-finalized
@@ -72,3 +192,73 @@ class KeepLastRetentionTests(BaseTestCase):
         self.assertEqual(len(soft_deleted), 2)
         self.assertNotIn(polling.id, soft_deleted)
         self.assertTrue(set(soft_deleted).issubset({o.id for o in olds}))
+        # Deleted asynchronously, in one batch.
+        queued.assert_called_once()
+
+    def test_expired_backups_are_claimed_before_the_delete_task_runs(self):
+        node = factories.make_cloud_node(self.account, self.member, code="digitalocean")
+        schedule = factories.make_schedule(node, self.member, keep_last=1)
+        backups = [
+            CoreDigitalOceanBackup.objects.create(
+                digitalocean=node.digitalocean, schedule=schedule,
+                status=UtilBackup.Status.COMPLETE,
+            )
+            for _ in range(3)
+        ]
+        with override_settings(RETENTION_BATCH_SIZE=1), \
+                mock.patch.object(retention.delete_expired_backups, "apply_async") as queued:
+            retention.apply_retention(backups[-1])
+
+        self.assertEqual(queued.call_count, 2)
+        self.assertEqual(queued.call_args_list[0].kwargs["args"][0], CoreDigitalOceanBackup._meta.label)
+        statuses = dict(CoreDigitalOceanBackup.objects.values_list("id", "status"))
+        self.assertEqual(statuses[backups[0].id], UtilBackup.Status.DELETE_REQUESTED)
+        self.assertEqual(statuses[backups[1].id], UtilBackup.Status.DELETE_REQUESTED)
+        self.assertEqual(statuses[backups[2].id], UtilBackup.Status.COMPLETE)
+
+
+class ChainRetentionTests(BaseTestCase):
+    """expired_backups keeps incremental chains whole."""
+
+    def _backups(self, *bases):
+        # bases[i] is the index of backup i's base, or None for a full backup;
+        # backup i is created i minutes after the first.
+        node = factories.make_website_node(self.account, self.member)
+        start = timezone.now() - timedelta(days=1)
+        backups = []
+        for i, base in enumerate(bases):
+            backup = CoreWebsiteBackup.objects.create(
+                website=node.website, status=UtilBackup.Status.COMPLETE,
+                base_backup=backups[base] if base is not None else None,
+            )
+            CoreWebsiteBackup.objects.filter(id=backup.id).update(created=start + timedelta(minutes=i))
+            backups.append(backup)
+        self.ids = [backup.id for backup in backups]
+        return CoreWebsiteBackup.objects.filter(website=node.website)
+
+    def _expired(self, backups, keep_last):
+        return [self.ids.index(backup_id) for backup_id in expired_backups(backups, keep_last)]
+
+    def test_plain_backups_keep_the_newest(self):
+        backups = self._backups(None, None, None, None)
+        self.assertEqual(self._expired(backups, 2), [0, 1])
+
+    def test_kept_increment_keeps_its_base_and_earlier_increments(self):
+        # 0 = base, 1..3 = increments of 0.
+        backups = self._backups(None, 0, 0, 0)
+        self.assertEqual(self._expired(backups, 1), [])
+
+    def test_old_chain_expires_once_a_new_base_is_kept(self):
+        # 0 = base, 1-2 = its increments, 3 = new base, 4 = its increment.
+        backups = self._backups(None, 0, 0, None, 3)
+        self.assertEqual(self._expired(backups, 2), [0, 1, 2])
+
+    def test_kept_tail_of_an_old_chain_pins_that_chain(self):
+        backups = self._backups(None, 0, 0, None, 3)
+        self.assertEqual(self._expired(backups, 3), [])
+
+    def test_chain_is_released_once_only_a_newer_base_is_kept(self):
+        # 0 = base, 1-3 = its increments, 4 = new base.
+        backups = self._backups(None, 0, 0, 0, None)
+        self.assertEqual(self._expired(backups, 2), [])
+        self.assertEqual(self._expired(backups, 1), [0, 1, 2, 3])
@@ -1,13 +1,46 @@
+import errno
+import io
 import os
+import random
+import subprocess
 import tempfile
+import threading
+import time
 import uuid
+import zipfile
 from types import SimpleNamespace
 from unittest import mock
 
+from celery.exceptions import Retry
+
+from django.core.cache import cache
 from django.test import override_settings
 
-from apps._tasks.integration.storage.local import storage_local
+from apps._tasks.helper.retention import delete_expired_backups, delete_stored_backups
+from apps._tasks.integration.storage.chunked import AdaptiveChunkSize, ChunkReader, retry_request
+from apps._tasks.integration.storage import dedup as DEDUP
+from apps._tasks.integration.storage.dedup import Repository
+from apps._tasks.integration.storage.folders import cached_folder_id, forget_folder
+from apps._tasks.integration.storage.google_drive import _google_drive_upload_chunks
+from apps._tasks.integration.storage.local import place_file, storage_local
+from apps._tasks.integration.storage.registry import BACKENDS, S3CompatibleBackend, get_backend
+from apps._tasks.integration.storage.s3_compat import S3_COMPATIBLE, s3_transfer_config, s3_upload_file
+from apps._tasks.exceptions import NodeDropboxNotEnoughStorageError
+from apps._tasks.integration.storage.tasks import (
+    storage_upload,
+    storage_upload_fanout,
+    upload_failure_status,
+    upload_signatures,
+)
+from apps._tasks.integration.storage import validation as VALIDATION
+from apps._tasks.integration.storage.streaming import (
+    MultipartDestination,
+    StreamingArchive,
+    StreamingUpload,
+    StreamingUploadError,
+)
 from apps.console.backup.models import CoreWebsiteBackup, CoreWebsiteBackupStoragePoints
+from apps.console.node.models import CoreNode
 from apps.console.storage.models import CoreStorage, CoreStorageAWSS3, CoreStorageLocal, CoreStorageType
 from apps.console.utils.models import UtilBackup
 from apps.tests import factories
@@ -138,6 +171,23 @@ class LocalStorageUploadTests(BaseTestCase):
             with open(target, "rb") as fh:
                 self.assertEqual(fh.read(), payload)
 
+    def test_place_file_falls_back_when_links_are_unsupported(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "src.zip")
+            dst = os.path.join(tmp, "dst.zip")
+            with open(src, "wb") as fh:
+                fh.write(b"archive" * 1000)
+
+            unsupported = OSError(errno.EXDEV, "Invalid cross-device link")
+            with mock.patch("apps._tasks.integration.storage.local._reflink", side_effect=unsupported), \
+                    mock.patch("apps._tasks.integration.storage.local.os.link", side_effect=unsupported):
+                method = place_file(src, dst)
+
+            self.assertEqual(method, "copy_file_range")
+            with open(dst, "rb") as fh:
+                self.assertEqual(fh.read(), b"archive" * 1000)
+            self.assertFalse(os.path.exists(f"{dst}.part"))
+
     def test_upload_missing_source_marks_file_not_found(self):
         with tempfile.TemporaryDirectory() as tmp, override_settings(LOCAL_STORAGE_ROOT=tmp):
             storage = make_local_storage(self.account, self.member)
@@ -247,3 +297,872 @@ class LocalStorageDownloadViewTests(BaseTestCase):
             self.client.force_login(self.user)
             r = self.client.get(f"/api/v1/storage/local/file/{point.id}/")
             self.assertEqual(r.status_code, 404)
+
+
+class FakeMultipartClient:
+    """In-memory S3 multipart API: keeps uploaded parts, assembles on complete."""
+
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.parts = {}
+        self.body = None
+        self.aborted = False
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        if PartNumber == self.fail_part:
+            raise RuntimeError("part upload failed")
+        self.parts[PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        self.body = b"".join(self.parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+
+
+class StreamingUploadTests(BaseTestCase):
+    PART = 5 * 1024 * 1024
+
+    def _destination(self, client):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        point = make_website_backup_point(
+            self.member, storage, status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_IN_PROGRESS)
+        return MultipartDestination(point, client=client)
+
+    def test_archive_fans_out_identical_zip_to_every_destination(self):
+        clients = [FakeMultipartClient(), FakeMultipartClient()]
+        destinations = [self._destination(c) for c in clients]
+        archive = StreamingArchive(StreamingUpload(destinations, part_size=self.PART))
+        payload = os.urandom(2 * self.PART) + b"-- tail\n"
+        archive.copy_stream("appdb.sql", io.BytesIO(payload).read)
+        size = archive.close()
+
+        for client, destination in zip(clients, destinations):
+            self.assertGreater(len(client.parts), 1)
+            self.assertEqual(len(client.body), size)
+            with zipfile.ZipFile(io.BytesIO(client.body)) as zf:
+                self.assertEqual(zf.read("appdb.sql"), payload)
+            point = destination.stored_backup
+            point.refresh_from_db()
+            self.assertEqual(point.status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE)
+            self.assertEqual(point.storage_file_id, f"{point.backup.uuid}.zip")
+
+    def test_failed_destination_is_isolated(self):
+        good, bad = FakeMultipartClient(), FakeMultipartClient(fail_part=1)
+        destinations = [self._destination(good), self._destination(bad)]
+        archive = StreamingArchive(StreamingUpload(destinations, part_size=self.PART))
+        archive.copy_stream("appdb.sql", io.BytesIO(b"x" * 100).read)
+        archive.close()
+
+        self.assertIsNotNone(good.body)
+        self.assertTrue(bad.aborted)
+        bad_point = destinations[1].stored_backup
+        bad_point.refresh_from_db()
+        self.assertEqual(bad_point.status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_FAILED)
+
+    def test_all_destinations_failing_raises(self):
+        destinations = [self._destination(FakeMultipartClient(fail_part=1))]
+        archive = StreamingArchive(StreamingUpload(destinations, part_size=self.PART))
+        archive.copy_stream("appdb.sql", io.BytesIO(b"x" * 100).read)
+        with self.assertRaises(StreamingUploadError):
+            archive.close()
+
+
+    def test_dump_command_times_out_while_stdout_is_held_open(self):
+        archive = StreamingArchive(StreamingUpload([self._destination(FakeMultipartClient())], part_size=self.PART))
+        started = time.monotonic()
+        # The process writes nothing and keeps stdout open past the deadline.
+        with self.assertRaises(subprocess.TimeoutExpired):
+            archive.dump_command(["sleep", "30"], "appdb.sql", timeout=1)
+        self.assertLess(time.monotonic() - started, 10)
+        archive.abort()
+
+
+class StorageUploadFanoutTests(BaseTestCase):
+    """Several S3-compatible destinations share one read of the backup zip."""
+
+    def _backup_with_points(self, codes):
+        node = factories.make_website_node(self.account, self.member)
+        backup = CoreWebsiteBackup.objects.create(
+            website=node.website, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.UPLOAD_IN_PROGRESS, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        points = []
+        for code in codes:
+            storage = (make_local_storage(self.account, self.member) if code == "local"
+                       else factories.make_storage(self.account, self.member, code=code))
+            points.append(CoreWebsiteBackupStoragePoints.objects.create(
+                backup=backup, storage=storage,
+                status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_READY,
+            ))
+        return node, backup, points
+
+    def _write_zip(self, backup, payload):
+        local_zip = f"_storage/{backup.uuid}.zip"
+        with open(local_zip, "wb") as fh:
+            fh.write(payload)
+        self.addCleanup(lambda: os.path.exists(local_zip) and os.remove(local_zip))
+        self.addCleanup(lambda: os.path.exists(f"_storage/{backup.uuid}.log")
+                        and os.remove(f"_storage/{backup.uuid}.log"))
+
+    def test_signatures_group_s3_compatible_points(self):
+        node, backup, points = self._backup_with_points(["aws_s3", "aws_s3", "local"])
+        signatures = upload_signatures(node.id, backup.id, points)
+        by_task = {sig.task: sig.args for sig in signatures}
+        self.assertEqual(by_task["storage_upload"], (node.id, backup.id, points[2].id))
+        self.assertEqual(by_task["storage_upload_fanout"],
+                         (node.id, backup.id, [points[0].id, points[1].id]))
+
+    def test_single_s3_point_keeps_storage_upload(self):
+        node, backup, points = self._backup_with_points(["aws_s3"])
+        signatures = upload_signatures(node.id, backup.id, points)
+        self.assertEqual([sig.task for sig in signatures], ["storage_upload"])
+
+    def test_fanout_uploads_every_point(self):
+        node, backup, points = self._backup_with_points(["aws_s3", "aws_s3"])
+        payload = os.urandom(1024)
+        self._write_zip(backup, payload)
+        clients = [FakeMultipartClient(), FakeMultipartClient()]
+        with mock.patch("apps._tasks.integration.storage.streaming.s3_client",
+                        side_effect=clients):
+            storage_upload_fanout.apply(args=[node.id, backup.id, [p.id for p in points]])
+
+        for client, point in zip(clients, points):
+            point.refresh_from_db()
+            self.assertEqual(client.body, payload)
+            self.assertEqual(point.status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE)
+            self.assertEqual(point.storage_file_id, f"{backup.uuid}.zip")
+
+    def test_fanout_retries_only_failed_points(self):
+        node, backup, points = self._backup_with_points(["aws_s3", "aws_s3"])
+        self._write_zip(backup, b"zip-bytes")
+        clients = [FakeMultipartClient(), FakeMultipartClient(fail_part=1)]
+        with mock.patch("apps._tasks.integration.storage.streaming.s3_client",
+                        side_effect=clients), \
+             mock.patch.object(CoreNode, "notify_upload_fail"), \
+             mock.patch.object(storage_upload_fanout, "retry",
+                               side_effect=Retry("retrying")) as retry:
+            storage_upload_fanout.apply(
+                args=[node.id, backup.id, [p.id for p in points]], throw=False)
+
+        retry.assert_called_once()
+        self.assertEqual(retry.call_args.kwargs["args"], [node.id, backup.id, [points[1].id]])
+        points[0].refresh_from_db()
+        points[1].refresh_from_db()
+        self.assertEqual(points[0].status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE)
+        self.assertEqual(points[1].status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_RETRY)
+        # The failed point's multipart upload stays open for the retry to resume.
+        self.assertFalse(clients[1].aborted)
+        self.assertEqual(points[1].metadata["upload_session"]["upload_id"], "upload-1")
+        self.assertNotIn("upload_session", points[0].metadata or {})
+
+    def test_fanout_retry_resumes_failed_points(self):
+        node, backup, points = self._backup_with_points(["aws_s3", "aws_s3"])
+        self._write_zip(backup, b"zip-bytes")
+
+        def resume(local_zip, stored_backups):
+            for stored_backup in stored_backups:
+                stored_backup.storage_file_id = f"{backup.uuid}.zip"
+            return [(stored_backup, None) for stored_backup in stored_backups]
+
+        with mock.patch("apps._tasks.integration.storage.tasks.fan_out_file") as fan_out, \
+             mock.patch("apps._tasks.integration.storage.tasks.resume_file_uploads",
+                        side_effect=resume) as resume_uploads:
+            storage_upload_fanout.apply(args=[node.id, backup.id, [points[1].id]], retries=1)
+
+        fan_out.assert_not_called()
+        self.assertEqual([p.id for p in resume_uploads.call_args.args[1]], [points[1].id])
+        points[1].refresh_from_db()
+        self.assertEqual(points[1].status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE)
+
+    def test_fanout_missing_zip_marks_file_not_found(self):
+        node, backup, points = self._backup_with_points(["aws_s3", "aws_s3"])
+        self.addCleanup(lambda: os.path.exists(f"_storage/{backup.uuid}.log")
+                        and os.remove(f"_storage/{backup.uuid}.log"))
+        storage_upload_fanout.apply(args=[node.id, backup.id, [p.id for p in points]])
+        for point in points:
+            point.refresh_from_db()
+            self.assertEqual(
+                point.status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_FAILED_FILE_NOT_FOUND)
+
+
+class StorageBackendRegistryTests(BaseTestCase):
+    """storage_upload / generate_download_url / soft_delete dispatch through the registry."""
+
+    def test_every_s3_compatible_code_has_an_s3_backend(self):
+        for code in S3_COMPATIBLE:
+            self.assertIsInstance(get_backend(code), S3CompatibleBackend, code)
+        self.assertIn("local", BACKENDS)
+        self.assertIsNone(get_backend("carrier-pigeon"))
+
+    def test_s3_backend_delete_presign_head(self):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        point = make_website_backup_point(
+            self.member, storage,
+            status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE,
+            storage_file_id="prefix/backup.zip",
+        )
+        client = mock.Mock()
+        client.head_object.return_value = {"ContentLength": 42}
+        client.generate_presigned_url.return_value = "https://signed"
+        with mock.patch.object(S3CompatibleBackend, "client", return_value=client):
+            self.assertEqual(point.generate_download_url(), "https://signed")
+            self.assertEqual(get_backend("aws_s3").head(point), 42)
+            point.soft_delete()
+
+        client.delete_object.assert_called_once_with(Bucket="test-bucket", Key="prefix/backup.zip")
+        point.refresh_from_db()
+        self.assertEqual(point.status, CoreWebsiteBackupStoragePoints.Status.DELETE_COMPLETED)
+
+    def test_upload_dispatches_to_backend(self):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        point = make_website_backup_point(
+            self.member, storage, status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_READY,
+        )
+        self.addCleanup(lambda: os.path.exists(f"_storage/{point.backup.uuid}.log")
+                        and os.remove(f"_storage/{point.backup.uuid}.log"))
+        node = point.backup.website.node
+        with mock.patch.object(get_backend("aws_s3"), "uploader") as uploader:
+            storage_upload.apply(args=[node.id, point.backup.id, point.id])
+        uploader.assert_called_once()
+        self.assertEqual(uploader.call_args.args[0].id, point.id)
+
+    def test_google_drive_list_walks_the_backupsheep_folder(self):
+        folder = "application/vnd.google-apps.folder"
+        pages = {
+            "name = 'BackupSheep'": [{"files": [{"id": "root", "name": "BackupSheep", "mimeType": folder}]}],
+            "'root' in parents": [
+                {"files": [{"id": "n1", "name": "site", "mimeType": folder}], "nextPageToken": "p2"},
+                {"files": [{"id": "f0", "name": "notes.txt", "mimeType": "text/plain", "size": "3"}]},
+            ],
+            "'n1' in parents": [{"files": [{"id": "f1", "name": "a.zip", "mimeType": "application/zip",
+                                            "size": "42"}]}],
+        }
+
+        def get(url, params):
+            query = next(q for q in pages if params["q"].startswith(q))
+            page = 1 if params.get("pageToken") else 0
+            return mock.Mock(status_code=200, json=lambda: pages[query][page])
+
+        storage = SimpleNamespace(storage_google_drive=SimpleNamespace(get_client=lambda: SimpleNamespace(get=get)))
+        self.assertEqual(
+            sorted(get_backend("google_drive").list(storage)),
+            [("BackupSheep/notes.txt", 3), ("BackupSheep/site/a.zip", 42)],
+        )
+        self.assertEqual(list(get_backend("google_drive").list(storage, "BackupSheep/site/")),
+                         [("BackupSheep/site/a.zip", 42)])
+
+    def test_onedrive_list_follows_folders_and_next_links(self):
+        storage = SimpleNamespace(storage_onedrive=SimpleNamespace(drive_id="d1", get_client=lambda: {}))
+        responses = {
+            "root:/backupsheep:/children": {
+                "value": [{"id": "n1", "name": "site", "folder": {"childCount": 2}}],
+            },
+            "items/n1/children": {
+                "value": [{"id": "f1", "name": "a.zip", "file": {}, "size": 10}],
+                "@odata.nextLink": "https://graph/next",
+            },
+            "https://graph/next": {"value": [{"id": "f2", "name": "b.zip", "file": {}, "size": 20}]},
+        }
+
+        def get(url, headers):
+            body = next(body for suffix, body in responses.items() if url.endswith(suffix))
+            return mock.Mock(status_code=200, json=lambda: body)
+
+        with mock.patch("apps._tasks.integration.storage.registry.requests.get", side_effect=get):
+            self.assertEqual(
+                list(get_backend("onedrive").list(storage)),
+                [("backupsheep/site/a.zip", 10), ("backupsheep/site/b.zip", 20)],
+            )
+
+    def test_pcloud_list_flattens_the_recursive_listing(self):
+        storage = SimpleNamespace(storage_pcloud=SimpleNamespace(hostname="api.pcloud.com", get_client=lambda: {}))
+        listing = {"result": 0, "metadata": {"contents": [
+            {"name": "site", "isfolder": True, "contents": [{"name": "a.zip", "isfolder": False, "size": 7}]},
+            {"name": "other.txt", "isfolder": False, "size": 1},
+        ]}}
+        with mock.patch("apps._tasks.integration.storage.registry.requests.get",
+                        return_value=mock.Mock(json=lambda: listing)):
+            self.assertEqual(list(get_backend("pcloud").list(storage, "/site/")), [("/site/a.zip", 7)])
+
+    def test_upload_failure_status_mapping(self):
+        storage = make_local_storage(self.account, self.member)
+        point = make_website_backup_point(
+            self.member, storage, status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_READY,
+        )
+        self.assertEqual(
+            upload_failure_status(point, NodeDropboxNotEnoughStorageError("full")),
+            CoreWebsiteBackupStoragePoints.Status.UPLOAD_FAILED_STORAGE_LIMIT,
+        )
+        self.assertEqual(
+            upload_failure_status(point, ValueError("boom")),
+            CoreWebsiteBackupStoragePoints.Status.UPLOAD_FAILED,
+        )
+
+
+class S3UploadEngineTests(BaseTestCase):
+    """Every S3-compatible storage_<code> uploads through s3_upload_file with
+    per-storage multipart tuning."""
+
+    @override_settings(S3_UPLOAD_PART_SIZE=8 * 1024 * 1024, S3_UPLOAD_MAX_CONCURRENCY=10)
+    def test_transfer_config_defaults_and_overrides(self):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        config = s3_transfer_config(storage)
+        self.assertEqual(config.multipart_chunksize, 8 * 1024 * 1024)
+        self.assertEqual(config.max_request_concurrency, 10)
+        self.assertIsNone(config.max_bandwidth)
+
+        storage.upload_part_size_mb = 128
+        storage.upload_max_concurrency = 32
+        storage.upload_bandwidth_limit_mbps = 100
+        config = s3_transfer_config(storage)
+        self.assertEqual(config.multipart_chunksize, 128 * 1024 * 1024)
+        self.assertEqual(config.max_request_concurrency, 32)
+        self.assertEqual(config.max_bandwidth, 100 * 125000)
+
+    def test_upload_file_uses_tuning_and_records_key(self):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        storage.upload_max_concurrency = 32
+        storage.save()
+        point = make_website_backup_point(
+            self.member, storage, status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_IN_PROGRESS,
+        )
+        client = mock.Mock()
+        with tempfile.NamedTemporaryFile(suffix=".zip") as local_zip:
+            local_zip.write(b"zip-bytes")
+            local_zip.flush()
+            with mock.patch("apps._tasks.integration.storage.s3_compat.s3_client",
+                            return_value=client) as make_client:
+                s3_upload_file(point, local_zip=local_zip.name)
+
+        make_client.assert_called_once_with(storage, max_pool_connections=32)
+        args, kwargs = client.upload_file.call_args
+        self.assertEqual(args, (local_zip.name, "test-bucket", f"{point.backup.uuid}.zip"))
+        self.assertEqual(kwargs["Config"].max_request_concurrency, 32)
+        self.assertEqual(kwargs["ExtraArgs"]["StorageClass"], "STANDARD")
+        point.refresh_from_db()
+        self.assertEqual(point.storage_file_id, f"{point.backup.uuid}.zip")
+        self.assertEqual(point.status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE)
+
+    def test_bandwidth_capped_storage_skips_fan_out(self):
+        node = factories.make_website_node(self.account, self.member)
+        backup = CoreWebsiteBackup.objects.create(
+            website=node.website, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.UPLOAD_IN_PROGRESS, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        points = []
+        for limit in (None, None, 50):
+            storage = factories.make_storage(self.account, self.member, code="aws_s3")
+            storage.upload_bandwidth_limit_mbps = limit
+            storage.save()
+            points.append(CoreWebsiteBackupStoragePoints.objects.create(
+                backup=backup, storage=storage,
+                status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_READY,
+            ))
+        by_task = {sig.task: sig.args for sig in upload_signatures(node.id, backup.id, points)}
+        self.assertEqual(by_task["storage_upload"], (node.id, backup.id, points[2].id))
+        self.assertEqual(by_task["storage_upload_fanout"],
+                         (node.id, backup.id, [points[0].id, points[1].id]))
+
+    def test_tuned_storages_skip_fan_out(self):
+        node = factories.make_website_node(self.account, self.member)
+        backup = CoreWebsiteBackup.objects.create(
+            website=node.website, uuid=f"t{uuid.uuid4().hex}",
+            status=UtilBackup.Status.UPLOAD_IN_PROGRESS, attempt_no=1,
+            type=UtilBackup.Type.ON_DEMAND,
+        )
+        points = []
+        for tuning in ({}, {}, {"upload_part_size_mb": 64}, {"upload_max_concurrency": 32}):
+            storage = factories.make_storage(self.account, self.member, code="aws_s3")
+            for field, value in tuning.items():
+                setattr(storage, field, value)
+            storage.save()
+            points.append(CoreWebsiteBackupStoragePoints.objects.create(
+                backup=backup, storage=storage,
+                status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_READY,
+            ))
+        signatures = upload_signatures(node.id, backup.id, points)
+        single = [sig.args[2] for sig in signatures if sig.task == "storage_upload"]
+        fan_out = [sig.args[2] for sig in signatures if sig.task == "storage_upload_fanout"]
+        self.assertEqual(single, [points[2].id, points[3].id])
+        self.assertEqual(fan_out, [[points[0].id, points[1].id]])
+
+    def test_upload_tuning_endpoint(self):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        self.client.force_login(self.user)
+        r = self.client.post(
+            f"/api/v1/storage/{storage.id}/upload_tuning/",
+            {"upload_part_size_mb": 64, "upload_bandwidth_limit_mbps": 200},
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 200)
+        storage.refresh_from_db()
+        self.assertEqual(storage.upload_part_size_mb, 64)
+        self.assertEqual(storage.upload_bandwidth_limit_mbps, 200)
+        self.assertIsNone(storage.upload_max_concurrency)
+
+        r = self.client.post(
+            f"/api/v1/storage/{storage.id}/upload_tuning/",
+            {"upload_part_size_mb": 1},
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 400)
+
+
+class FakeResumableS3Client:
+    """Multipart API subset with server-side part state, to resume against."""
+
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.uploads = {}
+        self.uploaded = []
+        self.aborted = []
+        self.completed = None
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise IOError("connection reset")
+        self.uploads[UploadId][PartNumber] = Body
+        self.uploaded.append(PartNumber)
+        return {"ETag": f'"{PartNumber}"'}
+
+    def list_parts(self, Bucket, Key, UploadId, **kwargs):
+        parts = self.uploads[UploadId]
+        return {
+            "Parts": [{"PartNumber": n, "ETag": f'"{n}"', "Size": len(parts[n])} for n in sorted(parts)],
+            "IsTruncated": False,
+        }
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads[UploadId]
+        self.completed = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+
+
+class ResumableUploadTests(BaseTestCase):
+    """A retried S3 upload continues from the parts the provider acknowledged."""
+
+    def _point(self):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        storage.upload_part_size_mb = 1
+        storage.upload_max_concurrency = 1
+        storage.save()
+        return make_website_backup_point(
+            self.member, storage, status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_IN_PROGRESS,
+        )
+
+    def _zip(self, payload):
+        local_zip = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+        local_zip.write(payload)
+        local_zip.close()
+        self.addCleanup(os.remove, local_zip.name)
+        return local_zip.name
+
+    def test_retry_resumes_from_acknowledged_parts(self):
+        point = self._point()
+        payload = os.urandom(3 * 1024 * 1024 + 1000)  # four 1 MiB parts
+        local_zip = self._zip(payload)
+        client = FakeResumableS3Client(fail_part=3)
+
+        with mock.patch("apps._tasks.integration.storage.s3_compat.s3_client", return_value=client):
+            with self.assertRaises(IOError):
+                s3_upload_file(point, local_zip=local_zip)
+            session = point.metadata["upload_session"]
+            self.assertEqual(session["upload_id"], "upload-1")
+
+            client.fail_part = None
+            client.uploaded = []
+            s3_upload_file(point, local_zip=local_zip)
+
+        self.assertNotIn(1, client.uploaded)
+        self.assertNotIn(2, client.uploaded)
+        self.assertIn(3, client.uploaded)
+        self.assertEqual(list(client.uploads), ["upload-1"])
+        self.assertEqual(client.completed, payload)
+        point.refresh_from_db()
+        self.assertEqual(point.status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE)
+        self.assertNotIn("upload_session", point.metadata or {})
+
+    def test_changed_archive_starts_a_new_upload(self):
+        point = self._point()
+        local_zip = self._zip(os.urandom(2 * 1024 * 1024 + 10))
+        client = FakeResumableS3Client(fail_part=2)
+
+        with mock.patch("apps._tasks.integration.storage.s3_compat.s3_client", return_value=client):
+            with self.assertRaises(IOError):
+                s3_upload_file(point, local_zip=local_zip)
+            with open(local_zip, "ab") as fh:
+                fh.write(b"rebuilt")
+            client.fail_part = None
+            s3_upload_file(point, local_zip=local_zip)
+
+        self.assertEqual(list(client.uploads), ["upload-1", "upload-2"])
+        with open(local_zip, "rb") as fh:
+            self.assertEqual(client.completed, fh.read())
+
+    def test_abort_upload_aborts_the_open_multipart_upload(self):
+        point = self._point()
+        point.metadata = {"upload_session": {
+            "kind": "s3", "size": 10, "mtime": 0,
+            "bucket": "test-bucket", "key": "k.zip", "upload_id": "upload-9", "part_size": 5,
+        }}
+        point.save()
+        client = FakeResumableS3Client()
+        with mock.patch.object(S3CompatibleBackend, "client", return_value=client):
+            get_backend("aws_s3").abort_upload(point)
+        self.assertEqual(client.aborted, ["upload-9"])
+        point.refresh_from_db()
+        self.assertIsNone(point.metadata)
+
+
+class ChunkedUploadTests(BaseTestCase):
+    """Read-ahead, adaptive chunking and backoff used by the cloud-drive backends."""
+
+    def _zip(self, payload):
+        local_zip = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+        local_zip.write(payload)
+        local_zip.close()
+        self.addCleanup(os.remove, local_zip.name)
+        return local_zip.name
+
+    def test_reader_yields_aligned_chunks_and_grows_them(self):
+        payload = os.urandom(5 * 1024 * 1024 + 123)
+        local_zip = self._zip(payload)
+        sizer = AdaptiveChunkSize(minimum=512 * 1024, maximum=2 * 1024 * 1024, multiple=256 * 1024)
+
+        received = bytearray()
+        sizes = []
+        with ChunkReader(local_zip, 100, sizer) as chunks:
+            for offset, data in chunks:
+                self.assertEqual(offset, 100 + len(received))
+                received += data
+                sizes.append(len(data))
+                sizer.record(0.01)
+
+        self.assertEqual(bytes(received), payload[100:])
+        self.assertTrue(all(size % (256 * 1024) == 0 for size in sizes[:-1]))
+        self.assertEqual(sizer.size, 2 * 1024 * 1024)
+
+    def test_retry_request_backs_off_on_throttling(self):
+        responses = iter([
+            SimpleNamespace(status_code=429, headers={"Retry-After": "7"}),
+            SimpleNamespace(status_code=503, headers={}),
+            SimpleNamespace(status_code=308, headers={}),
+        ])
+        sizer = AdaptiveChunkSize(minimum=1024, maximum=8192, initial=8192)
+        with mock.patch("apps._tasks.integration.storage.chunked.time.sleep") as sleep:
+            response = retry_request(lambda: next(responses), sizer)
+
+        self.assertEqual(response.status_code, 308)
+        self.assertEqual(sleep.call_args_list[0], mock.call(7.0))
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(sizer.size, 2048)
+
+    def test_google_drive_resends_unacknowledged_tail(self):
+        payload = os.urandom(3 * 1024 * 1024)
+        local_zip = self._zip(payload)
+        stored = bytearray()
+
+        def put(url, data, headers, timeout):
+            start = int(headers["Content-Range"].split()[1].split("-")[0])
+            self.assertEqual(start, len(stored))
+            # Drive acknowledges at most 1 MiB per request.
+            stored.extend(data[:1024 * 1024])
+            if len(stored) == len(payload):
+                return SimpleNamespace(status_code=200, headers={}, json=lambda: {"id": "drive-file"})
+            return SimpleNamespace(status_code=308, headers={"Range": f"bytes=0-{len(stored) - 1}"})
+
+        point = mock.Mock(metadata=None)
+        _google_drive_upload_chunks(
+            SimpleNamespace(put=put), point, local_zip, "https://upload", 0, len(payload)
+        )
+
+        self.assertEqual(bytes(stored), payload)
+        self.assertEqual(point.storage_file_id, "drive-file")
+
+
+class BulkDeleteTests(BaseTestCase):
+    """Retention deletes stored files in batches per storage (delete_many)."""
+
+    def test_s3_delete_many_batches_keys_and_reports_failures(self):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        points = [SimpleNamespace(id=i, storage=storage, storage_file_id=f"k{i}") for i in range(1001)]
+        client = mock.Mock()
+        client.delete_objects.side_effect = [
+            {"Errors": [{"Key": "k7", "Code": "AccessDenied", "Message": "Access Denied"}]},
+            {},
+        ]
+        with mock.patch.object(S3CompatibleBackend, "client", return_value=client):
+            errors = get_backend("aws_s3").delete_many(points)
+
+        self.assertEqual(client.delete_objects.call_count, 2)
+        first, second = (call.kwargs["Delete"]["Objects"] for call in client.delete_objects.call_args_list)
+        self.assertEqual((len(first), len(second)), (1000, 1))
+        self.assertEqual(list(errors), [7])
+
+    def test_google_drive_delete_many_uses_one_batch_request(self):
+        client = mock.Mock()
+        client.post.return_value = mock.Mock(
+            status_code=200,
+            headers={"Content-Type": "multipart/mixed; boundary=batch_x"},
+            text=(
+                "--batch_x\r\nContent-Type: application/http\r\nContent-ID: <response-1>\r\n\r\n"
+                "HTTP/1.1 204 No Content\r\n\r\n"
+                "--batch_x\r\nContent-Type: application/http\r\nContent-ID: <response-2>\r\n\r\n"
+                "HTTP/1.1 404 Not Found\r\n\r\n"
+                "--batch_x\r\nContent-Type: application/http\r\nContent-ID: <response-3>\r\n\r\n"
+                "HTTP/1.1 403 Forbidden\r\n\r\n{}\r\n--batch_x--\r\n"
+            ),
+        )
+        storage = SimpleNamespace(storage_google_drive=SimpleNamespace(get_client=lambda: client))
+        points = [SimpleNamespace(id=i, storage=storage, storage_file_id=f"file-{i}") for i in (1, 2, 3)]
+
+        errors = get_backend("google_drive").delete_many(points)
+
+        client.post.assert_called_once()
+        self.assertIn(b"DELETE /drive/v3/files/file-2 HTTP/1.1", client.post.call_args.kwargs["data"])
+        self.assertEqual(list(errors), [3])
+
+    def test_delete_expired_backups_deletes_a_batch_per_storage(self):
+        storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        points = [
+            make_website_backup_point(
+                self.member, storage,
+                status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE,
+                storage_file_id=f"prefix/{i}.zip",
+            )
+            for i in range(3)
+        ]
+        ids = [point.backup_id for point in points]
+        CoreWebsiteBackup.objects.filter(id__in=ids).update(status=UtilBackup.Status.DELETE_REQUESTED)
+        client = mock.Mock()
+        client.delete_objects.return_value = {}
+        with mock.patch.object(S3CompatibleBackend, "client", return_value=client):
+            delete_expired_backups.apply(args=[CoreWebsiteBackup._meta.label, ids])
+
+        client.delete_objects.assert_called_once()
+        keys = {item["Key"] for item in client.delete_objects.call_args.kwargs["Delete"]["Objects"]}
+        self.assertEqual(keys, {"prefix/0.zip", "prefix/1.zip", "prefix/2.zip"})
+        for point in points:
+            point.refresh_from_db()
+            self.assertEqual(point.status, CoreWebsiteBackupStoragePoints.Status.DELETE_COMPLETED)
+        self.assertEqual(
+            set(CoreWebsiteBackup.objects.filter(id__in=ids).values_list("status", flat=True)),
+            {UtilBackup.Status.DELETE_COMPLETED},
+        )
+
+
+class FolderCacheTests(BaseTestCase):
+    """Cloud-drive folder IDs are resolved once per storage until invalidated."""
+
+    def setUp(self):
+        super().setUp()
+        self.storage = factories.make_storage(self.account, self.member, code="aws_s3")
+        self.addCleanup(cache.clear)
+
+    def test_resolves_once_until_forgotten(self):
+        resolve = mock.Mock(return_value="folder-1")
+        self.assertEqual(cached_folder_id(self.storage, "BackupSheep", resolve), "folder-1")
+        self.assertEqual(cached_folder_id(self.storage, "BackupSheep", resolve), "folder-1")
+        self.assertEqual(resolve.call_count, 1)
+
+        forget_folder(self.storage, "BackupSheep")
+        cached_folder_id(self.storage, "BackupSheep", resolve)
+        self.assertEqual(resolve.call_count, 2)
+
+    def test_unresolved_folder_is_not_cached(self):
+        resolve = mock.Mock(return_value=None)
+        cached_folder_id(self.storage, "BackupSheep", resolve)
+        cached_folder_id(self.storage, "BackupSheep", resolve)
+        self.assertEqual(resolve.call_count, 2)
+
+
+class StorageValidationTests(BaseTestCase):
+    """backup_initiate validates storage points concurrently and reuses recent results."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.storage = factories.make_storage(self.account, self.member, code="aws_s3", bucket="bucket-a")
+
+    def _validate(self, *storages):
+        points = CoreStorage.objects.filter(id__in=[s.id for s in storages]).order_by("id")
+        return VALIDATION.validate_storage_points(points)
+
+    def test_result_is_reused_until_the_credentials_change(self):
+        with mock.patch.object(CoreStorage, "validate", autospec=True, return_value=True) as validate:
+            self.assertEqual(self._validate(self.storage)[0][1], True)
+            self.assertEqual(self._validate(self.storage)[0][1], True)
+            self.assertEqual(validate.call_count, 1)
+
+            provider = self.storage.storage_aws_s3
+            provider.bucket_name = "bucket-b"
+            provider.save()
+            self._validate(self.storage)
+            self.assertEqual(validate.call_count, 2)
+
+    def test_failures_are_cached_too(self):
+        with mock.patch.object(CoreStorage, "validate", autospec=True, return_value=False) as validate:
+            self.assertEqual(self._validate(self.storage)[0][1], False)
+            self.assertEqual(self._validate(self.storage)[0][1], False)
+            self.assertEqual(validate.call_count, 1)
+
+    def test_fingerprint_ignores_bookkeeping_fields(self):
+        before = VALIDATION.credential_fingerprint(self.storage)
+        provider = self.storage.storage_aws_s3
+        provider.encryption_updated = not provider.encryption_updated
+        provider.save()
+        self.assertEqual(VALIDATION.credential_fingerprint(CoreStorage.objects.get(id=self.storage.id)), before)
+
+    def test_storage_points_are_validated_concurrently(self):
+        other = factories.make_storage(self.account, self.member, code="aws_s3", bucket="bucket-b")
+        # Each validation waits for the other: serial validation would break the barrier.
+        barrier = threading.Barrier(2, timeout=10)
+
+        def validate(storage):
+            barrier.wait()
+            return storage.id == other.id
+
+        with mock.patch.object(CoreStorage, "validate", autospec=True, side_effect=validate):
+            results = self._validate(self.storage, other)
+        self.assertEqual([(storage.id, ok) for storage, ok in results],
+                         [(self.storage.id, False), (other.id, True)])
+
+    def test_waits_for_a_validation_claimed_by_another_worker(self):
+        key = VALIDATION._cache_key(self.storage)
+        cache.add(key + ":claim", True, 60)
+
+        def other_worker_finishes(seconds):
+            cache.set(key, True, 60)
+
+        with mock.patch.object(CoreStorage, "validate", autospec=True) as validate, \
+             mock.patch.object(VALIDATION.time, "sleep", side_effect=other_worker_finishes):
+            self.assertEqual(self._validate(self.storage)[0][1], True)
+        validate.assert_not_called()
+
+    def test_backup_initiate_attaches_valid_storage_points(self):
+        node = factories.make_website_node(self.account, self.member)
+        broken = factories.make_storage(self.account, self.member, code="aws_s3", bucket="broken")
+
+        with mock.patch.object(CoreStorage, "validate", autospec=True,
+                               side_effect=lambda storage: storage.id != broken.id), \
+             mock.patch.object(CoreNode, "notify_storage_validation_fail") as notify:
+            backup = node.backup_initiate(
+                "task-1", UtilBackup.Type.ON_DEMAND, 1, None, [self.storage.id, broken.id], None
+            )
+        self.assertEqual(list(backup.storage_points.all()), [self.storage])
+        notify.assert_called_once()
+
+
+class DedupRepositoryTests(BaseTestCase):
+    """Backups on a dedup_repository storage store only chunks the repository lacks."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+
+    def _zip(self, members):
+        local_zip = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+        local_zip.close()
+        with zipfile.ZipFile(local_zip.name, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in members.items():
+                zf.writestr(zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, 0)), data)
+        self.addCleanup(os.remove, local_zip.name)
+        return local_zip.name
+
+    def test_second_backup_reuses_unchanged_members_and_restores(self):
+        rng = random.Random(9)
+        static = rng.randbytes(3 * 1024 * 1024)
+        changed = bytearray(rng.randbytes(5 * 1024 * 1024))
+        with tempfile.TemporaryDirectory() as tmp, override_settings(LOCAL_STORAGE_ROOT=tmp):
+            storage = make_local_storage(self.account, self.member)
+            repository = Repository(storage, "node-1")
+
+            first_zip = self._zip({"static.bin": static, "db.sql": bytes(changed)})
+            _key, first = repository.store_archive("backup-1", first_zip)
+            changed[4 * 1024 * 1024:4 * 1024 * 1024] = b"new row"
+            second_zip = self._zip({"static.bin": static, "db.sql": bytes(changed)})
+            key, second = repository.store_archive("backup-2", second_zip)
+
+            self.assertEqual(first["reused_members"], 0)
+            self.assertEqual(second["reused_members"], 1)
+            self.assertLess(second["new_chunks"], first["new_chunks"])
+
+            restored = os.path.join(tmp, "restored.zip")
+            repository.restore_archive(key, restored)
+            with zipfile.ZipFile(restored) as zf:
+                self.assertEqual(zf.read("static.bin"), static)
+                self.assertEqual(zf.read("db.sql"), bytes(changed))
+
+    @mock.patch.multiple(DEDUP, MIN_CHUNK=1000, MAX_CHUNK=50000, SCAN_BLOCK=97,
+                         BOUNDARY_MASK=((1 << 6) - 1) << 58)
+    def test_boundary_matches_the_rolling_gear_hash(self):
+        def rolling(buf):
+            h, position = 0, DEDUP.MIN_CHUNK
+            for byte in buf[DEDUP.MIN_CHUNK:DEDUP.MAX_CHUNK]:
+                h = ((h << 1) + int(DEDUP.GEAR[byte])) & ((1 << 64) - 1)
+                position += 1
+                if not h & DEDUP.BOUNDARY_MASK:
+                    return position
+            return min(len(buf), DEDUP.MAX_CHUNK)
+
+        rng = random.Random(7)
+        for _ in range(200):
+            buf = bytearray(rng.randbytes(rng.randint(1001, 60000)))
+            self.assertEqual(DEDUP._boundary(buf, len(buf)), rolling(buf))
+
+    def test_prune_keeps_chunks_still_referenced(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(LOCAL_STORAGE_ROOT=tmp):
+            storage = make_local_storage(self.account, self.member)
+            repository = Repository(storage, "node-1")
+            shared = os.urandom(1024 * 1024)
+            first_zip = self._zip({"a": shared, "b": os.urandom(1024)})
+            first_key, _ = repository.store_archive("backup-1", first_zip)
+            second_key, _ = repository.store_archive("backup-2", self._zip({"a": shared}))
+
+            repository.delete_manifest(first_key)
+            self.assertEqual(repository.prune(grace=0), 1)
+            repository.restore_archive(second_key, os.path.join(tmp, "restored.zip"))
+
+    def test_retention_leaves_backups_on_a_no_delete_storage(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(LOCAL_STORAGE_ROOT=tmp):
+            storage = make_local_storage(self.account, self.member, no_delete=True)
+            point = make_website_backup_point(
+                self.member, storage,
+                status=CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE,
+            )
+            repository = Repository(storage, point.backup.node.uuid_str)
+            key, _ = repository.store_archive(point.backup.uuid, self._zip({"a": b"data"}))
+            point.storage_file_id = repository.store.location(key)
+            point.metadata = {"format": DEDUP.FORMAT, "manifest": key}
+            point.save()
+
+            delete_stored_backups(CoreWebsiteBackupStoragePoints.objects.filter(id=point.id))
+
+            point.refresh_from_db()
+            self.assertEqual(point.status, CoreWebsiteBackupStoragePoints.Status.UPLOAD_COMPLETE)
+            repository.restore_archive(key, os.path.join(tmp, "restored.zip"))
+
+    def test_dedup_storage_dispatches_to_repository(self):
+        storage = make_local_storage(self.account, self.member)
+        storage.dedup_repository = True
+        point = SimpleNamespace(storage=storage)
+        with mock.patch("apps._tasks.integration.storage.registry.storage_dedup") as storage_dedup, \
+                mock.patch.object(get_backend("local"), "uploader") as uploader:
+            get_backend("local").upload(point)
+        storage_dedup.assert_called_once_with(point)
+        uploader.assert_not_called()
@@ -382,6 +382,66 @@ TELEGRAM_BOT_KEY = config.get("TELEGRAM_BOT_KEY", "")
 # disk/NFS mount (or bind-mount over /backups) to move where backups land.
 LOCAL_STORAGE_ROOT = config.get("BS_LOCAL_STORAGE_PATH", "/backups")
 
+# Streaming database backups (CoreDatabase.option_stream_upload): dumps are zipped
+# straight into S3 multipart uploads instead of _storage/{uuid}.zip. Part size (MiB,
+# S3 minimum 5) and the number of parts buffered/in flight at once bound the dump
+# worker's memory to roughly (inflight + 1) parts.
+STREAM_UPLOAD_PART_SIZE = int(config.get("BS_STREAM_UPLOAD_PART_SIZE_MB", 64)) * 1024 * 1024
+STREAM_UPLOAD_MAX_INFLIGHT = int(config.get("BS_STREAM_UPLOAD_MAX_INFLIGHT", 2))
+
+# Multipart tuning for the S3-compatible upload engine (storage.s3_compat.s3_upload_file).
+# Per-storage CoreStorage.upload_* values override these; the defaults match boto3's.
+S3_UPLOAD_PART_SIZE = int(config.get("BS_S3_UPLOAD_PART_SIZE_MB", 8)) * 1024 * 1024
+S3_UPLOAD_MAX_CONCURRENCY = int(config.get("BS_S3_UPLOAD_MAX_CONCURRENCY", 10))
+
+# How long cloud-drive folder IDs (Google Drive, pCloud) stay cached per storage
+# (storage.folders); a missing folder drops its entry early.
+STORAGE_FOLDER_CACHE_TTL = int(config.get("BS_STORAGE_FOLDER_CACHE_TTL", 24 * 3600))
+
+# Storage-point validation at backup start (storage.validation): how long a
+# passed / failed validation is reused per storage and credentials, and how many
+# storage points are validated at once.
+STORAGE_VALIDATION_CACHE_TTL = int(config.get("BS_STORAGE_VALIDATION_CACHE_TTL", 300))
+STORAGE_VALIDATION_FAILURE_CACHE_TTL = int(config.get("BS_STORAGE_VALIDATION_FAILURE_CACHE_TTL", 60))
+STORAGE_VALIDATION_CONCURRENCY = int(config.get("BS_STORAGE_VALIDATION_CONCURRENCY", 8))
+
+# Expired backups deleted per delete_expired_backups task (helper.retention).
+RETENTION_BATCH_SIZE = int(config.get("BS_RETENTION_BATCH_SIZE", 200))
+
+# Cloud / volume snapshot polling (helper.snapshot_poller): seconds between checks
+# of a node's snapshots before it has completion history, and the bounds of the
+# adaptive interval. The poll_cloud_snapshots beat task ticks every MIN seconds.
+CLOUD_POLL_INTERVAL = int(config.get("BS_CLOUD_POLL_INTERVAL", 120))
+CLOUD_POLL_MIN_INTERVAL = int(config.get("BS_CLOUD_POLL_MIN_INTERVAL", 30))
+CLOUD_POLL_MAX_INTERVAL = int(config.get("BS_CLOUD_POLL_MAX_INTERVAL", 900))
+
+# Disk-space reservations on _storage (helper.disk_ledger): how long a dump or
+# restore waits for other runs' reservations before failing, and after how long
+# a reservation its worker never released stops counting.
+DISK_RESERVATION_WAIT = int(config.get("BS_DISK_RESERVATION_WAIT", 900))
+DISK_RESERVATION_TTL = int(config.get("BS_DISK_RESERVATION_TTL", 48 * 3600))
+
+# Admission of scheduled backups (helper.admission): the spread of the stable
+# per-schedule start delay, concurrent backups per source host / provider
+# connection / storage destination, and local dumps on _storage at once
+# (0 = unlimited). The admit_scheduled_backups beat task ticks every TICK seconds.
+SCHEDULER_JITTER_SECONDS = int(config.get("BS_SCHEDULER_JITTER_SECONDS", 300))
+SCHEDULER_MAX_PER_HOST = int(config.get("BS_SCHEDULER_MAX_PER_HOST", 2))
+SCHEDULER_MAX_PER_CONNECTION = int(config.get("BS_SCHEDULER_MAX_PER_CONNECTION", 4))
+SCHEDULER_MAX_PER_STORAGE = int(config.get("BS_SCHEDULER_MAX_PER_STORAGE", 8))
+SCHEDULER_MAX_LOCAL_DUMPS = int(config.get("BS_SCHEDULER_MAX_LOCAL_DUMPS", 8))
+SCHEDULER_TICK_SECONDS = int(config.get("BS_SCHEDULER_TICK_SECONDS", 15))
+
+# Upper bounds for the adaptive lftp settings of website mirrors (backup._lftp_tuning):
+# files transferred at once, and segments per file.
+LFTP_MAX_PARALLEL = int(config.get("BS_LFTP_MAX_PARALLEL", 16))
+LFTP_MAX_PGET = int(config.get("BS_LFTP_MAX_PGET", 4))
+
+# zstd settings for schedules whose archive_format is tar_zstd (integration.archive).
+# Threads 0 = one compression thread per core.
+ARCHIVE_ZSTD_LEVEL = int(config.get("BS_ARCHIVE_ZSTD_LEVEL", 3))
+ARCHIVE_ZSTD_THREADS = int(config.get("BS_ARCHIVE_ZSTD_THREADS", 0))
+
 # Storage to be used for application logs etc. Tested with AWS S3 and Cloudflare R2
 S3_ACCESS_KEY_ID = config["S3_ACCESS_KEY_ID"]
 S3_SECRET_ACCESS_KEY = config["S3_SECRET_ACCESS_KEY"]
@@ -525,6 +585,9 @@ CELERY_RESULT_SERIALIZER = "json"
 # autodiscovery does not find them; backups are dispatched by name via
 # send_task()/chord(), which fails on an unregistered task unless listed here.
 CELERY_IMPORTS = (
+    "apps._tasks.helper.admission",
+    "apps._tasks.helper.retention",
+    "apps._tasks.helper.snapshot_poller",
     "apps._tasks.helper.tasks",
     "apps._tasks.integration.aws",
     "apps._tasks.integration.aws_rds",
@@ -567,6 +630,16 @@ CELERY_BEAT_SCHEDULE = {
         "task": "delete_old_db_logs",
         "schedule": crontab(minute=30, hour=3),  # daily at 03:30 (worker timezone)
     },
+    # Check the in-flight cloud / volume snapshots that are due (helper.snapshot_poller).
+    "poll-cloud-snapshots": {
+        "task": "poll_cloud_snapshots",
+        "schedule": float(CLOUD_POLL_MIN_INTERVAL),
+    },
+    # Start queued scheduled backups (see helper.admission).
+    "admit-scheduled-backups": {
+        "task": "admit_scheduled_backups",
+        "schedule": float(SCHEDULER_TICK_SECONDS),
+    },
 }
 
 # Task routing across the worker types (see docker-compose.yml):
@@ -579,7 +652,7 @@ CELERY_BEAT_SCHEDULE = {
 #   logs ...... DB log entries, Slack/Telegram/Firebase notifications, and on-disk
 #               run-log retention (worker-logs)
 #
-# storage_upload/finalize_backup/delete_from_disk go to "storage" so they always run on a
+# storage_upload(_fanout)/finalize_backup/delete_from_disk go to "storage" so they always run on a
 # worker that can see the files the dump produced. Anything not listed here falls to the
 # default queue, drained by the cloud worker.
 CELERY_TASK_DEFAULT_QUEUE = "default"
@@ -594,6 +667,7 @@ CELERY_TASK_ROUTES = {
     "restore_database_backup": {"queue": "database"},
     # Local-disk upload + cleanup — handled by the scalable worker-storage pool.
     "storage_upload": {"queue": "storage"},
+    "storage_upload_fanout": {"queue": "storage"},
     "finalize_backup": {"queue": "storage"},
     "delete_from_disk": {"queue": "storage"},
     # Cloud/volume provider snapshots — API-only, no local disk.
@@ -611,6 +685,12 @@ CELERY_TASK_ROUTES = {
     "backup_ovh_us": {"queue": "cloud"},
     # Async snapshot status polling (re-queues itself); API-only, no local disk.
     "poll_cloud_backup": {"queue": "cloud"},
+    "poll_cloud_snapshots": {"queue": "cloud"},
+    "poll_connection_snapshots": {"queue": "cloud"},
+    # Scheduled-backup admission (database only).
+    "admit_scheduled_backups": {"queue": "cloud"},
+    # Retention deletes (provider APIs only) -- kept off the storage queue.
+    "delete_expired_backups": {"queue": "cloud"},
     # Log + notification pipeline (worker-logs): DB log entries, Slack/Telegram/Firebase
     # fan-out, and on-disk run-log retention.
     "send_log_to_db": {"queue": "logs"},